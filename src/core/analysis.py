@@ -0,0 +1,429 @@
+"""
+Single-pass analysis of a Python module into a compact model shared by every stage
+"""
+
+import ast
+import hashlib
+import json
+import threading
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+
+MODEL_CACHE_SIZE = 512
+# Bump when ModuleModel changes so models persisted by older versions are not reused
+MODEL_FORMAT_VERSION = 1
+# NumPy calls (module functions or array methods) by category; attributes such as
+# np.float32 or np.newaxis count too
+NUMPY_CATEGORIES = {
+    'reduction': {'sum', 'mean', 'max', 'min', 'prod', 'std', 'var', 'argmax', 'argmin', 'cumsum', 'cumprod',
+                  'amax', 'amin', 'nansum', 'nanmean', 'median', 'count_nonzero'},
+    'elementwise': {'exp', 'log', 'log1p', 'sqrt', 'abs', 'absolute', 'sin', 'cos', 'tan', 'tanh', 'power',
+                    'square', 'maximum', 'minimum', 'clip', 'where', 'sign', 'floor', 'ceil', 'isnan', 'isfinite'},
+    'linalg': {'dot', 'matmul', 'inner', 'outer', 'einsum', 'tensordot', 'norm', 'solve', 'inv', 'det', 'eig',
+               'svd', 'cholesky', 'lstsq'},
+    'creation': {'zeros', 'ones', 'empty', 'full', 'zeros_like', 'ones_like', 'empty_like', 'full_like', 'arange',
+                 'linspace', 'array', 'asarray', 'ascontiguousarray', 'eye', 'identity'},
+    'shape': {'reshape', 'transpose', 'ravel', 'flatten', 'concatenate', 'stack', 'vstack', 'hstack', 'squeeze',
+              'tile', 'repeat', 'swapaxes'},
+    'broadcasting': {'newaxis', 'expand_dims', 'broadcast_to', 'broadcast_arrays'},
+    'dtype': {'float32', 'float64', 'int32', 'int64', 'uint8', 'bool_', 'complex128', 'astype', 'dtype'},
+}
+_NUMPY_CATEGORY = {name: category for category, names in NUMPY_CATEGORIES.items() for name in names}
+# Array methods that builtin types do not have, so they count on any object
+_ARRAY_METHODS = NUMPY_CATEGORIES['reduction'] | {'astype', 'reshape', 'ravel', 'flatten', 'transpose', 'dot'}
+NUMPY_KERNEL_THRESHOLD = 3
+
+
+@dataclass
+class FunctionInfo:
+    name: str
+    qualname: str
+    lineno: int
+    end_lineno: int
+    is_async: bool
+    args: list  # [(name, annotation or None)]
+    returns: str = None
+    decorators: list = field(default_factory=list)
+    calls: list = field(default_factory=list)
+    numpy_ops: dict = field(default_factory=dict)  # NUMPY_CATEGORIES category -> count
+
+
+@dataclass
+class ClassInfo:
+    name: str
+    lineno: int
+    end_lineno: int
+    bases: list
+    methods: list = field(default_factory=list)
+
+
+@dataclass
+class Statement:
+    """One top-level statement; the span includes decorators"""
+    kind: str  # 'import', 'function', 'class', 'assign' or 'other'
+    name: str
+    start: int
+    end: int
+    signature: str = ''
+    defines: set = field(default_factory=set)
+    references: set = field(default_factory=set)
+    alone: bool = True  # no other statement shares its first or last line
+
+
+@dataclass
+class ModuleModel:
+    """Everything later stages need from a module, without holding on to the AST"""
+    source_hash: str
+    total_lines: int
+    code_lines: int
+    functions: list
+    classes: list
+    imports: list  # imported module names, relative ones keep their leading dots
+    from_names: list  # 'module.name' for every `from module import name`
+    import_statements: int
+    used_names: set  # every name loaded anywhere, for unused-import detection
+    docstring_spans: list  # (start, end) of docstrings that can be dropped
+    globals: list
+    statements: list
+    call_graph: dict
+    type_hints: int
+
+    def summary(self):
+        return {
+            'functions': len(self.functions),
+            'classes': len(self.classes),
+            'imports': self.import_statements,
+            'total_lines': self.total_lines,
+        }
+
+    def numpy_kernels(self, threshold=NUMPY_KERNEL_THRESHOLD):
+        """Top-level functions with at least `threshold` NumPy operations"""
+        return [function for function in self.functions
+                if function.qualname == function.name and sum(function.numpy_ops.values()) >= threshold]
+
+    def statement_source(self, python_code, statement):
+        lines = python_code.splitlines()
+        return '\n'.join(lines[statement.start - 1:statement.end])
+
+
+def source_hash(python_code):
+    return hashlib.sha256(python_code.encode('utf-8')).hexdigest()
+
+
+def function_signature(node):
+    prefix = 'async def' if isinstance(node, ast.AsyncFunctionDef) else 'def'
+    returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+    return f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+
+
+def class_signature(node):
+    bases = ', '.join(ast.unparse(base) for base in node.bases)
+    lines = [f"class {node.name}({bases}):" if bases else f"class {node.name}:"]
+    for item in node.body:
+        if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            lines.append(f"    {function_signature(item)}")
+    return '\n'.join(lines)
+
+
+def _referenced_names(node):
+    return {n.id for n in ast.walk(node) if isinstance(n, ast.Name) and isinstance(n.ctx, ast.Load)}
+
+
+def _assigned_names(node):
+    names = set()
+    for target in getattr(node, 'targets', [getattr(node, 'target', None)]):
+        if target is None:
+            continue
+        names.update(n.id for n in ast.walk(target) if isinstance(n, ast.Name))
+    return names
+
+
+def _called_names(node):
+    calls = set()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Call):
+            if isinstance(n.func, ast.Name):
+                calls.add(n.func.id)
+            elif isinstance(n.func, ast.Attribute):
+                calls.add(n.func.attr)
+    return sorted(calls)
+
+
+def _import_bindings(node):
+    if isinstance(node, ast.ImportFrom) and (node.module == '__future__' or any(a.name == '*' for a in node.names)):
+        return set()
+    return {alias.asname or alias.name.split('.')[0] for alias in node.names}
+
+
+def numpy_aliases(tree):
+    """(names bound to numpy or numpy.linalg, {local name: numpy name} imported from numpy) for a module AST"""
+    modules, direct = set(), {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.asname or alias.name for alias in node.names
+                           if alias.name in ('numpy', 'numpy.linalg') and (alias.asname or alias.name == 'numpy'))
+        elif isinstance(node, ast.ImportFrom) and node.module in ('numpy', 'numpy.linalg'):
+            direct.update((alias.asname or alias.name, alias.name) for alias in node.names)
+            modules.update(alias.asname or alias.name for alias in node.names if alias.name == 'linalg')
+    return modules, direct
+
+
+def _is_numpy_module(node, modules):
+    """np, np.linalg or a name bound to either"""
+    if isinstance(node, ast.Name):
+        return node.id in modules
+    return isinstance(node, ast.Attribute) and node.attr == 'linalg' and _is_numpy_module(node.value, modules)
+
+
+def _numpy_ops(node, modules, direct):
+    ops = {}
+
+    def count(category):
+        ops[category] = ops.get(category, 0) + 1
+
+    if not modules and not direct:
+        return ops
+    for n in ast.walk(node):
+        if isinstance(n, ast.Attribute) and _is_numpy_module(n.value, modules) and n.attr in _NUMPY_CATEGORY:
+            count(_NUMPY_CATEGORY[n.attr])
+        elif isinstance(n, ast.Attribute) and n.attr == 'T':
+            count('shape')
+        elif isinstance(n, ast.Call):
+            if isinstance(n.func, ast.Name) and direct.get(n.func.id) in _NUMPY_CATEGORY:
+                count(_NUMPY_CATEGORY[direct[n.func.id]])
+            elif (isinstance(n.func, ast.Attribute) and n.func.attr in _ARRAY_METHODS
+                  and not _is_numpy_module(n.func.value, modules)):
+                count(_NUMPY_CATEGORY[n.func.attr])
+            if any(keyword.arg == 'dtype' for keyword in n.keywords):
+                count('dtype')
+        elif isinstance(n, ast.BinOp) and isinstance(n.op, ast.MatMult):
+            count('linalg')
+        elif isinstance(n, ast.Subscript):
+            index = n.slice.elts if isinstance(n.slice, ast.Tuple) else [n.slice]
+            if any(isinstance(item, ast.Constant) and item.value is None for item in index):
+                count('broadcasting')
+    return ops
+
+
+def _owns_lines(node, lines):
+    """True when only the node (and a trailing comment) is on its first and last
+    lines, so dropping those lines drops nothing else"""
+    # Column offsets count UTF-8 bytes
+    before = lines[node.lineno - 1].encode('utf-8')[:node.col_offset]
+    after = lines[node.end_lineno - 1].encode('utf-8')[node.end_col_offset:].strip()
+    return not before.strip() and (not after or after.startswith(b'#'))
+
+
+def _docstring_spans(tree, lines):
+    spans = []
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        body = node.body
+        # A docstring that is the whole body must stay or the code no longer parses
+        if len(body) > 1 and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                and isinstance(body[0].value.value, str) and _owns_lines(body[0], lines):
+            spans.append((body[0].lineno, body[0].end_lineno))
+    return sorted(spans)
+
+
+def _statement_start(node):
+    return min([node.lineno] + [d.lineno for d in getattr(node, 'decorator_list', [])])
+
+
+class _ModelBuilder(ast.NodeVisitor):
+    """Collect functions (including methods and nested defs), classes and hints in one walk"""
+
+    def __init__(self, numpy_names=(set(), set())):
+        self.functions, self.classes = [], []
+        self.type_hints = 0
+        self._scope = []
+        self._numpy_names = numpy_names
+
+    def _visit_function(self, node):
+        args = node.args.posonlyargs + node.args.args + node.args.kwonlyargs
+        args += [arg for arg in (node.args.vararg, node.args.kwarg) if arg is not None]
+        self.type_hints += sum(1 for arg in args if arg.annotation is not None) + (node.returns is not None)
+        self.functions.append(FunctionInfo(
+            name=node.name,
+            qualname='.'.join(self._scope + [node.name]),
+            lineno=_statement_start(node),
+            end_lineno=node.end_lineno,
+            is_async=isinstance(node, ast.AsyncFunctionDef),
+            args=[(arg.arg, ast.unparse(arg.annotation) if arg.annotation else None) for arg in args],
+            returns=ast.unparse(node.returns) if node.returns else None,
+            decorators=[ast.unparse(d) for d in node.decorator_list],
+            calls=_called_names(node),
+            numpy_ops=_numpy_ops(node, *self._numpy_names),
+        ))
+        self._scope.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def visit_ClassDef(self, node):
+        self.classes.append(ClassInfo(
+            name=node.name,
+            lineno=_statement_start(node),
+            end_lineno=node.end_lineno,
+            bases=[ast.unparse(base) for base in node.bases],
+            methods=[item.name for item in node.body
+                     if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef))],
+        ))
+        self._scope.append(node.name)
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_AnnAssign(self, node):
+        self.type_hints += 1
+        self.generic_visit(node)
+
+
+def _top_level_statement(node, lines):
+    start = _statement_start(node)
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return Statement('import', '', start, node.end_lineno, defines=_import_bindings(node),
+                         alone=_owns_lines(node, lines))
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        is_class = isinstance(node, ast.ClassDef)
+        return Statement('class' if is_class else 'function', node.name, start, node.end_lineno,
+                         signature=class_signature(node) if is_class else function_signature(node),
+                         defines={node.name}, references=_referenced_names(node) - {node.name})
+    if isinstance(node, (ast.Assign, ast.AnnAssign)):
+        return Statement('assign', '', start, node.end_lineno,
+                         defines=_assigned_names(node), references=_referenced_names(node))
+    return Statement('other', '', start, node.end_lineno, references=_referenced_names(node))
+
+
+def build_module_model(python_code, digest=None):
+    """Parse once and reduce the AST to a ModuleModel; raises SyntaxError"""
+    tree = ast.parse(python_code)
+    builder = _ModelBuilder(numpy_aliases(tree))
+    builder.visit(tree)
+
+    imports, from_names, import_statements = [], [], 0
+    used_names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Name):
+            used_names.add(node.id)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str) and node.value.isidentifier():
+            # Names listed in __all__ or used in string annotations
+            used_names.add(node.value)
+        elif isinstance(node, ast.Import):
+            import_statements += 1
+            imports.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            import_statements += 1
+            module = '.' * node.level + (node.module or '')
+            imports.append(module)
+            from_names.extend(f"{module}.{alias.name}" if node.module else module + alias.name
+                              for alias in node.names)
+
+    lines = python_code.split('\n')
+    statements = [_top_level_statement(node, lines) for node in tree.body]
+    global_names = sorted(set().union(*(s.defines for s in statements if s.kind == 'assign')))
+    return ModuleModel(
+        source_hash=digest or source_hash(python_code),
+        total_lines=len(lines),
+        code_lines=sum(1 for line in lines if line.strip() and not line.strip().startswith('#')),
+        functions=builder.functions,
+        classes=builder.classes,
+        imports=imports,
+        from_names=from_names,
+        import_statements=import_statements,
+        used_names=used_names,
+        docstring_spans=_docstring_spans(tree, lines),
+        globals=global_names,
+        statements=statements,
+        call_graph={function.qualname: function.calls for function in builder.functions},
+        type_hints=builder.type_hints,
+    )
+
+
+def model_to_json(model):
+    return json.dumps(asdict(model), default=sorted)
+
+
+def model_from_json(text):
+    data = json.loads(text)
+    data['functions'] = [FunctionInfo(**dict(function, args=[tuple(arg) for arg in function['args']]))
+                         for function in data['functions']]
+    data['classes'] = [ClassInfo(**info) for info in data['classes']]
+    data['statements'] = [Statement(**dict(statement, defines=set(statement['defines']),
+                                           references=set(statement['references'])))
+                          for statement in data['statements']]
+    data['used_names'] = set(data['used_names'])
+    data['docstring_spans'] = [tuple(span) for span in data['docstring_spans']]
+    return ModuleModel(**data)
+
+
+def model_store_key(digest):
+    return hashlib.sha256(f"module-model\0{MODEL_FORMAT_VERSION}\0{digest}".encode('utf-8')).hexdigest()
+
+
+class ModelCache:
+    """LRU of module models keyed by source hash, bounded by entry count.
+
+    With a `store` (a TranslationCache), models missing from memory are read
+    from and written to disk next to the translations, so a later run skips
+    the parse for files it has seen before.
+    """
+
+    def __init__(self, max_entries=MODEL_CACHE_SIZE, store=None):
+        self.max_entries = max_entries
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, python_code):
+        key = source_hash(python_code)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+            self.misses += 1
+        model = self._load(key)
+        if model is None:
+            model = build_module_model(python_code, key)
+            if self.store is not None:
+                self.store.put(model_store_key(key), model_to_json(model))
+        with self._lock:
+            self._models[key] = model
+            while len(self._models) > self.max_entries:
+                self._models.popitem(last=False)
+        return model
+
+    def _load(self, key):
+        if self.store is None:
+            return None
+        text = self.store.get(model_store_key(key), counted=False)
+        if text is None:
+            return None
+        try:
+            return model_from_json(text)
+        except (ValueError, TypeError, KeyError):
+            return None
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+
+_model_cache = ModelCache()
+
+
+def persist_models(store):
+    """Keep module models in `store` (a TranslationCache) as well as in memory"""
+    _model_cache.store = store
+
+
+def analyze_module(python_code):
+    """Return the cached ModuleModel for `python_code`; raises SyntaxError"""
+    return _model_cache.get(python_code)
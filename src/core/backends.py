@@ -0,0 +1,361 @@
+"""
+Translation backends: one long-lived pooled client per provider, retries with
+jittered exponential backoff and a per-target registry driven by config
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+import weakref
+
+import openai
+
+try:
+    import anthropic
+except ImportError:
+    anthropic = None
+
+from src.core.tracing import current_span, tracer
+
+SYSTEM_PROMPT = "You are a code migration assistant."
+DEFAULT_TARGETS = {
+    'cpp': {'provider': 'openai', 'model': 'gpt-3.5-turbo'},
+    'rust': {'provider': 'anthropic', 'model': 'claude-3-sonnet-20240229'},
+}
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_TEMPERATURE = 0.1
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLED_STATUS = {429, 529}
+
+_rate_limit_listeners = []
+
+
+class BackendError(Exception):
+    """A request failed for good: not retryable, or out of retries"""
+
+
+def is_api_error(error):
+    if isinstance(error, openai.OpenAIError):
+        return True
+    if anthropic is not None and isinstance(error, anthropic.AnthropicError):
+        return True
+    return hasattr(error, 'status_code')
+
+
+def is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if anthropic is not None and isinstance(error, (anthropic.APITimeoutError, anthropic.APIConnectionError)):
+        return True
+    return getattr(error, 'status_code', None) in RETRYABLE_STATUS
+
+
+def retry_delay(error, attempt, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Full-jitter backoff, or the server's Retry-After when it sends one"""
+    response = getattr(error, 'response', None)
+    retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+    try:
+        if retry_after is not None:
+            return min(cap, float(retry_after))
+    except ValueError:
+        pass
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def add_rate_limit_listener(listener):
+    """Call `listener(headers, throttled)` after every response, e.g. a RequestScheduler's observe"""
+    _rate_limit_listeners.append(listener)
+
+
+def remove_rate_limit_listener(listener):
+    if listener in _rate_limit_listeners:
+        _rate_limit_listeners.remove(listener)
+
+
+def notify_rate_limit(headers, throttled=False):
+    for listener in list(_rate_limit_listeners):
+        listener(headers or {}, throttled)
+
+
+def _notify_error(error):
+    response = getattr(error, 'response', None)
+    if getattr(error, 'status_code', None) in THROTTLED_STATUS:
+        notify_rate_limit(getattr(response, 'headers', None), throttled=True)
+
+
+async def _close_at_shutdown(client):
+    try:
+        yield
+    finally:
+        await client.close()
+
+
+class Backend:
+    """A model behind one shared client; subclasses implement the `_…` calls"""
+
+    provider = None
+
+    def __init__(self, model, base_url=None, api_key=None, timeout=DEFAULT_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES):
+        self.model = model
+        self.base_url = base_url
+        self.api_key = api_key
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()  # loop -> (client, closer)
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._make_client()
+            return self._client
+
+    async def async_client(self):
+        """The client for the running loop, closed when that loop shuts down.
+
+        Async clients are bound to the loop that first uses them, so each
+        asyncio.run() gets its own; asyncio.run() finalizes the closer
+        generator before closing the loop, after which it would be too late.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_clients.get(loop)
+            if entry is None:
+                client = self._make_async_client()
+                entry = self._async_clients[loop] = (client, _close_at_shutdown(client))
+                started = False
+            else:
+                started = True
+        if not started:
+            await entry[1].asend(None)
+        return entry[0]
+
+    def _raise_unless_retryable(self, error, attempt):
+        if is_retryable(error) and attempt < self.max_retries:
+            return
+        if is_api_error(error):
+            raise BackendError(f"{self.provider} request failed after {attempt + 1} attempts: {error}") from error
+        raise error
+
+    def _trace_retry(self, error, delay):
+        current_span().add('retries')
+        tracer.instant('retry', model=self.model, error=error.__class__.__name__,
+                       status=getattr(error, 'status_code', None), delay_ms=round(delay * 1000, 1))
+
+    def _retrying(self, call):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return call()
+            except Exception as e:
+                _notify_error(e)
+                self._raise_unless_retryable(e, attempt)
+                delay = retry_delay(e, attempt)
+                self._trace_retry(e, delay)
+                print(f"Retrying {self.model} request in {delay:.1f}s ({e.__class__.__name__})")
+                time.sleep(delay)
+
+    async def _retrying_async(self, call):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await call()
+            except Exception as e:
+                _notify_error(e)
+                self._raise_unless_retryable(e, attempt)
+                delay = retry_delay(e, attempt)
+                self._trace_retry(e, delay)
+                print(f"Retrying {self.model} request in {delay:.1f}s ({e.__class__.__name__})")
+                await asyncio.sleep(delay)
+
+    def complete(self, prompt, max_tokens):
+        return self._retrying(lambda: self._complete(prompt, max_tokens))
+
+    async def acomplete(self, prompt, max_tokens, temperature=None):
+        """`temperature` overrides the default, e.g. for speculative candidates"""
+        extra = {} if temperature is None else {'temperature': temperature}
+        return await self._retrying_async(lambda: self._acomplete(prompt, max_tokens, **extra))
+
+    def stream(self, prompt, max_tokens):
+        """Yield (text, finish_reason); only opening the stream is retried"""
+        chunks = self._retrying(lambda: self._open_stream(prompt, max_tokens))
+        yield from chunks
+
+
+class OpenAIBackend(Backend):
+    """OpenAI or any OpenAI-compatible server (set base_url for a local stand-in)"""
+
+    provider = 'openai'
+
+    def _client_kwargs(self):
+        api_key = self.api_key or os.environ.get('OPENAI_API_KEY')
+        if api_key is None and self.base_url:
+            api_key = 'local'
+        # Retries happen here, with jitter, rather than inside the SDK
+        return {'base_url': self.base_url, 'api_key': api_key, 'timeout': self.timeout, 'max_retries': 0}
+
+    def _make_client(self):
+        return openai.OpenAI(**self._client_kwargs())
+
+    def _make_async_client(self):
+        return openai.AsyncOpenAI(**self._client_kwargs())
+
+    def _request(self, prompt, max_tokens, temperature=None, **extra):
+        temperature = DEFAULT_TEMPERATURE if temperature is None else temperature
+        return dict(model=self.model, max_tokens=max_tokens, temperature=temperature, messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ], **extra)
+
+    def _text(self, response):
+        choice = response.choices[0] if response.choices else None
+        if choice is None or choice.message.content is None:
+            reason = choice.finish_reason if choice is not None else 'no choices'
+            raise BackendError(f"{self.model} returned no text ({reason})")
+        return choice.message.content.strip()
+
+    # Raw responses expose the x-ratelimit-* headers the scheduler adapts to
+    def _complete(self, prompt, max_tokens):
+        raw = self.client().chat.completions.with_raw_response.create(**self._request(prompt, max_tokens))
+        notify_rate_limit(raw.headers)
+        return self._text(raw.parse())
+
+    async def _acomplete(self, prompt, max_tokens, temperature=None):
+        raw = await (await self.async_client()).chat.completions.with_raw_response.create(
+            **self._request(prompt, max_tokens, temperature))
+        notify_rate_limit(raw.headers)
+        return self._text(raw.parse())
+
+    def _open_stream(self, prompt, max_tokens):
+        raw = self.client().chat.completions.with_raw_response.create(
+            **self._request(prompt, max_tokens, stream=True))
+        notify_rate_limit(raw.headers)
+        stream = raw.parse()
+
+        def chunks():
+            try:
+                for chunk in stream:
+                    if chunk.choices:
+                        choice = chunk.choices[0]
+                        yield choice.delta.content or "", choice.finish_reason
+            finally:
+                stream.close()
+        return chunks()
+
+
+class AnthropicBackend(Backend):
+    provider = 'anthropic'
+
+    def _client_kwargs(self):
+        if anthropic is None:
+            raise BackendError("the anthropic package is not installed (pip install anthropic)")
+        return {'base_url': self.base_url, 'api_key': self.api_key or os.environ.get('ANTHROPIC_API_KEY'),
+                'timeout': self.timeout, 'max_retries': 0}
+
+    def _make_client(self):
+        return anthropic.Anthropic(**self._client_kwargs())
+
+    def _make_async_client(self):
+        return anthropic.AsyncAnthropic(**self._client_kwargs())
+
+    def _request(self, prompt, max_tokens, temperature=None):
+        request = dict(model=self.model, max_tokens=max_tokens, system=SYSTEM_PROMPT,
+                       messages=[{"role": "user", "content": prompt}])
+        if temperature is not None:
+            request['temperature'] = temperature
+        return request
+
+    def _text(self, response):
+        texts = [block.text for block in response.content if getattr(block, 'type', None) == 'text']
+        if not texts:
+            raise BackendError(f"{self.model} returned no text ({response.stop_reason})")
+        return ''.join(texts).strip()
+
+    def _complete(self, prompt, max_tokens):
+        raw = self.client().messages.with_raw_response.create(**self._request(prompt, max_tokens))
+        notify_rate_limit(raw.headers)
+        return self._text(raw.parse())
+
+    async def _acomplete(self, prompt, max_tokens, temperature=None):
+        raw = await (await self.async_client()).messages.with_raw_response.create(
+            **self._request(prompt, max_tokens, temperature))
+        notify_rate_limit(raw.headers)
+        return self._text(raw.parse())
+
+    def _open_stream(self, prompt, max_tokens):
+        manager = self.client().messages.stream(**self._request(prompt, max_tokens))
+        stream = manager.__enter__()
+
+        def chunks():
+            try:
+                for text in stream.text_stream:
+                    yield text, None
+                truncated = stream.get_final_message().stop_reason == 'max_tokens'
+                yield "", 'length' if truncated else 'stop'
+            finally:
+                manager.__exit__(None, None, None)
+        return chunks()
+
+
+PROVIDERS = {'openai': OpenAIBackend, 'anthropic': AnthropicBackend}
+
+_config = {target: dict(settings) for target, settings in DEFAULT_TARGETS.items()}
+_instances = {}
+_registry_lock = threading.Lock()
+
+
+def load_backend_config(path):
+    """Read {target: {provider, model, base_url, timeout, max_retries}} from JSON or YAML"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if str(path).endswith(('.yaml', '.yml')):
+            import yaml
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def configure_backends(config=None, **overrides):
+    """Merge per-target settings into the registry; `overrides` map target -> settings"""
+    with _registry_lock:
+        for target, settings in list((config or {}).items()) + list(overrides.items()):
+            merged = dict(_config.get(target, {}))
+            merged.update({key: value for key, value in settings.items() if value is not None})
+            if merged.get('provider') not in PROVIDERS:
+                raise ValueError(f"Unknown provider for {target}: {merged.get('provider')}")
+            if merged != _config.get(target):
+                # Rebuilt on next use so the new settings take effect; unchanged targets keep their warm client
+                _instances.pop(target, None)
+            _config[target] = merged
+
+
+def reset_backends():
+    with _registry_lock:
+        _config.clear()
+        _config.update({target: dict(settings) for target, settings in DEFAULT_TARGETS.items()})
+        _instances.clear()
+
+
+def register_backend(target_language, backend):
+    """Install a ready-made backend for a target, e.g. a test double"""
+    with _registry_lock:
+        _instances[target_language] = backend
+
+
+def get_backend(target_language):
+    """The shared backend for `target_language`, created on first use"""
+    with _registry_lock:
+        backend = _instances.get(target_language)
+        if backend is None:
+            settings = dict(_config[target_language])
+            backend = PROVIDERS[settings.pop('provider')](**settings)
+            _instances[target_language] = backend
+        return backend
+
+
+def model_for(target_language):
+    return get_backend(target_language).model
@@ -0,0 +1,635 @@
+"""
+Batch migration of directories and globs with bounded concurrent LLM calls
+"""
+
+import asyncio
+import glob
+import itertools
+import math
+import os
+import time
+
+from collections.abc import Mapping
+from dataclasses import dataclass, replace
+from pathlib import Path
+
+from src.core.backends import add_rate_limit_listener, model_for, remove_rate_limit_listener
+from src.core.chunking import translate_chunked_async
+from src.core.dedup import DedupIndex
+from src.core.journal import MigrationJournal
+from src.core.manifest import (
+    translate_incremental_async, output_is_current, write_manifest, content_hash, record_repair,
+)
+from src.core.project import (
+    build_import_graph, topological_waves, extract_interface, dependency_context, module_name,
+)
+from src.core.repair import repair_async, DEFAULT_MAX_ITERATIONS, DEFAULT_TOKEN_BUDGET
+from src.core.pipeline import (
+    DEFAULT_MAX_MEMORY_MB, MEMORY_PER_SOURCE_BYTE, MemoryBudget, peak_rss_mb, run_pipeline,
+)
+from src.core.streaming import finalize_partial, discard_partial
+from src.core.main import (
+    PROMPT_VERSION,
+    cached_translation,
+    complete_prompt_async,
+    stream_translation,
+    speculative_translation_async,
+    read_python_file,
+    analyze_python_code,
+    needs_chunking,
+    convert_to_cpp,
+    convert_to_rust,
+    write_cpp_file,
+)
+from src.core.scheduler import RequestScheduler, request_cost
+from src.core.speculative import stdout_check
+from src.core.tokens import current_file, usage
+from src.core.tracing import tracer
+from src.core.validation import ValidationPool, UNITY_GROUP_SIZE
+from src.core.workspace import validation_report
+
+DEFAULT_CONCURRENCY = 8
+TARGET_EXTENSIONS = {'cpp': '.cpp', 'rust': '.rs'}
+# Files in flight per LLM slot: one waiting for the model while another validates
+FILES_PER_SLOT = 2
+
+
+@dataclass
+class BatchOptions:
+    target_language: str
+    output_dir: str
+    context: str = ""
+    concurrency: int = DEFAULT_CONCURRENCY
+    validate: bool = True
+    cache: object = None
+    chunked: bool = False
+    incremental: bool = False
+    validate_tier: str = 'syntax'
+    compile_timeout: float = None
+    workspace: object = None
+    unity: bool = False
+    max_repairs: int = DEFAULT_MAX_ITERATIONS
+    repair_token_budget: int = DEFAULT_TOKEN_BUDGET
+    stream: bool = False
+    project: bool = False
+    rpm: int = None
+    tpm: int = None
+    compile_flags: tuple = ()
+    dedup: object = None
+    max_memory_mb: int = DEFAULT_MAX_MEMORY_MB
+    journal: object = None
+    resume: bool = False
+    candidates: int = 1
+    candidate_check: bool = False
+
+
+class BatchValidator:
+    """Async front end to a ValidationPool.
+
+    In unity mode, files finishing conversion close together are collected
+    for a short window and validated as one unity group.
+    """
+
+    def __init__(self, pool, tier, unity=False, window=0.05):
+        self.pool = pool
+        self.tier = tier
+        self.unity = unity
+        self.window = window
+        self._waiting = {}
+        self._flush_handle = None
+
+    async def validate(self, cpp_code):
+        if not self.unity:
+            return await asyncio.wrap_future(self.pool.submit(cpp_code, self.tier))
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[len(self._waiting)] = (cpp_code, future)
+        if len(self._waiting) >= UNITY_GROUP_SIZE:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        waiting, self._waiting = self._waiting, {}
+        if waiting:
+            asyncio.get_running_loop().create_task(self._validate_group(waiting))
+
+    async def _validate_group(self, waiting):
+        sources = {index: cpp_code for index, (cpp_code, _) in waiting.items()}
+        try:
+            results = await asyncio.to_thread(lambda: dict(self.pool.validate_many(sources, self.tier, unity=True)))
+        except Exception as e:
+            for _, future in waiting.values():
+                future.set_exception(e)
+            return
+        for index, (_, future) in waiting.items():
+            future.set_result(results[index])
+
+
+def is_batch_input(input_spec):
+    return os.path.isdir(input_spec) or any(ch in input_spec for ch in '*?[')
+
+
+def discover_python_files(input_spec):
+    """Return the input root and the sorted list of Python files it covers"""
+    if os.path.isdir(input_spec):
+        root = Path(input_spec)
+        files = sorted(path for path in root.rglob('*.py') if path.is_file())
+        return root, files
+
+    files = sorted(
+        Path(path) for path in glob.glob(input_spec, recursive=True)
+        if path.endswith('.py') and os.path.isfile(path)
+    )
+    if not files:
+        return Path('.'), []
+    root = Path(os.path.commonpath([str(path.parent) for path in files]))
+    return root, files
+
+
+def iter_python_files(root):
+    """Python files under `root`, yielded while the tree is walked (sorted within each directory)"""
+    for directory, subdirectories, names in os.walk(root):
+        subdirectories.sort()
+        for name in sorted(names):
+            path = Path(directory) / name
+            if name.endswith('.py') and path.is_file():
+                yield path
+
+
+def iter_batch_files(input_spec):
+    """Like discover_python_files, but a directory is walked lazily as files are consumed.
+
+    A glob's root is the common parent of its matches, so globs are still
+    listed up front (paths only).
+    """
+    if os.path.isdir(input_spec):
+        return Path(input_spec), iter_python_files(input_spec)
+    root, files = discover_python_files(input_spec)
+    return root, iter(files)
+
+
+class _SourceFiles(Mapping):
+    """Path -> source, read when accessed so an import graph never holds the whole tree"""
+
+    def __init__(self, files):
+        self.files = files
+
+    def __getitem__(self, path):
+        return read_python_file(str(path)) or ""
+
+    def __iter__(self):
+        return iter(self.files)
+
+    def __len__(self):
+        return len(self.files)
+
+
+def _source_weight(source_file):
+    try:
+        return os.path.getsize(source_file) * MEMORY_PER_SOURCE_BYTE
+    except OSError:
+        return 0
+
+
+def _journal_key(output_path, options):
+    return os.path.relpath(output_path, options.output_dir)
+
+
+def _run_parameters(options):
+    """Everything besides the source and context that journaled code depends on"""
+    target_language = options.target_language
+    return '\0'.join((target_language, model_for(target_language), str(PROMPT_VERSION),
+                      options.validate_tier if options.validate else 'unvalidated',
+                      ' '.join(options.compile_flags)))
+
+
+def _journaled_units(journal, key, lookup, convert, reused, parameters):
+    """lookup/convert pair that reuses unit translations from the journal and
+    records new ones; each reuse appends to `reused`"""
+    def unit_key(source, context):
+        return content_hash('\0'.join((parameters, context, source)))
+
+    def journal_lookup(source, context):
+        code = journal.unit(key, unit_key(source, context))
+        if code is not None:
+            reused.append(key)
+            return code
+        return lookup(source, context) if lookup is not None else None
+
+    def journal_convert(source, context, cache=None):
+        code = convert(source, context, cache)
+        if code is not None:
+            journal.record_unit(key, unit_key(source, context), code)
+        return code
+
+    return journal_lookup, journal_convert
+
+
+def mirror_output_path(source_file, input_root, output_dir, target_language):
+    relative = Path(source_file).relative_to(input_root)
+    return Path(output_dir) / relative.with_suffix(TARGET_EXTENSIONS[target_language])
+
+
+def default_output_dir(input_spec, target_language):
+    input_root, _ = iter_batch_files(input_spec)
+    return f"{input_root.resolve().name}_{target_language}"
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = math.ceil(fraction * len(ordered))
+    return ordered[max(0, min(len(ordered), rank) - 1)]
+
+
+def _write_output(converted_code, output_path):
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    return write_cpp_file(converted_code, str(output_path))
+
+
+async def _write_traced(converted_code, output_path):
+    with tracer.span('write', cpu=False, bytes=len(converted_code)):
+        return await asyncio.to_thread(_write_output, converted_code, output_path)
+
+
+async def _migrate_stages(source_file, output_path, options, result, llm_slots, validator):
+    with tracer.span('read', cpu=False) as span:
+        python_code = await asyncio.to_thread(read_python_file, str(source_file))
+        span.set('bytes', len(python_code or ""))
+    if python_code is None:
+        result['error'] = 'read failed'
+        return
+
+    target_language = options.target_language
+    journal, key, resumed = options.journal, None, None
+    if journal is not None:
+        key = _journal_key(output_path, options)
+        input_hash = content_hash('\0'.join((_run_parameters(options), options.context, python_code)))
+        entry = journal.entry(key) if options.resume else None
+        if entry is not None and entry['input_hash'] == input_hash:
+            if entry['state'] == 'written' and os.path.exists(output_path):
+                result['status'] = 'ok'
+                result['resumed'] = 'written'
+                result['resumed_tokens'] = entry['prompt_tokens'] + entry['completion_tokens']
+                return
+            if entry['state'] in ('translated', 'validated') and entry['code'] is not None:
+                resumed = entry
+                result['resumed'] = entry['state']
+        journal.begin(key, input_hash)
+
+    with tracer.span('analyze'):
+        result['analysis'] = analyze_python_code(python_code)
+
+    convert = convert_to_cpp if target_language == 'cpp' else convert_to_rust
+    # With validation on, this file's translations reach the cache only once its code compiles;
+    # without it they go under keys that validated runs never read
+    cache = options.cache
+    if cache is not None and validator is not None:
+        cache = cache.held()
+    elif cache is not None:
+        cache = cache.unvalidated()
+    manifest = replacements = None
+    # Only a .part this run streamed may be moved into place; an older one is a crashed run's leftover
+    streamed = False
+    convert_started = time.perf_counter()
+
+    # Cache hits never enter the request queue, so they cost no rate-limit budget
+    lookup = None
+    if cache is not None:
+        def lookup(source, context):
+            return cached_translation(source, context, cache, target_language)
+    unit_lookup, unit_convert, units_resumed = lookup, convert, []
+    if journal is not None:
+        unit_lookup, unit_convert = _journaled_units(journal, key, lookup, convert, units_resumed,
+                                                     _run_parameters(options))
+
+    verdict = None
+    with tracer.span('convert', cpu=False, bytes=len(python_code)):
+        if resumed is not None:
+            converted_code = resumed['code']
+            # A stream cut off by the crash must not be finalized in place of the journaled code
+            discard_partial(output_path)
+        elif options.incremental:
+            converted_code, manifest, stats = await translate_incremental_async(
+                python_code, unit_convert, target_language, output_path, model_for(target_language),
+                PROMPT_VERSION, options.context, cache, llm_slots, unit_lookup,
+                options.dedup, str(source_file))
+            result['units_reused'] = stats['reused']
+            result['units_translated'] = stats['translated']
+            if converted_code is not None and not stats['translated'] and output_is_current(output_path, manifest):
+                if journal is not None:
+                    journal.advance(key, 'written', converted_code)
+                result['status'] = 'ok'
+                return
+        elif options.chunked or needs_chunking(python_code, options.context, target_language):
+            converted_code = await translate_chunked_async(python_code, unit_convert, target_language,
+                                                           options.context, cache, llm_slots, unit_lookup,
+                                                           options.dedup, str(source_file))
+        else:
+            converted_code = None
+            if lookup is not None:
+                converted_code = await asyncio.to_thread(lookup, python_code, options.context)
+            cost = request_cost(python_code + options.context, target_language)
+            if converted_code is None and options.stream:
+                async with llm_slots.slot(cost):
+                    converted_code, stream_result = await asyncio.to_thread(
+                        stream_translation, python_code, target_language, options.context, cache, output_path)
+                if stream_result is not None:
+                    streamed = not stream_result['aborted']
+                    result['ttfb'] = stream_result['ttfb']
+                    if stream_result['aborted']:
+                        result['aborted_tokens'] = stream_result['tokens']
+            elif converted_code is None and options.candidates > 1 and validator is not None:
+                check = stdout_check(source_file, target_language) if options.candidate_check else None
+                converted_code, verdict, race = await speculative_translation_async(
+                    python_code, target_language, options.context, cache, options.candidates,
+                    validator.validate, check, llm_slots)
+                if race is not None:
+                    result['race'] = race
+            elif converted_code is None:
+                async with llm_slots.slot(cost):
+                    converted_code = await asyncio.to_thread(convert, python_code, options.context, cache)
+    result['convert_time'] = time.perf_counter() - convert_started
+    if units_resumed:
+        result['units_resumed'] = len(units_resumed)
+    if converted_code is None:
+        result['error'] = 'conversion failed'
+        if journal is not None:
+            journal.fail(key, result['error'])
+        return
+    if journal is not None and resumed is None:
+        journal.advance(key, 'translated', converted_code)
+
+    if validator is not None and result.get('resumed') != 'validated':
+        # A speculative winner was already validated as it arrived
+        if verdict is None:
+            with tracer.span('compile', cpu=False, bytes=len(converted_code)) as span:
+                verdict = await validator.validate(converted_code)
+                span.set('compiler_ms', round(verdict['duration'] * 1000, 3))
+        result['compile_time'] = verdict['duration']
+        result['compiled'] = verdict['success']
+        if not verdict['success'] and options.max_repairs:
+            async def complete_async(prompt):
+                async with llm_slots.slot(request_cost(prompt, target_language)):
+                    return await complete_prompt_async(prompt, target_language)
+
+            with tracer.span('repair', cpu=False):
+                converted_code, repaired, errors, repair_stats = await repair_async(
+                    converted_code, target_language, validator.validate, complete_async,
+                    options.max_repairs, options.repair_token_budget, verdict['errors'])
+            result['repair_rounds'] = repair_stats['iterations']
+            result['repaired'] = repaired
+            if repaired and manifest is not None:
+                replacements = record_repair(manifest, converted_code)
+            verdict = {'success': repaired, 'errors': errors}
+        if not verdict['success']:
+            discard_partial(output_path)
+            if cache is not options.cache:
+                cache.discard()
+            print(f"Compilation failed for {source_file}:\n{verdict['errors']}")
+            result['error'] = 'compilation failed'
+            if journal is not None:
+                # Reusing the same translation on a retry would only fail the same way
+                journal.fail(key, result['error'], drop_units=True)
+            return
+        if cache is not options.cache:
+            if result['compiled'] or replacements is not None:
+                cache.commit(replacements)
+            else:
+                # Repaired without a per-unit mapping: which cached translation broke is unknown
+                cache.discard()
+        if journal is not None:
+            journal.advance(key, 'validated', converted_code)
+
+    if streamed and await asyncio.to_thread(finalize_partial, output_path, converted_code):
+        result['status'] = 'ok'
+    elif await _write_traced(converted_code, output_path):
+        discard_partial(output_path)
+        if manifest is not None:
+            write_manifest(output_path, manifest)
+        result['status'] = 'ok'
+    else:
+        result['error'] = 'write failed'
+    if journal is not None:
+        if result['status'] == 'ok':
+            journal.advance(key, 'written', converted_code)
+        else:
+            journal.fail(key, result['error'])
+
+
+async def _migrate_file(source_file, output_path, options, llm_slots, validator):
+    started = time.perf_counter()
+    result = {'file': str(source_file), 'output': str(output_path), 'status': 'failed', 'error': None}
+    # Each file runs in its own task, so this attributes token usage and trace rows per file
+    current_file.set(str(source_file))
+    tracer.start_lane(str(source_file))
+    # The ledger outlives this run; count only what this migration spends
+    spent_before = usage.for_file(str(source_file))
+    try:
+        await _migrate_stages(source_file, output_path, options, result, llm_slots, validator)
+    except Exception as e:
+        # One file blowing up must not take the rest of the batch down with it
+        result['status'], result['error'] = 'failed', f"{type(e).__name__}: {e}"
+        if options.journal is not None:
+            options.journal.fail(_journal_key(output_path, options), result['error'])
+    finally:
+        result['latency'] = time.perf_counter() - started
+        result.update(usage.for_file(str(source_file), since=spent_before))
+        if options.journal is not None:
+            options.journal.add_tokens(_journal_key(output_path, options), result.get('prompt_tokens', 0),
+                                       result.get('completion_tokens', 0))
+    return result
+
+
+async def _run_batch(files, input_root, options):
+    # Cheapest requests first, under the RPM/TPM budgets and the provider's rate-limit headers
+    llm_slots = RequestScheduler(options.concurrency, options.rpm, options.tpm)
+    add_rate_limit_listener(llm_slots.observe)
+    validation_pool, validator = None, None
+    if options.validate:
+        timeouts = {options.validate_tier: options.compile_timeout} if options.compile_timeout else None
+        validation_pool = ValidationPool(timeouts=timeouts, flags=options.compile_flags,
+                                         workspace=options.workspace, language=options.target_language)
+        # Unity builds are a C++ technique; Rust files are checked one crate at a time
+        unity = options.unity and options.target_language == 'cpp'
+        validator = BatchValidator(validation_pool, options.validate_tier, unity)
+
+    def migrate(source_file, file_options=options):
+        output_path = mirror_output_path(source_file, input_root, options.output_dir, options.target_language)
+        return _migrate_file(source_file, output_path, file_options, llm_slots, validator)
+
+    budget = MemoryBudget(options.max_memory_mb * 1024 * 1024) if options.max_memory_mb else None
+    workers = max(1, options.concurrency * FILES_PER_SLOT)
+    try:
+        if options.project:
+            return await _run_waves(list(files), input_root, options, migrate, workers, budget)
+        return await run_pipeline(files, migrate, workers, budget, _source_weight)
+    finally:
+        if budget is not None and budget.waits:
+            print(f"Memory budget: {budget.waits} files waited for memory "
+                  f"(peak {budget.peak / (1024 * 1024):.0f} MB reserved of {options.max_memory_mb} MB)")
+        remove_rate_limit_listener(llm_slots.observe)
+        llm_slots.report()
+        if validation_pool is not None:
+            validation_pool.close()
+            if options.workspace is not None or options.unity:
+                validation_report(validation_pool.stats)
+
+
+async def _run_waves(files, input_root, options, migrate, workers, budget):
+    """Translate modules in import order, one parallel wave at a time.
+
+    Each module's context carries only the translated interfaces of the
+    modules it imports, never their source.
+    """
+    graph = await asyncio.to_thread(build_import_graph, _SourceFiles(files), input_root)
+    waves = topological_waves(graph)
+    print(f"Project: {len(waves)} waves, widest {max(len(wave) for wave in waves)} modules")
+
+    interfaces, results = {}, {}
+    for wave in waves:
+
+        def migrate_module(source_file):
+            known = {module_name(dependency, input_root): interfaces[dependency]
+                     for dependency in graph[source_file] if interfaces.get(dependency)}
+            context = dependency_context(options.context, known, options.target_language)
+            return migrate(source_file, replace(options, context=context))
+
+        wave_results = await run_pipeline(wave, migrate_module, workers, budget, _source_weight)
+        for source_file, result in zip(wave, wave_results):
+            results[source_file] = result
+            if result['status'] == 'ok':
+                output_path = mirror_output_path(source_file, input_root, options.output_dir,
+                                                 options.target_language)
+                code = await asyncio.to_thread(Path(output_path).read_text, encoding='utf-8')
+                interfaces[source_file] = extract_interface(code, options.target_language)
+    return [results[source_file] for source_file in files]
+
+
+def summarize_batch(results, elapsed):
+    races = [result['race'] for result in results if 'race' in result]
+    latencies = [result['latency'] for result in results]
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    python_lines = sum(result['analysis']['total_lines'] for result in results if result.get('analysis'))
+    convert_times = [result['convert_time'] for result in results if 'convert_time' in result]
+    compile_times = [result['compile_time'] for result in results if 'compile_time' in result]
+    # First-attempt verdicts, before any repair
+    compiled = [result['compiled'] for result in results if 'compiled' in result]
+    return {
+        'files': len(results),
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'elapsed': elapsed,
+        'files_per_second': len(results) / elapsed if elapsed > 0 else 0.0,
+        'python_lines': python_lines,
+        'lines_per_second': python_lines / elapsed if elapsed > 0 else 0.0,
+        'p50_latency': percentile(latencies, 0.50),
+        'p95_latency': percentile(latencies, 0.95),
+        'convert_p50': percentile(convert_times, 0.50),
+        'convert_p95': percentile(convert_times, 0.95),
+        'compile_p50': percentile(compile_times, 0.50),
+        'compile_p95': percentile(compile_times, 0.95),
+        'compile_pass_rate': sum(compiled) / len(compiled) if compiled else 0.0,
+        'ttfb_p50': percentile([r['ttfb'] for r in results if r.get('ttfb') is not None], 0.50),
+        'aborted_streams': sum(1 for result in results if 'aborted_tokens' in result),
+        'aborted_tokens': sum(result.get('aborted_tokens', 0) for result in results),
+        'repaired': sum(1 for result in results if result.get('repaired')),
+        'units_reused': sum(result.get('units_reused', 0) for result in results),
+        'units_translated': sum(result.get('units_translated', 0) for result in results),
+        'prompt_tokens': sum(result.get('prompt_tokens', 0) for result in results),
+        'completion_tokens': sum(result.get('completion_tokens', 0) for result in results),
+        'peak_rss_mb': peak_rss_mb(),
+        'resumed_files': sum(1 for result in results if result.get('resumed') == 'written'),
+        'resumed_translations': sum(1 for result in results if result.get('resumed') in ('translated', 'validated')),
+        'units_resumed': sum(result.get('units_resumed', 0) for result in results),
+        'resumed_tokens': sum(result.get('resumed_tokens', 0) for result in results),
+        'speculated': len(races),
+        'race_p95': percentile([race['latency'] for race in races], 0.95),
+        'race_valid': sum(1 for race in races if race['valid']),
+        'race_cancelled': sum(race['cancelled'] for race in races),
+        'race_winner_tokens': sum(race['winner_tokens'] for race in races),
+        'race_extra_tokens': sum(race['extra_tokens'] for race in races),
+        'race_cancelled_tokens': sum(race['cancelled_tokens'] for race in races),
+        'race_winners': {index: sum(1 for race in races if race['winner'] == index)
+                         for index in sorted({race['winner'] for race in races if race['winner'] is not None})},
+    }
+
+
+def print_batch_summary(summary, results):
+    for result in results:
+        if result['status'] != 'ok':
+            print(f"FAILED {result['file']}: {result['error']}")
+    print(f"Migrated {summary['succeeded']}/{summary['files']} files in {summary['elapsed']:.2f}s")
+    if summary['ttfb_p50'] or summary['aborted_streams']:
+        print(f"Streaming: p50 time-to-first-byte {summary['ttfb_p50']:.2f}s, "
+              f"{summary['aborted_streams']} aborted streams ({summary['aborted_tokens']} tokens)")
+    if summary['resumed_files'] or summary['resumed_translations'] or summary['units_resumed']:
+        print(f"Resume: skipped {summary['resumed_files']} finished files (~{summary['resumed_tokens']} tokens "
+              f"not spent again), reused {summary['resumed_translations']} translations and "
+              f"{summary['units_resumed']} units from the journal")
+    if summary['speculated']:
+        winner_tokens = summary['race_winner_tokens']
+        overhead = f" (+{summary['race_extra_tokens'] / winner_tokens:.0%})" if winner_tokens else ""
+        winners = ', '.join(f"#{index}: {count}" for index, count in summary['race_winners'].items())
+        print(f"Speculation: {summary['race_valid']}/{summary['speculated']} files had a valid candidate, "
+              f"p95 {summary['race_p95']:.2f}s to the winner, {summary['race_cancelled']} requests cancelled, "
+              f"~{summary['race_extra_tokens']} extra tokens{overhead}; winners by candidate {winners}")
+    if summary['repaired']:
+        print(f"Repair loop fixed {summary['repaired']} files")
+    if summary['units_reused'] or summary['units_translated']:
+        print(f"Incremental: reused {summary['units_reused']} units, translated {summary['units_translated']}")
+    if summary['prompt_tokens']:
+        print(f"Tokens: {summary['prompt_tokens']} prompt + {summary['completion_tokens']} completion")
+        costly = sorted(results, key=lambda r: r.get('prompt_tokens', 0) + r.get('completion_tokens', 0),
+                        reverse=True)
+        for result in costly[:5]:
+            print(f"  {result['file']}: {result['prompt_tokens']} prompt + "
+                  f"{result['completion_tokens']} completion tokens")
+    print(f"Throughput: {summary['files_per_second']:.2f} files/s ({summary['lines_per_second']:.0f} lines/s), "
+          f"p50 {summary['p50_latency']:.2f}s, p95 {summary['p95_latency']:.2f}s per file")
+    print(f"Memory: peak RSS {summary['peak_rss_mb']:.0f} MB")
+
+
+def run_batch(input_spec, target_language, output_dir, context="",
+              concurrency=DEFAULT_CONCURRENCY, validate=True, cache=None, chunked=False,
+              incremental=False, validate_tier='syntax', compile_timeout=None, workspace=None,
+              unity=False, max_repairs=DEFAULT_MAX_ITERATIONS, repair_token_budget=DEFAULT_TOKEN_BUDGET,
+              stream=False, project=False, rpm=None, tpm=None, compile_flags=(), dedup=False,
+              max_memory=DEFAULT_MAX_MEMORY_MB, resume=False, candidates=1, candidate_check=False):
+    input_root, files = iter_batch_files(input_spec)
+    first = next(files, None)
+    if first is None:
+        print(f"No Python files found for: {input_spec}")
+        return None
+    files = itertools.chain([first], files)
+
+    options = BatchOptions(target_language, output_dir, context, concurrency, validate, cache,
+                           chunked, incremental, validate_tier, compile_timeout, workspace, unity,
+                           max_repairs, repair_token_budget, stream, project, rpm, tpm, compile_flags,
+                           DedupIndex() if dedup else None, max_memory, resume=resume,
+                           candidates=candidates, candidate_check=candidate_check)
+    if dedup:
+        # Functions are deduplicated unit by unit, so every file is translated in chunks
+        options.chunked = True
+    memory = f"memory budget {max_memory} MB" if max_memory else "no memory budget"
+    print(f"Migrating Python files from {input_root} to {output_dir} "
+          f"({target_language}, concurrency {concurrency}, {memory})")
+    started = time.perf_counter()
+    options.journal = MigrationJournal(output_dir, resume)
+    try:
+        results = asyncio.run(_run_batch(files, input_root, options))
+    finally:
+        options.journal.close()
+    summary = summarize_batch(results, time.perf_counter() - started)
+    print_batch_summary(summary, results)
+    if summary['failed']:
+        print(f"Rerun with --resume to retry only the {summary['failed']} unfinished files")
+    if options.dedup is not None:
+        options.dedup.report()
+    return summary
@@ -0,0 +1,244 @@
+"""
+End-to-end performance benchmark against the offline stub server, with JSON
+results for comparing commits
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+from src.core.backends import configure_backends, reset_backends
+from src.core.batch import run_batch
+from src.core.cache import TranslationCache
+from src.core.stub_server import StubLLMServer, load_recordings
+
+RESULTS_VERSION = 1
+# (size name, number of files, functions per file)
+CORPUS_SIZES = (('small', 6, 3), ('medium', 3, 25), ('large', 1, 120))
+HIGHER_IS_BETTER = ('files_per_second', 'lines_per_second', 'compile_pass_rate', 'cache_hit_rate')
+LOWER_IS_BETTER = ('p50_latency', 'p95_latency', 'convert_p95', 'compile_p95', 'prompt_tokens',
+                   'completion_tokens')
+DEFAULT_TOLERANCE = 0.10
+# Share of broken stub completions when tuning --candidates, so races have something to win
+DEFAULT_TUNING_INVALID_RATE = 0.3
+
+
+def generate_program(functions, seed=0):
+    """A deterministic Python module with `functions` functions and a class every tenth"""
+    lines = ['import math', '']
+    for i in range(functions):
+        n = seed * 1000 + i
+        if i % 10 == 9:
+            lines += [f'class Accumulator{n}:', '    def __init__(self):', '        self.total = 0', '',
+                      '    def add(self, value):', '        self.total += value', '        return self.total', '']
+        lines += [f'def step_{n}(values, scale):',
+                  f'    """Scale, filter and sum values (variant {n})"""',
+                  '    result = 0',
+                  '    for value in values:',
+                  f'        if value % {i % 7 + 2} == 0:',
+                  '            result += int(math.sqrt(abs(value)) * scale)',
+                  '        else:',
+                  f'            result -= value // {i % 5 + 1}',
+                  '    return result', '']
+    lines += ['if __name__ == "__main__":',
+              f'    print(step_{seed * 1000}(range(100), 2))', '']
+    return '\n'.join(lines)
+
+
+def write_corpus(directory, sizes=CORPUS_SIZES):
+    """Write the benchmark corpus under `directory`, one subdirectory per size"""
+    directory = Path(directory)
+    seed = 0
+    for name, files, functions in sizes:
+        (directory / name).mkdir(parents=True, exist_ok=True)
+        for index in range(files):
+            (directory / name / f'{name}_{index}.py').write_text(generate_program(functions, seed), encoding='utf-8')
+            seed += 1
+    return directory
+
+
+def git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() or None
+
+
+def run_benchmark(target_language='cpp', latency=0.05, jitter=0.02, error_rate=0.0, rpm=None, tpm=None,
+                  concurrency=8, validate=True, corpus=None, recordings=None, seed=0, invalid_rate=0.0):
+    """Migrate the corpus twice through the stub server: cold, then against a warm cache.
+
+    Returns a JSON-serializable dict with one batch summary per pass plus
+    cache hit rate and token usage for that pass.
+    """
+    config = {'target_language': target_language, 'latency': latency, 'jitter': jitter,
+              'error_rate': error_rate, 'rpm': rpm, 'tpm': tpm, 'concurrency': concurrency,
+              'validate': validate, 'corpus': str(corpus) if corpus else 'generated', 'seed': seed,
+              'invalid_rate': invalid_rate}
+    runs = {}
+    with tempfile.TemporaryDirectory(prefix='migrator-bench-') as tmp, \
+            StubLLMServer(recordings, latency, jitter, error_rate, rpm, tpm, seed,
+                          invalid_rate=invalid_rate) as server:
+        corpus_dir = Path(corpus) if corpus else write_corpus(Path(tmp) / 'corpus')
+        cache = TranslationCache(str(Path(tmp) / 'cache'))
+        configure_backends({target_language: {'provider': 'openai', 'model': 'stub-model',
+                                              'base_url': server.url}})
+        try:
+            for name in ('cold', 'warm'):
+                hits, misses = cache.hits, cache.misses
+                summary = run_batch(str(corpus_dir), target_language, str(Path(tmp) / f'out-{name}'),
+                                    concurrency=concurrency, validate=validate, cache=cache, rpm=rpm, tpm=tpm)
+                if summary is None:
+                    return None
+                lookups = (cache.hits - hits) + (cache.misses - misses)
+                summary['cache_hit_rate'] = (cache.hits - hits) / lookups if lookups else 0.0
+                runs[name] = summary
+        finally:
+            reset_backends()
+        server_stats = dict(server.stats)
+
+    return {'version': RESULTS_VERSION, 'commit': git_commit(),
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'config': config,
+            'server': server_stats, 'runs': runs}
+
+
+def tune_candidates(counts, target_language='cpp', latency=0.05, jitter=0.02,
+                    invalid_rate=DEFAULT_TUNING_INVALID_RATE, concurrency=8, corpus=None, seed=0):
+    """Migrate the corpus once per --candidates count against a stub that breaks
+    `invalid_rate` of its completions.
+
+    Returns one row per count with p95 latency and tokens (cancelled requests
+    counted at their prompt), each also relative to the first count.
+    """
+    rows = []
+    with tempfile.TemporaryDirectory(prefix='migrator-tune-') as tmp, \
+            StubLLMServer(latency=latency, jitter=jitter, seed=seed, invalid_rate=invalid_rate) as server:
+        corpus_dir = Path(corpus) if corpus else write_corpus(Path(tmp) / 'corpus')
+        configure_backends({target_language: {'provider': 'openai', 'model': 'stub-model',
+                                              'base_url': server.url}})
+        try:
+            for count in counts:
+                summary = run_batch(str(corpus_dir), target_language, str(Path(tmp) / f'out-{count}'),
+                                    concurrency=concurrency, candidates=count)
+                if summary is None:
+                    return None
+                rows.append({'candidates': count, 'p50_latency': summary['p50_latency'],
+                             'p95_latency': summary['p95_latency'],
+                             'success_rate': summary['succeeded'] / summary['files'],
+                             'tokens': (summary['prompt_tokens'] + summary['completion_tokens']
+                                        + summary['race_cancelled_tokens'])})
+        finally:
+            reset_backends()
+    first = rows[0]
+    for row in rows:
+        row['p95_improvement'] = 1 - row['p95_latency'] / first['p95_latency'] if first['p95_latency'] else 0.0
+        row['extra_tokens'] = row['tokens'] / first['tokens'] - 1 if first['tokens'] else 0.0
+    return rows
+
+
+def print_candidate_tuning(rows):
+    first = rows[0]['candidates']
+    print(f"{'N':>3} {'p50':>8} {'p95':>8} {f'p95 vs N={first}':>12} {'tokens':>9} {'extra':>7} {'migrated':>9}")
+    for row in rows:
+        print(f"{row['candidates']:>3} {row['p50_latency']:>7.3f}s {row['p95_latency']:>7.3f}s "
+              f"{-row['p95_improvement']:>+12.0%} {row['tokens']:>9} {row['extra_tokens']:>+7.0%} "
+              f"{row['success_rate']:>9.0%}")
+
+
+def compare_benchmarks(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """Return a list of regressions larger than `tolerance` (a fraction) between two result dicts"""
+    regressions = []
+    for name, summary in current['runs'].items():
+        previous = baseline.get('runs', {}).get(name)
+        if previous is None:
+            continue
+        for metric in HIGHER_IS_BETTER + LOWER_IS_BETTER:
+            old, new = previous.get(metric), summary.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (metric in HIGHER_IS_BETTER and change < -tolerance) or (metric in LOWER_IS_BETTER and change > tolerance):
+                regressions.append(f"{name} {metric}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+
+def print_benchmark(results):
+    for name, summary in results['runs'].items():
+        print(f"{name:>5}: {summary['files_per_second']:.2f} files/s, {summary['lines_per_second']:.0f} lines/s, "
+              f"latency p50 {summary['p50_latency']:.3f}s p95 {summary['p95_latency']:.3f}s, "
+              f"convert p95 {summary['convert_p95']:.3f}s, compile p95 {summary['compile_p95']:.3f}s, "
+              f"compile pass {summary['compile_pass_rate']:.0%}, cache hits {summary['cache_hit_rate']:.0%}, "
+              f"{summary['prompt_tokens']}+{summary['completion_tokens']} tokens")
+    stats = results['server']
+    print(f"Stub server: {stats['requests']} requests, {stats['rate_limited']} rate limited, "
+          f"{stats['errors']} injected errors, {stats['replayed']} replayed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline end-to-end migration benchmark')
+    parser.add_argument('--output', '-o', default='benchmark-results.json', help='Where to write the JSON results')
+    parser.add_argument('--baseline', help='Earlier results JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='Relative change that counts as a regression (default: 0.10)')
+    parser.add_argument('--target-language', '-t', default='cpp', choices=['cpp', 'rust'])
+    parser.add_argument('--corpus', help='Directory of Python files to use instead of the generated corpus')
+    parser.add_argument('--recordings', help='Recorded completions for the stub server (JSON)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Stub response latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.02, help='Stub latency jitter in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of stub requests that fail')
+    parser.add_argument('--rpm', type=int, help='Stub and scheduler requests-per-minute limit')
+    parser.add_argument('--tpm', type=int, help='Stub and scheduler tokens-per-minute limit')
+    parser.add_argument('--concurrency', '-j', type=int, default=8)
+    parser.add_argument('--no-validate', action='store_true', help='Skip compilation validation')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--invalid-rate', type=float,
+                        help='Share of stub completions that fail compilation '
+                             f'(default: 0, or {DEFAULT_TUNING_INVALID_RATE} with --tune-candidates)')
+    parser.add_argument('--tune-candidates', metavar='N,N,...',
+                        help='Compare p95 latency and token cost across --candidates counts, e.g. 1,2,4')
+    args = parser.parse_args()
+
+    if args.tune_candidates:
+        counts = [int(count) for count in args.tune_candidates.split(',')]
+        invalid_rate = DEFAULT_TUNING_INVALID_RATE if args.invalid_rate is None else args.invalid_rate
+        rows = tune_candidates(counts, args.target_language, args.latency, args.jitter, invalid_rate,
+                               args.concurrency, args.corpus, args.seed)
+        if rows is None:
+            sys.exit(1)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'version': RESULTS_VERSION, 'commit': git_commit(),
+                       'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'invalid_rate': invalid_rate,
+                       'candidates': rows}, f, indent=2)
+        print_candidate_tuning(rows)
+        print(f"Results written to {args.output}")
+        return
+
+    results = run_benchmark(args.target_language, args.latency, args.jitter, args.error_rate, args.rpm, args.tpm,
+                            args.concurrency, not args.no_validate, args.corpus,
+                            load_recordings(args.recordings) if args.recordings else None, args.seed,
+                            args.invalid_rate or 0.0)
+    if results is None:
+        sys.exit(1)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print_benchmark(results)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_benchmarks(json.load(f), results, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
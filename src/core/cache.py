@@ -0,0 +1,230 @@
+"""
+Content-addressed on-disk cache for LLM translations
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+
+from pathlib import Path
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction frees down to this fraction of the limit, so a full cache is not rescanned on every put
+EVICT_TO = 0.9
+
+
+def default_cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(Path.home(), '.cache')
+    return os.path.join(base, 'code-migrator', 'translations')
+
+
+def normalize_source(python_code):
+    """Drop whitespace-only differences so cosmetic edits still hit the cache"""
+    lines = python_code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines).strip('\n')
+
+
+def make_cache_key(python_code, context, model, target_language, prompt_version):
+    digest = hashlib.sha256()
+    for part in (normalize_source(python_code), context or "", model, target_language, str(prompt_version)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def evict_lru(entries, target_bytes):
+    """Delete (mtime, size, path) entries oldest first until at most
+    `target_bytes` remain; returns the bytes left"""
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= target_bytes:
+            break
+        try:
+            path.unlink()
+            total -= size
+        except OSError:
+            pass
+    return total
+
+
+class TranslationCache:
+    """Translations stored one file per key, evicted least-recently-used first.
+
+    Recency is tracked through file mtimes, which are refreshed on every hit,
+    so the cache survives across runs without a separate index.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, refresh=False):
+        self.cache_dir = Path(cache_dir or default_cache_dir())
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _entry_path(self, key):
+        return self.cache_dir / key[:2] / key
+
+    def get(self, key, counted=True):
+        """Return the entry for `key` or None; `counted=False` keeps the lookup
+        out of the hit/miss stats (module models share the cache)"""
+        path = self._entry_path(key)
+        code = None
+        if not self.refresh:
+            try:
+                code = path.read_text(encoding='utf-8')
+                os.utime(path)
+            except OSError:
+                code = None
+        if counted:
+            with self._lock:
+                if code is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+        return code
+
+    def held(self):
+        """A view of this cache whose put() waits for commit()"""
+        return HeldTranslations(self)
+
+    def unvalidated(self):
+        """A view for runs that skip validation; see UnvalidatedTranslations"""
+        return UnvalidatedTranslations(self)
+
+    def delete(self, key):
+        path = self._entry_path(key)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes -= size
+
+    def put(self, key, code):
+        path = self._entry_path(key)
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                file.write(code)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Warning: could not write translation cache entry: {e}")
+            return
+        try:
+            written = path.stat().st_size
+        except OSError:
+            # Evicted or deleted by another writer in the meantime
+            written = 0
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += written - replaced
+            self._evict_if_needed()
+
+    def _entries(self):
+        entries = []
+        for path in self.cache_dir.glob('*/*'):
+            if path.name.startswith('.tmp-'):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict_if_needed(self):
+        if self._total_bytes is None:
+            self._total_bytes = sum(size for _, size, _ in self._entries())
+        if self._total_bytes <= self.max_bytes:
+            return
+        self._total_bytes = evict_lru(self._entries(), self.max_bytes * EVICT_TO)
+
+    def report(self):
+        print(f"Translation cache: {self.hits} hits, {self.misses} misses")
+
+
+class HeldTranslations:
+    """Cache view for a run that validates its output: translations are kept
+    in memory and only written to the cache by commit(), once the code built
+    from them has compiled, so a broken translation is never replayed. Cache
+    hits are remembered too, so discard() can drop entries that did not
+    compile after all."""
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.pending = {}
+        self.used = {}
+
+    def get(self, key):
+        if key in self.pending:
+            return self.pending[key]
+        code = self.cache.get(key)
+        if code is not None:
+            self.used[key] = code
+        return code
+
+    def put(self, key, code):
+        self.pending[key] = code
+
+    def commit(self, replacements=None):
+        """Write the held translations; after a repair, `replacements` maps each
+        unrepaired code to its repaired version (None when unknown), and cache
+        hits the repair changed are rewritten or dropped too"""
+        for key, code in list(self.pending.items()):
+            if replacements is not None:
+                code = replacements.get(code)
+            if code is not None:
+                self.cache.put(key, code)
+        if replacements is not None:
+            for key, code in self.used.items():
+                repaired = replacements.get(code)
+                if repaired is None:
+                    self.cache.delete(key)
+                elif repaired != code:
+                    self.cache.put(key, repaired)
+        self.pending.clear()
+        self.used.clear()
+
+    def discard(self):
+        """The output failed validation: forget held translations and delete the hits it was built from"""
+        for key in self.used:
+            self.cache.delete(key)
+        self.pending.clear()
+        self.used.clear()
+
+
+class UnvalidatedTranslations:
+    """Cache view for a run that skips validation: it reads validated entries
+    but writes under separate keys, which validated runs never read"""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    @staticmethod
+    def _key(key):
+        return hashlib.sha256(f"unvalidated\0{key}".encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        code = self.cache.get(key, counted=False)
+        if code is None:
+            code = self.cache.get(self._key(key), counted=False)
+        # Both probes are one lookup in the stats
+        with self.cache._lock:
+            if code is None:
+                self.cache.misses += 1
+            else:
+                self.cache.hits += 1
+        return code
+
+    def put(self, key, code):
+        self.cache.put(self._key(key), code)
@@ -0,0 +1,226 @@
+"""
+Split Python modules into top-level units, translate them concurrently and
+stitch the results back into one translation unit
+"""
+
+import asyncio
+
+from dataclasses import dataclass, field
+
+from src.core.analysis import analyze_module
+from src.core.scheduler import RequestScheduler, request_cost
+
+DEFAULT_CONCURRENCY = 8
+HEADER_PREFIXES = {
+    'cpp': ('#include', 'using namespace'),
+    'rust': ('use ', 'extern crate', '#!['),
+}
+
+
+@dataclass
+class TranslationUnit:
+    name: str
+    kind: str  # 'globals', 'function', 'class' or 'main'
+    source: str
+    signature: str
+    lineno: int
+    defines: set = field(default_factory=set)
+    references: set = field(default_factory=set)
+    dependencies: list = field(default_factory=list)
+
+
+def split_into_units(python_code, model=None):
+    """Split a module into globals, top-level functions/classes and the __main__ block"""
+    model = model or analyze_module(python_code)
+    lines = python_code.splitlines()
+    units = []
+    globals_parts, globals_names, globals_line = [], set(), None
+    main_parts, main_line = [], None
+
+    for statement in model.statements:
+        source = '\n'.join(lines[statement.start - 1:statement.end])
+        if statement.kind == 'import':
+            continue
+        if statement.kind in ('function', 'class'):
+            units.append(TranslationUnit(
+                name=statement.name,
+                kind=statement.kind,
+                source=source,
+                signature=statement.signature,
+                lineno=statement.start,
+                defines=set(statement.defines),
+                references=set(statement.references),
+            ))
+        elif statement.kind == 'assign':
+            globals_parts.append((source, statement))
+            globals_names |= statement.defines
+            globals_line = globals_line or statement.start
+        else:
+            # The __main__ block and any other top-level statements run at startup
+            main_parts.append((source, statement))
+            main_line = main_line or statement.start
+
+    if globals_parts:
+        source = '\n'.join(part for part, _ in globals_parts)
+        references = set().union(*(statement.references for _, statement in globals_parts))
+        units.append(TranslationUnit('globals', 'globals', source, source, globals_line,
+                                     defines=globals_names, references=references - globals_names))
+    if main_parts:
+        source = '\n'.join(part for part, _ in main_parts)
+        references = set().union(*(statement.references for _, statement in main_parts))
+        units.append(TranslationUnit('__main__', 'main', source, '', main_line, references=references))
+
+    _resolve_dependencies(units)
+    return order_units(units)
+
+
+def _resolve_dependencies(units):
+    owners = {}
+    for unit in units:
+        for name in unit.defines:
+            owners.setdefault(name, unit.name)
+    for unit in units:
+        unit.dependencies = sorted({owners[name] for name in unit.references
+                                    if name in owners and owners[name] != unit.name})
+
+
+def order_units(units):
+    """Order units so dependencies come first, keeping source order otherwise.
+
+    Mutually recursive units keep their source order. Globals always lead and
+    the entry point always comes last.
+    """
+    by_name = {unit.name: unit for unit in units}
+    ordered, placed, visiting = [], set(), set()
+
+    def visit(unit):
+        if unit.name in placed or unit.name in visiting:
+            return
+        visiting.add(unit.name)
+        for dependency in unit.dependencies:
+            visit(by_name[dependency])
+        visiting.discard(unit.name)
+        placed.add(unit.name)
+        ordered.append(unit)
+
+    rank = {'globals': 0, 'function': 1, 'class': 1, 'main': 2}
+    for unit in sorted(units, key=lambda u: (rank[u.kind], u.lineno)):
+        visit(unit)
+    return ordered
+
+
+def imports_source(python_code, model=None):
+    model = model or analyze_module(python_code)
+    return '\n'.join(model.statement_source(python_code, statement) for statement in model.statements
+                     if statement.kind == 'import')
+
+
+def unit_context(unit, units_by_name, module_imports, context, target_language):
+    """Build the per-unit context: only the signatures of what the unit depends on"""
+    language_name = 'C++' if target_language == 'cpp' else 'Rust'
+    parts = [context] if context else []
+    parts.append(f"This is one fragment of a larger Python module being translated piece by piece to {language_name}.")
+    if unit.kind == 'main':
+        parts.append("Translate it as the program entry point (main function).")
+    elif unit.kind == 'globals':
+        parts.append("Translate these module-level definitions as global declarations. Do not write a main function.")
+    else:
+        parts.append("Translate only this fragment. Do not write a main function.")
+    if module_imports:
+        parts.append(f"The module imports:\n{module_imports}")
+    signatures = [units_by_name[name].signature for name in unit.dependencies if units_by_name[name].signature]
+    if signatures:
+        parts.append("It may use these definitions, which are translated separately:\n" + '\n'.join(signatures))
+    return '\n\n'.join(parts)
+
+
+def strip_code_fences(code):
+    lines = code.strip().splitlines()
+    if lines and lines[0].startswith('```'):
+        lines = lines[1:]
+    if lines and lines[-1].strip().startswith('```'):
+        lines = lines[:-1]
+    return '\n'.join(lines)
+
+
+def split_unit_headers(code, target_language):
+    """Split a translated fragment into its include/use lines and the rest"""
+    prefixes = HEADER_PREFIXES.get(target_language, ())
+    headers, body = [], []
+    for line in strip_code_fences(code).splitlines():
+        if prefixes and line.startswith(prefixes):
+            headers.append(line.strip())
+        else:
+            body.append(line)
+    return headers, '\n'.join(body).strip('\n')
+
+
+def assemble_units(translated_units, target_language):
+    """Merge translated fragments, hoisting and deduplicating include/use lines"""
+    headers, bodies = [], []
+    for code in translated_units:
+        unit_headers, body = split_unit_headers(code, target_language)
+        headers.extend(line for line in unit_headers if line not in headers)
+        bodies.append(body)
+    # Inner attributes and includes must precede everything else
+    headers.sort(key=lambda line: not line.startswith('#!['))
+    sections = ['\n'.join(headers)] if headers else []
+    sections.extend(body for body in bodies if body)
+    return '\n\n'.join(sections) + '\n'
+
+
+async def translate_units_async(units, convert, module_imports, target_language,
+                                context="", cache=None, llm_slots=None, all_units=None, lookup=None,
+                                dedup=None, module_label=None):
+    """Translate units concurrently; failed units come back as None.
+
+    `all_units` is the whole module when only a subset of it is retranslated,
+    so dependency signatures can still be looked up. `lookup(source, context)`
+    returns a cached translation, which then skips the request queue. With a
+    DedupIndex in `dedup`, functions equal up to renaming share one request.
+    """
+    llm_slots = llm_slots or RequestScheduler(DEFAULT_CONCURRENCY)
+    units_by_name = {unit.name: unit for unit in (all_units or units)}
+
+    async def request(unit, unit_ctx):
+        if lookup is not None:
+            cached = await asyncio.to_thread(lookup, unit.source, unit_ctx)
+            if cached is not None:
+                return cached
+        async with llm_slots.slot(request_cost(unit.source + unit_ctx, target_language)):
+            return await asyncio.to_thread(convert, unit.source, unit_ctx, cache)
+
+    async def translate(unit):
+        unit_ctx = unit_context(unit, units_by_name, module_imports, context, target_language)
+        if dedup is not None and unit.kind == 'function':
+            label = f"{module_label}:{unit.name}" if module_label else unit.name
+            return await dedup.translate(unit, unit_ctx, lambda: request(unit, unit_ctx), label)
+        return await request(unit, unit_ctx)
+
+    return await asyncio.gather(*(translate(unit) for unit in units))
+
+
+async def translate_chunked_async(python_code, convert, target_language, context="",
+                                  cache=None, llm_slots=None, lookup=None, dedup=None, module_label=None):
+    try:
+        units = split_into_units(python_code)
+    except SyntaxError as e:
+        print(f"Error parsing Python code: {e}")
+        return None
+    if not units:
+        return None
+    outputs = await translate_units_async(units, convert, imports_source(python_code),
+                                          target_language, context, cache, llm_slots, lookup=lookup,
+                                          dedup=dedup, module_label=module_label)
+    if any(output is None for output in outputs):
+        return None
+    return assemble_units(outputs, target_language)
+
+
+def translate_chunked(python_code, convert, target_language, context="", cache=None,
+                      concurrency=DEFAULT_CONCURRENCY, dedup=None):
+    """Translate a module unit by unit with up to `concurrency` requests in flight"""
+    async def run():
+        return await translate_chunked_async(python_code, convert, target_language, context,
+                                             cache, RequestScheduler(concurrency), dedup=dedup)
+    return asyncio.run(run())
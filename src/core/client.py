@@ -0,0 +1,189 @@
+"""
+Thin client for the migration daemon: hands a migrator command line to a
+running daemon and streams its output back. Standard library only, so a
+delegated run never imports the backend SDKs.
+"""
+
+import argparse
+import json
+import os
+import sys
+import urllib.error
+import urllib.request
+
+from pathlib import Path
+
+DAEMON_ENV = 'CODE_MIGRATOR_DAEMON'
+TOKEN_ENV = 'CODE_MIGRATOR_DAEMON_TOKEN'
+TOKEN_HEADER = 'X-Migrator-Token'
+PROBE_TIMEOUT = 0.5
+REQUEST_TIMEOUT = 10
+# Options that belong to the process that was started, so they are never delegated
+LOCAL_ONLY = ('--no-daemon', '--trace', '--help', '-h')
+# Lets the client tell a daemon serving a different checkout apart from its own
+PACKAGE_ROOT = str(Path(__file__).resolve().parents[2])
+
+
+def state_path():
+    """Where a running daemon records its URL and token"""
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(Path.home(), '.cache')
+    return os.path.join(base, 'code-migrator', 'daemon.json')
+
+
+def _headers(token):
+    return {'Content-Type': 'application/json', TOKEN_HEADER: token or ''}
+
+
+def request(url, method, path, payload=None, timeout=REQUEST_TIMEOUT, token=None):
+    """JSON request to the daemon; returns the decoded reply, or None when it is unreachable"""
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url.rstrip('/') + path, data=data, method=method, headers=_headers(token))
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as response:
+            return json.loads(response.read() or b'{}')
+    except urllib.error.HTTPError as e:
+        try:
+            return json.loads(e.read() or b'{}')
+        except ValueError:
+            return {'error': f"HTTP {e.code}"}
+    except (OSError, ValueError):
+        return None
+
+
+def _read_state():
+    try:
+        with open(state_path(), 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return state if isinstance(state, dict) else {}
+
+
+def find_daemon():
+    """(url, token) of a running daemon for this checkout, else None.
+
+    $CODE_MIGRATOR_DAEMON (with $CODE_MIGRATOR_DAEMON_TOKEN) wins over the
+    state file; set it empty to never delegate.
+    """
+    url, token = os.environ.get(DAEMON_ENV), os.environ.get(TOKEN_ENV)
+    if url is None or token is None:
+        state = _read_state()
+        if url is None:
+            url = state.get('url')
+        if token is None and url and state.get('url', '').rstrip('/') == url.rstrip('/'):
+            token = state.get('token')
+    if not url or not token:
+        return None
+    health = request(url, 'GET', '/health', timeout=PROBE_TIMEOUT, token=token)
+    if not health or health.get('root') != PACKAGE_ROOT:
+        return None
+    return url.rstrip('/'), token
+
+
+def job_priority(argv):
+    """--priority N from a migrator command line (default 0)"""
+    for index, arg in enumerate(argv):
+        value = None
+        if arg == '--priority' and index + 1 < len(argv):
+            value = argv[index + 1]
+        elif arg.startswith('--priority='):
+            value = arg.split('=', 1)[1]
+        if value is not None:
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+
+def submit(url, argv, cwd=None, priority=0, token=None):
+    """Queue a job; returns its status dict (with 'id'), or a dict with 'error'"""
+    reply = request(url, 'POST', '/jobs', {'argv': list(argv), 'cwd': cwd or os.getcwd(), 'priority': priority},
+                    token=token)
+    return reply or {'error': 'migration daemon unreachable'}
+
+
+def follow(url, job_id, out=None, err=None, token=None):
+    """Write a job's output as it is produced; returns the job's exit code"""
+    out, err = out or sys.stdout, err or sys.stderr
+    req = urllib.request.Request(f"{url}/jobs/{job_id}/events", headers=_headers(token))
+    try:
+        with urllib.request.urlopen(req, timeout=None) as response:
+            for line in response:
+                event = json.loads(line)
+                if 'output' in event:
+                    stream = err if event.get('stream') == 'stderr' else out
+                    stream.write(event['output'])
+                    stream.flush()
+                if 'exit_code' in event:
+                    return event['exit_code']
+    except (OSError, ValueError) as e:
+        err.write(f"Lost connection to the migration daemon: {e}\n")
+        return 1
+    err.write("Lost connection to the migration daemon\n")
+    return 1
+
+
+def run_remote(argv):
+    """Run a migrator command line on the daemon; returns its exit code, or None to run it here"""
+    if not argv or any(arg.split('=', 1)[0] in LOCAL_ONLY for arg in argv):
+        return None
+    daemon = find_daemon()
+    if daemon is None:
+        return None
+    url, token = daemon
+    job = submit(url, argv, os.getcwd(), job_priority(argv), token)
+    if 'id' not in job:
+        print(f"Migration daemon rejected the job ({job.get('error')}); running locally", file=sys.stderr)
+        return None
+    try:
+        return follow(url, job['id'], token=token)
+    except KeyboardInterrupt:
+        request(url, 'DELETE', f"/jobs/{job['id']}", token=token)
+        return 130
+
+
+def print_jobs(jobs):
+    for job in jobs:
+        exit_code = '' if job['exit_code'] is None else f" exit {job['exit_code']}"
+        print(f"{job['id']:>5}  {job['state']:<9} priority {job['priority']:<3}{exit_code}  {' '.join(job['argv'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or stop the migration daemon')
+    parser.add_argument('command', choices=['status', 'jobs', 'job', 'cancel', 'stop'])
+    parser.add_argument('job_id', nargs='?', type=int)
+    args = parser.parse_args()
+
+    daemon = find_daemon()
+    if daemon is None:
+        print("No migration daemon is running")
+        return 1
+    url, token = daemon
+    if args.command in ('job', 'cancel') and args.job_id is None:
+        parser.error(f"{args.command} needs a job id")
+    if args.command == 'status':
+        health = request(url, 'GET', '/health', token=token)
+        print(f"Migration daemon {url}: pid {health['pid']}, {health['workers']} workers, "
+              f"{health['running']} running, {health['queued']} queued, up {health['uptime']:.0f}s")
+    elif args.command == 'jobs':
+        print_jobs(request(url, 'GET', '/jobs', token=token)['jobs'])
+    elif args.command == 'job':
+        job = request(url, 'GET', f"/jobs/{args.job_id}", token=token)
+        if 'error' in job:
+            print(job['error'])
+            return 1
+        print_jobs([job])
+        print(job['output'], end='')
+    elif args.command == 'cancel':
+        reply = request(url, 'DELETE', f"/jobs/{args.job_id}", token=token)
+        print(reply.get('error') or f"Cancelled job {args.job_id}")
+        return 1 if 'error' in reply else 0
+    else:
+        request(url, 'POST', '/shutdown', token=token)
+        print(f"Stopped the migration daemon at {url}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,506 @@
+"""
+Long-running migration daemon: one process keeps the backend clients, the
+imported SDKs, compiler and analysis caches and the validation workspace warm,
+and runs migration command lines from a prioritized queue on worker threads
+"""
+
+import argparse
+import contextvars
+import hmac
+import itertools
+import json
+import os
+import queue
+import secrets
+import sys
+import threading
+import time
+import traceback
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.core import main as migrator
+from src.core.backends import reset_backends
+from src.core.client import LOCAL_ONLY, PACKAGE_ROOT, TOKEN_HEADER, state_path
+from src.core.rust_validation import rustc_version
+from src.core.tokens import current_run, usage
+from src.core.workspace import compiler_version
+
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 2
+# Finished jobs kept for status queries; older ones are forgotten first
+KEEP_FINISHED = 200
+EVENT_WAIT = 1.0
+
+_running_job = contextvars.ContextVar('running_job', default=None)
+
+
+def session_key(args, cwd):
+    """Jobs with equal keys may share the process at once; they agree on the
+    working directory and on every process-wide setting a run changes"""
+    return (cwd, args.strip_comments, args.backend_config, args.target_language, args.provider, args.model,
+            args.base_url, args.request_timeout, args.max_retries,
+            # persist_models() points the process-wide model cache at this run's translation cache
+            args.no_cache, args.cache_dir, args.cache_max_size, args.refresh)
+
+
+class Job:
+    """One queued command line, its captured output and its outcome"""
+
+    def __init__(self, job_id, argv, cwd, priority):
+        self.id = job_id
+        self.argv = argv
+        self.cwd = cwd
+        self.priority = priority
+        self.state = 'queued'
+        self.exit_code = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.events = []
+        self._changed = threading.Condition()
+
+    @property
+    def done(self):
+        return self.state in ('done', 'failed', 'cancelled')
+
+    def write(self, stream, text):
+        with self._changed:
+            self.events.append({'stream': stream, 'output': text})
+            self._changed.notify_all()
+
+    def finish(self, state, exit_code):
+        with self._changed:
+            self.state, self.exit_code, self.finished = state, exit_code, time.time()
+            self._changed.notify_all()
+
+    def wait_events(self, offset, timeout=EVENT_WAIT):
+        """Events after `offset`, waiting up to `timeout` for new ones; returns (events, done)"""
+        with self._changed:
+            if len(self.events) <= offset and not self.done:
+                self._changed.wait(timeout)
+            return self.events[offset:], self.done
+
+    def output(self):
+        with self._changed:
+            return ''.join(event['output'] for event in self.events)
+
+    def status(self):
+        return {'id': self.id, 'state': self.state, 'argv': self.argv, 'cwd': self.cwd,
+                'priority': self.priority, 'exit_code': self.exit_code, 'submitted': self.submitted,
+                'started': self.started, 'finished': self.finished}
+
+
+class _RoutedStream:
+    """sys.stdout / sys.stderr stand-in that sends each write to the job running
+    in the calling thread, or to the only running job for threads a job started
+    itself (validation pools, chunk workers); anything else goes to the daemon's own stream"""
+
+    def __init__(self, name, daemon, fallback):
+        self.name = name
+        self.daemon = daemon
+        self.fallback = fallback
+
+    def write(self, text):
+        job = _running_job.get() or self.daemon.sole_running_job()
+        if job is None:
+            return self.fallback.write(text)
+        job.write(self.name, text)
+        return len(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+    def isatty(self):
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self.fallback, name)
+
+
+class _SessionGate:
+    """Admits concurrent jobs only while they share a session key.
+
+    A job with a different key waits for the running ones to drain, and
+    holds back new jobs of the current key meanwhile so it is not starved.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.active = 0
+        self._waiting = []
+        self._cond = threading.Condition()
+
+    def enter(self, key, switch):
+        with self._cond:
+            self._waiting.append(key)
+            while self.active and (key != self.key or any(other != self.key for other in self._waiting)):
+                self._cond.wait()
+            self._waiting.remove(key)
+            if not self.active:
+                switch(key, self.key)
+                self.key = key
+            self.active += 1
+
+    def leave(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+
+def _switch_session(key, previous):
+    """Apply a job group's process-wide settings before its first job runs"""
+    os.chdir(key[0])
+    if previous is not None and key[1:] != previous[1:]:
+        # Backend overrides accumulate in the registry; start from the defaults for different settings
+        reset_backends()
+    usage.reset()
+
+
+def warm_up():
+    """Fill the compiler version caches so the first job does not pay for them"""
+    for probe in (compiler_version, rustc_version):
+        try:
+            probe()
+        except Exception:
+            pass
+
+
+class _DaemonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    daemon = None
+
+    def _authorized(self):
+        """Jobs run arbitrary migrator command lines, so only callers that read the
+        daemon's token from its private state file get in. The Host check keeps
+        DNS-rebound pages out even before the token is checked."""
+        if self.headers.get('Host', '').lower() not in self.daemon.allowed_hosts():
+            self._reply(403, {'error': 'unexpected Host header'})
+            return False
+        token = self.headers.get(TOKEN_HEADER, '')
+        if not hmac.compare_digest(token.encode('utf-8'), self.daemon.token.encode('utf-8')):
+            self._reply(401, {'error': 'missing or wrong daemon token'})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts == ['health']:
+            self._reply(200, self.daemon.health())
+        elif parts == ['jobs']:
+            self._reply(200, {'jobs': [job.status() for job in self.daemon.job_list()]})
+        elif len(parts) in (2, 3) and parts[0] == 'jobs':
+            job = self._job(parts[1])
+            if job is None:
+                return
+            if len(parts) == 2:
+                self._reply(200, dict(job.status(), output=job.output()))
+            elif parts[2] == 'events':
+                self._events(job)
+            else:
+                self._reply(404, {'error': f"unknown path {self.path}"})
+        else:
+            self._reply(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.headers.get('Content-Type', '').split(';')[0].strip().lower() != 'application/json':
+            self._reply(415, {'error': 'request body must be application/json'})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        except ValueError:
+            self._reply(400, {'error': 'request body is not JSON'})
+            return
+        if not isinstance(body, dict):
+            self._reply(400, {'error': 'request body must be a JSON object'})
+            return
+        path = self.path.strip('/')
+        if path == 'jobs':
+            job, error = self.daemon.submit(body.get('argv'), body.get('cwd'), body.get('priority', 0))
+            if job is None:
+                self._reply(400, {'error': error})
+            else:
+                self._reply(202, job.status())
+        elif path == 'shutdown':
+            self._reply(200, {'stopping': True})
+            threading.Thread(target=self.daemon.stop, daemon=True).start()
+        else:
+            self._reply(404, {'error': f"unknown path {self.path}"})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = self.path.strip('/').split('/')
+        job = self._job(parts[1]) if len(parts) == 2 and parts[0] == 'jobs' else None
+        if job is None:
+            if len(parts) != 2:
+                self._reply(404, {'error': f"unknown path {self.path}"})
+            return
+        if self.daemon.cancel(job):
+            self._reply(200, job.status())
+        else:
+            self._reply(409, {'error': f"job {job.id} is {job.state} and can no longer be cancelled"})
+
+    def _job(self, job_id):
+        job = self.daemon.jobs.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            self._reply(404, {'error': f"no job {job_id}"})
+        return job
+
+    def _events(self, job):
+        """Newline-delimited JSON: output events as they happen, then the exit code"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        offset = 0
+        while True:
+            events, done = job.wait_events(offset)
+            offset += len(events)
+            lines = [json.dumps(event) + '\n' for event in events]
+            if done:
+                lines.append(json.dumps({'state': job.state, 'exit_code': job.exit_code}) + '\n')
+            if lines:
+                self.wfile.write(''.join(lines).encode('utf-8'))
+                self.wfile.flush()
+            if done:
+                return
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class MigrationDaemon:
+    """Local HTTP daemon running migrator command lines on `workers` threads.
+
+    Jobs are taken highest priority first, then in submission order. Each
+    runs `runner(args)` (the migrator's migrate() by default) with its
+    output captured for status queries and streaming. Every request must
+    carry `token` (a fresh random one unless given).
+    """
+
+    def __init__(self, workers=DEFAULT_WORKERS, host='127.0.0.1', port=0, runner=None, token=None):
+        self.workers = workers
+        self.runner = runner or migrator.migrate
+        self.token = token or secrets.token_urlsafe(32)
+        self.jobs = {}
+        self.started = time.time()
+        self._queue = queue.PriorityQueue()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._gate = _SessionGate()
+        self._running = set()
+        self._threads = []
+        self._streams = None
+        handler = type('DaemonHandler', (_DaemonHandler,), {'daemon': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._stopped = threading.Event()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def allowed_hosts(self):
+        """Host headers a local client sends; anything else is a rebound name"""
+        host, port = self._server.server_address[:2]
+        names = {host, 'localhost', '127.0.0.1', '[::1]'}
+        return {f"{name}:{port}".lower() for name in names}
+
+    def start(self):
+        """Start the workers and the HTTP server in background threads"""
+        self._start_workers()
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        return self
+
+    def serve_forever(self):
+        self._start_workers()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.stop()
+
+    def _start_workers(self):
+        self._streams = (sys.stdout, sys.stderr)
+        sys.stdout = _RoutedStream('stdout', self, self._streams[0])
+        sys.stderr = _RoutedStream('stderr', self, self._streams[1])
+        threading.Thread(target=warm_up, daemon=True).start()
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        for _ in range(self.workers):
+            self._queue.put((float('inf'), next(self._ids), None))
+        self._server.shutdown()
+        self._server.server_close()
+        if self._streams is not None:
+            sys.stdout, sys.stderr = self._streams
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def submit(self, argv, cwd, priority=0):
+        """Queue a command line; returns (job, None) or (None, error)"""
+        if not isinstance(argv, list) or not argv or not all(isinstance(arg, str) for arg in argv):
+            return None, "argv must be a non-empty list of strings"
+        local = [arg for arg in argv if arg.split('=', 1)[0] in LOCAL_ONLY]
+        if local:
+            return None, f"{local[0]} only works when the migrator runs in the calling process"
+        if not cwd or not os.path.isabs(cwd) or not os.path.isdir(cwd):
+            return None, "cwd must be an existing absolute directory"
+        if not isinstance(priority, int):
+            return None, "priority must be an integer"
+        with self._lock:
+            job = Job(next(self._ids), argv, cwd, priority)
+            self.jobs[job.id] = job
+            self._forget_finished()
+        self._queue.put((-priority, job.id, job))
+        return job, None
+
+    def cancel(self, job):
+        """Cancel a job that has not started; running jobs are left to finish"""
+        with self._lock:
+            if job.state != 'queued':
+                return False
+            job.finish('cancelled', None)
+            return True
+
+    def job_list(self):
+        with self._lock:
+            return list(self.jobs.values())
+
+    def sole_running_job(self):
+        with self._lock:
+            return next(iter(self._running)) if len(self._running) == 1 else None
+
+    def health(self):
+        with self._lock:
+            states = [job.state for job in self.jobs.values()]
+        return {'pid': os.getpid(), 'root': PACKAGE_ROOT, 'url': self.url, 'workers': self.workers,
+                'queued': states.count('queued'), 'running': states.count('running'),
+                'finished': len(states) - states.count('queued') - states.count('running'),
+                'uptime': time.time() - self.started}
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - KEEP_FINISHED)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.state != 'queued':
+                    continue
+                job.state, job.started = 'running', time.time()
+            self._run(job)
+
+    def _run(self, job):
+        token = _running_job.set(job)
+        # The usage ledger is process-wide; this keeps the job's Tokens line to its own requests
+        run_token = current_run.set(job.id)
+        exit_code = 1
+        try:
+            try:
+                args = migrator.parse_arguments(job.argv)
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else 1
+                return
+            self._gate.enter(session_key(args, job.cwd), _switch_session)
+            with self._lock:
+                self._running.add(job)
+            try:
+                self.runner(args)
+                exit_code = 0
+            except SystemExit as e:
+                exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                if isinstance(e.code, str):
+                    job.write('stderr', e.code + '\n')
+            except Exception:
+                job.write('stderr', traceback.format_exc())
+            finally:
+                with self._lock:
+                    self._running.discard(job)
+                self._gate.leave()
+        finally:
+            usage.end_run(job.id)
+            current_run.reset(run_token)
+            _running_job.reset(token)
+            job.finish('done' if exit_code == 0 else 'failed', exit_code)
+
+
+def write_state(url, token):
+    """Record the URL and token where only this user can read them"""
+    path = state_path()
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    # O_CREAT's mode does not apply to a file left by an earlier daemon
+    os.fchmod(fd, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({'url': url, 'token': token, 'pid': os.getpid(), 'root': PACKAGE_ROOT}, f)
+
+
+def clear_state():
+    """Remove the state file if it still describes this process"""
+    path = state_path()
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if json.load(f).get('pid') == os.getpid():
+                os.remove(path)
+    except (OSError, ValueError, AttributeError):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migration daemon: runs migrator jobs in one warm process')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Port to listen on (default: {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                       help=f'Jobs run at once (default: {DEFAULT_WORKERS})')
+    args = parser.parse_args()
+
+    try:
+        daemon = MigrationDaemon(args.workers, args.host, args.port)
+    except OSError as e:
+        print(f"Could not listen on {args.host}:{args.port}: {e}")
+        return 1
+    write_state(daemon.url, daemon.token)
+    print(f"Migration daemon on {daemon.url} with {args.workers} workers; "
+          f"src/core/main.py now hands its runs to it (--no-daemon to opt out)")
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        clear_state()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
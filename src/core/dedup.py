@@ -0,0 +1,244 @@
+"""
+Deduplication of copy-pasted functions: alpha-renamed AST fingerprints so
+functions that differ only in identifier names are translated once, and
+MinHash signatures to report near-duplicates across a batch
+"""
+
+import ast
+import asyncio
+import hashlib
+import random
+import re
+
+from src.core.tokens import count_tokens
+
+NUM_PERMUTATIONS = 64
+BANDS = 16
+SHINGLE_SIZE = 3
+NEAR_DUPLICATE_THRESHOLD = 0.8
+# Smaller functions (a getter, a one-line wrapper) make noisy near-duplicate pairs
+MIN_NEAR_DUPLICATE_TOKENS = 25
+_MERSENNE = (1 << 61) - 1
+_random = random.Random(0)
+_PERMUTATIONS = [(_random.randrange(1, _MERSENNE), _random.randrange(_MERSENNE)) for _ in range(NUM_PERMUTATIONS)]
+_TOKEN_RE = re.compile(r'\w+|[^\w\s]')
+# Identifiers outside string and char literals and comments, not reached through `.`, `::` or `->`
+_CODE_RE = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])\'|//[^\n]*|/\*.*?\*/'
+                      r'|(?<![\w.])(?<!::)(?<!->)[A-Za-z_]\w*', re.DOTALL)
+
+
+def bound_names(function):
+    """Names the function binds, in first-seen order: its own name, parameters and locals"""
+    declared_outside = {name for node in ast.walk(function) if isinstance(node, (ast.Global, ast.Nonlocal))
+                        for name in node.names}
+    names = [function.name]
+    for node in ast.walk(function):
+        if isinstance(node, ast.arg):
+            found = [node.arg]
+        elif isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            found = [node.id]
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node is not function:
+            found = [node.name]
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            found = [node.name]
+        elif isinstance(node, ast.alias):
+            found = [node.asname or node.name.split('.')[0]]
+        else:
+            continue
+        names.extend(name for name in found if name not in names and name not in declared_outside)
+    return names
+
+
+class _AlphaRenamer(ast.NodeTransformer):
+    def __init__(self, canonical):
+        self.canonical = canonical
+
+    def _rename(self, name):
+        return self.canonical.get(name, name)
+
+    def visit_Name(self, node):
+        node.id = self._rename(node.id)
+        return node
+
+    def visit_arg(self, node):
+        node.arg = self._rename(node.arg)
+        self.generic_visit(node)
+        return node
+
+    def visit_ExceptHandler(self, node):
+        node.name = node.name and self._rename(node.name)
+        self.generic_visit(node)
+        return node
+
+    def visit_alias(self, node):
+        if node.asname:
+            node.asname = self._rename(node.asname)
+        elif node.name in self.canonical:
+            node.asname = self._rename(node.name)
+        return node
+
+    def _visit_definition(self, node):
+        node.name = self._rename(node.name)
+        # Docstrings do not change what the code does
+        if (node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Constant)
+                and isinstance(node.body[0].value.value, str)):
+            node.body = node.body[1:] or [ast.Pass()]
+        self.generic_visit(node)
+        return node
+
+    visit_FunctionDef = visit_AsyncFunctionDef = visit_ClassDef = _visit_definition
+
+
+def fingerprint(source):
+    """(digest, bound names, normalized source) for a single function, or None.
+
+    The digest is equal for functions that differ only in the names they
+    bind; bound names line up position by position within a class.
+    """
+    try:
+        tree = ast.parse(source)
+    except SyntaxError:
+        return None
+    if len(tree.body) != 1 or not isinstance(tree.body[0], (ast.FunctionDef, ast.AsyncFunctionDef)):
+        return None
+    names = bound_names(tree.body[0])
+    normalized = _AlphaRenamer({name: f"_v{index}" for index, name in enumerate(names)}).visit(tree)
+    digest = hashlib.sha256(ast.dump(normalized, include_attributes=False).encode('utf-8')).hexdigest()
+    return digest, names, ast.unparse(normalized)
+
+
+def minhash(text):
+    """MinHash signature of the token shingles of `text`, or None for very short texts"""
+    tokens = _TOKEN_RE.findall(text)
+    if len(tokens) < MIN_NEAR_DUPLICATE_TOKENS:
+        return None
+    shingles = {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+              for shingle in shingles]
+    return tuple(min((a * value + b) % _MERSENNE for value in hashes) for a, b in _PERMUTATIONS)
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+def near_duplicates(signatures, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """[(similarity, key, other key)] for signatures above `threshold`, using LSH banding
+    so only pairs that share a band are compared"""
+    rows = NUM_PERMUTATIONS // BANDS
+    buckets = {}
+    for key, signature in signatures.items():
+        for band in range(BANDS):
+            buckets.setdefault((band, signature[band * rows:(band + 1) * rows]), []).append(key)
+    candidates = {tuple(sorted((first, second), key=str)) for bucket in buckets.values()
+                  for index, first in enumerate(bucket) for second in bucket[index + 1:]}
+    pairs = [(similarity(signatures[first], signatures[second]), first, second) for first, second in candidates]
+    return sorted((pair for pair in pairs if pair[0] >= threshold), key=lambda pair: (-pair[0], str(pair[1:])))
+
+
+def _field_like(code, name):
+    """Whether `name` is also used as a member, path segment or field in `code`.
+
+    `name:` counts as a field (Rust struct literals, designated names); `name :`
+    with a space is a C++ range-for or conditional and does not.
+    """
+    escaped = re.escape(name)
+    return re.search(rf'(?:\.|::|->)\s*{escaped}\b|\b{escaped}:(?!:)', code) is not None
+
+
+def remap_identifiers(code, mapping):
+    """Rename identifiers in translated code, all at once so swaps work.
+
+    Returns None when the first name (the function's own) cannot be mapped:
+    it does not appear in the code, its new name is already taken there, or it
+    is also used as a field. Other names that cannot be renamed cleanly keep
+    the name they have, which only changes how the code reads.
+    """
+    used = {match.group() for match in _CODE_RE.finditer(code) if not match.group().startswith(('"', "'", '/'))}
+    renamed = {old for old, new in mapping if old != new and old in used}
+    renames = {}
+    for index, (old, new) in enumerate(mapping):
+        if old == new:
+            continue
+        clean = old in used and (new not in used or new in renamed) and not _field_like(code, old)
+        if not clean and index == 0:
+            return None
+        if clean:
+            renames[old] = new
+    # A name whose rename was refused must not be taken by another rename
+    taken = {old for old in renamed if old not in renames}
+    renames = {old: new for old, new in renames.items() if new not in taken}
+    if not renames:
+        return code if mapping[0][0] == mapping[0][1] else None
+
+    def replace(match):
+        return renames.get(match.group(), match.group())
+
+    return _CODE_RE.sub(replace, code)
+
+
+class DedupIndex:
+    """Shared across a batch: the first function of each equivalence class is
+    translated, the others wait for it and get its translation with their own
+    identifiers mapped back."""
+
+    def __init__(self):
+        self._classes = {}
+        self._signatures = {}
+        self._members = {}
+        self.saved_calls = 0
+        self.saved_tokens = 0
+
+    async def translate(self, unit, context, translate, label=None):
+        """Translation for a function unit; `translate()` is awaited only for the
+        first member of its class, or when remapping a shared result fails"""
+        label = label or unit.name
+        found = fingerprint(unit.source)
+        if found is None:
+            return await translate()
+        digest, names, normalized = found
+        signature = minhash(normalized)
+        if signature is not None:
+            self._signatures[label] = signature
+        self._members.setdefault(digest, []).append(label)
+        shared = self._classes.get(digest)
+        if shared is None:
+            self._classes[digest] = shared = asyncio.get_running_loop().create_future()
+            code = None
+            try:
+                code = await translate()
+            finally:
+                shared.set_result((names, code))
+            return code
+        first_names, first_code = await asyncio.shield(shared)
+        code = remap_identifiers(first_code, list(zip(first_names, names))) if first_code is not None else None
+        if code is None:
+            return await translate()
+        self.saved_calls += 1
+        self.saved_tokens += count_tokens(unit.source + context) + count_tokens(code)
+        return code
+
+    def classes(self):
+        """Equivalence classes with more than one member"""
+        return [members for members in self._members.values() if len(members) > 1]
+
+    def report(self, limit=10):
+        classes = self.classes()
+        if classes:
+            print(f"Dedup: {sum(len(members) for members in classes)} functions in {len(classes)} classes "
+                  f"of identical code; saved {self.saved_calls} LLM calls (~{self.saved_tokens} tokens)")
+            for members in sorted(classes, key=len, reverse=True)[:limit]:
+                print(f"  {', '.join(members)}")
+        class_of = {label: digest for digest, members in self._members.items() for label in members}
+        pairs, seen = [], set()
+        for pair in near_duplicates(self._signatures):
+            classes_pair = frozenset((class_of[pair[1]], class_of[pair[2]]))
+            # One line per pair of classes: copies of a function are near-duplicates of the same things
+            if len(classes_pair) == 2 and classes_pair not in seen:
+                seen.add(classes_pair)
+                pairs.append(pair)
+        if pairs:
+            print(f"Near-duplicates (translated separately): {len(pairs)} pairs")
+            for score, first, second in pairs[:limit]:
+                print(f"  {first} ~ {second} ({score:.2f})")
@@ -0,0 +1,324 @@
+"""
+Profile-guided hot-spot migration: run a program under cProfile, translate only
+its hottest functions into a pybind11 (C++) or PyO3 (Rust) extension module and
+swap them in through a generated import shim
+"""
+
+import ast
+import os
+import pstats
+import shlex
+import stat
+import subprocess
+import sys
+import tempfile
+
+from src.core.analysis import analyze_module
+from src.core.chunking import imports_source
+from src.core.profiles import profile_flags
+from src.core.speedup import DEFAULT_RUNS, run_limited, summarize_runs
+
+DEFAULT_TOP_N = 3
+PROFILE_TIMEOUT = 300
+BUILD_TIMEOUT = 600
+PYO3_VERSION = '0.22'
+# Set to any value to keep the Python functions, e.g. for a before/after comparison
+PURE_ENV = 'CODE_MIGRATOR_PURE'
+SHIM_MARKER = '# code-migrator: native hot spots'
+GENERATED_MARKER = 'Generated by code-migrator'
+
+# Runs the entry script (or -m module) with a given directory first on sys.path,
+# ahead of the script's own directory that a plain `python script.py` would put there
+_BOOTSTRAP = """import os, runpy, sys
+entry = sys.argv[2:]
+if entry[0] == '-m':
+    sys.path[:0] = [sys.argv[1]]
+    sys.argv = entry[1:]
+    runpy.run_module(entry[1], run_name='__main__', alter_sys=True)
+else:
+    sys.path[:0] = [sys.argv[1], os.path.dirname(os.path.abspath(entry[0]))]
+    sys.argv = entry
+    runpy.run_path(entry[0], run_name='__main__')
+"""
+
+
+def entry_arguments(python_file, entry=None):
+    """The argv (after the interpreter) that runs the workload from the current
+    directory; default the file itself"""
+    return shlex.split(entry) if entry else [python_file]
+
+
+def profile_program(python_file, entry=None, input_text="", timeout=PROFILE_TIMEOUT):
+    """Run the workload under cProfile; returns (pstats.Stats or None, errors)"""
+    arguments = entry_arguments(python_file, entry)
+    with tempfile.TemporaryDirectory(prefix='migrator-hotspots-') as directory:
+        stats_path = os.path.join(directory, 'profile.pstats')
+        try:
+            result = subprocess.run([sys.executable, '-m', 'cProfile', '-o', stats_path] + arguments,
+                                    input=input_text, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None, f"Profiled run timed out after {timeout} seconds"
+        if result.returncode != 0 or not os.path.exists(stats_path):
+            return None, result.stderr.strip()[-1000:] or f"exit {result.returncode}"
+        return pstats.Stats(stats_path), None
+
+
+def ineligible_reason(node):
+    """Why a top-level function cannot move into an extension module, or None"""
+    if isinstance(node, ast.AsyncFunctionDef):
+        return 'async'
+    if node.decorator_list:
+        return 'decorated'
+    for child in ast.walk(node):
+        if isinstance(child, (ast.Yield, ast.YieldFrom)):
+            return 'generator'
+        if isinstance(child, (ast.Global, ast.Nonlocal)):
+            return 'rebinds globals'
+    return None
+
+
+def rank_hotspots(stats, python_file, python_code):
+    """Functions defined in `python_file`, hottest self time first.
+
+    Each row has name, self_time, cumulative, calls, share (of all profiled
+    self time) and the reason it cannot be migrated, None for top-level
+    functions that can.
+    """
+    target = os.path.realpath(python_file)
+    model = analyze_module(python_code)
+    tree = ast.parse(python_code)
+    top_level = {node.name: node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    spans = {statement.name: (statement.start, statement.end) for statement in model.statements
+             if statement.kind == 'function'}
+    class_bodies = {(statement.name, statement.start) for statement in model.statements if statement.kind == 'class'}
+    total = sum(entry[2] for entry in stats.stats.values()) or 1e-9
+    rows = []
+    for (filename, lineno, name), (_, calls, self_time, cumulative, _) in stats.stats.items():
+        # Module and class bodies run once at import; they are not functions to move
+        if name == '<module>' or (name, lineno) in class_bodies or os.path.realpath(filename) != target:
+            continue
+        start, end = spans.get(name, (0, 0))
+        reason = ineligible_reason(top_level[name]) if start <= lineno <= end else 'method or nested function'
+        rows.append({'name': name, 'self_time': self_time, 'cumulative': cumulative, 'calls': calls,
+                     'share': self_time / total, 'reason': reason})
+    rows.sort(key=lambda row: row['self_time'], reverse=True)
+    return rows
+
+
+def select_hotspots(ranking, top_n=DEFAULT_TOP_N):
+    return [row['name'] for row in ranking if row['reason'] is None and row['self_time'] > 0][:top_n]
+
+
+def hotspot_source(python_code, names):
+    """Source for the hot functions plus what they need: imports, referenced
+    module globals and the same-module helpers they call (kept internal).
+
+    Returns (source, helper names).
+    """
+    model = analyze_module(python_code)
+    functions = {statement.name: statement for statement in model.statements if statement.kind == 'function'}
+    included, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name in included:
+            continue
+        included.add(name)
+        pending.extend(reference for reference in functions[name].references
+                       if reference in functions and reference not in included)
+    references = set().union(*(functions[name].references for name in included))
+    parts = [model.statement_source(python_code, statement) for statement in model.statements
+             if (statement.kind == 'function' and statement.name in included)
+             or (statement.kind == 'assign' and statement.defines & references)]
+    imports = imports_source(python_code)
+    source = '\n\n'.join(([imports] if imports else []) + parts) + '\n'
+    return source, sorted(included - set(names))
+
+
+def binding_context(module_name, names, helpers, target_language):
+    """Extra prompt context asking for an extension module rather than a program"""
+    exported = ', '.join(names)
+    internal = f" Translate {', '.join(helpers)} as internal helpers that are not exported." if helpers else ""
+    if target_language == 'cpp':
+        return (f"Write a pybind11 extension module, not a program: no main(). Include <pybind11/pybind11.h> "
+                f"(and <pybind11/stl.h> for containers) and end with PYBIND11_MODULE({module_name}, m) "
+                f"exporting {exported} under their Python names with py::arg for every parameter, so keyword "
+                f"calls keep working.{internal}")
+    return (f"Write a PyO3 {PYO3_VERSION} extension module, not a program: no main(). Use pyo3::prelude::*, "
+            f"mark {exported} #[pyfunction] keeping their Python names and parameter names, and add them in "
+            f"#[pymodule] fn {module_name}(m: &Bound<'_, PyModule>) -> PyResult<()>.{internal}")
+
+
+def _write_executable(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+
+def write_extension(output_dir, module_name, code, target_language, flags=(), dependencies=None):
+    """Write the extension source and a build.sh that builds it in place; returns the build script path.
+
+    `flags` are extra compiler flags (C++), `dependencies` extra {crate: version} (Rust).
+    """
+    suffix = '$("$PYTHON" -c "import sysconfig; print(sysconfig.get_config_var(\'EXT_SUFFIX\'))")'
+    lines = ["#!/bin/sh", f"# {GENERATED_MARKER}: builds the {module_name} extension module", "set -e",
+             'DIR=$(dirname "$0")', 'PYTHON=${PYTHON:-python3}']
+    if target_language == 'cpp':
+        with open(os.path.join(output_dir, module_name + '.cpp'), 'w', encoding='utf-8') as f:
+            f.write(code)
+        flags = ' '.join(['-std=c++17'] + profile_flags('release', 'cpp') + list(flags))
+        # On its own line so set -e stops the build when pybind11 is missing
+        lines += ['INCLUDES=$("$PYTHON" -m pybind11 --includes)',
+                  f'c++ {flags} -Wall -shared -fPIC $INCLUDES "$DIR/{module_name}.cpp" -o "$DIR/{module_name}{suffix}"']
+    else:
+        os.makedirs(os.path.join(output_dir, 'src'), exist_ok=True)
+        with open(os.path.join(output_dir, 'src', 'lib.rs'), 'w', encoding='utf-8') as f:
+            f.write(code)
+        with open(os.path.join(output_dir, 'Cargo.toml'), 'w', encoding='utf-8') as f:
+            f.write(f'# {GENERATED_MARKER}\n[package]\nname = "{module_name}"\nversion = "0.1.0"\n'
+                    f'edition = "2021"\n\n[lib]\nname = "{module_name}"\ncrate-type = ["cdylib"]\n\n'
+                    f'[dependencies]\npyo3 = {{ version = "{PYO3_VERSION}", features = ["extension-module"] }}\n'
+                    + ''.join(f'{crate} = "{version}"\n' for crate, version in (dependencies or {}).items())
+                    + '\n[profile.release]\nlto = true\ncodegen-units = 1\n')
+        lines += ['cargo build --release --quiet --manifest-path "$DIR/Cargo.toml"',
+                  f'cp "$DIR/target/release/lib{module_name}.so" "$DIR/{module_name}{suffix}"']
+    script = os.path.join(output_dir, 'build.sh')
+    _write_executable(script, '\n'.join(lines) + '\n')
+    return script
+
+
+def write_shim(output_dir, stem, module_name, names):
+    """Write <stem>_native_shim.py, whose install() swaps the native functions into a namespace"""
+    path = os.path.join(output_dir, f"{stem}_native_shim.py")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f'''"""
+{GENERATED_MARKER}: swaps native versions of the hot functions into {stem}
+"""
+
+import os
+
+NATIVE_FUNCTIONS = {tuple(names)!r}
+
+
+def install(namespace):
+    """Replace NATIVE_FUNCTIONS in `namespace`; the Python versions stay when
+    the extension is not built or {PURE_ENV} is set. Returns the swapped names."""
+    if os.environ.get({PURE_ENV!r}):
+        return ()
+    try:
+        import {module_name} as native
+    except ImportError:
+        return ()
+    for name in NATIVE_FUNCTIONS:
+        namespace[name] = getattr(native, name)
+    return NATIVE_FUNCTIONS
+''')
+    return path
+
+
+def patch_program(python_code, stem, names):
+    """The program with a shim call right after the last hot function definition"""
+    model = analyze_module(python_code)
+    last = max(statement.end for statement in model.statements
+               if statement.kind == 'function' and statement.name in names)
+    lines = python_code.splitlines()
+    shim = ["", SHIM_MARKER, f"from {stem}_native_shim import install as _install_native_hot_spots",
+            "_install_native_hot_spots(globals())"]
+    return '\n'.join(lines[:last] + shim + lines[last:]) + '\n'
+
+
+def build_extension(script, module_name, names, timeout=BUILD_TIMEOUT):
+    """Run the generated build script with this interpreter and check that the
+    module imports and exports `names`; returns errors or None"""
+    env = dict(os.environ, PYTHON=sys.executable)
+    try:
+        result = subprocess.run([script], capture_output=True, text=True, timeout=timeout, env=env)
+    except subprocess.TimeoutExpired:
+        return f"Extension build timed out after {timeout} seconds"
+    if result.returncode != 0:
+        return (result.stderr or result.stdout).strip()[-2000:] or f"build.sh exited with {result.returncode}"
+    check = (f"import sys; sys.path.insert(0, sys.argv[1]); import {module_name} as native; "
+             f"missing = [name for name in {list(names)!r} if not hasattr(native, name)]; "
+             f"sys.exit('missing exports: ' + ', '.join(missing) if missing else 0)")
+    result = subprocess.run([sys.executable, '-c', check, os.path.dirname(os.path.abspath(script))],
+                            capture_output=True, text=True)
+    return None if result.returncode == 0 else result.stderr.strip()[-2000:]
+
+
+def time_workload(python_file, output_dir, entry=None, input_text="", runs=DEFAULT_RUNS, timeout=PROFILE_TIMEOUT):
+    """Time the workload as written and with the migrated module first on the path.
+
+    Returns summarize_runs() of the two, with 'before' in the python_* fields
+    and 'after' in the native_* fields.
+    """
+    arguments = entry_arguments(python_file, entry)
+    patched = os.path.join(output_dir, os.path.basename(python_file))
+    migrated = [patched if os.path.abspath(argument) == os.path.abspath(python_file) else argument
+                for argument in arguments]
+    # Both sides go through the same bootstrap so its startup cost cancels out
+    before_command = [sys.executable, '-c', _BOOTSTRAP, os.path.dirname(os.path.abspath(python_file))] + arguments
+    after_command = [sys.executable, '-c', _BOOTSTRAP, os.path.abspath(output_dir)] + migrated
+    before = [run_limited(before_command, input_text, timeout, None) for _ in range(runs)]
+    after = [run_limited(after_command, input_text, timeout, None) for _ in range(runs)]
+    return summarize_runs('workload', before, after)
+
+
+def print_ranking(ranking, selected, limit=10):
+    print("Hottest functions by self time:")
+    for row in ranking[:limit]:
+        status = 'migrating' if row['name'] in selected else (row['reason'] or 'kept in Python')
+        print(f"  {row['name']}: {row['self_time'] * 1000:.1f} ms self, {row['cumulative'] * 1000:.1f} ms total, "
+              f"{row['calls']} calls, {row['share']:.0%} of profiled time ({status})")
+
+
+def migrate_hotspots(python_file, python_code, target_language, convert, output_dir, top_n=DEFAULT_TOP_N,
+                     entry=None, input_text="", context="", cache=None, runs=DEFAULT_RUNS, build=True):
+    """Profile, translate the top_n hot functions into an extension module next to
+    a patched copy of the program, build it and time the workload before and after.
+
+    Returns True when the files were written and, with `build`, the extension built.
+    """
+    stem = os.path.splitext(os.path.basename(python_file))[0]
+    module_name = f"{stem}_native"
+    print(f"Profiling {' '.join(entry_arguments(python_file, entry))} under cProfile...")
+    stats, errors = profile_program(python_file, entry, input_text)
+    if stats is None:
+        print(f"Profiled run failed:\n{errors}")
+        return False
+    ranking = rank_hotspots(stats, python_file, python_code)
+    names = select_hotspots(ranking, top_n)
+    print_ranking(ranking, names)
+    if not names:
+        print(f"No migratable functions from {python_file} showed up in the profile.")
+        return False
+
+    source, helpers = hotspot_source(python_code, names)
+    code = convert(source, '\n'.join(part for part in (context, binding_context(module_name, names, helpers,
+                                                                                 target_language)) if part), cache)
+    if code is None:
+        print("Failed to translate the hot functions.")
+        return False
+    os.makedirs(output_dir, exist_ok=True)
+    script = write_extension(output_dir, module_name, code, target_language)
+    write_shim(output_dir, stem, module_name, names)
+    with open(os.path.join(output_dir, os.path.basename(python_file)), 'w', encoding='utf-8') as f:
+        f.write(patch_program(python_code, stem, names))
+    print(f"Wrote the {module_name} extension, build script, import shim and patched {stem}.py to {output_dir}")
+    if not build:
+        return True
+
+    print(f"Building {module_name}...")
+    errors = build_extension(script, module_name, names)
+    if errors:
+        print(f"Extension build failed (the patched program falls back to Python):\n{errors}")
+        return False
+    case = time_workload(python_file, output_dir, entry, input_text, runs)
+    match = "stdout matches" if case['stdout_match'] else "STDOUT DIFFERS"
+    print(f"Workload before: {case['python_wall'] * 1000:.1f} ms, after: {case['native_wall'] * 1000:.1f} ms "
+          f"({case['runs']} runs, {match})")
+    if case['speedup'] is None:
+        print(f"  No speedup figure: {case['errors'][0]}")
+    elif case['speedup_ci']:
+        print(f"  Speedup: {case['speedup']:.2f}x (95% CI {case['speedup_ci'][0]:.2f}x-{case['speedup_ci'][1]:.2f}x)")
+    else:
+        print(f"  Speedup: {case['speedup']:.2f}x")
+    return case['stdout_match'] and case['speedup'] is not None
@@ -0,0 +1,183 @@
+"""
+Crash-safe batch journal: a SQLite database in the output directory that
+records each file's progress (pending, translated, validated, written or
+failed), its generated code, translated units and token usage, so
+`--resume` can skip finished work after an interrupted run
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+JOURNAL_NAME = '.migration-journal.sqlite'
+# States a file moves through; anything short of written is redone on resume
+STATES = ('pending', 'translated', 'validated', 'written', 'failed')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    input_hash TEXT NOT NULL,
+    state TEXT NOT NULL,
+    code TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS units (
+    path TEXT NOT NULL,
+    key TEXT NOT NULL,
+    code TEXT NOT NULL,
+    PRIMARY KEY (path, key)
+);
+"""
+
+# A changed input starts over; the same input keeps what an earlier attempt got to
+_BEGIN = """
+INSERT INTO files (path, input_hash, state, attempts, updated) VALUES (?, ?, 'pending', 1, ?)
+ON CONFLICT(path) DO UPDATE SET
+    state = CASE WHEN input_hash = excluded.input_hash AND state != 'failed' THEN state ELSE 'pending' END,
+    code = CASE WHEN input_hash = excluded.input_hash THEN code END,
+    input_hash = excluded.input_hash, error = NULL, attempts = attempts + 1, updated = excluded.updated
+"""
+
+
+def journal_path(output_dir):
+    return os.path.join(output_dir, JOURNAL_NAME)
+
+
+class MigrationJournal:
+    """Per-file and per-unit state of a batch.
+
+    Workers never touch the database for writes: updates are queued and a
+    single writer thread commits everything queued so far in one
+    transaction, so many workers cost one fsync per commit instead of one
+    each. WAL mode lets lookups read while that transaction is open.
+    """
+
+    def __init__(self, output_dir, resume=False):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = journal_path(output_dir)
+        self._writer = self._connect()
+        self._writer.executescript(_SCHEMA)
+        if not resume:
+            self._writer.executescript("DELETE FROM files; DELETE FROM units;")
+        self._reader = self._connect()
+        self._read_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self.commits = 0
+        self.updates = 0
+        self._thread = threading.Thread(target=self._write_loop, name='journal-writer', daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL survives a crash of this process; only a power loss can drop the last commits
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            updates = [item for item in batch if isinstance(item, tuple)]
+            if updates:
+                try:
+                    self._writer.execute("BEGIN")
+                    for sql, params in updates:
+                        self._writer.execute(sql, params)
+                    self._writer.execute("COMMIT")
+                    self.commits += 1
+                    self.updates += len(updates)
+                except sqlite3.Error as e:
+                    print(f"Warning: could not update the migration journal: {e}")
+                    if self._writer.in_transaction:
+                        self._writer.execute("ROLLBACK")
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
+
+    def _update(self, sql, *params):
+        self._queue.put((sql, params))
+
+    def _read(self, sql, *params):
+        with self._read_lock:
+            try:
+                return self._reader.execute(sql, params).fetchone()
+            except sqlite3.Error as e:
+                print(f"Warning: could not read the migration journal: {e}")
+                return None
+
+    def entry(self, path):
+        """{'input_hash', 'state', 'code', 'prompt_tokens', 'completion_tokens'} for a file, or None"""
+        row = self._read("SELECT input_hash, state, code, prompt_tokens, completion_tokens FROM files "
+                         "WHERE path = ?", path)
+        if row is None:
+            return None
+        return dict(zip(('input_hash', 'state', 'code', 'prompt_tokens', 'completion_tokens'), row))
+
+    def unit(self, path, key):
+        row = self._read("SELECT code FROM units WHERE path = ? AND key = ?", path, key)
+        return row[0] if row else None
+
+    def begin(self, path, input_hash):
+        """Start an attempt; a changed input or run setup also drops the file's units"""
+        self._update("DELETE FROM units WHERE path = ? AND EXISTS "
+                     "(SELECT 1 FROM files WHERE path = ? AND input_hash != ?)", path, path, input_hash)
+        self._update(_BEGIN, path, input_hash, time.time())
+
+    def advance(self, path, state, code=None):
+        self._update("UPDATE files SET state = ?, code = COALESCE(?, code), updated = ? WHERE path = ?",
+                     state, code, time.time(), path)
+
+    def fail(self, path, error, drop_units=False):
+        """Mark a file failed; `drop_units` forgets its translated units so a retry asks again"""
+        self._update("UPDATE files SET state = 'failed', error = ?, updated = ? WHERE path = ?",
+                     error, time.time(), path)
+        if drop_units:
+            self._update("UPDATE files SET code = NULL WHERE path = ?", path)
+            self._update("DELETE FROM units WHERE path = ?", path)
+
+    def record_unit(self, path, key, code):
+        self._update("INSERT OR REPLACE INTO units (path, key, code) VALUES (?, ?, ?)", path, key, code)
+
+    def add_tokens(self, path, prompt_tokens, completion_tokens):
+        if prompt_tokens or completion_tokens:
+            self._update("UPDATE files SET prompt_tokens = prompt_tokens + ?, "
+                         "completion_tokens = completion_tokens + ? WHERE path = ?",
+                         prompt_tokens, completion_tokens, path)
+
+    def flush(self):
+        """Wait until every queued update is committed"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait()
+
+    def counts(self):
+        """Number of files in each state"""
+        self.flush()
+        with self._read_lock:
+            rows = self._reader.execute("SELECT state, COUNT(*) FROM files GROUP BY state").fetchall()
+        return dict(rows)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        self._writer.close()
+        self._reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
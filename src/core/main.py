@@ -6,26 +6,175 @@ Python to C++ Migrator - Simple I/O Structure
 
 import sys
 import os
-import subprocess
-import tempfile
 import argparse
-import openai
+import asyncio
+import atexit
+import mmap
+import secrets
+import shutil
+import tempfile
 
 from pathlib import Path
 
+from src.core.client import run_remote
+
+if __name__ == "__main__":
+    # Hand the run to a warm migration daemon, when one is up, before paying for the imports below
+    _daemon_exit_code = run_remote(sys.argv[1:])
+    if _daemon_exit_code is not None:
+        sys.exit(_daemon_exit_code)
+
+from src.core.analysis import analyze_module, persist_models
+from src.core.backends import (
+    BackendError, DEFAULT_TARGETS, PROVIDERS, configure_backends, get_backend, load_backend_config, model_for,
+)
+from src.core.cache import TranslationCache, make_cache_key, DEFAULT_MAX_BYTES
+from src.core.chunking import translate_chunked
+from src.core.dedup import DedupIndex
+from src.core.manifest import translate_incremental, output_is_current, write_manifest, record_repair
+from src.core.repair import repair, DEFAULT_MAX_ITERATIONS, DEFAULT_TOKEN_BUDGET
+from src.core.tokens import (
+    compact_source, count_tokens, dedupe_blocks, estimate_cost, fits_budget, output_budget, usage,
+)
+from src.core.streaming import (
+    stream_to_partial, finalize_partial, discard_partial, print_stream_report,
+)
+from src.core.rust_validation import RustWorkspace, parse_dependency_spec
+from src.core.hotspots import DEFAULT_TOP_N, migrate_hotspots
+from src.core.pipeline import DEFAULT_MAX_MEMORY_MB
+from src.core.numeric import DEFAULT_ATOL, DEFAULT_RTOL, NDARRAY_VERSION, check_numpy_kernels, numpy_context
+from src.core.profiles import DEFAULT_PROFILE, PROFILES, binary_path, build_profile, profile_flags, write_build_script
+from src.core.scheduler import request_cost
+from src.core.speculative import DEFAULT_CANDIDATES, print_race_report, race_candidates, stdout_check
+from src.core.speedup import (
+    DEFAULT_MEMORY_MB, DEFAULT_RUN_TIMEOUT, DEFAULT_RUNS, benchmark_translation, load_inputs, print_profile_timings,
+    print_speedup_report, select_fastest_profile,
+)
+from src.core.tracing import current_span, finish_trace, tracer
+from src.core.validation import TIERS, eigen_flags, run_compile, run_rust_check
+from src.core.workspace import ValidationWorkspace
+
 input_file="input.py"
 output_file="output.cpp"
 
+CPP_MODEL = DEFAULT_TARGETS['cpp']['model']
+RUST_MODEL = DEFAULT_TARGETS['rust']['model']
+LANGUAGE_NAMES = {'cpp': 'C++', 'rust': 'Rust'}
+# Bump whenever the prompt wording changes so cached translations are not reused
+PROMPT_VERSION = 1
+PROMPT_OPTIONS = {'strip_comments': False}
+# Inputs at least this large (generated modules) are read through mmap
+MMAP_THRESHOLD = 1 << 20
 
-def parse_arguments():
+
+def parse_arguments(argv=None):
     parser = argparse.ArgumentParser(description='Python to C++/Rust Code Migrator')
-    parser.add_argument('input_file', help='Input Python file to migrate')
+    parser.add_argument('input_file', help='Input Python file, directory or glob to migrate')
     parser.add_argument('--target-language', '-t', default='cpp', 
                        choices=['cpp', 'rust'], help='Target language (default: cpp)')
     parser.add_argument('--output-path', '-o', help='Output file path (default: auto-generated)')
     parser.add_argument('--context', '-c', help='Additional context for migration')
+    parser.add_argument('--output-dir', help='Output directory for batch mode (default: <input>_<target>)')
+    parser.add_argument('--concurrency', '-j', type=int, default=8,
+                       help='Maximum concurrent LLM requests in batch mode (default: 8)')
+    parser.add_argument('--rpm', type=int,
+                       help='Batch mode: requests-per-minute budget (default: learned from rate-limit headers)')
+    parser.add_argument('--tpm', type=int,
+                       help='Batch mode: tokens-per-minute budget (default: learned from rate-limit headers)')
+    parser.add_argument('--resume', action='store_true',
+                       help='Batch mode: continue from the journal in the output directory, skipping files '
+                            'already written and reusing translations an interrupted run already paid for')
+    parser.add_argument('--max-memory', type=int, default=DEFAULT_MAX_MEMORY_MB, metavar='MB',
+                       help='Batch mode: memory budget shared by the files in flight, sized from their sources; '
+                            f'0 lifts it (default: {DEFAULT_MAX_MEMORY_MB})')
+    parser.add_argument('--project', action='store_true',
+                       help='Batch mode: translate modules in import order, giving each the translated '
+                            'signatures of the modules it imports')
+    parser.add_argument('--chunked', action='store_true',
+                       help='Translate top-level functions/classes as separate concurrent requests')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Chunked translation that only retranslates units changed since the last run')
+    parser.add_argument('--dedup', action='store_true',
+                       help='Translate functions that are equal up to identifier names once and map the result '
+                            'back to each copy, and report MinHash near-duplicates (implies --chunked)')
+    parser.add_argument('--candidates', type=int, default=DEFAULT_CANDIDATES, metavar='N',
+                       help='Request N translations at once at spread temperatures, validate them as they arrive '
+                            'and keep the first that compiles, cancelling the rest (whole-file translations only)')
+    parser.add_argument('--candidate-check', action='store_true',
+                       help='With --candidates: a winner must also print what the Python program prints')
+    parser.add_argument('--stream', action='store_true',
+                       help='Stream the translation into <output>.part and abort early on broken output')
+    parser.add_argument('--no-validate', action='store_true', help='Skip compilation validation')
+    parser.add_argument('--validate-tier', default='syntax', choices=TIERS,
+                       help='Compile validation depth: syntax-only, object file or full link (default: syntax)')
+    parser.add_argument('--compile-timeout', type=float,
+                       help='Per-tier compile timeout in seconds (default: 15/30 for C++, 30/60 for Rust)')
+    parser.add_argument('--no-workspace', action='store_true',
+                       help='Validate without the precompiled headers, shared cargo target dir and verdict cache')
+    parser.add_argument('--rust-deps',
+                       help='Crates the Rust output may use, e.g. "ndarray=0.15,rand=0.8" (fetched once, checked offline)')
+    parser.add_argument('--unity', action='store_true',
+                       help='Batch mode: validate small files together in unity builds')
+    parser.add_argument('--max-repairs', type=int, default=DEFAULT_MAX_ITERATIONS,
+                       help='Repair rounds for code that fails to compile, 0 to disable (default: 3)')
+    parser.add_argument('--repair-token-budget', type=int, default=DEFAULT_TOKEN_BUDGET,
+                       help='Token budget per file for repair requests (default: 8000)')
+    parser.add_argument('--strip-comments', action='store_true',
+                       help='Drop comments and docstrings from the Python source sent to the model')
+    parser.add_argument('--backend-config',
+                       help='JSON/YAML file mapping each target to provider, model, base_url, timeout, max_retries')
+    parser.add_argument('--provider', choices=sorted(PROVIDERS), help='Provider for the selected target language')
+    parser.add_argument('--model', help='Model for the selected target language')
+    parser.add_argument('--base-url',
+                       help='API base URL, e.g. a local OpenAI-compatible server (implies --provider openai)')
+    parser.add_argument('--request-timeout', type=float, help='Per-request timeout in seconds (default: 120)')
+    parser.add_argument('--max-retries', type=int,
+                       help='Retries with jittered backoff on 429/5xx/timeouts (default: 4)')
+    parser.add_argument('--hotspots', type=int, nargs='?', const=DEFAULT_TOP_N, metavar='N',
+                       help='Profile the program and move only its N hottest functions (default: '
+                            f'{DEFAULT_TOP_N}) into a pybind11/PyO3 extension with an import shim, '
+                            'written to --output-dir (default: <name>_<target>_hotspots)')
+    parser.add_argument('--hotspot-entry', metavar='CMD',
+                       help='Arguments after `python` that run the profiled workload from the current directory, '
+                            'e.g. "bench.py --size 1000" (default: the input file)')
+    parser.add_argument('--hotspot-input', metavar='FILE', help='Stdin for the profiled workload')
+    parser.add_argument('--numpy-check', action='store_true',
+                       help='Translate the NumPy kernels into an extension module and compare them with the '
+                            'original on generated arrays, with throughput (needs numpy and pybind11 or PyO3)')
+    parser.add_argument('--numpy-rtol', type=float, default=DEFAULT_RTOL,
+                       help=f'Relative tolerance for --numpy-check (default: {DEFAULT_RTOL:g})')
+    parser.add_argument('--numpy-atol', type=float, default=DEFAULT_ATOL,
+                       help=f'Absolute tolerance for --numpy-check (default: {DEFAULT_ATOL:g})')
+    parser.add_argument('--profile', choices=list(PROFILES) + ['auto'],
+                       help='Build the output with a named profile and write <name>.target.cmake plus a shared '
+                            'CMakeLists.txt (C++) or <name>.build.sh (Rust) next to it; auto times each optimized profile on the workload. '
+                            'C++ validation also compiles with the profile flags')
+    parser.add_argument('--profile-workload', action='append', metavar='FILE',
+                       help='Stdin for one PGO training / auto-selection run; repeat for more '
+                            '(default: the --benchmark-input files, else empty stdin)')
+    parser.add_argument('--benchmark', action='store_true',
+                       help='Build the output optimized and time it against the Python script, checking stdout')
+    parser.add_argument('--benchmark-input', action='append', metavar='FILE',
+                       help='Stdin for one benchmark case; repeat for more cases (default: empty stdin)')
+    parser.add_argument('--benchmark-runs', type=int, default=DEFAULT_RUNS,
+                       help=f'Runs per program and case (default: {DEFAULT_RUNS})')
+    parser.add_argument('--benchmark-timeout', type=float, default=DEFAULT_RUN_TIMEOUT,
+                       help=f'Per-run time limit in seconds (default: {DEFAULT_RUN_TIMEOUT:g})')
+    parser.add_argument('--benchmark-memory', type=int, default=DEFAULT_MEMORY_MB,
+                       help=f'Per-run address-space limit in MB (default: {DEFAULT_MEMORY_MB})')
+    parser.add_argument('--trace', metavar='OUT_JSON',
+                       help='Write a Chrome-trace JSON of per-stage timings, tokens and cost, and print a summary')
+    parser.add_argument('--no-daemon', action='store_true',
+                       help='Run in this process even when a migration daemon (python -m src.core.daemon) is up')
+    parser.add_argument('--priority', type=int, default=0,
+                       help='Queue priority when a migration daemon runs the job; higher runs first (default: 0)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the translation cache')
+    parser.add_argument('--refresh', action='store_true', help='Ignore cached translations but store fresh ones')
+    parser.add_argument('--cache-dir', help='Translation cache directory (default: ~/.cache/code-migrator/translations)')
+    parser.add_argument('--cache-max-size', type=int, default=DEFAULT_MAX_BYTES // (1024 * 1024),
+                       help='Translation cache size limit in MB (default: 256)')
     
-    return parser.parse_args()
+    return parser.parse_args(argv)
 
 def get_output_path(input_file, target_language, user_output_path=None):
     if user_output_path:
@@ -41,11 +190,18 @@ def get_output_path(input_file, target_language, user_output_path=None):
 
 def read_python_file(input_file):
     try:
-        with open(input_file, 'r', encoding='utf-8') as input_file:
-            return input_file.read()
+        with open(input_file, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < MMAP_THRESHOLD:
+                content = file.read().decode('utf-8')
+            else:
+                # Decoded straight from the mapped pages, without a second bytes copy
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    content = str(mapped, 'utf-8')
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content
     except FileNotFoundError:
-        print(f"Error: File '{file}' not found")
-        print(f"Error: File '{file}' not found")
+        print(f"Error: File '{input_file}' not found")
         return None
     except Exception as e:
         print(f"Error reading file: {e}")
@@ -53,135 +209,317 @@ def read_python_file(input_file):
 
 
 def analyze_python_code(python_code):
-    lines = python_code.split('\n')
-    functions = [line for line in lines if line.strip().startswith('def ')]
-    classes = [line for line in lines if line.strip().startswith('class ')]
-    imports = [line for line in lines if line.strip().startswith(('import ', 'from '))]
-    
-    return {
-        'functions': len(functions),
-        'classes': len(classes),
-        'imports': len(imports),
-        'total_lines': len(lines)
-    }
-
+    try:
+        return analyze_module(python_code).summary()
+    except SyntaxError as e:
+        print(f"Error parsing Python code: {e}")
+        return {'functions': 0, 'classes': 0, 'imports': 0, 'total_lines': len(python_code.split('\n'))}
 
-def convert_to_cpp(python_code, context=""):
-    client = openai.OpenAI()
 
-    try:
-        
-        
-        
-        prompt = f"""
-Please translate the following Python code to C++.
+def build_prompt(python_code, context, language_name):
+    return f"""
+Please translate the following Python code to {language_name}.
 
 Context: {context}
 
 Python Code:
 {python_code}
 
-Please provide only the C++ code without any explanations or markdown formatting.
+Please provide only the {language_name} code without any explanations or markdown formatting.
 """
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                
-                {"role":"system","content":"You are a code migration assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=1000,
-            temperature=0.1
-        )
-        
-        result = response.choices[0].message.content.strip()
-        
-    except Exception as e:
+
+
+def prepare_prompt(python_code, context, target_language):
+    """Return (prompt, max_tokens, fits) with max_tokens sized from the input;
+    fits is False when the prompt or the expected output is over the model's budget"""
+    model = model_for(target_language)
+    prompt = build_prompt(python_code, dedupe_blocks(context) if context else context,
+                          LANGUAGE_NAMES[target_language])
+    input_tokens = count_tokens(python_code, model)
+    max_tokens = output_budget(input_tokens, target_language, model)
+    return prompt, max_tokens, fits_budget(count_tokens(prompt, model), input_tokens, target_language, model)
+
+
+def needs_chunking(python_code, context, target_language):
+    compacted = compact_source(python_code, PROMPT_OPTIONS['strip_comments'])
+    return not prepare_prompt(compacted, translation_context(compacted, context, target_language), target_language)[2]
+
+
+def numpy_kernel_names(python_code):
+    try:
+        return [function.name for function in analyze_module(python_code).numpy_kernels()]
+    except SyntaxError:
+        return []
+
+
+def translation_context(python_code, context, target_language):
+    """User context plus the Eigen / ndarray mapping when the code has NumPy kernels"""
+    mapping = numpy_context(python_code, target_language)
+    if not mapping or mapping in (context or ""):
+        return context
+    return '\n'.join(part for part in (context, mapping) if part)
+
+
+def _cache_lookup(cache, python_code, context, model, target_language):
+    if cache is None:
+        return None, None
+    key = make_cache_key(python_code, context, model, target_language, PROMPT_VERSION)
+    return key, cache.get(key)
+
+
+def stream_prompt(prompt, target_language, max_tokens=1000):
+    """Yield (text, finish_reason) chunks for a prompt as they are generated"""
+    return get_backend(target_language).stream(prompt, max_tokens)
+
+
+def record_usage(prompt_tokens, completion_tokens, model):
+    """Count tokens in the run ledger and against the stage being traced"""
+    usage.record(prompt_tokens, completion_tokens)
+    span = current_span()
+    span.add('prompt_tokens', prompt_tokens)
+    span.add('completion_tokens', completion_tokens)
+    span.add('cost', estimate_cost(prompt_tokens, completion_tokens, model))
+
+
+def complete_prompt(prompt, target_language, max_tokens=None):
+    """Send a raw prompt to the model for `target_language`; None on API errors"""
+    backend = get_backend(target_language)
+    prompt_tokens = count_tokens(prompt, backend.model)
+    max_tokens = max_tokens or output_budget(prompt_tokens, target_language, backend.model)
+    try:
+        result = backend.complete(prompt, max_tokens)
+    except BackendError as e:
         print(f"Error calling API: {e}")
         return None
+    record_usage(prompt_tokens, count_tokens(result, backend.model), backend.model)
+    return result
 
-def convert_to_rust(python_code, context=""):
-    """Convert Python code to Rust"""
+
+async def complete_prompt_async(prompt, target_language, max_tokens=None, temperature=None):
+    """complete_prompt on the backend's async client, for use inside an event loop"""
+    backend = get_backend(target_language)
+    prompt_tokens = count_tokens(prompt, backend.model)
+    max_tokens = max_tokens or output_budget(prompt_tokens, target_language, backend.model)
+    # Backends registered by callers may not take a temperature
+    extra = {} if temperature is None else {'temperature': temperature}
     try:
-        
-        prompt = f"""
-Please translate the following Python code to Rust.
+        result = await backend.acomplete(prompt, max_tokens, **extra)
+    except BackendError as e:
+        print(f"Error calling API: {e}")
+        return None
+    record_usage(prompt_tokens, count_tokens(result, backend.model), backend.model)
+    return result
 
-Context: {context}
 
-Python Code:
-{python_code}
+def cached_translation(python_code, context, cache, target_language):
+    """The cached translation, if any, without sending a request"""
+    python_code = compact_source(python_code, PROMPT_OPTIONS['strip_comments'])
+    context = translation_context(python_code, context, target_language)
+    return _cache_lookup(cache, python_code, context, model_for(target_language), target_language)[1]
 
-Please provide only the Rust code without any explanations or markdown formatting.
-"""
-        
-        response = client.messages.create(
-            model="claude-3-sonnet-20240229",
-            max_tokens=4000,
-            messages=[
-                {"role": "user", "content": prompt}
-            ]
-        )
-        
-        return response.content[0].text.strip()
-        
-    except Exception as e:
-        print(f"Error calling API: {e}")
+
+def _convert(python_code, context, cache, target_language):
+    python_code = compact_source(python_code, PROMPT_OPTIONS['strip_comments'])
+    context = translation_context(python_code, context, target_language)
+    model = model_for(target_language)
+    cache_key, cached = _cache_lookup(cache, python_code, context, model, target_language)
+    if cached is not None:
+        return cached
+
+    prompt, max_tokens, fits = prepare_prompt(python_code, context, target_language)
+    if not fits:
+        print(f"Translation exceeds the {model} token budget (context window or completion limit); "
+              f"use --chunked")
         return None
+    result = complete_prompt(prompt, target_language, max_tokens)
+    if result is not None and cache_key is not None:
+        cache.put(cache_key, result)
+    return result
+
+
+def convert_to_cpp(python_code, context="", cache=None):
+    return _convert(python_code, context, cache, 'cpp')
+
+def convert_to_rust(python_code, context="", cache=None):
+    """Convert Python code to Rust"""
+    return _convert(python_code, context, cache, 'rust')
+
+
+async def speculative_translation_async(python_code, target_language, context, cache, candidates, validate,
+                                        check=None, llm_slots=None):
+    """Race `candidates` translations to the first valid one; returns (code, verdict, stats).
+
+    verdict and stats are None for a cache hit, which is validated as usual.
+    Only valid winners are cached.
+    """
+    model = model_for(target_language)
+    python_code = compact_source(python_code, PROMPT_OPTIONS['strip_comments'])
+    context = translation_context(python_code, context, target_language)
+    cache_key, cached = _cache_lookup(cache, python_code, context, model, target_language)
+    if cached is not None:
+        return cached, None, None
+    prompt, max_tokens, fits = prepare_prompt(python_code, context, target_language)
+    if not fits:
+        print(f"Translation exceeds the {model} token budget (context window or completion limit); "
+              f"use --chunked")
+        return None, None, None
+
+    async def complete(temperature, extra):
+        if llm_slots is None:
+            return await complete_prompt_async(prompt, target_language, max_tokens, temperature)
+        # Extra candidates only use slots no ordinary request is waiting for
+        async with llm_slots.slot(request_cost(prompt, target_language), priority=1 if extra else 0):
+            return await complete_prompt_async(prompt, target_language, max_tokens, temperature)
+
+    code, verdict, stats = await race_candidates(candidates, complete, validate, check,
+                                                 count_tokens(prompt, model))
+    if code is not None and verdict['success'] and cache_key is not None:
+        cache.put(cache_key, code)
+    return code, verdict, stats
+
+
+def stream_translation(python_code, target_language, context, cache, output_path):
+    """Translate with a streamed response written to <output>.part as it arrives.
+
+    Returns (code, stream_result); stream_result is None on a cache hit.
+    """
+    model = model_for(target_language)
+    python_code = compact_source(python_code, PROMPT_OPTIONS['strip_comments'])
+    context = translation_context(python_code, context, target_language)
+    cache_key, cached = _cache_lookup(cache, python_code, context, model, target_language)
+    if cached is not None:
+        return cached, None
+    prompt, max_tokens, fits = prepare_prompt(python_code, context, target_language)
+    if not fits:
+        print(f"Translation exceeds the {model} token budget (context window or completion limit); "
+              f"use --chunked")
+        return None, None
+    result = stream_to_partial(stream_prompt(prompt, target_language, max_tokens), target_language, output_path)
+    print_stream_report(result)
+    completion_tokens = count_tokens(result['code'], model) if result['code'] else result['tokens']
+    record_usage(count_tokens(prompt, model), completion_tokens, model)
+    if result['code'] is not None and cache_key is not None:
+        cache.put(cache_key, result['code'])
+    return result['code'], result
+
+
+def get_converter(target_language):
+    converters = {'cpp': convert_to_cpp, 'rust': convert_to_rust}
+    return converters.get(target_language)
 
 
 def write_cpp_file(cpp_code, output_file):
+    """Write through a temp file and a rename, so an interrupted run never leaves a partial output"""
+    temp_path = None
     try:
-        with open(output_file, 'w', encoding='utf-8') as file:
+        # Created like open() would create it (0o666 less the umask), unlike mkstemp's 0o600
+        candidate = os.path.join(os.path.dirname(output_file) or '.', f".tmp-{secrets.token_hex(8)}")
+        fd = os.open(candidate, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        temp_path = candidate
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
             file.write(cpp_code)
+        os.replace(temp_path, output_file)
+        temp_path = None
         print(f"Successfully wrote C++ code to: {output_file}")
         return True
     except Exception as e:
         print(f"Error writing file: {e}")
         return False
+    finally:
+        if temp_path is not None:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
 
 
-def _write_temp_cpp_file(cpp_code, temp_dir):
-    temp_cpp_file = os.path.join(temp_dir, "temp_code.cpp")
-    with open(temp_cpp_file, 'w', encoding='utf-8') as f:
-        f.write(cpp_code)
-    return temp_cpp_file
+def write_traced(code, output_file):
+    with tracer.span('write', file=str(output_file), bytes=len(code)):
+        return write_cpp_file(code, output_file)
 
-def _run_gcc_compilation(temp_cpp_file, temp_dir):
-    output_path = os.path.join(temp_dir, 'output')
-    return subprocess.run(
-        ['g++', '-std=c++17', '-o', output_path, temp_cpp_file],
-        capture_output=True,
-        text=True,
-        timeout=30
-    )
 
-def compile_cpp_code(cpp_code, output_file):
-    try:
-        with tempfile.TemporaryDirectory() as temp_dir:
-            temp_cpp_file = _write_temp_cpp_file(cpp_code, temp_dir)
-            compile_result = _run_gcc_compilation(temp_cpp_file, temp_dir)
-            
-            if compile_result.returncode == 0:
-                print("C++ code compiled successfully!")
-                return True, None
-            else:
-                error_output = compile_result.stderr
-                print(" C++ compilation failed!")
-                print("Compilation errors:")
-                print(error_output)
-                return False, error_output
-                
-    except subprocess.TimeoutExpired:
-        print("Compilation timed out")
-        return False, "Compilation timed out after 30 seconds"
-    except FileNotFoundError:
+def make_workspace(target_language, rust_deps=None, flags=()):
+    if target_language == 'rust':
+        return RustWorkspace(dependencies=parse_dependency_spec(rust_deps))
+    return ValidationWorkspace(flags=flags)
+
+
+def validation_flags(profile, target_language):
+    """C++ validation compiles with the chosen profile's flags; rustc type checking does not depend on them"""
+    if profile in PROFILES and target_language == 'cpp':
+        return tuple(profile_flags(profile, target_language))
+    return ()
+
+
+def validate_code(code, tier='syntax', timeout=None, workspace=None, target_language='cpp', flags=()):
+    with tracer.span('compile', tier=tier, language=target_language, bytes=len(code)) as span:
+        if workspace is not None:
+            result = workspace.validate(code, tier, timeout)
+        elif target_language == 'rust':
+            result = run_rust_check(code, tier, timeout)
+        else:
+            result = run_compile(code, tier, timeout, flags)
+        span.set('compiler_ms', round(result.get('duration', 0.0) * 1000, 3))
+        span.set('success', result['success'])
+        span.set('cache_hit', bool(result.get('cache_hit')))
+    return result
+
+
+def compile_code(code, target_language, tier='syntax', timeout=None, workspace=None, flags=()):
+    return report_validation(validate_code(code, tier, timeout, workspace, target_language, flags), target_language)
+
+
+def report_validation(result, target_language):
+    """Print a validation result; returns (success, errors)"""
+    language_name = LANGUAGE_NAMES[target_language]
+    if result.get('cache_hit'):
+        print(f"Validation cache hit ({result['time_saved']:.2f}s compile time saved)")
+    if result['success']:
+        print(f"{language_name} code compiled successfully!")
+        return True, None
+    if result['errors'] == "g++ compiler not found":
         print(" g++ not found - install g++ to compile C++ code")
-        return False, "g++ compiler not found"
-    except Exception as e:
-        print(f"Compilation error: {e}")
-        return False, str(e)
+    elif result['errors'] in ("rustc not found", "cargo not found"):
+        print(f" {result['errors']} - install a Rust toolchain to compile Rust code")
+    elif result['errors'].startswith("Compilation timed out"):
+        print("Compilation timed out")
+    else:
+        print(f" {language_name} compilation failed!")
+        print("Compilation errors:")
+        print(result['errors'])
+    return False, result['errors']
+
+
+def compile_cpp_code(cpp_code, output_file, tier='syntax', timeout=None, workspace=None):
+    return compile_code(cpp_code, 'cpp', tier, timeout, workspace)
+
+
+def build_output(code, target_language, python_file, output_path, profile, workload):
+    """Build the written output with `profile` ('auto' picks the fastest) next to it; returns the profile or None"""
+    cwd = os.path.dirname(os.path.abspath(python_file))
+    if profile == 'auto':
+        print("Timing build profiles on the workload...")
+        with tracer.span('profile-select'):
+            profile, timings = select_fastest_profile(code, target_language, workload, cwd=cwd)
+        print_profile_timings(timings, profile)
+        if profile is None:
+            print("No build profile produced a working binary.")
+            return None
+    with tracer.span('build', profile=profile):
+        with tempfile.TemporaryDirectory(prefix='migrator-build-') as directory:
+            binary, errors = build_profile(code, target_language, profile, directory, workload, cwd)
+            if binary is not None:
+                shutil.copy2(binary, binary_path(output_path))
+    if binary is None:
+        print(f"Build with the {profile} profile failed:\n{errors}")
+        return None
+    print(f"Built {binary_path(output_path)} with the {profile} profile")
+    script = write_build_script(output_path, target_language, profile)
+    if script is None:
+        print("Left the existing hand-written build script next to the output untouched")
+    else:
+        print(f"Build script written to {script}")
+    return profile
 
 
 def main():
@@ -195,56 +533,262 @@ def main():
     context = sys.argv[2] if len(sys.argv) > 2 else ""
     
     args = parse_arguments()
-    
+    if args.trace:
+        tracer.enable()
+        # Registered with atexit so failed runs, which leave via sys.exit, are traced too
+        atexit.register(finish_trace, args.trace)
+    migrate(args)
+
+
+def migrate(args):
+    """Run one migration from parsed arguments; exits through sys.exit on failure.
+
+    main() calls it for local runs and the migration daemon calls it for queued jobs.
+    """
+    # The ledger is per process; report only what this run spends
+    spent_before = usage.snapshot()
     python_file = args.input_file
     target_language = args.target_language
     output_path = args.output_path
     context = args.context or ""
+    PROMPT_OPTIONS['strip_comments'] = args.strip_comments
+    try:
+        configure_backends(load_backend_config(args.backend_config) if args.backend_config else None,
+                           **{target_language: {
+                               'provider': args.provider or ('openai' if args.base_url else None),
+                               'model': args.model, 'base_url': args.base_url,
+                               'timeout': args.request_timeout, 'max_retries': args.max_retries,
+                           }})
+    except (OSError, ValueError) as e:
+        print(f"Invalid backend configuration: {e}")
+        sys.exit(1)
+    cache = None
+    if not args.no_cache:
+        cache = TranslationCache(args.cache_dir, max_bytes=args.cache_max_size * 1024 * 1024,
+                                 refresh=args.refresh)
+    # Module models live in the same cache, under one size budget
+    persist_models(cache)
+    
+    compile_flags = validation_flags(args.profile, target_language)
+    if target_language == 'cpp':
+        # Translated NumPy kernels include Eigen
+        compile_flags += eigen_flags()
+    from src.core.batch import is_batch_input, default_output_dir, run_batch
+    if is_batch_input(python_file):
+        if args.benchmark:
+            print("--benchmark compares one script with its translation; skipped in batch mode")
+        if args.profile:
+            print("--profile builds one program; batch mode only validates with the profile flags")
+        output_dir = args.output_dir or default_output_dir(python_file, target_language)
+        workspace = None if args.no_workspace else make_workspace(target_language, args.rust_deps, compile_flags)
+        summary = run_batch(python_file, target_language, output_dir, context,
+                            concurrency=args.concurrency, validate=not args.no_validate, cache=cache,
+                            chunked=args.chunked, incremental=args.incremental,
+                            validate_tier=args.validate_tier, compile_timeout=args.compile_timeout,
+                            workspace=workspace,
+                            unity=args.unity, max_repairs=args.max_repairs,
+                            repair_token_budget=args.repair_token_budget, stream=args.stream,
+                            project=args.project, rpm=args.rpm, tpm=args.tpm, compile_flags=compile_flags,
+                            dedup=args.dedup, max_memory=args.max_memory,
+                            resume=args.resume, candidates=args.candidates,
+                            candidate_check=args.candidate_check)
+        if cache is not None:
+            cache.report()
+        usage.report(since=spent_before)
+        if summary is None or summary['failed']:
+            sys.exit(1)
+        return
     
     print(f"Reading Python file: {python_file}")
     print(f"Target language: {target_language}")
     
-    python_code = read_python_file(python_file)
+    with tracer.span('read', file=python_file) as span:
+        python_code = read_python_file(python_file)
+        span.set('bytes', len(python_code or ""))
     if python_code is None:
         print("Failed to read Python file. Exiting.")
         sys.exit(1)
     
     print(f"Successfully read {len(python_code.splitlines())} lines of Python code")
     
-    analysis = analyze_python_code(python_code)
+    with tracer.span('analyze'):
+        analysis = analyze_python_code(python_code)
     print(f"Analysis: {analysis['functions']} functions, {analysis['classes']} classes, {analysis['imports']} imports")
+    kernels = numpy_kernel_names(python_code)
+    if kernels:
+        library = 'Eigen' if target_language == 'cpp' else 'ndarray'
+        print(f"NumPy kernels: {', '.join(kernels)} (translated with the {library} mapping)")
+        if target_language == 'rust' and 'ndarray' not in parse_dependency_spec(args.rust_deps):
+            args.rust_deps = ','.join(part for part in (args.rust_deps, f"ndarray={NDARRAY_VERSION}") if part)
+    
+    if args.hotspots:
+        input_text = ""
+        if args.hotspot_input:
+            input_text = read_python_file(args.hotspot_input)
+            if input_text is None:
+                sys.exit(1)
+        output_dir = args.output_dir or f"{Path(python_file).stem}_{target_language}_hotspots"
+        with tracer.span('hotspots', target=target_language):
+            migrated = migrate_hotspots(python_file, python_code, target_language, get_converter(target_language),
+                                        output_dir, args.hotspots, args.hotspot_entry, input_text, context, cache,
+                                        args.benchmark_runs, build=not args.no_validate)
+        usage.report(since=spent_before)
+        if not migrated:
+            sys.exit(1)
+        return
+    
+    final_output_path = get_output_path(python_file, target_language, output_path)
     
     print(f"Converting to {target_language.upper()}...")
-    if target_language == 'cpp':
-        converted_code = convert_to_cpp(python_code, context)
-    elif target_language == 'rust':
-        converted_code = convert_to_rust(python_code, context)
-    else:
+    convert = get_converter(target_language)
+    if convert is None:
         print(f"Unsupported target language: {target_language}")
         sys.exit(1)
+    if not (args.chunked or args.incremental) and needs_chunking(python_code, context, target_language):
+        print(f"Input exceeds the {model_for(target_language)} token budget; translating in chunks")
+        args.chunked = True
+    dedup = None
+    if args.dedup:
+        dedup = DedupIndex()
+        args.chunked = True
+    manifest = replacements = None
+    # Only a .part this run streamed may be moved into place; an older one is a crashed run's leftover
+    streamed = False
+    workspace, race_verdict = None, None
+    # Translations are cached only once they have compiled, so a broken one is not replayed on every run;
+    # --no-validate output goes under keys that validated runs never read
+    translations = cache
+    if cache is not None:
+        translations = cache.unvalidated() if args.no_validate else cache.held()
+    with tracer.span('convert', target=target_language, bytes=len(python_code)):
+        if args.incremental:
+            converted_code, manifest, stats = translate_incremental(
+                python_code, convert, target_language, final_output_path, model_for(target_language),
+                PROMPT_VERSION, context, translations, concurrency=args.concurrency, dedup=dedup)
+            print(f"Incremental: reused {stats['reused']} units, translated {stats['translated']}")
+            if converted_code is not None and not stats['translated'] and output_is_current(final_output_path, manifest):
+                print(f"Output is up to date: {final_output_path}")
+                return
+        elif args.chunked:
+            converted_code = translate_chunked(python_code, convert, target_language, context, translations,
+                                               concurrency=args.concurrency, dedup=dedup)
+        elif args.stream:
+            converted_code, stream_result = stream_translation(python_code, target_language, context,
+                                                               translations, final_output_path)
+            streamed = stream_result is not None and not stream_result['aborted']
+        elif args.candidates > 1 and not args.no_validate:
+            if not args.no_workspace:
+                workspace = make_workspace(target_language, args.rust_deps, compile_flags)
+                workspace.prepare()
+
+            async def validate(code):
+                return await asyncio.to_thread(validate_code, code, args.validate_tier, args.compile_timeout,
+                                               workspace, target_language, compile_flags)
+
+            check = stdout_check(python_file, target_language) if args.candidate_check else None
+            converted_code, race_verdict, race = asyncio.run(speculative_translation_async(
+                python_code, target_language, context, translations, args.candidates, validate, check))
+            if race is not None:
+                print_race_report(race)
+        else:
+            converted_code = convert(python_code, context, translations)
+    if dedup is not None:
+        dedup.report()
     
     if converted_code is None:
         print("Failed to convert code. Exiting.")
         sys.exit(1)
     
     print(f"{target_language.upper()} code generated successfully!")
+    if cache is not None:
+        cache.report()
     
-    if target_language == 'cpp':
-        print("Validating C++ compilation...")
-        compilation_success, compilation_errors = compile_cpp_code(converted_code, output_path)
+    repaired = False
+    language_name = LANGUAGE_NAMES[target_language]
+    if not args.no_validate:
+        print(f"Validating {language_name} compilation...")
+        if workspace is None and not args.no_workspace:
+            workspace = make_workspace(target_language, args.rust_deps, compile_flags)
+            workspace.prepare()
+        if race_verdict is not None:
+            # The winning candidate was validated during the race
+            compilation_success, compilation_errors = report_validation(race_verdict, target_language)
+        else:
+            compilation_success, compilation_errors = compile_code(converted_code, target_language,
+                                                                   args.validate_tier, args.compile_timeout,
+                                                                   workspace, compile_flags)
+        
+        if not compilation_success and args.max_repairs:
+            print("Requesting repairs for the failing functions...")
+            with tracer.span('repair') as span:
+                converted_code, compilation_success, compilation_errors, repair_stats = repair(
+                    converted_code, target_language,
+                    lambda code: validate_code(code, args.validate_tier, args.compile_timeout, workspace,
+                                               target_language, compile_flags),
+                    lambda prompt: complete_prompt(prompt, target_language),
+                    args.max_repairs, args.repair_token_budget, compilation_errors)
+                span.set('rounds', repair_stats['iterations'])
+            print(f"Repair: {repair_stats['iterations']} rounds, {repair_stats['fragments']} fragments, "
+                  f"~{repair_stats['tokens']} tokens")
+            repaired = repair_stats['fragments'] > 0
+            if compilation_success:
+                print(f"Repaired {language_name} code compiled successfully!")
+                if manifest is not None:
+                    replacements = record_repair(manifest, converted_code)
         
         if not compilation_success:
-            print("Compilation validation failed. Not saving invalid C++ code.")
+            discard_partial(final_output_path)
+            if translations is not cache:
+                translations.discard()
+            print(f"Compilation validation failed. Not saving invalid {language_name} code.")
             print("Please review the compilation errors above.")
             sys.exit(1)
+        if translations is not cache:
+            if not repaired or replacements is not None:
+                translations.commit(replacements)
+            else:
+                # Repaired without a per-unit mapping: which cached translation broke is unknown
+                translations.discard()
     
-    final_output_path = get_output_path(python_file, target_language, output_path)
-    if write_cpp_file(converted_code, final_output_path):
+    usage.report(since=spent_before)
+    if streamed and finalize_partial(final_output_path, converted_code):
+        print(f"Translation complete! Output saved to: {final_output_path}")
+    elif write_traced(converted_code, final_output_path):
+        discard_partial(final_output_path)
+        if manifest is not None:
+            write_manifest(final_output_path, manifest)
         print(f"Translation complete! Output saved to: {final_output_path}")
     else:
         print("Failed to write output file.")
         sys.exit(1)
 
+    profile = DEFAULT_PROFILE
+    if args.profile:
+        workload = load_inputs(args.profile_workload or args.benchmark_input)
+        profile = build_output(converted_code, target_language, python_file, final_output_path, args.profile,
+                               workload)
+        if profile is None:
+            sys.exit(1)
+
+    if args.numpy_check:
+        output_dir = args.output_dir or f"{Path(python_file).stem}_{target_language}_kernels"
+        with tracer.span('numpy-check'):
+            matched = check_numpy_kernels(python_file, python_code, target_language, convert, output_dir, context,
+                                          cache, args.numpy_rtol, args.numpy_atol)
+        if not matched:
+            sys.exit(1)
+
+    if args.benchmark:
+        print(f"Benchmarking {language_name} ({profile} build) against Python "
+              f"({args.benchmark_runs} runs per case)...")
+        with tracer.span('benchmark'):
+            report = benchmark_translation(python_file, converted_code, target_language,
+                                           load_inputs(args.benchmark_input), args.benchmark_runs,
+                                           args.benchmark_timeout, args.benchmark_memory, profile=profile)
+        print_speedup_report(report, language_name)
+        if report['build_error'] or not all(case['stdout_match'] for case in report['cases']):
+            sys.exit(1)
+
 
 if __name__ == "__main__":
     main()
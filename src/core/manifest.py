@@ -0,0 +1,216 @@
+"""
+Per-unit hash manifests for incremental re-migration
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+
+from src.core.chunking import (
+    split_into_units,
+    imports_source,
+    translate_units_async,
+    assemble_units,
+    split_unit_headers,
+)
+from src.core.repair import find_top_level_blocks
+from src.core.scheduler import RequestScheduler
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def manifest_path(output_path):
+    return str(output_path) + MANIFEST_SUFFIX
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def dependency_hash(unit, units_by_name, module_imports):
+    """Hash of everything outside the unit that its prompt depends on"""
+    parts = [module_imports]
+    parts.extend(f"{name}:{units_by_name[name].signature}" for name in unit.dependencies)
+    return content_hash('\n'.join(parts))
+
+
+def load_manifest(output_path):
+    try:
+        with open(manifest_path(output_path), 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def write_manifest(output_path, manifest):
+    path = manifest_path(output_path)
+    directory = os.path.dirname(path) or '.'
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.manifest-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            json.dump(manifest, file, indent=2)
+        os.replace(temp_path, path)
+        return True
+    except OSError as e:
+        print(f"Warning: could not write manifest {path}: {e}")
+        return False
+
+
+def _reusable_units(previous, target_language, model, prompt_version, context):
+    """Map unit name to its previous entry if the manifest was built the same way"""
+    if previous is None:
+        return {}
+    if (previous.get('target_language') != target_language or previous.get('model') != model
+            or previous.get('prompt_version') != prompt_version
+            or previous.get('context_hash') != content_hash(context or "")):
+        return {}
+    return {entry['name']: entry for entry in previous.get('units', [])}
+
+
+def output_is_current(output_path, manifest):
+    try:
+        with open(output_path, 'r', encoding='utf-8') as file:
+            return content_hash(file.read()) == manifest.get('output_hash')
+    except OSError:
+        return False
+
+
+async def translate_incremental_async(python_code, convert, target_language, output_path,
+                                      model, prompt_version, context="", cache=None, llm_slots=None,
+                                      lookup=None, dedup=None, module_label=None):
+    """Retranslate only units whose source or dependency signatures changed.
+
+    Returns (code, manifest, stats) where stats counts reused and translated
+    units; code is None when a translation failed.
+    """
+    try:
+        units = split_into_units(python_code)
+    except SyntaxError as e:
+        print(f"Error parsing Python code: {e}")
+        return None, None, {'reused': 0, 'translated': 0}
+    module_imports = imports_source(python_code)
+    units_by_name = {unit.name: unit for unit in units}
+    previous = _reusable_units(load_manifest(output_path), target_language, model,
+                               prompt_version, context)
+
+    entries, stale = [], []
+    for unit in units:
+        entry = {
+            'name': unit.name,
+            'source_hash': content_hash(unit.source),
+            'deps_hash': dependency_hash(unit, units_by_name, module_imports),
+        }
+        old = previous.get(unit.name)
+        if (old and old.get('code') is not None and old['source_hash'] == entry['source_hash']
+                and old['deps_hash'] == entry['deps_hash']):
+            entry['code'] = old['code']
+        else:
+            stale.append((unit, entry))
+        entries.append(entry)
+
+    stats = {'reused': len(units) - len(stale), 'translated': len(stale)}
+    if stale:
+        outputs = await translate_units_async([unit for unit, _ in stale], convert, module_imports,
+                                              target_language, context, cache, llm_slots,
+                                              all_units=units, lookup=lookup, dedup=dedup,
+                                              module_label=module_label)
+        if any(output is None for output in outputs):
+            return None, None, stats
+        for (_, entry), output in zip(stale, outputs):
+            entry['code'] = output
+
+    for entry in entries:
+        entry['code_hash'] = content_hash(entry['code'])
+    code = assemble_units([entry['code'] for entry in entries], target_language)
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'target_language': target_language,
+        'model': model,
+        'prompt_version': prompt_version,
+        'context_hash': content_hash(context or ""),
+        'output_hash': content_hash(code),
+        'units': entries,
+    }
+    return code, manifest, stats
+
+
+def _blocks(code):
+    lines = code.split('\n')
+    return [(start, end, '\n'.join(lines[start - 1:end])) for start, end in find_top_level_blocks(code)]
+
+
+def _block_head(block):
+    """Declaration up to the opening brace, whitespace-normalized"""
+    return ' '.join(block.split('{', 1)[0].split())
+
+
+def _repaired_unit(code, target_language, repaired_blocks, new_blocks, framed, repaired_headers):
+    """`code` with each block the repair rewrote swapped for its repaired version, or
+    None when a block has no single repaired counterpart or other text changed"""
+    headers, body = split_unit_headers(code, target_language)
+    lines = body.split('\n')
+    for start, end, block in reversed(_blocks(body)):
+        if block in repaired_blocks:
+            continue
+        candidates = new_blocks.get(_block_head(block), [])
+        if len(candidates) != 1:
+            return None
+        lines[start - 1:end] = candidates[0].split('\n')
+    body = '\n'.join(lines)
+    if body and f"\n{body}\n" not in framed:
+        return None
+    headers = [line for line in headers if line in repaired_headers]
+    return '\n'.join(headers + [body]) if headers else body
+
+
+def record_repair(manifest, repaired_code):
+    """Store the repaired code in the manifest's unit entries.
+
+    Each top-level block of a unit that the repair changed is matched to the
+    repaired block with the same declaration; a unit is only cleared (and
+    retranslated next run) when that match is ambiguous. Returns
+    {unrepaired unit code: repaired code or None} for every unit, so the
+    translations cache can store the repaired versions.
+    """
+    target_language = manifest['target_language']
+    repaired_headers, _ = split_unit_headers(repaired_code, target_language)
+    framed = f"\n{repaired_code}\n"
+    repaired_blocks = {block for _, _, block in _blocks(repaired_code)}
+    entries = [entry for entry in manifest['units'] if entry.get('code') is not None]
+    unit_blocks = set()
+    for entry in entries:
+        unit_blocks.update(block for _, _, block in _blocks(split_unit_headers(entry['code'], target_language)[1]))
+    # Repaired blocks that no unit has verbatim, by declaration
+    new_blocks = {}
+    for block in repaired_blocks - unit_blocks:
+        new_blocks.setdefault(_block_head(block), []).append(block)
+
+    repaired = [(entry['code'], _repaired_unit(entry['code'], target_language, repaired_blocks, new_blocks,
+                                               framed, set(repaired_headers)))
+                for entry in entries]
+    # Includes the repair added belong to no unit; keep them with the first unit that has code
+    known = set().union(*(split_unit_headers(code, target_language)[0] for _, code in repaired if code))
+    added = [line for line in repaired_headers if line not in known]
+    replacements = {}
+    for entry, (old, code) in zip(entries, repaired):
+        if code is not None and added:
+            code, added = '\n'.join(added + [code]), []
+        replacements[old] = entry['code'] = code
+        entry['code_hash'] = content_hash(code) if code is not None else None
+    manifest['output_hash'] = content_hash(repaired_code)
+    return replacements
+
+
+def translate_incremental(python_code, convert, target_language, output_path, model,
+                          prompt_version, context="", cache=None, concurrency=8, dedup=None):
+    async def run():
+        return await translate_incremental_async(python_code, convert, target_language, output_path,
+                                                 model, prompt_version, context, cache,
+                                                 RequestScheduler(concurrency), dedup=dedup)
+    return asyncio.run(run())
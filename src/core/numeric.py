@@ -0,0 +1,272 @@
+"""
+NumPy-aware translation: a dedicated Eigen / ndarray mapping for functions the
+analysis flags as NumPy kernels, and a numeric check of the translated kernels
+against the original on generated arrays, with throughput figures
+"""
+
+import ast
+import json
+import os
+import subprocess
+import sys
+
+from src.core.analysis import analyze_module
+from src.core.hotspots import (
+    binding_context, build_extension, hotspot_source, ineligible_reason, write_extension,
+)
+from src.core.validation import eigen_flags
+
+DEFAULT_RTOL = 1e-6
+DEFAULT_ATOL = 1e-9
+DEFAULT_SIZE = 100000
+CHECK_TIMEOUT = 600
+NDARRAY_VERSION = '0.16'
+RUST_NUMPY_VERSION = '0.22'
+# Parameter names that are almost always integer sizes or axes rather than arrays
+INT_PARAMETERS = {'n', 'k', 'm', 'axis', 'size', 'count', 'steps', 'iterations', 'window', 'order', 'degree',
+                  'i', 'j', 'idx', 'index', 'seed'}
+
+# Eigen types for float64 arrays by dimension, shared by the translation and the binding prompts
+EIGEN_ARRAYS = {1: 'Eigen::ArrayXd', 2: 'Eigen::Array<double, Eigen::Dynamic, Eigen::Dynamic, Eigen::RowMajor>'}
+
+NUMPY_MAPPINGS = {
+    'cpp': f"""NumPy functions ({{kernels}}) map to Eigen (#include <Eigen/Dense>):
+- 1-D float64 arrays -> {EIGEN_ARRAYS[1]}, 2-D -> {EIGEN_ARRAYS[2]}
+  (row-major matches NumPy's C order); float32 -> the float variants; take inputs as const Eigen::Ref<const T>&.
+- Elementwise ufuncs -> array expressions (.exp(), .log(), .sqrt(), .abs(), .square(), .max(), .min());
+  np.where -> (cond).select(a, b); np.clip -> .cwiseMax(lo).cwiseMin(hi).
+- Reductions -> .sum(), .mean(), .maxCoeff(), .minCoeff(), .prod(); axis=0 -> .colwise(), axis=1 -> .rowwise().
+- np.dot / @ -> .matrix() products (use .noalias() for assignment); broadcasting of a row or column -> .rowwise()
+  or .colwise() with the vector, never an explicit copy.
+- Keep whole-array expressions so Eigen fuses and vectorizes them; where a loop is needed, iterate the innermost
+  index over contiguous memory and avoid temporaries inside it.""",
+    'rust': """NumPy functions ({kernels}) map to the ndarray crate (use ndarray::prelude::*):
+- Inputs as ArrayView1<f64> / ArrayView2<f64> (f32 for float32), outputs as Array1 / Array2 in standard (C) layout.
+- Elementwise ufuncs -> .mapv(f64::exp) etc. or arithmetic on views; np.where -> Zip::from(..).map_collect.
+- Reductions -> .sum(), .mean(), fold for max/min; axis=k -> .sum_axis(Axis(k)) / .mean_axis(Axis(k)).
+- np.dot / @ -> .dot(); broadcasting -> arithmetic between views of compatible shapes or .broadcast().
+- Fuse passes with Zip so each element is touched once; for explicit loops use .as_slice() on standard-layout
+  arrays and iterate the contiguous slice so the compiler can vectorize.""",
+}
+
+
+def numpy_context(python_code, target_language):
+    """The mapping to add to the prompt when the code contains NumPy kernels, else ''"""
+    try:
+        kernels = analyze_module(python_code).numpy_kernels()
+    except SyntaxError:
+        return ""
+    if not kernels:
+        return ""
+    return NUMPY_MAPPINGS[target_language].format(kernels=', '.join(function.name for function in kernels))
+
+
+def _annotation_kind(annotation):
+    text = ast.unparse(annotation)
+    if 'ndarray' in text or 'NDArray' in text or 'ArrayLike' in text:
+        return 'array'
+    return {'float': 'float', 'int': 'int', 'bool': 'bool'}.get(text)
+
+
+def _two_dimensional(name, function):
+    for node in ast.walk(function):
+        uses = isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id == name
+        if uses and isinstance(node.slice, ast.Tuple):
+            return True
+        if isinstance(node, ast.Attribute) and node.attr == 'T' and isinstance(node.value, ast.Name) \
+                and node.value.id == name:
+            return True
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.MatMult) and any(
+                isinstance(side, ast.Name) and side.id == name for side in (node.left, node.right)):
+            return True
+        if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Attribute) and node.value.attr == 'shape' \
+                and isinstance(node.value.value, ast.Name) and node.value.value.id == name \
+                and isinstance(node.slice, ast.Constant) and node.slice.value == 1:
+            return True
+    return False
+
+
+def kernel_parameters(python_code, function_name):
+    """Guess what to pass each parameter of a kernel: [{'name', 'kind', 'ndim', 'value'}].
+
+    Annotations win, then defaults, then the name; everything else is taken to
+    be a float64 array, 2-D when the body indexes it with a tuple, transposes
+    it, multiplies it with @ or reads shape[1].
+    """
+    tree = ast.parse(python_code)
+    function = next(node for node in tree.body if isinstance(node, ast.FunctionDef) and node.name == function_name)
+    arguments = function.args.posonlyargs + function.args.args
+    defaults = [None] * (len(arguments) - len(function.args.defaults)) + list(function.args.defaults)
+    parameters = []
+    for argument, default in zip(arguments, defaults):
+        kind = _annotation_kind(argument.annotation) if argument.annotation is not None else None
+        value = default.value if isinstance(default, ast.Constant) else None
+        if kind is None and value is not None:
+            kind = type(value).__name__ if type(value).__name__ in ('int', 'float', 'bool') else None
+        if kind is None:
+            kind = 'int' if argument.arg in INT_PARAMETERS else 'array'
+        if value is None:
+            value = {'int': 0 if argument.arg == 'axis' else 3, 'float': 0.5, 'bool': True}.get(kind)
+        ndim = (2 if _two_dimensional(argument.arg, function) else 1) if kind == 'array' else 0
+        parameters.append({'name': argument.arg, 'kind': kind, 'ndim': ndim, 'value': value})
+    return parameters
+
+
+def kernel_binding_context(module_name, names, helpers, target_language):
+    """binding_context() plus how NumPy arrays cross the extension boundary"""
+    context = binding_context(module_name, names, helpers, target_language)
+    if target_language == 'cpp':
+        return context + (" Include <pybind11/eigen.h> so NumPy arrays convert to Eigen: take 1-D float64 inputs as "
+                          f"const Eigen::Ref<const {EIGEN_ARRAYS[1]}>& and 2-D ones as "
+                          f"const Eigen::Ref<const {EIGEN_ARRAYS[2]}>& so C-ordered arrays are not copied, "
+                          f"and return {EIGEN_ARRAYS[1]}, {EIGEN_ARRAYS[2]} or double.")
+    return context + (f" Use the numpy {RUST_NUMPY_VERSION} crate: take PyReadonlyArray1<f64> / PyReadonlyArray2<f64>, "
+                      "compute on .as_array() views with ndarray, and return arrays with .into_pyarray_bound(py) "
+                      "or plain f64.")
+
+
+_HARNESS = '''"""
+Generated by code-migrator: numeric check of {module_name} against the original {stem} kernels
+"""
+
+import importlib.util
+import json
+import sys
+import timeit
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("numpy is not installed for " + sys.executable)
+
+sys.path[:0] = [{output_dir!r}, {source_dir!r}]
+import {module_name} as native
+
+spec = importlib.util.spec_from_file_location("original_{stem}", {source_file!r})
+original = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(original)
+
+KERNELS = {kernels!r}
+RTOL, ATOL = {rtol!r}, {atol!r}
+SIZE = {size!r}
+
+
+def make_argument(parameter, rng, square):
+    if parameter["kind"] != "array":
+        return parameter["value"]
+    # With any 2-D input, every array shares one side length so products and broadcasts line up
+    side = max(2, int(SIZE ** 0.5))
+    shape = (side, side) if parameter["ndim"] == 2 else ((side,) if square else (SIZE,))
+    # Positive and away from zero so log, sqrt and division stay defined
+    return np.ascontiguousarray(rng.uniform(0.5, 1.5, size=shape))
+
+
+def per_call(function, arguments):
+    count, seconds = timeit.Timer(lambda: function(*arguments)).autorange()
+    return seconds / count
+
+
+results = {{}}
+for name, parameters in KERNELS.items():
+    rng = np.random.default_rng(0)
+    square = any(parameter["ndim"] == 2 for parameter in parameters)
+    arguments = [make_argument(parameter, rng, square) for parameter in parameters]
+    elements = sum(argument.size for argument in arguments if isinstance(argument, np.ndarray))
+    try:
+        expected = np.asarray(getattr(original, name)(*[np.copy(a) if isinstance(a, np.ndarray) else a
+                                                        for a in arguments]), dtype=float)
+        actual = np.asarray(getattr(native, name)(*[np.copy(a) if isinstance(a, np.ndarray) else a
+                                                    for a in arguments]), dtype=float)
+    except Exception as e:
+        results[name] = {{"ok": False, "error": type(e).__name__ + ": " + str(e)}}
+        continue
+    if expected.shape != actual.shape:
+        results[name] = {{"ok": False, "error": "shape %s, expected %s" % (actual.shape, expected.shape)}}
+        continue
+    error = float(np.max(np.abs(actual - expected))) if expected.size else 0.0
+    results[name] = {{
+        "ok": bool(np.allclose(actual, expected, rtol=RTOL, atol=ATOL, equal_nan=True)),
+        "max_abs_error": error,
+        "elements": int(elements),
+        "python_seconds": per_call(getattr(original, name), arguments),
+        "native_seconds": per_call(getattr(native, name), arguments),
+    }}
+print(json.dumps(results))
+'''
+
+
+def write_harness(output_dir, python_file, module_name, kernels, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL,
+                  size=DEFAULT_SIZE):
+    """Write check_<module>.py, which compares each kernel on generated arrays and prints JSON"""
+    source_file = os.path.abspath(python_file)
+    path = os.path.join(output_dir, f"check_{module_name}.py")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(_HARNESS.format(module_name=module_name, stem=os.path.splitext(os.path.basename(python_file))[0],
+                                output_dir=os.path.abspath(output_dir), source_dir=os.path.dirname(source_file),
+                                source_file=source_file, kernels=kernels, rtol=rtol, atol=atol, size=size))
+    return path
+
+
+def run_harness(harness, timeout=CHECK_TIMEOUT):
+    """Run a check harness with this interpreter; returns (results, errors)"""
+    try:
+        result = subprocess.run([sys.executable, harness], capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return None, f"Numeric check timed out after {timeout} seconds"
+    if result.returncode != 0:
+        return None, result.stderr.strip()[-2000:] or f"exit {result.returncode}"
+    try:
+        return json.loads(result.stdout.strip().splitlines()[-1]), None
+    except (ValueError, IndexError):
+        return None, f"Unreadable check output: {result.stdout[-500:]}"
+
+
+def print_numeric_report(results, rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL):
+    for name, result in results.items():
+        if 'error' in result:
+            print(f"  {name}: FAILED ({result['error']})")
+            continue
+        verdict = 'ok' if result['ok'] else f"OUTSIDE rtol={rtol:g} atol={atol:g}"
+        python_rate = result['elements'] / max(result['python_seconds'], 1e-12) / 1e6
+        native_rate = result['elements'] / max(result['native_seconds'], 1e-12) / 1e6
+        speedup = result['python_seconds'] / max(result['native_seconds'], 1e-12)
+        print(f"  {name}: max |error| {result['max_abs_error']:.3g} ({verdict}); "
+              f"Python {python_rate:.1f} M elements/s, native {native_rate:.1f} M elements/s ({speedup:.2f}x)")
+
+
+def check_numpy_kernels(python_file, python_code, target_language, convert, output_dir, context="", cache=None,
+                        rtol=DEFAULT_RTOL, atol=DEFAULT_ATOL, size=DEFAULT_SIZE):
+    """Translate the module's NumPy kernels into an extension module, build it and
+    compare it with the original on generated arrays. Returns True when every
+    kernel matched within tolerance."""
+    stem = os.path.splitext(os.path.basename(python_file))[0]
+    module_name = f"{stem}_kernels"
+    tree = ast.parse(python_code)
+    top_level = {node.name: node for node in tree.body if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef))}
+    names = [function.name for function in analyze_module(python_code).numpy_kernels()
+             if ineligible_reason(top_level[function.name]) is None]
+    if not names:
+        print("No NumPy kernels to check.")
+        return False
+    print(f"Checking NumPy kernels {', '.join(names)} numerically...")
+    source, helpers = hotspot_source(python_code, names)
+    parts = (context, numpy_context(python_code, target_language),
+             kernel_binding_context(module_name, names, helpers, target_language))
+    code = convert(source, '\n'.join(part for part in parts if part), cache)
+    if code is None:
+        print("Failed to translate the NumPy kernels.")
+        return False
+    os.makedirs(output_dir, exist_ok=True)
+    script = write_extension(output_dir, module_name, code, target_language, flags=eigen_flags(),
+                             dependencies={'numpy': RUST_NUMPY_VERSION, 'ndarray': NDARRAY_VERSION})
+    errors = build_extension(script, module_name, names)
+    if errors:
+        print(f"Kernel extension build failed:\n{errors}")
+        return False
+    kernels = {name: kernel_parameters(python_code, name) for name in names}
+    results, errors = run_harness(write_harness(output_dir, python_file, module_name, kernels, rtol, atol, size))
+    if results is None:
+        print(f"Numeric check failed to run:\n{errors}")
+        return False
+    print_numeric_report(results, rtol, atol)
+    return all(result.get('ok') for result in results.values())
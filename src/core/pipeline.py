@@ -0,0 +1,88 @@
+"""
+Memory-bounded pipeline for repository-scale batches: files are pulled from
+a lazy iterator through a bounded queue, so discovery waits for the
+per-file stages, and files in flight share a byte budget
+"""
+
+import asyncio
+import resource
+
+DEFAULT_MAX_MEMORY_MB = 1024
+# A file in flight holds its source, the prompt, the translation and compiler output
+MEMORY_PER_SOURCE_BYTE = 4
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class MemoryBudget:
+    """Bytes reserved by files in flight.
+
+    Reservations are admitted in arrival order and wait until they fit; a
+    file larger than the whole budget is admitted once nothing else holds
+    memory, so it runs alone instead of never.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_use = 0
+        self.peak = 0
+        self.waits = 0
+        self._tickets = 0
+        self._serving = 0
+        self._changed = asyncio.Condition()
+
+    def _admissible(self, ticket, size):
+        return ticket == self._serving and (self.in_use == 0 or self.in_use + size <= self.limit)
+
+    async def acquire(self, size):
+        async with self._changed:
+            ticket = self._tickets
+            self._tickets += 1
+            if not self._admissible(ticket, size):
+                self.waits += 1
+            await self._changed.wait_for(lambda: self._admissible(ticket, size))
+            self._serving += 1
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+            self._changed.notify_all()
+
+    async def release(self, size):
+        async with self._changed:
+            self.in_use -= size
+            self._changed.notify_all()
+
+
+async def run_pipeline(items, handle, workers, budget=None, weight=None):
+    """Run `handle(item)` for every item with at most `workers` in flight.
+
+    `items` is consumed lazily: the queue between it and the workers holds
+    at most `workers` entries, so a large tree is never listed up front.
+    With a budget, each item reserves `weight(item)` bytes while it is
+    handled. Returns the results in item order.
+    """
+    queue = asyncio.Queue(maxsize=workers)
+    results = {}
+
+    async def produce():
+        for index, item in enumerate(items):
+            await queue.put((index, item))
+        for _ in range(workers):
+            await queue.put(None)
+
+    async def work():
+        while (entry := await queue.get()) is not None:
+            index, item = entry
+            reserved = weight(item) if budget is not None else 0
+            if budget is not None:
+                await budget.acquire(reserved)
+            try:
+                results[index] = await handle(item)
+            finally:
+                if budget is not None:
+                    await budget.release(reserved)
+
+    await asyncio.gather(produce(), *(work() for _ in range(workers)))
+    return [results[index] for index in range(len(results))]
@@ -0,0 +1,254 @@
+"""
+Named optimization profiles for building migrated code, including a PGO
+training run, and the CMake / shell build script that records them
+"""
+
+import os
+import shutil
+import stat
+import subprocess
+
+from src.core.validation import RUST_EDITION, compiler_command, eigen_flags
+
+PROFILES = {
+    'debug': {'cpp': ['-O0', '-g'], 'rust': ['-C', 'opt-level=0', '-g']},
+    'release': {'cpp': ['-O3', '-DNDEBUG'], 'rust': ['-C', 'opt-level=3']},
+    'release-native': {'cpp': ['-O3', '-DNDEBUG', '-march=native'],
+                       'rust': ['-C', 'opt-level=3', '-C', 'target-cpu=native']},
+    'lto': {'cpp': ['-O3', '-DNDEBUG', '-flto'],
+            'rust': ['-C', 'opt-level=3', '-C', 'lto=fat', '-C', 'codegen-units=1']},
+    'pgo': {'cpp': ['-O3', '-DNDEBUG'], 'rust': ['-C', 'opt-level=3']},
+}
+# Instrumented and profile-guided flags added on top of the pgo profile; {dir} is the profile directory
+PGO_GENERATE = {'cpp': ['-fprofile-generate={dir}'], 'rust': ['-C', 'profile-generate={dir}']}
+PGO_USE = {'cpp': ['-fprofile-use={dir}', '-fprofile-correction'],
+           'rust': ['-C', 'profile-use={dir}/merged.profdata']}
+DEFAULT_PROFILE = 'release'
+# Candidates for --profile auto; debug is never the fastest
+AUTO_PROFILES = ('release', 'release-native', 'lto', 'pgo')
+BUILD_TIMEOUT = 120
+TRAINING_TIMEOUT = 60
+GENERATED_MARKER = 'Generated by code-migrator'
+CMAKE_TARGET_SUFFIX = '.target.cmake'
+RUST_SCRIPT_SUFFIX = '.build.sh'
+
+
+def profile_flags(profile, target_language):
+    """Compiler flags for a named profile (without the PGO stage flags)"""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown build profile: {profile}")
+    return list(PROFILES[profile][target_language])
+
+
+def _pgo_flags(stage_flags, target_language, profile_dir):
+    return [flag.format(dir=profile_dir) for flag in stage_flags[target_language]]
+
+
+def _build_command(source_path, directory, target_language, flags):
+    if target_language == 'cpp':
+        return compiler_command(source_path, directory, 'link', list(flags) + list(eigen_flags()))
+    return (['rustc', '--edition', RUST_EDITION, '--error-format=short'] + list(flags)
+            + ['-o', os.path.join(directory, 'output'), source_path])
+
+
+def _compile(command):
+    try:
+        result = subprocess.run(command, capture_output=True, text=True, timeout=BUILD_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        return f"Build timed out after {BUILD_TIMEOUT} seconds"
+    except FileNotFoundError:
+        return f"{command[0]} not found"
+    return None if result.returncode == 0 else result.stderr
+
+
+def _llvm_profdata():
+    # Prefer the toolchain's own llvm-tools: a system llvm-profdata from an
+    # older LLVM cannot read the .profraw format newer rustc writes
+    try:
+        sysroot = subprocess.run(['rustc', '--print', 'sysroot'], capture_output=True, text=True).stdout.strip()
+        host = next(line.split()[1] for line in subprocess.run(['rustc', '-vV'], capture_output=True,
+                                                                 text=True).stdout.splitlines()
+                    if line.startswith('host:'))
+        bundled = os.path.join(sysroot, 'lib', 'rustlib', host, 'bin', 'llvm-profdata')
+        if os.path.exists(bundled):
+            return bundled
+    except (OSError, StopIteration):
+        pass
+    return shutil.which('llvm-profdata')
+
+
+def _train(binary, workload, cwd):
+    """Run the instrumented binary once per workload input; returns an error or None"""
+    for name, input_text in workload.items():
+        try:
+            result = subprocess.run([binary], input=input_text, capture_output=True, text=True,
+                                    timeout=TRAINING_TIMEOUT, cwd=cwd)
+        except subprocess.TimeoutExpired:
+            return f"PGO training run '{name}' timed out after {TRAINING_TIMEOUT} seconds"
+        if result.returncode != 0:
+            return f"PGO training run '{name}' exited with {result.returncode}: {result.stderr.strip()[-500:]}"
+    return None
+
+
+def _merge_profiles(profile_dir):
+    profdata = _llvm_profdata()
+    if profdata is None:
+        return "llvm-profdata not found (rustup component add llvm-tools)"
+    raw = [os.path.join(profile_dir, name) for name in os.listdir(profile_dir) if name.endswith('.profraw')]
+    return _compile([profdata, 'merge', '-o', os.path.join(profile_dir, 'merged.profdata')] + raw)
+
+
+def build_profile(code, target_language, profile, directory, workload=None, cwd=None):
+    """Build `code` with a named profile into `directory`; returns (binary path, errors).
+
+    The pgo profile builds an instrumented binary, runs it on each stdin text
+    in `workload` ({name: text}, one empty-stdin run by default) from `cwd`,
+    then rebuilds the same path with the collected profile.
+    """
+    extension = '.cpp' if target_language == 'cpp' else '.rs'
+    source_path = os.path.join(directory, 'translated' + extension)
+    with open(source_path, 'w', encoding='utf-8') as f:
+        f.write(code)
+    flags = profile_flags(profile, target_language)
+    binary = os.path.join(directory, 'output')
+    if profile == 'pgo':
+        profile_dir = os.path.join(directory, 'pgo-data')
+        os.makedirs(profile_dir, exist_ok=True)
+        # Both stages write the same output path: GCC names .gcda files after it
+        generate = flags + _pgo_flags(PGO_GENERATE, target_language, profile_dir)
+        errors = (_compile(_build_command(source_path, directory, target_language, generate))
+                  or _train(binary, workload or {'default': ''}, cwd))
+        if errors is None and target_language == 'rust':
+            errors = _merge_profiles(profile_dir)
+        if errors:
+            return None, errors
+        flags = flags + _pgo_flags(PGO_USE, target_language, profile_dir)
+    errors = _compile(_build_command(source_path, directory, target_language, flags))
+    if errors:
+        return None, errors
+    return binary, None
+
+
+def _cmake_project():
+    """CMakeLists.txt that builds every generated target file in its directory"""
+    return '\n'.join([
+        f"# {GENERATED_MARKER}: builds every *{CMAKE_TARGET_SUFFIX} target in this directory",
+        "cmake_minimum_required(VERSION 3.13)",
+        "project(migrated CXX)",
+        "",
+        "set(CMAKE_CXX_STANDARD 17)",
+        "set(CMAKE_CXX_STANDARD_REQUIRED ON)",
+        "",
+        f'file(GLOB MIGRATED_TARGETS CONFIGURE_DEPENDS "${{CMAKE_CURRENT_SOURCE_DIR}}/*{CMAKE_TARGET_SUFFIX}")',
+        "foreach(target_file ${MIGRATED_TARGETS})",
+        "  include(${target_file})",
+        "endforeach()",
+    ]) + '\n'
+
+
+def _cmake_script(name, source, profile, uses_eigen=False):
+    flags = ' '.join(profile_flags(profile, 'cpp'))
+    lines = [f"# {GENERATED_MARKER}: {profile} profile"]
+    if profile == 'pgo':
+        lines += [
+            "#   cmake -B build -DPGO_STAGE=generate && cmake --build build",
+            f"#   ./build/{name} < workload.txt",
+            "#   cmake -B build -DPGO_STAGE=use && cmake --build build",
+        ]
+    lines += [
+        f"add_executable({name} {source})",
+        f"target_compile_options({name} PRIVATE {flags})",
+    ]
+    if uses_eigen:
+        lines += ["find_package(Eigen3 3.3 REQUIRED NO_MODULE)", f"target_link_libraries({name} Eigen3::Eigen)"]
+    if profile == 'lto':
+        lines.append(f"target_link_options({name} PRIVATE {flags})")
+    if profile == 'pgo':
+        generate = ' '.join(_pgo_flags(PGO_GENERATE, 'cpp', '${PGO_DIR}'))
+        use = ' '.join(_pgo_flags(PGO_USE, 'cpp', '${PGO_DIR}'))
+        lines += [
+            "",
+            'set(PGO_STAGE "generate" CACHE STRING "generate: instrumented build; use: rebuild with the profile")',
+            f'set(PGO_DIR "${{CMAKE_BINARY_DIR}}/pgo-data/{name}")',
+            'if(PGO_STAGE STREQUAL "use")',
+            f"  set(PGO_FLAGS {use})",
+            "else()",
+            f"  set(PGO_FLAGS {generate})",
+            "endif()",
+            f"target_compile_options({name} PRIVATE ${{PGO_FLAGS}})",
+            f"target_link_options({name} PRIVATE ${{PGO_FLAGS}})",
+        ]
+    return '\n'.join(lines) + '\n'
+
+
+def _rust_script(name, source, profile):
+    flags = ' '.join(['--edition', RUST_EDITION] + profile_flags(profile, 'rust'))
+    build = f'rustc {flags} -o "$DIR/{name}" "$DIR/{source}"'
+    lines = ["#!/bin/sh", f"# {GENERATED_MARKER}: {profile} profile"]
+    if profile == 'pgo':
+        lines.append(f"# Usage: {name}{RUST_SCRIPT_SUFFIX} WORKLOAD... (each file is fed to one training run on stdin)")
+    lines += ["set -e", 'DIR=$(dirname "$0")']
+    if profile != 'pgo':
+        return '\n'.join(lines + [build]) + '\n'
+    # Scripts for other outputs in the directory keep their own profile data
+    profile_dir = f'"$DIR/{name}-pgo-data"'
+    generate = ' '.join(_pgo_flags(PGO_GENERATE, 'rust', profile_dir))
+    use = ' '.join(_pgo_flags(PGO_USE, 'rust', profile_dir))
+    lines += [
+        f'rm -rf {profile_dir}',
+        f"{build} {generate}",
+        f'if [ $# -eq 0 ]; then "$DIR/{name}" < /dev/null > /dev/null; fi',
+        f'for input in "$@"; do "$DIR/{name}" < "$input" > /dev/null; done',
+        f'llvm-profdata merge -o "$DIR/{name}-pgo-data/merged.profdata" {profile_dir}',
+        f"{build} {use}",
+    ]
+    return '\n'.join(lines) + '\n'
+
+
+def binary_path(output_path):
+    """Where the built executable goes: the output path without its extension"""
+    stem, extension = os.path.splitext(output_path)
+    return stem if extension else output_path + '.bin'
+
+
+def build_script_path(output_path, target_language):
+    """Per-output script, named after the output so outputs sharing a directory keep theirs"""
+    stem = os.path.splitext(os.path.abspath(output_path))[0]
+    return stem + (CMAKE_TARGET_SUFFIX if target_language == 'cpp' else RUST_SCRIPT_SUFFIX)
+
+
+def _hand_written(path):
+    if not os.path.exists(path):
+        return False
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        return GENERATED_MARKER not in f.read()
+
+
+def write_build_script(output_path, target_language, profile):
+    """Write the build script for `output_path` next to it and return its path.
+
+    Rust gets `<stem>.build.sh`. C++ gets a `<stem>.target.cmake` target file
+    plus a shared CMakeLists.txt that includes every target file in the
+    directory, so several outputs in one directory build together. Returns
+    None when a hand-written script of either name is already there.
+    """
+    path = build_script_path(output_path, target_language)
+    cmake_lists = os.path.join(os.path.dirname(path), 'CMakeLists.txt')
+    if _hand_written(path) or (target_language == 'cpp' and _hand_written(cmake_lists)):
+        return None
+    source = os.path.basename(output_path)
+    name = os.path.splitext(source)[0]
+    if target_language == 'cpp':
+        with open(output_path, 'r', encoding='utf-8', errors='replace') as f:
+            uses_eigen = '#include <Eigen/' in f.read()
+        script = _cmake_script(name, source, profile, uses_eigen)
+    else:
+        script = _rust_script(name, source, profile)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(script)
+    if target_language == 'cpp':
+        with open(cmake_lists, 'w', encoding='utf-8') as f:
+            f.write(_cmake_project())
+    if target_language == 'rust':
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
@@ -0,0 +1,190 @@
+"""
+Project-level scheduling: import graph, topological waves and the translated
+interfaces that dependent modules receive as context
+"""
+
+import re
+
+from pathlib import Path
+
+from src.core.analysis import analyze_module
+from src.core.repair import find_top_level_blocks
+
+_MAIN_RE = re.compile(r'\bmain\s*\(')
+_TYPE_PREFIXES = {
+    'cpp': ('class ', 'struct ', 'enum ', 'template', 'namespace ', 'typedef ', 'using '),
+    'rust': ('struct ', 'pub struct ', 'enum ', 'pub enum ', 'trait ', 'pub trait ', 'type ', 'pub type '),
+}
+
+
+def module_name(path, root):
+    """Dotted module name of `path` relative to the input root"""
+    parts = list(Path(path).relative_to(root).with_suffix('').parts)
+    if parts and parts[-1] == '__init__':
+        parts = parts[:-1]
+    return '.'.join(parts)
+
+
+def _resolve_relative(name, current, is_package):
+    level = len(name) - len(name.lstrip('.'))
+    if not level:
+        return name
+    package = current.split('.') if is_package else current.split('.')[:-1]
+    if level > 1:
+        package = package[:-(level - 1)] if level - 1 <= len(package) else []
+    rest = name[level:]
+    return '.'.join(package + ([rest] if rest else []))
+
+
+def build_import_graph(sources, root):
+    """Map each file to the set of files in `sources` it imports.
+
+    `sources` maps path -> Python source. Modules can be imported relative to
+    the input root or through the root's own package name.
+    """
+    root = Path(root)
+    by_name = {}
+    for path in sources:
+        name = module_name(path, root)
+        by_name[name] = path
+        by_name['.'.join(part for part in (root.resolve().name, name) if part)] = path
+
+    graph = {}
+    for path, python_code in sources.items():
+        try:
+            model = analyze_module(python_code)
+        except SyntaxError:
+            graph[path] = set()
+            continue
+        current = module_name(path, root)
+        is_package = Path(path).name == '__init__.py'
+        dependencies = set()
+        for imported in model.imports + model.from_names:
+            parts = _resolve_relative(imported, current, is_package).split('.')
+            # Longest prefix that is one of our modules: a.b.func -> a.b
+            for end in range(len(parts), 0, -1):
+                target = by_name.get('.'.join(parts[:end]))
+                if target is not None:
+                    if target != path:
+                        dependencies.add(target)
+                    break
+        graph[path] = dependencies
+    return graph
+
+
+def strongly_connected_components(graph):
+    """Tarjan's algorithm, without recursion so deep import chains are fine.
+
+    Components come out dependencies first, each as a sorted list of paths.
+    """
+    index, low, stack, on_stack, components = {}, {}, [], set(), []
+    for root in sorted(graph):
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(sorted(graph[root])))]
+        while work:
+            node, dependencies = work[-1]
+            for dependency in dependencies:
+                if dependency not in graph:
+                    continue
+                if dependency not in index:
+                    index[dependency] = low[dependency] = len(index)
+                    stack.append(dependency)
+                    on_stack.add(dependency)
+                    work.append((dependency, iter(sorted(graph[dependency]))))
+                    break
+                if dependency in on_stack:
+                    low[node] = min(low[node], index[dependency])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(sorted(component))
+    return components
+
+
+def topological_waves(graph):
+    """Group files into waves whose members only depend on earlier waves.
+
+    Waves are built over the import cycles (strongly connected components):
+    the modules of one cycle share a wave and are translated without each
+    other's interfaces, while everything else, including modules that import
+    a cycle, still follows all of its dependencies.
+    """
+    components = strongly_connected_components(graph)
+    component_of = {path: number for number, members in enumerate(components) for path in members}
+    levels = []
+    for number, members in enumerate(components):
+        if len(members) > 1:
+            print(f"Warning: import cycle between {len(members)} modules "
+                  f"({', '.join(str(path) for path in members)}), translating them together")
+        dependencies = {component_of[dependency] for path in members for dependency in graph[path]
+                        if dependency in component_of} - {number}
+        levels.append(1 + max((levels[dependency] for dependency in dependencies), default=-1))
+    waves = [[] for _ in range(max(levels, default=-1) + 1)]
+    for members, level in zip(components, levels):
+        waves[level].extend(members)
+    return [sorted(wave) for wave in waves]
+
+
+def _declaration_head(lines, start, end):
+    head = []
+    for line in lines[start - 1:end]:
+        head.append(line)
+        if '{' in line:
+            break
+    return '\n'.join(head).split('{', 1)[0].rstrip()
+
+
+def extract_interface(code, target_language):
+    """Reduce translated code to the declarations other modules need.
+
+    Function bodies become prototypes (C++) or `;`-terminated signatures
+    (Rust); type definitions are kept whole. The entry point is dropped.
+    """
+    lines = code.splitlines()
+    type_prefixes = _TYPE_PREFIXES[target_language]
+    declarations = []
+    for start, end in find_top_level_blocks(code):
+        head = _declaration_head(lines, start, end)
+        stripped = head.lstrip()
+        if not stripped or _MAIN_RE.search(stripped):
+            continue
+        if stripped.startswith(type_prefixes):
+            declarations.append('\n'.join(lines[start - 1:end]))
+        elif target_language == 'rust' and stripped.startswith('impl'):
+            body = lines[start:end - 1]
+            methods = [_declaration_head(body, s, e).strip() for s, e in find_top_level_blocks('\n'.join(body))]
+            # Trait impls expose every method, inherent impls only the pub ones
+            methods = [f"    {method};" for method in methods if ' for ' in stripped or method.startswith('pub')]
+            declarations.append('\n'.join([f"{stripped} {{"] + methods + ['}']))
+        elif target_language == 'rust' and not stripped.startswith('pub'):
+            continue
+        else:
+            declarations.append(f"{stripped};")
+    return '\n\n'.join(declarations)
+
+
+def dependency_context(context, interfaces, target_language):
+    """Append dependencies' translated interfaces to the user context"""
+    if not interfaces:
+        return context
+    language_name = 'C++' if target_language == 'cpp' else 'Rust'
+    parts = [context] if context else []
+    parts.append(f"This module imports other modules of the same project that are already translated to "
+                 f"{language_name}. Use exactly these declarations instead of redefining them:")
+    for name, interface in sorted(interfaces.items()):
+        parts.append(f"// module {name}\n{interface}")
+    return '\n\n'.join(parts)
@@ -0,0 +1,219 @@
+"""
+Compiler-error-driven repair of generated code, one failing function at a time
+"""
+
+import asyncio
+import re
+
+from src.core.chunking import strip_code_fences
+from src.core.tokens import estimate_tokens
+
+DEFAULT_MAX_ITERATIONS = 3
+DEFAULT_TOKEN_BUDGET = 8000
+
+_GCC_DIAGNOSTIC_RE = re.compile(
+    r'^(?P<file>[^:\n]+):(?P<line>\d+):(?P<column>\d+): (?P<severity>fatal error|error)(?:\[\w+\])?: (?P<message>.*)$',
+    re.MULTILINE,
+)
+# cargo names the checked file after the bin target, so any .rs path counts
+SOURCE_NAMES = {'cpp': 'temp_code.cpp', 'rust': '.rs'}
+
+
+def parse_diagnostics(stderr, source_name='temp_code.cpp'):
+    """Extract error diagnostics that point into the generated source"""
+    diagnostics = []
+    for match in _GCC_DIAGNOSTIC_RE.finditer(stderr or ""):
+        if not match.group('file').endswith(source_name):
+            continue
+        diagnostics.append({
+            'line': int(match.group('line')),
+            'column': int(match.group('column')),
+            'message': match.group('message').strip(),
+        })
+    return diagnostics
+
+
+def find_top_level_blocks(code):
+    """Return (start_line, end_line) spans of top-level brace blocks, 1-based.
+
+    A block starts at the first line of the declaration that opens it, so the
+    span covers the full function, class or impl including its signature.
+    Braces inside strings, character literals and comments are ignored.
+    """
+    spans = []
+    depth = 0
+    line = 1
+    statement_start = None
+    block_start = None
+    i, length = 0, len(code)
+    while i < length:
+        ch = code[i]
+        nxt = code[i + 1] if i + 1 < length else ''
+        if ch == '\n':
+            line += 1
+        elif ch == '/' and nxt == '/':
+            end = code.find('\n', i)
+            i = length if end == -1 else end
+            continue
+        elif ch == '/' and nxt == '*':
+            end = code.find('*/', i + 2)
+            end = length if end == -1 else end + 2
+            line += code.count('\n', i, end)
+            i = end
+            continue
+        elif ch == '"' or (ch == "'" and _is_char_literal(code, i)):
+            end = _skip_quoted(code, i)
+            line += code.count('\n', i, end)
+            i = end
+            continue
+        elif ch == '#' and depth == 0 and (i == 0 or code[i - 1] == '\n'):
+            # Preprocessor lines are never part of a declaration
+            end = code.find('\n', i)
+            i = length if end == -1 else end
+            continue
+        elif depth == 0 and not ch.isspace() and statement_start is None:
+            statement_start = line
+        if ch == '{':
+            if depth == 0:
+                block_start = statement_start or line
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0 and block_start is not None:
+                spans.append((block_start, line))
+                block_start = None
+                statement_start = None
+        elif ch == ';' and depth == 0:
+            statement_start = None
+        i += 1
+    return spans
+
+
+def _is_char_literal(code, i):
+    # Rust lifetimes ('a) look like an unterminated char literal
+    return i + 2 < len(code) and (code[i + 2] == "'" or code[i + 1] == '\\')
+
+
+def _skip_quoted(code, i):
+    quote = code[i]
+    i += 1
+    while i < len(code):
+        if code[i] == '\\':
+            i += 2
+            continue
+        if code[i] == quote:
+            return i + 1
+        i += 1
+    return i
+
+
+def enclosing_span(spans, line):
+    for start, end in spans:
+        if start <= line <= end:
+            return start, end
+    return line, line
+
+
+def declaration_summary(code, spans, exclude):
+    """First line of every other top-level block, as context for the model"""
+    lines = code.splitlines()
+    return '\n'.join(lines[start - 1].strip() for start, end in spans
+                     if (start, end) != exclude and start - 1 < len(lines))
+
+
+def build_repair_prompt(fragment, diagnostics, declarations, language_name):
+    errors = '\n'.join(f"line {d['line']}: {d['message']}" for d in diagnostics)
+    return f"""
+The following {language_name} code fragment fails to compile.
+
+Compiler errors (line numbers refer to the full file):
+{errors}
+
+Fragment:
+{fragment}
+
+Other top-level declarations in the same file:
+{declarations}
+
+Please provide only the corrected fragment, without any explanations or markdown formatting.
+"""
+
+
+def _splice(code, replacements):
+    lines = code.splitlines()
+    for (start, end), new_text in sorted(replacements.items(), reverse=True):
+        lines[start - 1:end] = new_text.splitlines()
+    return '\n'.join(lines) + '\n'
+
+
+async def repair_async(code, target_language, validate_async, complete_async,
+                       max_iterations=DEFAULT_MAX_ITERATIONS, token_budget=DEFAULT_TOKEN_BUDGET,
+                       errors=None):
+    """Re-request only the failing fragments until the code compiles.
+
+    `validate_async(code)` returns a verdict dict with success and errors;
+    `complete_async(prompt)` returns the model's answer or None. Returns
+    (code, success, errors, stats).
+    """
+    language_name = 'C++' if target_language == 'cpp' else 'Rust'
+    stats = {'iterations': 0, 'fragments': 0, 'tokens': 0}
+    if errors is None:
+        verdict = await validate_async(code)
+        if verdict['success']:
+            return code, True, None, stats
+        errors = verdict['errors']
+
+    while stats['iterations'] < max_iterations:
+        diagnostics = parse_diagnostics(errors, SOURCE_NAMES[target_language])
+        if not diagnostics:
+            break
+        spans = find_top_level_blocks(code)
+        by_span = {}
+        for diagnostic in diagnostics:
+            by_span.setdefault(enclosing_span(spans, diagnostic['line']), []).append(diagnostic)
+
+        lines = code.splitlines()
+        prompts, planned = {}, 0
+        for span, span_diagnostics in by_span.items():
+            fragment = '\n'.join(lines[span[0] - 1:span[1]])
+            prompt = build_repair_prompt(fragment, span_diagnostics,
+                                         declaration_summary(code, spans, span), language_name)
+            # Expect the patch to be about as long as the fragment it replaces
+            planned += estimate_tokens(prompt) + estimate_tokens(fragment)
+            if stats['tokens'] + planned > token_budget:
+                break
+            prompts[span] = prompt
+        if not prompts:
+            break
+
+        stats['iterations'] += 1
+        spans_in_order = list(prompts)
+        answers = await asyncio.gather(*(complete_async(prompts[span]) for span in spans_in_order))
+        stats['tokens'] += sum(estimate_tokens(prompts[span]) + estimate_tokens(answer or "")
+                               for span, answer in zip(spans_in_order, answers))
+        replacements = {span: strip_code_fences(answer) for span, answer in zip(spans_in_order, answers)
+                        if answer is not None}
+        if not replacements:
+            break
+        stats['fragments'] += len(replacements)
+        code = _splice(code, replacements)
+
+        verdict = await validate_async(code)
+        if verdict['success']:
+            return code, True, None, stats
+        errors = verdict['errors']
+
+    return code, False, errors, stats
+
+
+def repair(code, target_language, validate, complete, max_iterations=DEFAULT_MAX_ITERATIONS,
+           token_budget=DEFAULT_TOKEN_BUDGET, errors=None):
+    """Synchronous wrapper around repair_async for single-file runs"""
+    async def validate_async(candidate):
+        return await asyncio.to_thread(validate, candidate)
+
+    async def complete_async(prompt):
+        return await asyncio.to_thread(complete, prompt)
+
+    return asyncio.run(repair_async(code, target_language, validate_async, complete_async,
+                                    max_iterations, token_budget, errors))
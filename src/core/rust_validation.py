@@ -0,0 +1,174 @@
+"""
+Persistent Rust validation workspace with a pool of warm cargo target directories
+"""
+
+import fcntl
+import functools
+import os
+import re
+import subprocess
+import threading
+import time
+
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.core.validation import DEFAULT_RUST_TIMEOUTS, RUST_EDITION, has_rust_main, run_rust_check
+from src.core.workspace import VerdictCache, default_workspace_dir, is_environment_failure
+
+BUILTIN_CRATES = {'std', 'core', 'alloc', 'crate', 'self', 'super', 'proc_macro'}
+_CRATE_USE_RE = re.compile(r'^\s*(?:pub\s+)?(?:use|extern\s+crate)\s+(?:::)?([A-Za-z_][A-Za-z0-9_]*)', re.MULTILINE)
+_OFFLINE_FAILURES = ("no matching package", "failed to select a version", "--offline", "failed to download")
+# Cargo locks a target directory for the whole build, so parallel checks each take their own
+TARGET_SLOTS = os.cpu_count() or 1
+LIBRARY_MAIN = "\n\nfn main() {}\n"
+
+
+def external_crates(rust_code):
+    return {name for name in _CRATE_USE_RE.findall(rust_code) if name not in BUILTIN_CRATES}
+
+
+def parse_dependency_spec(spec):
+    """Parse 'ndarray=0.15,rand=0.8' into {'ndarray': '0.15', 'rand': '0.8'}"""
+    dependencies = {}
+    for item in (spec or '').split(','):
+        if item.strip():
+            name, _, version = item.partition('=')
+            dependencies[name.strip()] = version.strip() or '*'
+    return dependencies
+
+
+@functools.lru_cache(maxsize=None)
+def rustc_version():
+    try:
+        result = subprocess.run(['rustc', '--version'], capture_output=True, text=True, timeout=10)
+        return result.stdout.strip() or 'unknown'
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+class RustWorkspace(VerdictCache):
+    """Persistent scratch crate with a small pool of reusable target directories.
+
+    Code that only uses std is checked with rustc directly, which is fully
+    parallel. Code that uses external crates is dropped into the scratch crate
+    as a bin target and checked with `cargo check --offline`. Each check locks
+    one of TARGET_SLOTS target directories, so parallel workers do not queue on
+    cargo's build lock, and the dependencies prefetched by `prefetch()` are
+    compiled once per slot and reused.
+    """
+
+    def __init__(self, workspace_dir=None, dependencies=None):
+        self.workspace_dir = Path(workspace_dir or default_workspace_dir()) / 'rust'
+        self.dependencies = dict(dependencies or {})
+        self.crate_dir = self.workspace_dir / 'scratch-crate'
+        self.rustc = rustc_version()
+
+    def ensure_crate(self):
+        manifest = ['[package]', 'name = "migrator_check"', 'version = "0.1.0"',
+                    f'edition = "{RUST_EDITION}"', '', '[dependencies]']
+        manifest += [f'{name} = "{version}"' for name, version in sorted(self.dependencies.items())]
+        manifest_text = '\n'.join(manifest) + '\n'
+        cargo_toml = self.crate_dir / 'Cargo.toml'
+        (self.crate_dir / 'src' / 'bin').mkdir(parents=True, exist_ok=True)
+        lib_rs = self.crate_dir / 'src' / 'lib.rs'
+        if not lib_rs.exists():
+            lib_rs.write_text('', encoding='utf-8')
+        if not cargo_toml.exists() or cargo_toml.read_text(encoding='utf-8') != manifest_text:
+            cargo_toml.write_text(manifest_text, encoding='utf-8')
+        return self.crate_dir
+
+    def prefetch(self):
+        """Download and build the dependency set once so later checks can run offline"""
+        if not self.dependencies:
+            return True
+        self.ensure_crate()
+        try:
+            fetched = subprocess.run(['cargo', 'fetch'], cwd=self.crate_dir, capture_output=True, text=True,
+                                     timeout=600)
+            if fetched.returncode != 0:
+                print(f"Warning: cargo fetch failed, Rust checks will use whatever is cached:\n{fetched.stderr}")
+                return False
+            with self._target_slot() as target_dir:
+                subprocess.run(['cargo', 'check', '--offline', '--lib'], cwd=self.crate_dir, capture_output=True,
+                               text=True, timeout=600, env=self._cargo_env(target_dir))
+            return True
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Warning: could not prefetch Rust dependencies: {e}")
+            return False
+
+    def prepare(self):
+        self.prune()
+        self.prefetch()
+
+    def _cargo_env(self, target_dir):
+        return dict(os.environ, CARGO_TARGET_DIR=str(target_dir))
+
+    @contextmanager
+    def _target_slot(self):
+        """Lock and yield a free target directory, waiting on one if all are busy"""
+        lock_dir = self.workspace_dir / 'targets'
+        lock_dir.mkdir(parents=True, exist_ok=True)
+        slots = list(range(TARGET_SLOTS))
+        preferred = os.getpid() % TARGET_SLOTS
+        for attempt, slot in enumerate(slots[preferred:] + slots[:preferred] + [preferred]):
+            lock_file = open(lock_dir / f"{slot}.lock", 'w')
+            try:
+                flags = fcntl.LOCK_EX if attempt == TARGET_SLOTS else fcntl.LOCK_EX | fcntl.LOCK_NB
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                lock_file.close()
+                continue
+            try:
+                yield lock_dir / str(slot)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+                lock_file.close()
+            return
+
+    def cache_key(self, rust_code, tier):
+        return self._digest(rust_code, tier, RUST_EDITION, sorted(self.dependencies.items()), self.rustc)
+
+    def cargo_check(self, rust_code, tier='syntax', timeout=None):
+        timeout = timeout or DEFAULT_RUST_TIMEOUTS[tier]
+        self.ensure_crate()
+        # Threads of one process (--candidates) check concurrently, so the pid alone is not unique
+        bin_name = f"check_{self._digest(rust_code)[:16]}_{os.getpid()}_{threading.get_ident()}"
+        bin_path = self.crate_dir / 'src' / 'bin' / f"{bin_name}.rs"
+        # Library code has no entry point; a bin target needs one to type-check
+        bin_path.write_text(rust_code if has_rust_main(rust_code) else rust_code + LIBRARY_MAIN, encoding='utf-8')
+        command = ['cargo', 'check' if tier == 'syntax' else 'build', '--offline', '--quiet',
+                   '--message-format=short', '--bin', bin_name]
+        started = time.perf_counter()
+        result = {'success': False, 'errors': None, 'tier': tier}
+        try:
+            with self._target_slot() as target_dir:
+                completed = subprocess.run(command, cwd=self.crate_dir, capture_output=True, text=True,
+                                           timeout=timeout, env=self._cargo_env(target_dir))
+            result['success'] = completed.returncode == 0
+            result['errors'] = None if result['success'] else completed.stderr
+        except subprocess.TimeoutExpired:
+            result['errors'] = f"Compilation timed out after {timeout} seconds"
+        except FileNotFoundError:
+            result['errors'] = "cargo not found"
+        finally:
+            try:
+                bin_path.unlink()
+            except OSError:
+                pass
+        result['duration'] = time.perf_counter() - started
+        return result
+
+    def validate(self, rust_code, tier='syntax', timeout=None):
+        key = self.cache_key(rust_code, tier)
+        cached = self.lookup(key)
+        if cached is not None:
+            return dict(cached, cache_hit=True, time_saved=cached['duration'], duration=0.0)
+        if external_crates(rust_code) & set(self.dependencies):
+            result = self.cargo_check(rust_code, tier, timeout)
+        else:
+            result = run_rust_check(rust_code, tier, timeout)
+        offline_miss = not result['success'] and any(text in result['errors'] for text in _OFFLINE_FAILURES)
+        if not is_environment_failure(result) and not offline_miss:
+            self.store(key, result)
+        return dict(result, cache_hit=False, time_saved=0.0)
@@ -0,0 +1,215 @@
+"""
+Rate-limit-aware scheduling of LLM requests: token buckets for requests and
+tokens per minute, AIMD concurrency and shortest-job-first admission
+"""
+
+import asyncio
+import contextlib
+import heapq
+import itertools
+import re
+import time
+
+from datetime import datetime, timezone
+
+from src.core.tokens import OUTPUT_RATIO, count_tokens
+
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+# Throttles arriving within this window are one congestion event, not several
+THROTTLE_WINDOW = 1.0
+
+
+class TokenBucket:
+    """Refills continuously at `rate_per_minute`; holds at most one minute's worth"""
+
+    def __init__(self, rate_per_minute):
+        # The configured budget is a ceiling; provider headers can only slow the bucket down
+        self.base_rate = rate_per_minute / 60.0
+        self.rate = self.base_rate
+        self.capacity = float(rate_per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available (0 when it is available now)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def sync(self, remaining, reset_seconds=None):
+        """Trust the provider's view of what is left in the current window.
+
+        Headers can be shared with other clients, so they only ever lower the
+        level and the refill rate; once the window recovers the configured
+        rate applies again.
+        """
+        self._refill()
+        self.level = min(self.level, float(remaining))
+        if reset_seconds and remaining < self.capacity:
+            self.rate = min(self.base_rate, (self.capacity - remaining) / reset_seconds)
+        else:
+            self.rate = self.base_rate
+
+
+def parse_reset(value):
+    """Parse '1s', '6m0s', '250ms' or an RFC 3339 timestamp into seconds from now"""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if parts and ''.join(number + unit for number, unit in parts) == value.strip():
+        return sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def read_rate_limit_headers(headers):
+    """Extract {'requests'|'tokens': (limit, remaining, reset_seconds)} from OpenAI or Anthropic headers"""
+    limits = {}
+    for kind in ('requests', 'tokens'):
+        for limit_key, remaining_key, reset_key in (
+                (f'x-ratelimit-limit-{kind}', f'x-ratelimit-remaining-{kind}', f'x-ratelimit-reset-{kind}'),
+                (f'anthropic-ratelimit-{kind}-limit', f'anthropic-ratelimit-{kind}-remaining',
+                 f'anthropic-ratelimit-{kind}-reset')):
+            remaining = headers.get(remaining_key)
+            if remaining is None:
+                continue
+            try:
+                limit = float(headers.get(limit_key)) if headers.get(limit_key) else None
+                limits[kind] = (limit, float(remaining), parse_reset(headers.get(reset_key)))
+            except ValueError:
+                pass
+            break
+    return limits
+
+
+class RequestScheduler:
+    """Admit LLM requests under RPM/TPM budgets with AIMD-controlled concurrency.
+
+    Waiting requests are admitted cheapest first, so one large file does not
+    hold up a queue of small ones. Concurrency grows by one per window of
+    successful responses and halves on a rate-limit response. Buckets are
+    created from the configured limits or from the provider's headers.
+    """
+
+    def __init__(self, max_concurrency=8, rpm=None, tpm=None, min_concurrency=1):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.limit = float(max_concurrency)
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.active = 0
+        self.stats = {'requests': 0, 'throttled': 0, 'waited': 0.0, 'min_limit': float(max_concurrency)}
+        self._queue = []
+        self._order = itertools.count()
+        self._timer = None
+        self._loop = None
+        self._last_throttle = 0.0
+
+    @contextlib.asynccontextmanager
+    async def slot(self, cost=0, priority=0):
+        """Hold one request slot; `cost` is the estimated prompt plus completion tokens.
+
+        Requests with a higher `priority` number are only dispatched when
+        nothing more urgent is waiting.
+        """
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        future = loop.create_future()
+        queued = time.monotonic()
+        heapq.heappush(self._queue, (priority, cost, next(self._order), future))
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        self.stats['waited'] += time.monotonic() - queued
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _budget_wait(self, cost):
+        waits = [bucket.wait_time(amount) for bucket, amount in ((self.requests, 1), (self.tokens, cost))
+                 if bucket is not None]
+        return max(waits, default=0.0)
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._queue and self.active < max(self.min_concurrency, int(self.limit)):
+            _, cost, _, future = self._queue[0]
+            if future.cancelled():
+                heapq.heappop(self._queue)
+                continue
+            wait = self._budget_wait(cost)
+            if wait > 0:
+                self._timer = self._loop.call_later(wait, self._dispatch)
+                return
+            heapq.heappop(self._queue)
+            for bucket, amount in ((self.requests, 1), (self.tokens, cost)):
+                if bucket is not None:
+                    bucket.take(amount)
+            self.active += 1
+            self.stats['requests'] += 1
+            future.set_result(None)
+
+    def _release(self):
+        self.active -= 1
+        self._dispatch()
+
+    def observe(self, headers=None, throttled=False):
+        """Feedback from a response; safe to call from any thread"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._apply_feedback, dict(headers or {}), throttled)
+        except RuntimeError:
+            pass
+
+    def _apply_feedback(self, headers, throttled):
+        for kind, (limit, remaining, reset) in read_rate_limit_headers(headers).items():
+            bucket = getattr(self, kind)
+            if bucket is None and limit:
+                bucket = TokenBucket(limit)
+                setattr(self, kind, bucket)
+            if bucket is not None:
+                bucket.sync(remaining, reset)
+        now = time.monotonic()
+        if throttled:
+            self.stats['throttled'] += 1
+            if now - self._last_throttle > THROTTLE_WINDOW:
+                self.limit = max(self.min_concurrency, self.limit / 2)
+                self.stats['min_limit'] = min(self.stats['min_limit'], self.limit)
+            self._last_throttle = now
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1.0 / max(self.limit, 1.0))
+        self._dispatch()
+
+    def report(self):
+        if self.stats['throttled'] or self.requests or self.tokens:
+            print(f"Scheduler: {self.stats['requests']} requests, {self.stats['throttled']} throttled, "
+                  f"concurrency {self.limit:.1f} (lowest {self.stats['min_limit']:.1f}), "
+                  f"{self.stats['waited']:.1f}s queued")
+
+
+def request_cost(text, target_language):
+    """Estimated prompt plus completion tokens for translating `text`"""
+    prompt_tokens = count_tokens(text)
+    return prompt_tokens + int(prompt_tokens * OUTPUT_RATIO.get(target_language, 2.0))
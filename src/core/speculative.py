@@ -0,0 +1,145 @@
+"""
+Speculative translation: request several candidates at spread temperatures,
+validate each as it arrives and keep the first that compiles (and passes
+the optional output check), cancelling the requests still outstanding
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from src.core.backends import DEFAULT_TEMPERATURE
+from src.core.profiles import build_profile
+from src.core.speedup import run_limited, DEFAULT_RUN_TIMEOUT
+from src.core.tokens import count_tokens
+
+DEFAULT_CANDIDATES = 1
+BASE_TEMPERATURE = DEFAULT_TEMPERATURE
+TEMPERATURE_STEP = 0.3
+MAX_TEMPERATURE = 1.0
+CHECK_PROFILE = 'debug'
+
+
+def candidate_temperatures(n):
+    """The usual temperature first, then hotter ones for more varied candidates"""
+    return [round(min(MAX_TEMPERATURE, BASE_TEMPERATURE + TEMPERATURE_STEP * index), 2) for index in range(n)]
+
+
+def _error_count(errors):
+    lines = [line for line in (errors or '').splitlines() if 'error' in line.lower()]
+    return len(lines) or 1
+
+
+def candidate_score(code, verdict):
+    """Higher is better: valid, then compiled, then fewer errors, then less code
+    (ignoring whitespace, so formatting does not count)"""
+    compiled = verdict.get('compiled', verdict['success'])
+    errors = 0 if verdict['success'] else _error_count(verdict.get('errors'))
+    return (verdict['success'], compiled, -errors, -len(''.join(code.split())))
+
+
+def stdout_check(python_file, target_language, stdin_text="", timeout=DEFAULT_RUN_TIMEOUT):
+    """Output check for race_candidates: builds a candidate and compares its stdout
+    with the Python program's (run once, on first use)"""
+    python_file = os.path.abspath(python_file)
+    cwd = os.path.dirname(python_file)
+    expected, lock = {}, threading.Lock()
+
+    def run(code):
+        with lock:
+            if 'stdout' not in expected:
+                expected.update(run_limited([sys.executable, python_file], stdin_text, timeout, cwd=cwd))
+        if expected['error']:
+            return {'success': False, 'errors': f"the Python program failed: {expected['error']}"}
+        with tempfile.TemporaryDirectory(prefix='migrator-check-') as directory:
+            binary, errors = build_profile(code, target_language, CHECK_PROFILE, directory)
+            if binary is None:
+                return {'success': False, 'errors': errors}
+            native = run_limited([binary], stdin_text, timeout, cwd=cwd)
+        if native['error']:
+            return {'success': False, 'errors': native['error']}
+        if native['stdout'] != expected['stdout']:
+            return {'success': False, 'errors': "stdout differs from the Python program"}
+        return {'success': True, 'errors': None}
+
+    async def check(code):
+        return await asyncio.to_thread(run, code)
+    return check
+
+
+async def race_candidates(n, complete, validate, check=None, prompt_tokens=0):
+    """Race `n` candidates to the first valid one.
+
+    `complete(temperature, extra)` returns a candidate (None on failure);
+    `extra` is true for every candidate but the first, which is the request
+    that would have been sent anyway.
+    `validate(code)` a verdict dict and `check(code)` an output verdict. When
+    several candidates are valid at once the best scored wins; when none is,
+    the best scored candidate comes back with its failing verdict for repair.
+    Returns (code, verdict, stats); code is None when no request succeeded.
+    """
+    started = time.perf_counter()
+    temperatures = candidate_temperatures(n)
+
+    async def candidate(index):
+        code = await complete(temperatures[index], index > 0)
+        if code is None:
+            return index, None, None
+        try:
+            verdict = await validate(code)
+        except Exception as e:
+            verdict = {'success': False, 'errors': str(e), 'duration': 0.0}
+        if verdict['success'] and check is not None:
+            checked = await check(code)
+            verdict = dict(verdict, success=checked['success'], errors=checked['errors'], compiled=True)
+        return index, code, verdict
+
+    pending = {asyncio.create_task(candidate(index)) for index in range(n)}
+    finished, winner = [], None
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            finished.extend(task.result() for task in done)
+            valid = [entry for entry in finished if entry[2] is not None and entry[2]['success']]
+            if valid:
+                winner = max(valid, key=lambda entry: candidate_score(entry[1], entry[2]))
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    arrived = [entry for entry in finished if entry[1] is not None]
+    if winner is None and arrived:
+        winner = max(arrived, key=lambda entry: candidate_score(entry[1], entry[2]))
+    spent = {index: prompt_tokens + count_tokens(code) for index, code, _ in arrived}
+    # A cancelled request has usually been billed for its prompt already
+    extra = sum(tokens for index, tokens in spent.items() if winner is None or index != winner[0])
+    extra += prompt_tokens * len(pending)
+    stats = {
+        'candidates': n,
+        'arrived': len(arrived),
+        'cancelled': len(pending),
+        'winner': winner[0] if winner else None,
+        'temperature': temperatures[winner[0]] if winner else None,
+        'valid': bool(winner and winner[2]['success']),
+        'latency': time.perf_counter() - started,
+        'winner_tokens': spent.get(winner[0], 0) if winner else 0,
+        'extra_tokens': extra,
+        'cancelled_tokens': prompt_tokens * len(pending),
+    }
+    if winner is None:
+        return None, None, stats
+    return winner[1], winner[2], stats
+
+
+def print_race_report(stats):
+    if stats['winner'] is None:
+        print(f"Speculation: none of {stats['candidates']} candidates came back")
+        return
+    outcome = 'won' if stats['valid'] else 'ranked best (none was valid)'
+    print(f"Speculation: candidate #{stats['winner']} (temperature {stats['temperature']}) {outcome} after "
+          f"{stats['latency']:.2f}s; {stats['arrived']} of {stats['candidates']} arrived, {stats['cancelled']} "
+          f"cancelled, ~{stats['extra_tokens']} extra tokens")
@@ -0,0 +1,246 @@
+"""
+Speedup report: build the translation optimized, run it and the original
+Python on the same inputs, compare stdout, wall time and peak RSS
+"""
+
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from src.core.profiles import AUTO_PROFILES, DEFAULT_PROFILE, build_profile
+
+DEFAULT_RUNS = 5
+DEFAULT_RUN_TIMEOUT = 10.0
+DEFAULT_MEMORY_MB = 1024
+CONFIDENCE = 0.95
+RESAMPLES = 2000
+RSS_POLL_INTERVAL = 0.002
+
+
+def _apply_limits(pid, timeout, memory_mb):
+    # prlimit on the running child rather than preexec_fn, which is unsafe
+    # when several threads spawn processes at once. CPU seconds back up the
+    # wall-clock kill; address space caps runaway allocation.
+    if not hasattr(resource, 'prlimit'):
+        # Linux only; elsewhere the wall-clock kill is the only limit
+        return
+    cpu = int(timeout) + 1
+    try:
+        resource.prlimit(pid, resource.RLIMIT_CPU, (cpu, cpu))
+        if memory_mb:
+            limit = memory_mb * 1024 * 1024
+            resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+    except (OSError, ValueError):
+        # Gone already, not permitted, or above the hard limit: keep the wall-clock kill
+        pass
+
+
+def _read_hwm_kb(pid):
+    with open(f'/proc/{pid}/status', 'r', encoding='ascii') as f:
+        for line in f:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return None
+
+
+def _sample_peak_rss(pid, done, peak):
+    # ru_maxrss from wait4 starts at the spawning process's RSS (it carries
+    # over through fork and exec), so read the child's own high-water mark
+    while not done.is_set():
+        try:
+            hwm = _read_hwm_kb(pid)
+        except (OSError, ValueError):
+            return
+        if hwm is not None:
+            peak[0] = max(peak[0], hwm)
+        done.wait(RSS_POLL_INTERVAL)
+
+
+def run_limited(command, input_text="", timeout=DEFAULT_RUN_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB, cwd=None,
+                env=None):
+    """Run one process under time and memory limits.
+
+    Returns wall time, peak RSS in MB (sampled every couple of milliseconds,
+    so very short peaks can be missed), stdout, exit code and whether it
+    was killed for running too long.
+    """
+    started = time.perf_counter()
+    try:
+        proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                cwd=cwd, env=env)
+    except OSError as e:
+        return {'wall': 0.0, 'rss_mb': 0.0, 'stdout': '', 'returncode': None, 'timed_out': False, 'error': str(e)}
+    _apply_limits(proc.pid, timeout, memory_mb)
+    timed_out, exited, peak = threading.Event(), threading.Event(), [0]
+    sampler = threading.Thread(target=_sample_peak_rss, args=(proc.pid, exited, peak))
+    sampler.start()
+
+    def kill():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, kill)
+    timer.start()
+    output = {}
+    readers = [threading.Thread(target=lambda name=name, stream=stream: output.update({name: stream.read()}))
+               for name, stream in (('stdout', proc.stdout), ('stderr', proc.stderr))]
+    for reader in readers:
+        reader.start()
+    try:
+        proc.stdin.write(input_text.encode('utf-8'))
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - started
+    timer.cancel()
+    exited.set()
+    sampler.join()
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    for reader in readers:
+        reader.join()
+    error = None
+    if timed_out.is_set():
+        error = f"killed after {timeout}s"
+    elif proc.returncode != 0:
+        error = output.get('stderr', b'').decode('utf-8', 'replace').strip()[-500:] or f"exit {proc.returncode}"
+    return {'wall': wall, 'rss_mb': (peak[0] or usage.ru_maxrss) / 1024,
+            'stdout': output.get('stdout', b'').decode('utf-8', 'replace'),
+            'returncode': proc.returncode, 'timed_out': timed_out.is_set(), 'error': error}
+
+
+def bootstrap_ratio_ci(baseline, candidate, confidence=CONFIDENCE, resamples=RESAMPLES, seed=0):
+    """Percentile bootstrap interval for mean(baseline) / mean(candidate)"""
+    rng = random.Random(seed)
+    ratios = []
+    for _ in range(resamples):
+        base = [rng.choice(baseline) for _ in baseline]
+        cand = [rng.choice(candidate) for _ in candidate]
+        ratios.append(statistics.fmean(base) / max(statistics.fmean(cand), 1e-9))
+    ratios.sort()
+    tail = (1 - confidence) / 2
+    return ratios[int(tail * (resamples - 1))], ratios[int((1 - tail) * (resamples - 1))]
+
+
+def summarize_runs(name, python_runs, native_runs):
+    """Compare repeated runs of two programs on one case: stdout parity, means, peak RSS and speedup"""
+    expected = python_runs[0]['stdout']
+    failures = [run['error'] for run in python_runs + native_runs if run['error']]
+    case = {
+        'case': name,
+        'runs': len(native_runs),
+        'stdout_match': all(run['stdout'] == expected for run in native_runs),
+        'errors': failures[:3],
+        'python_wall': statistics.fmean(run['wall'] for run in python_runs),
+        'native_wall': statistics.fmean(run['wall'] for run in native_runs),
+        'python_rss_mb': max(run['rss_mb'] for run in python_runs),
+        'native_rss_mb': max(run['rss_mb'] for run in native_runs),
+    }
+    if failures:
+        case['speedup'], case['speedup_ci'] = None, None
+        return case
+    python_times = [run['wall'] for run in python_runs]
+    native_times = [run['wall'] for run in native_runs]
+    case['speedup'] = case['python_wall'] / max(case['native_wall'], 1e-9)
+    case['speedup_ci'] = bootstrap_ratio_ci(python_times, native_times) if len(native_times) > 1 else None
+    return case
+
+
+def benchmark_translation(python_file, code, target_language, inputs=None, runs=DEFAULT_RUNS,
+                          timeout=DEFAULT_RUN_TIMEOUT, memory_mb=DEFAULT_MEMORY_MB, workers=None,
+                          profile=DEFAULT_PROFILE):
+    """Build the translation with `profile` and race it against the Python script.
+
+    `inputs` maps a case name to the stdin text for that case (one empty-stdin
+    case by default); they are also the PGO training workload. Every (case,
+    program, repetition) run is scheduled on a pool sized to the machine's
+    cores. Returns {'cases': [...], 'build_error'}.
+    """
+    inputs = inputs or {'default': ''}
+    cwd = os.path.dirname(os.path.abspath(python_file))
+    with tempfile.TemporaryDirectory(prefix='migrator-speedup-') as directory:
+        binary, build_error = build_profile(code, target_language, profile, directory, inputs, cwd)
+        if binary is None:
+            return {'cases': [], 'build_error': build_error}
+        commands = {'python': [sys.executable, os.path.abspath(python_file)], 'native': [binary]}
+        jobs = [(name, program, repetition) for name in inputs for program in commands for repetition in range(runs)]
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            results = list(pool.map(lambda job: run_limited(commands[job[1]], inputs[job[0]], timeout,
+                                                            memory_mb, cwd), jobs))
+
+    by_case = {}
+    for (name, program, _), result in zip(jobs, results):
+        by_case.setdefault(name, {'python': [], 'native': []})[program].append(result)
+    cases = [summarize_runs(name, runs_by_program['python'], runs_by_program['native'])
+             for name, runs_by_program in by_case.items()]
+    return {'cases': cases, 'build_error': None}
+
+
+def select_fastest_profile(code, target_language, workload=None, profiles=AUTO_PROFILES, runs=3,
+                           timeout=DEFAULT_RUN_TIMEOUT, cwd=None):
+    """Build every candidate profile and time it on the workload.
+
+    Runs are sequential so the profiles do not compete for cores. Returns
+    (fastest profile or None, {profile: seconds summed over the workload's
+    median runs, or the error string for profiles that failed to build or run}).
+    """
+    workload = workload or {'default': ''}
+    timings = {}
+    for profile in profiles:
+        with tempfile.TemporaryDirectory(prefix='migrator-profile-') as directory:
+            binary, errors = build_profile(code, target_language, profile, directory, workload, cwd)
+            total = 0.0
+            for input_text in (workload.values() if binary else ()):
+                walls = []
+                for _ in range(runs):
+                    result = run_limited([binary], input_text, timeout, cwd=cwd)
+                    errors = errors or result['error']
+                    walls.append(result['wall'])
+                total += statistics.median(walls)
+        timings[profile] = errors if errors else total
+    measured = {profile: value for profile, value in timings.items() if not isinstance(value, str)}
+    return (min(measured, key=measured.get) if measured else None), timings
+
+
+def load_inputs(paths):
+    """Benchmark cases from stdin files, named after the files"""
+    inputs = {}
+    for path in paths or ():
+        with open(path, 'r', encoding='utf-8') as f:
+            inputs[os.path.basename(path)] = f.read()
+    return inputs
+
+
+def print_profile_timings(timings, chosen):
+    for profile, value in timings.items():
+        if isinstance(value, str):
+            lines = value.strip().splitlines()
+            print(f"  {profile}: failed ({lines[-1] if lines else 'no output'})")
+        else:
+            print(f"  {profile}: {value * 1000:.1f} ms{'  <- fastest' if profile == chosen else ''}")
+
+
+def print_speedup_report(report, target_language):
+    if report['build_error']:
+        print(f"Optimized build failed:\n{report['build_error']}")
+        return
+    for case in report['cases']:
+        match = "stdout matches" if case['stdout_match'] else "STDOUT DIFFERS"
+        print(f"[{case['case']}] {case['runs']} runs, {match}")
+        print(f"  Python: {case['python_wall'] * 1000:.1f} ms, peak RSS {case['python_rss_mb']:.1f} MB")
+        print(f"  {target_language}: {case['native_wall'] * 1000:.1f} ms, peak RSS {case['native_rss_mb']:.1f} MB")
+        if case['speedup'] is None:
+            print(f"  No speedup figure: {case['errors'][0]}")
+        elif case['speedup_ci']:
+            low, high = case['speedup_ci']
+            print(f"  Speedup: {case['speedup']:.2f}x ({CONFIDENCE:.0%} CI {low:.2f}x-{high:.2f}x)")
+        else:
+            print(f"  Speedup: {case['speedup']:.2f}x")
@@ -0,0 +1,276 @@
+"""
+Incremental consumption of streamed LLM output with early abort
+"""
+
+import os
+import re
+import time
+
+_PROSE_LEAD_RE = re.compile(r"^(here|here's|sure|certainly|below|note|i |i'm|this code|the following)", re.IGNORECASE)
+_CODE_CHARS = set(';{}()=<>#[]')
+_CLOSERS = {')': '(', ']': '[', '}': '{'}
+
+
+class FenceStripper:
+    """Drop markdown fence lines from a stream without holding back code.
+
+    Partial lines are released as soon as they cannot turn into a fence, so
+    time-to-first-byte is not tied to line length. After a closing fence the
+    code is complete and `closed` is set.
+    """
+
+    def __init__(self):
+        self.closed = False
+        self._line = ''
+        self._emitted = 0
+        self._fence_open = False
+        self._seen_code = False
+
+    def feed(self, text):
+        if self.closed:
+            return ''
+        out = []
+        self._line += text
+        while '\n' in self._line and not self.closed:
+            line, self._line = self._line.split('\n', 1)
+            out.append(self._end_line(line))
+        if self.closed:
+            self._line = ''
+        elif self._line.strip() and not self._line.lstrip().startswith('`'):
+            out.append(self._line[self._emitted:])
+            self._emitted = len(self._line)
+            self._seen_code = True
+        return ''.join(out)
+
+    def _end_line(self, line):
+        emitted, self._emitted = self._emitted, 0
+        if line.strip().startswith('```'):
+            if self._fence_open or self._seen_code:
+                self.closed = True
+            else:
+                self._fence_open = True
+            return ''
+        if line.strip():
+            self._seen_code = True
+        return line[emitted:] + '\n'
+
+    def finish(self):
+        if self.closed or not self._line or self._line.strip().startswith('```'):
+            return ''
+        return self._line[self._emitted:]
+
+
+class StructureChecker:
+    """Track brackets, strings and comments incrementally to spot broken output.
+
+    `feed` returns a reason string as soon as the stream is clearly off the
+    rails (a closer without an opener, prose outside of any block), and
+    `finish` reports output that ends with unclosed blocks.
+    """
+
+    def __init__(self, target_language='cpp'):
+        self.target_language = target_language
+        self.stack = []
+        self._state = None  # None, 'line_comment', 'block_comment', '"', "'", 'quote_pending'
+        self._escape = False
+        self._pending = ''
+        self._prev = ''
+        self._line = ''
+        self._line_has_code = False
+
+    def feed(self, text):
+        for ch in text:
+            reason = self._step(ch)
+            if reason:
+                return reason
+        return None
+
+    def _step(self, ch):
+        prev, self._prev = self._prev, ch
+        state = self._state
+        if ch == '\n':
+            reason = self._end_line()
+            if state == 'line_comment':
+                self._state = None
+            return reason
+        self._line += ch
+
+        if state == 'line_comment':
+            return None
+        if state == 'block_comment':
+            if prev == '*' and ch == '/':
+                self._state = None
+                self._prev = ''
+            return None
+        if state in ('"', "'"):
+            if self._escape:
+                self._escape = False
+            elif ch == '\\':
+                self._escape = True
+            elif ch == state:
+                self._state = None
+            return None
+        if state == 'quote_pending':
+            # Rust: 'x' or '\n' is a char literal, 'a on its own is a lifetime
+            self._pending += ch
+            if self._pending == '\\':
+                self._state, self._escape = "'", True
+            elif len(self._pending) == 2:
+                self._state = None
+                if self._pending[1] != "'":
+                    return self._step_code(self._pending[0], '') or self._step_code(self._pending[1], self._pending[0])
+            return None
+        return self._step_code(ch, prev)
+
+    def _step_code(self, ch, prev):
+        if ch == '/' and prev == '/':
+            self._state = 'line_comment'
+            return None
+        if ch == '*' and prev == '/':
+            self._state = 'block_comment'
+            self._prev = ''
+            return None
+        if ch == '"':
+            self._state = '"'
+        elif ch == "'":
+            if self.target_language == 'rust':
+                self._state, self._pending = 'quote_pending', ''
+            else:
+                self._state = "'"
+        elif ch in '([{':
+            self.stack.append(ch)
+        elif ch in _CLOSERS:
+            if not self.stack or self.stack[-1] != _CLOSERS[ch]:
+                return f"unbalanced '{ch}'"
+            self.stack.pop()
+        if not ch.isspace() and ch != '/':
+            self._line_has_code = True
+        return None
+
+    def _end_line(self):
+        line, self._line = self._line.strip(), ''
+        has_code, self._line_has_code = self._line_has_code, False
+        if self.stack or not has_code or self._state in ('block_comment', '"'):
+            return None
+        if looks_like_prose(line):
+            return "prose in output"
+        return None
+
+    def finish(self, truncated=False):
+        reason = self._end_line()
+        if reason:
+            return reason
+        if self.stack:
+            return f"output ends with {len(self.stack)} unclosed brackets"
+        if truncated:
+            return "output truncated at max_tokens"
+        return None
+
+
+def looks_like_prose(line):
+    if not line or line.startswith(('//', '/*', '*', '#')):
+        return False
+    if _PROSE_LEAD_RE.match(line) and line.rstrip().endswith((':', '.', '!')):
+        return True
+    return len(line.split()) >= 6 and not (_CODE_CHARS & set(line))
+
+
+def consume_stream(chunks, target_language, sink=None):
+    """Consume (text, finish_reason) chunks, writing cleaned code to `sink`.
+
+    Stops early on a closing fence or when the structure checker reports a
+    problem. Returns a dict with code, aborted, reason, ttfb, elapsed and
+    tokens (one per content chunk, which is what the API streams).
+    """
+    stripper = FenceStripper()
+    checker = StructureChecker(target_language)
+    started = time.perf_counter()
+    result = {'code': None, 'aborted': False, 'reason': None, 'ttfb': None, 'tokens': 0}
+    parts, truncated = [], False
+
+    def emit(text):
+        if not text:
+            return None
+        if result['ttfb'] is None:
+            result['ttfb'] = time.perf_counter() - started
+        parts.append(text)
+        if sink is not None:
+            sink.write(text)
+            sink.flush()
+        return checker.feed(text)
+
+    try:
+        for text, finish_reason in chunks:
+            if text:
+                result['tokens'] += 1
+            reason = emit(stripper.feed(text or ''))
+            if finish_reason == 'length':
+                truncated = True
+            if reason:
+                result['aborted'], result['reason'] = True, reason
+                break
+            if stripper.closed:
+                break
+    except Exception as e:
+        result['aborted'], result['reason'] = True, f"stream error: {e}"
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+    if not result['aborted']:
+        reason = emit(stripper.finish()) or checker.finish(truncated)
+        if reason:
+            result['aborted'], result['reason'] = True, reason
+    result['elapsed'] = time.perf_counter() - started
+    if not result['aborted']:
+        result['code'] = ''.join(parts).strip('\n') + '\n'
+    return result
+
+
+def partial_path(output_path):
+    return str(output_path) + '.part'
+
+
+def stream_to_partial(chunks, target_language, output_path):
+    """Stream into <output>.part; the file is removed again if the stream aborts"""
+    path = partial_path(output_path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as sink:
+        result = consume_stream(chunks, target_language, sink)
+    if result['aborted']:
+        discard_partial(output_path)
+    return result
+
+
+def finalize_partial(output_path, code):
+    """Move this run's <output>.part into place holding `code`, the text that was
+    validated (the stream itself keeps surrounding newlines and any repairs are
+    missing); returns False when it could not"""
+    path = partial_path(output_path)
+    try:
+        with open(path, 'r+', encoding='utf-8') as file:
+            if file.read() != code:
+                file.seek(0)
+                file.write(code)
+                file.truncate()
+        os.replace(path, output_path)
+        return True
+    except OSError as e:
+        print(f"Warning: could not finalize {path}: {e}")
+        return False
+
+
+def discard_partial(output_path):
+    try:
+        os.remove(partial_path(output_path))
+    except OSError:
+        pass
+
+
+def print_stream_report(result):
+    ttfb = f"{result['ttfb']:.2f}s" if result['ttfb'] is not None else "n/a"
+    print(f"Streaming: first byte after {ttfb}, {result['tokens']} tokens in {result['elapsed']:.2f}s")
+    if result['aborted']:
+        print(f"Streaming aborted ({result['reason']}) after {result['tokens']} tokens")
@@ -0,0 +1,269 @@
+"""
+Offline OpenAI-compatible stand-in server: replays recorded completions with
+configurable latency, jitter, injected errors and rate-limit responses
+"""
+
+import argparse
+import ast
+import collections
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.core.tokens import estimate_tokens
+
+_PYTHON_RE = re.compile(r'Python Code:\n(.*?)\n\nPlease provide only', re.DOTALL)
+WINDOW = 60.0
+STREAM_CHUNK_CHARS = 32
+# Appended to a completion to make it fail compilation
+INVALID_SUFFIX = {'cpp': '#error stub: invalid candidate\n', 'rust': 'compile_error!("stub: invalid candidate");\n'}
+
+
+def prompt_digest(prompt):
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+
+def load_recordings(path):
+    """Read a JSON list of {prompt_sha256 | contains, completion} entries"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def synthesize_completion(prompt):
+    """A compilable program with one stub per top-level Python function or class.
+
+    Used when no recording matches, so output size and compile work follow
+    the size of the input. `main` is only emitted for a `__main__` guard (or
+    a module with no definitions), so chunked units assemble cleanly.
+    """
+    rust = 'to Rust' in prompt
+    match = _PYTHON_RE.search(prompt)
+    try:
+        tree = ast.parse(match.group(1)) if match else ast.Module(body=[], type_ignores=[])
+    except SyntaxError:
+        tree = ast.Module(body=[], type_ignores=[])
+    lines = [] if rust else ['#include <cstdint>']
+    has_main = False
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name != 'main':
+            params = [arg.arg for arg in node.args.args]
+            if rust:
+                lines.append(f"fn {node.name}({', '.join(f'{p}: i64' for p in params)}) -> i64 {{ 0 }}")
+            else:
+                lines.append(f"int64_t {node.name}({', '.join(f'int64_t {p}' for p in params)}) {{ return 0; }}")
+        elif isinstance(node, ast.ClassDef):
+            lines.append(f"struct {node.name};" if rust else f"struct {node.name} {{}};")
+        elif isinstance(node, ast.If) and '__main__' in ast.dump(node.test):
+            has_main = True
+    if has_main or not lines[0 if rust else 1:]:
+        lines.append('fn main() {}' if rust else 'int main() { return 0; }')
+    return '\n'.join(lines) + '\n'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    stub = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._reply(404, {'error': {'message': f'unknown path {self.path}', 'type': 'not_found'}})
+            return
+        prompt = '\n'.join(str(message.get('content', '')) for message in body.get('messages', [])
+                           if message.get('role') == 'user')
+        status, headers = self.stub.admit(prompt)
+        if status != 200:
+            message = 'rate limited' if status == 429 else 'injected failure'
+            self._reply(status, {'error': {'message': message, 'type': 'stub_error'}}, headers)
+            return
+        completion = self.stub.completion_for(prompt)
+        time.sleep(self.stub.delay())
+        if body.get('stream'):
+            self._stream(body.get('model', 'stub'), completion, headers)
+            return
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+        self._reply(200, {
+            'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': body.get('model'),
+            'choices': [{'index': 0, 'finish_reason': 'stop',
+                         'message': {'role': 'assistant', 'content': completion}}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                      'total_tokens': prompt_tokens + completion_tokens},
+        }, headers)
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client cancelled the request (a losing speculative candidate)
+            self.close_connection = True
+
+    def _stream(self, model, completion, headers):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+        pieces = [completion[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(completion), STREAM_CHUNK_CHARS)]
+        events = [({'content': piece}, None) for piece in pieces] + [({}, 'stop')]
+        for delta, finish_reason in events:
+            chunk = {'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, *args):
+        pass
+
+
+class StubLLMServer:
+    """OpenAI-compatible chat completions on localhost; no network needed.
+
+    `rpm`/`tpm` enforce a sliding one-minute window and answer 429 with
+    Retry-After and x-ratelimit-* headers when it is full; `error_rate` is
+    the share of requests that fail with a 500 and `invalid_rate` the share of
+    completions made to fail compilation.
+    """
+
+    def __init__(self, recordings=None, latency=0.0, jitter=0.0, error_rate=0.0, rpm=None, tpm=None,
+                 seed=0, host='127.0.0.1', port=0, invalid_rate=0.0):
+        self.recordings = recordings or []
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.invalid_rate = invalid_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.stats = {'requests': 0, 'completed': 0, 'errors': 0, 'rate_limited': 0, 'replayed': 0,
+                      'invalid': 0}
+        self._by_digest = {entry['prompt_sha256']: entry['completion']
+                           for entry in self.recordings if 'prompt_sha256' in entry}
+        self._random = random.Random(seed)
+        self._window = collections.deque()
+        self._lock = threading.Lock()
+        handler = type('StubHandler', (_StubHandler,), {'stub': self})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def delay(self):
+        with self._lock:
+            return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    def completion_for(self, prompt):
+        completion = self._by_digest.get(prompt_digest(prompt))
+        if completion is None:
+            completion = next((entry['completion'] for entry in self.recordings
+                               if entry.get('contains') and entry['contains'] in prompt), None)
+        with self._lock:
+            if completion is not None:
+                self.stats['replayed'] += 1
+            self.stats['completed'] += 1
+            invalid = self.invalid_rate and self._random.random() < self.invalid_rate
+            if invalid:
+                self.stats['invalid'] += 1
+        completion = completion if completion is not None else synthesize_completion(prompt)
+        if invalid:
+            completion += INVALID_SUFFIX['rust' if 'to Rust' in prompt else 'cpp']
+        return completion
+
+    def admit(self, prompt):
+        """(status, headers) for a new request, updating the rate-limit window"""
+        cost = estimate_tokens(prompt)
+        with self._lock:
+            self.stats['requests'] += 1
+            now = time.monotonic()
+            while self._window and now - self._window[0][0] >= WINDOW:
+                self._window.popleft()
+            used_requests = len(self._window)
+            used_tokens = sum(tokens for _, tokens in self._window)
+            reset = WINDOW - (now - self._window[0][0]) if self._window else 0.0
+            over = ((self.rpm and used_requests >= self.rpm) or
+                    (self.tpm and self._window and used_tokens + cost > self.tpm))
+            if not over:
+                self._window.append((now, cost))
+                used_requests, used_tokens = used_requests + 1, used_tokens + cost
+            headers = {}
+            if self.rpm:
+                headers.update({'x-ratelimit-limit-requests': str(self.rpm),
+                                'x-ratelimit-remaining-requests': str(max(0, self.rpm - used_requests)),
+                                'x-ratelimit-reset-requests': f"{reset:.3f}s"})
+            if self.tpm:
+                headers.update({'x-ratelimit-limit-tokens': str(self.tpm),
+                                'x-ratelimit-remaining-tokens': str(max(0, self.tpm - used_tokens)),
+                                'x-ratelimit-reset-tokens': f"{reset:.3f}s"})
+            if over:
+                self.stats['rate_limited'] += 1
+                headers['retry-after'] = f"{reset:.3f}"
+                return 429, headers
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                return 500, headers
+        return 200, headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline OpenAI-compatible stand-in server')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--recordings', help='JSON list of {prompt_sha256 | contains, completion}')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds before each response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- jitter on the latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with a 500')
+    parser.add_argument('--rpm', type=int, help='Requests per minute before answering 429')
+    parser.add_argument('--tpm', type=int, help='Prompt tokens per minute before answering 429')
+    parser.add_argument('--invalid-rate', type=float, default=0.0,
+                        help='Share of completions made to fail compilation')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recordings) if args.recordings else None
+    server = StubLLMServer(recordings, args.latency, args.jitter, args.error_rate, args.rpm, args.tpm,
+                           args.seed, port=args.port, invalid_rate=args.invalid_rate)
+    print(f"Stub LLM server on {server.url} (use --base-url {server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Token counting, prompt compaction, output sizing and usage accounting
+"""
+
+import contextvars
+import functools
+import io
+import re
+import threading
+import tokenize
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+from src.core.analysis import analyze_module
+
+# Context window and completion limit per model; unknown models get the defaults
+CONTEXT_WINDOWS = {'gpt-3.5-turbo': 16385, 'claude-3-sonnet-20240229': 200000}
+MAX_OUTPUT_TOKENS = {'gpt-3.5-turbo': 4096, 'claude-3-sonnet-20240229': 4096}
+DEFAULT_CONTEXT_WINDOW = 8192
+DEFAULT_MAX_OUTPUT = 4096
+MIN_OUTPUT_TOKENS = 256
+# Generated code is longer than the Python it comes from
+OUTPUT_RATIO = {'cpp': 1.8, 'rust': 2.0}
+# USD per million (prompt, completion) tokens; unknown models are reported at no cost
+PRICES_PER_MILLION = {'gpt-3.5-turbo': (0.50, 1.50), 'claude-3-sonnet-20240229': (3.00, 15.00)}
+
+current_file = contextvars.ContextVar('current_file', default=None)
+# Set by the daemon to each job's id, so concurrent jobs in one process report only their own tokens
+current_run = contextvars.ContextVar('current_run', default=None)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)"""
+    return len(text) // 4 + 1
+
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('cl100k_base')
+
+
+def count_tokens(text, model=None):
+    """Count tokens with the model's tokenizer when tiktoken is installed"""
+    if tiktoken is None or not text:
+        return estimate_tokens(text or "")
+    return len(_encoding(model or 'gpt-3.5-turbo').encode(text, disallowed_special=()))
+
+
+def expected_output(input_tokens, target_language):
+    """Completion tokens a translation of `input_tokens` worth of Python should need"""
+    return int(input_tokens * OUTPUT_RATIO.get(target_language, 2.0)) + MIN_OUTPUT_TOKENS
+
+
+def output_limit(model):
+    return MAX_OUTPUT_TOKENS.get(model, DEFAULT_MAX_OUTPUT)
+
+
+def output_budget(input_tokens, target_language, model):
+    """max_tokens for a translation of `input_tokens` worth of Python, at most the
+    model's completion limit (fits_budget() says whether that is enough)"""
+    return max(MIN_OUTPUT_TOKENS, min(expected_output(input_tokens, target_language), output_limit(model)))
+
+
+def estimate_cost(prompt_tokens, completion_tokens, model):
+    prompt_price, completion_price = PRICES_PER_MILLION.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
+
+
+def fits_context(prompt_tokens, max_tokens, model):
+    return prompt_tokens + max_tokens <= CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def fits_budget(prompt_tokens, input_tokens, target_language, model):
+    """Whether a translation can come back whole: its expected output stays within
+    the completion limit (a capped one would be cut off) and prompt plus output
+    fit the context window"""
+    if expected_output(input_tokens, target_language) > output_limit(model):
+        return False
+    return fits_context(prompt_tokens, output_budget(input_tokens, target_language, model), model)
+
+
+def _strip_comments(python_code):
+    lines = python_code.split('\n')
+    try:
+        comments = [token.start for token in tokenize.generate_tokens(io.StringIO(python_code).readline)
+                    if token.type == tokenize.COMMENT]
+    except (tokenize.TokenError, SyntaxError):
+        return python_code
+    for row, col in comments:
+        lines[row - 1] = lines[row - 1][:col].rstrip()
+        if not lines[row - 1].strip():
+            lines[row - 1] = None
+    return '\n'.join(line for line in lines if line is not None)
+
+
+def compact_source(python_code, strip_comments=False):
+    """Shrink source for a prompt without changing what it does.
+
+    Always drops imports nobody uses, trailing whitespace and runs of blank
+    lines; with `strip_comments` also drops comments and docstrings. An import
+    or docstring that shares a line with other code is kept.
+    """
+    try:
+        model = analyze_module(python_code)
+    except SyntaxError:
+        return python_code
+    drop = set()
+    for statement in model.statements:
+        if statement.kind == 'import' and statement.alone and statement.defines \
+                and not statement.defines & model.used_names:
+            drop.update(range(statement.start, statement.end + 1))
+    if strip_comments:
+        for start, end in model.docstring_spans:
+            drop.update(range(start, end + 1))
+
+    lines = [line.rstrip() for number, line in enumerate(python_code.split('\n'), 1) if number not in drop]
+    code = '\n'.join(lines)
+    if strip_comments:
+        code = _strip_comments(code)
+
+    compacted, blank = [], False
+    for line in code.split('\n'):
+        if not line.strip():
+            if not blank and compacted:
+                compacted.append('')
+            blank = True
+        else:
+            compacted.append(line)
+            blank = False
+    return '\n'.join(compacted).strip('\n') + '\n'
+
+
+def dedupe_blocks(text):
+    """Drop repeated blank-line-separated blocks, e.g. the same declaration listed
+    twice in a context. Single lines are never dropped on their own: a second
+    `};` or `public:` belongs to the code around it."""
+    seen, kept, depth = set(), [], 0
+    for block in re.split(r'\n[ \t]*\n', text):
+        balance = block.count('{') - block.count('}')
+        # Only whole top-level declarations; a block inside a class body depends on its neighbours
+        if depth == 0 and balance == 0:
+            key = '\n'.join(line.strip() for line in block.strip().split('\n'))
+            if key and key in seen:
+                continue
+            seen.add(key)
+        depth = max(0, depth + balance)
+        kept.append(block)
+    return '\n\n'.join(kept)
+
+
+class TokenLedger:
+    """Prompt and completion tokens per file and per process; safe across threads.
+
+    The counts keep growing across runs in one process (the daemon, the
+    benchmark's passes), so a run reports its share against a snapshot taken
+    when it started. Runs that overlap (daemon jobs) are told apart by
+    `current_run` instead.
+    """
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.requests = 0
+        self.by_file = {}
+        self.by_run = {}
+        self._lock = threading.Lock()
+
+    def record(self, prompt_tokens, completion_tokens):
+        key, run = current_file.get(), current_run.get()
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.requests += 1
+            if key is not None:
+                usage = self.by_file.setdefault(key, {'prompt_tokens': 0, 'completion_tokens': 0})
+                usage['prompt_tokens'] += prompt_tokens
+                usage['completion_tokens'] += completion_tokens
+            if run is not None:
+                usage = self.by_run.setdefault(run, {'prompt_tokens': 0, 'completion_tokens': 0, 'requests': 0})
+                usage['prompt_tokens'] += prompt_tokens
+                usage['completion_tokens'] += completion_tokens
+                usage['requests'] += 1
+
+    def reset(self):
+        with self._lock:
+            self.prompt_tokens = self.completion_tokens = self.requests = 0
+            self.by_file = {}
+            self.by_run = {}
+
+    def end_run(self, run):
+        with self._lock:
+            self.by_run.pop(run, None)
+
+    def snapshot(self):
+        """Totals so far (the current run's when one is set), to pass as `since` once the run is over"""
+        run = current_run.get()
+        with self._lock:
+            if run is not None:
+                return dict(self.by_run.get(run, {'prompt_tokens': 0, 'completion_tokens': 0, 'requests': 0}))
+            return {'prompt_tokens': self.prompt_tokens, 'completion_tokens': self.completion_tokens,
+                    'requests': self.requests}
+
+    def for_file(self, key, since=None):
+        """Tokens recorded for a file, less an earlier for_file() result"""
+        with self._lock:
+            counts = dict(self.by_file.get(key, {'prompt_tokens': 0, 'completion_tokens': 0}))
+        for name, value in (since or {}).items():
+            counts[name] -= value
+        return counts
+
+    def report(self, since=None):
+        totals = self.snapshot()
+        for name, value in (since or {}).items():
+            totals[name] -= value
+        if not totals['requests']:
+            return
+        source = "tiktoken" if tiktoken is not None else "estimated"
+        print(f"Tokens ({source}): {totals['prompt_tokens']} prompt + {totals['completion_tokens']} completion "
+              f"in {totals['requests']} requests")
+
+
+usage = TokenLedger()
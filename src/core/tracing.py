@@ -0,0 +1,178 @@
+"""
+Per-stage instrumentation: wall and CPU time, bytes, tokens, cost and retries,
+written as a Chrome trace (chrome://tracing, Perfetto) and summarized as a table
+"""
+
+import contextlib
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+# Counters summed per stage in the summary table, in column order
+COUNTERS = ('bytes', 'prompt_tokens', 'completion_tokens', 'cost', 'retries')
+HEADERS = {'count': 'n', 'wall_ms': 'wall ms', 'max_ms': 'max ms', 'cpu_ms': 'cpu ms',
+           'prompt_tokens': 'in tok', 'completion_tokens': 'out tok', 'cost': 'cost $', 'retries': 'retry'}
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+# Trace row for spans that interleave on one thread, e.g. one per file in batch mode
+lane = contextvars.ContextVar('trace_lane', default=None)
+
+
+class Span:
+    """One timed stage; `args` ends up in the trace event"""
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+        self._lock = threading.Lock()
+
+    def set(self, key, value):
+        self.args[key] = value
+
+    def add(self, key, amount=1):
+        # Worker threads of one stage (chunked translation) share its span
+        with self._lock:
+            self.args[key] = self.args.get(key, 0) + amount
+
+
+class _NullSpan:
+    """What span() returns while tracing is off: every call is a no-op"""
+
+    def set(self, key, value):
+        pass
+
+    def add(self, key, amount=1):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+def current_span():
+    return _current_span.get() or NULL_SPAN
+
+
+class Tracer:
+    """Collects complete ('X') and instant ('i') events in Chrome trace format"""
+
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._lanes = itertools.count(1)
+
+    def enable(self):
+        self.enabled = True
+        self.events = []
+        self._origin = time.perf_counter()
+
+    def span(self, name, category='stage', cpu=True, **args):
+        """Time a stage. Pass cpu=False for spans awaited in an event loop, whose
+        thread CPU time would include whatever else the loop ran meanwhile."""
+        if not self.enabled:
+            return NULL_SPAN
+        return self._record(Span(name, category, args), cpu)
+
+    @contextlib.contextmanager
+    def _record(self, span, cpu):
+        token = _current_span.set(span)
+        wall, cpu_start = time.perf_counter(), time.thread_time() if cpu else None
+        try:
+            yield span
+        except BaseException as e:
+            span.args['error'] = e.__class__.__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            end = time.perf_counter()
+            if cpu:
+                span.args['cpu_ms'] = round((time.thread_time() - cpu_start) * 1000, 3)
+            self._append({'name': span.name, 'cat': span.category, 'ph': 'X',
+                          'ts': self._micros(wall), 'dur': round((end - wall) * 1e6, 1),
+                          'args': span.args})
+
+    def start_lane(self, name):
+        """Give the current task its own named row in the trace"""
+        lane.set(next(self._lanes))
+        if self.enabled:
+            self._append({'name': 'thread_name', 'ph': 'M', 'args': {'name': name}})
+
+    def instant(self, name, category='event', **args):
+        if self.enabled:
+            self._append({'name': name, 'cat': category, 'ph': 'i', 's': 't',
+                          'ts': self._micros(time.perf_counter()), 'args': args})
+
+    def _micros(self, moment):
+        return round((moment - self._origin) * 1e6, 1)
+
+    def _append(self, event):
+        event['pid'] = os.getpid()
+        event['tid'] = lane.get() or threading.get_ident()
+        with self._lock:
+            self.events.append(event)
+
+    def write(self, path):
+        with self._lock:
+            events = list(self.events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def summary(self):
+        """Per-stage rows: count, wall/CPU totals and summed counters, in first-seen order"""
+        rows = {}
+        with self._lock:
+            events = [event for event in self.events if event['ph'] == 'X']
+        for event in events:
+            row = rows.setdefault(event['name'], {'stage': event['name'], 'count': 0, 'wall_ms': 0.0,
+                                                  'max_ms': 0.0, 'cpu_ms': 0.0, **dict.fromkeys(COUNTERS, 0)})
+            row['count'] += 1
+            row['wall_ms'] += event['dur'] / 1000
+            row['max_ms'] = max(row['max_ms'], event['dur'] / 1000)
+            row['cpu_ms'] += event['args'].get('cpu_ms', 0.0)
+            for counter in COUNTERS:
+                row[counter] += event['args'].get(counter, 0)
+        return list(rows.values())
+
+    def print_summary(self):
+        rows = self.summary()
+        if not rows:
+            return
+        columns = ('stage', 'count', 'wall_ms', 'max_ms', 'cpu_ms') + COUNTERS
+        table = Table(title='Pipeline stages', box=box.SIMPLE_HEAD, pad_edge=False, collapse_padding=True)
+        for column in columns:
+            header = HEADERS.get(column, column)
+            table.add_column(header, justify='left' if column == 'stage' else 'right', min_width=len(header))
+        for row in rows:
+            table.add_row(*(_format_cell(row[column]) for column in columns))
+        Console().print(table)
+
+
+def _format_cell(value):
+    if isinstance(value, float):
+        return f"{value:.4f}" if 0 < value < 0.1 else f"{value:.1f}"
+    return str(value)
+
+
+tracer = Tracer()
+
+
+def finish_trace(path):
+    """Write the trace to `path` and print the per-stage summary"""
+    tracer.write(path)
+    tracer.print_summary()
+    print(f"Trace written to {path} (open in chrome://tracing or ui.perfetto.dev)")
@@ -0,0 +1,254 @@
+"""
+Tiered C++ and Rust compile validation backed by a process pool
+"""
+
+import functools
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+TIERS = ('syntax', 'object', 'link')
+DEFAULT_TIMEOUTS = {'syntax': 15, 'object': 30, 'link': 30}
+BASE_FLAGS = ['-std=c++17']
+UNITY_MAX_BYTES = 4096
+UNITY_GROUP_SIZE = 8
+RUST_EDITION = '2021'
+DEFAULT_RUST_TIMEOUTS = {'syntax': 30, 'object': 60, 'link': 60}
+_RUST_MAIN_RE = re.compile(r'^\s*(?:pub\s+)?fn\s+main\s*\(', re.MULTILINE)
+EIGEN_INCLUDE_DIRS = ('/usr/include/eigen3', '/usr/local/include/eigen3', '/opt/homebrew/include/eigen3')
+
+
+@functools.lru_cache(maxsize=None)
+def eigen_flags():
+    """Include flags for Eigen (used by translated NumPy kernels) when it is installed"""
+    for directory in EIGEN_INCLUDE_DIRS:
+        if os.path.isdir(os.path.join(directory, 'Eigen')):
+            return ('-isystem', directory)
+    return ()
+
+
+def compiler_command(source_path, temp_dir, tier, flags=()):
+    command = ['g++'] + BASE_FLAGS + list(flags)
+    if tier == 'syntax':
+        return command + ['-fsyntax-only', source_path]
+    if tier == 'object':
+        return command + ['-c', '-o', os.path.join(temp_dir, 'output.o'), source_path]
+    return command + ['-o', os.path.join(temp_dir, 'output'), source_path]
+
+
+def _write_temp_cpp_file(cpp_code, temp_dir):
+    temp_cpp_file = os.path.join(temp_dir, "temp_code.cpp")
+    with open(temp_cpp_file, 'w', encoding='utf-8') as f:
+        f.write(cpp_code)
+    return temp_cpp_file
+
+
+def run_compile(cpp_code, tier='syntax', timeout=None, flags=(), object_dest=None):
+    """Compile one translation unit up to `tier`; safe to run in a worker process.
+
+    Returns a dict with success, errors, tier and duration. For the object
+    tier the object file is copied to `object_dest` when given.
+    """
+    if tier not in TIERS:
+        raise ValueError(f"Unknown validation tier: {tier}")
+    timeout = timeout or DEFAULT_TIMEOUTS[tier]
+    started = time.perf_counter()
+    result = {'success': False, 'errors': None, 'tier': tier}
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_cpp_file = _write_temp_cpp_file(cpp_code, temp_dir)
+            compile_result = subprocess.run(
+                compiler_command(temp_cpp_file, temp_dir, tier, flags),
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+            result['success'] = compile_result.returncode == 0
+            result['errors'] = None if result['success'] else compile_result.stderr
+            if result['success'] and tier == 'object' and object_dest:
+                shutil.copyfile(os.path.join(temp_dir, 'output.o'), object_dest)
+    except subprocess.TimeoutExpired:
+        result['errors'] = f"Compilation timed out after {timeout} seconds"
+    except FileNotFoundError:
+        result['errors'] = "g++ compiler not found"
+    except Exception as e:
+        result['errors'] = str(e)
+    result['duration'] = time.perf_counter() - started
+    return result
+
+
+_INCLUDE_RE = re.compile(r'^\s*#\s*include\b')
+
+
+def _rustc_command(source_path, temp_dir, tier, crate_type):
+    command = ['rustc', '--edition', RUST_EDITION, '--error-format=short', '--crate-type', crate_type]
+    if tier == 'syntax':
+        return command + ['--emit=metadata', '-o', os.path.join(temp_dir, 'output.rmeta'), source_path]
+    return command + ['-o', os.path.join(temp_dir, 'output'), source_path]
+
+
+def has_rust_main(rust_code):
+    return _RUST_MAIN_RE.search(rust_code) is not None
+
+
+def run_rust_check(rust_code, tier='syntax', timeout=None):
+    """Check one Rust file with rustc directly; safe to run in a worker process.
+
+    The syntax tier stops after type checking (--emit=metadata); the other
+    tiers do a full build. Returns the same dict shape as run_compile.
+    """
+    timeout = timeout or DEFAULT_RUST_TIMEOUTS[tier]
+    crate_type = 'bin' if has_rust_main(rust_code) else 'lib'
+    started = time.perf_counter()
+    result = {'success': False, 'errors': None, 'tier': tier}
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source_path = os.path.join(temp_dir, 'temp_code.rs')
+            with open(source_path, 'w', encoding='utf-8') as f:
+                f.write(rust_code)
+            compile_result = subprocess.run(
+                _rustc_command(source_path, temp_dir, tier, crate_type),
+                capture_output=True,
+                text=True,
+                timeout=timeout
+            )
+            result['success'] = compile_result.returncode == 0
+            result['errors'] = None if result['success'] else compile_result.stderr
+    except subprocess.TimeoutExpired:
+        result['errors'] = f"Compilation timed out after {timeout} seconds"
+    except FileNotFoundError:
+        result['errors'] = "rustc not found"
+    except Exception as e:
+        result['errors'] = str(e)
+    result['duration'] = time.perf_counter() - started
+    return result
+
+
+def build_unity_source(sources):
+    """Concatenate units into one translation unit, each in its own namespace"""
+    includes, bodies = [], []
+    for index, cpp_code in enumerate(sources):
+        body = []
+        for line in cpp_code.splitlines():
+            if _INCLUDE_RE.match(line):
+                if line.strip() not in includes:
+                    includes.append(line.strip())
+            else:
+                body.append(line)
+        bodies.append(f"namespace unity_unit_{index} {{\n" + '\n'.join(body) + f"\n}} // namespace unity_unit_{index}")
+    return '\n'.join(includes) + '\n\n' + '\n\n'.join(bodies) + '\n'
+
+
+def _include_set(cpp_code):
+    return tuple(sorted({line.strip() for line in cpp_code.splitlines() if _INCLUDE_RE.match(line)}))
+
+
+def unity_groups(sources, max_bytes=UNITY_MAX_BYTES, group_size=UNITY_GROUP_SIZE):
+    """Split {name: code} into unity groups of small units and a list of large ones.
+
+    Only units with the same includes share a group, so no unit compiles
+    thanks to a header another one pulled in.
+    """
+    by_includes, large = {}, []
+    for name, cpp_code in sources.items():
+        # Preprocessor state and file-scope statics would leak between units
+        if len(cpp_code) > max_bytes or '#define' in cpp_code or '#pragma once' in cpp_code:
+            large.append(name)
+            continue
+        by_includes.setdefault(_include_set(cpp_code), []).append(name)
+    groups = []
+    for names in by_includes.values():
+        for start in range(0, len(names), group_size):
+            group = names[start:start + group_size]
+            if len(group) > 1:
+                groups.append(group)
+            else:
+                large.extend(group)
+    return groups, large
+
+
+class ValidationPool:
+    """Process pool that validates many translation units concurrently.
+
+    With a ValidationWorkspace, verdicts come from and go to its cache and
+    compiles use its precompiled header; a RustWorkspace does the same for
+    `language='rust'` with its shared cargo target directory.
+    """
+
+    def __init__(self, max_workers=None, timeouts=None, flags=(), workspace=None, language='cpp'):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.language = language
+        default_timeouts = DEFAULT_RUST_TIMEOUTS if language == 'rust' else DEFAULT_TIMEOUTS
+        self.timeouts = dict(default_timeouts, **(timeouts or {}))
+        self.flags = tuple(flags)
+        self.workspace = workspace
+        if workspace is not None:
+            # Build the PCH / fetch crates before workers start so they do not race
+            workspace.prepare()
+        self.stats = {'hits': 0, 'misses': 0, 'time_saved': 0.0, 'unity_builds': 0}
+        self._stats_lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def _record(self, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        result = future.result()
+        if 'cache_hit' not in result:
+            return
+        with self._stats_lock:
+            self.stats['hits' if result['cache_hit'] else 'misses'] += 1
+            self.stats['time_saved'] += result['time_saved']
+
+    def submit(self, cpp_code, tier='syntax'):
+        if self.workspace is not None:
+            future = self.executor.submit(self.workspace.validate, cpp_code, tier, self.timeouts[tier])
+            future.add_done_callback(self._record)
+            return future
+        if self.language == 'rust':
+            return self.executor.submit(run_rust_check, cpp_code, tier, self.timeouts[tier])
+        return self.executor.submit(run_compile, cpp_code, tier, self.timeouts[tier], self.flags)
+
+    def validate_many(self, sources, tier='syntax', unity=False):
+        """Validate {name: code} and yield (name, result) as each unit finishes.
+
+        With `unity`, small units are first compiled together; a failing group
+        is retried unit by unit so errors are attributed correctly.
+        """
+        use_unity = unity and tier != 'link' and self.language == 'cpp'
+        groups, singles = (unity_groups(sources) if use_unity else ([], list(sources)))
+        pending = {}
+        for group in groups:
+            pending[self.submit(build_unity_source([sources[name] for name in group]), tier)] = group
+        for name in singles:
+            pending[self.submit(sources[name], tier)] = name
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                result = future.result()
+                if not isinstance(key, list):
+                    yield key, result
+                elif result['success']:
+                    with self._stats_lock:
+                        self.stats['unity_builds'] += 1
+                    for name in key:
+                        yield name, dict(result, unity=True)
+                else:
+                    for name in key:
+                        pending[self.submit(sources[name], tier)] = name
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,221 @@
+"""
+Persistent validation workspace: precompiled headers for the include
+prefixes translations share, plus a verdict and object-file cache keyed by
+source, flags and compiler version
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import subprocess
+import tempfile
+
+from pathlib import Path
+
+from src.core.cache import EVICT_TO, evict_lru
+from src.core.validation import BASE_FLAGS, run_compile
+
+DEFAULT_WORKSPACE_MAX_BYTES = 512 * 1024 * 1024
+# Bumped when verdicts computed before no longer hold (they were once compiled with a forced STL header)
+VERDICT_VERSION = 2
+_SYSTEM_INCLUDE_RE = re.compile(r'^\s*#\s*include\s*<([^<>\s]+)>\s*(?://.*)?$')
+
+
+def include_prefix(cpp_code):
+    """Headers of the <...> includes a source starts with, sorted.
+
+    Only comments and blank lines may sit between them; the prefix ends at
+    the first other line, so nothing the source defines first is skipped.
+    """
+    headers = set()
+    for line in cpp_code.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith('//'):
+            continue
+        match = _SYSTEM_INCLUDE_RE.match(line)
+        if match is None:
+            break
+        headers.add(match.group(1))
+    return tuple(sorted(headers))
+
+
+def default_workspace_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(Path.home(), '.cache')
+    return os.path.join(base, 'code-migrator', 'validation')
+
+
+@functools.lru_cache(maxsize=None)
+def compiler_version():
+    try:
+        result = subprocess.run(['g++', '--version'], capture_output=True, text=True, timeout=10)
+        return result.stdout.splitlines()[0] if result.stdout else 'unknown'
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def _write_atomic(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        file.write(text)
+    os.replace(temp_path, path)
+
+
+class VerdictCache:
+    """Verdicts stored as JSON files under <workspace>/verdicts, one per key.
+
+    prune() keeps the listed subdirectories under `max_bytes`, dropping the
+    least recently used files first (hits refresh their mtime).
+    """
+
+    workspace_dir = None
+    max_bytes = DEFAULT_WORKSPACE_MAX_BYTES
+    pruned_dirs = ('verdicts',)
+
+    def _digest(self, *parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode('utf-8'))
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _verdict_path(self, key):
+        return self.workspace_dir / 'verdicts' / key[:2] / f"{key}.json"
+
+    def lookup(self, key):
+        path = self._verdict_path(key)
+        try:
+            verdict = json.loads(path.read_text(encoding='utf-8'))
+            os.utime(path)
+            return verdict
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key, verdict):
+        try:
+            _write_atomic(self._verdict_path(key), json.dumps(verdict))
+        except OSError as e:
+            print(f"Warning: could not cache validation verdict: {e}")
+
+    def _files(self):
+        entries = []
+        for name in self.pruned_dirs:
+            for root, _, files in os.walk(self.workspace_dir / name):
+                for file_name in files:
+                    path = Path(root) / file_name
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def prune(self):
+        """Trim the workspace to its size limit; returns the bytes it now holds"""
+        entries = self._files()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            total = evict_lru(entries, self.max_bytes * EVICT_TO)
+        return total
+
+
+def is_environment_failure(verdict):
+    """Timeouts and missing tools say nothing about the code itself"""
+    return not verdict['success'] and verdict['errors'].startswith(
+        ("Compilation timed out", "g++ compiler not found", "rustc not found", "cargo not found"))
+
+
+class ValidationWorkspace(VerdictCache):
+    """On-disk state shared by every validation run.
+
+    A source is compiled against a precompiled header of exactly the <...>
+    includes it starts with, so it sees no header it did not ask for; the
+    header is built the second time that include prefix comes up. Instances
+    only hold paths and flags so they can be pickled into ValidationPool
+    workers; all shared state lives in the workspace directory.
+    """
+
+    pruned_dirs = ('verdicts', 'objects', 'pch')
+
+    def __init__(self, workspace_dir=None, use_pch=True, flags=(), max_bytes=DEFAULT_WORKSPACE_MAX_BYTES):
+        self.workspace_dir = Path(workspace_dir or default_workspace_dir())
+        self.use_pch = use_pch
+        self.flags = tuple(flags)
+        self.max_bytes = max_bytes
+        self.compiler = compiler_version()
+        self._pch_headers = {}
+
+    def prepare(self):
+        self.prune()
+
+    def ensure_pch(self, headers):
+        """Precompiled header for an include prefix, or None while it is not worth building"""
+        if not self.use_pch or not headers:
+            return None
+        if headers in self._pch_headers:
+            return self._pch_headers[headers]
+        pch_dir = self.workspace_dir / 'pch' / self._digest(self.compiler, *BASE_FLAGS, *self.flags, *headers)[:16]
+        header = pch_dir / 'prefix.h'
+        gch = pch_dir / 'prefix.h.gch'
+        if (pch_dir / 'failed').exists():
+            return None
+        if not header.exists():
+            # First sighting: building costs a few compiles, so wait until the prefix comes back
+            _write_atomic(header, ''.join(f"#include <{name}>\n" for name in headers))
+            return None
+        if not gch.exists():
+            temp_gch = pch_dir / f".tmp-{os.getpid()}.gch"
+            try:
+                result = subprocess.run(
+                    ['g++'] + BASE_FLAGS + list(self.flags) + ['-x', 'c++-header', str(header), '-o', str(temp_gch)],
+                    capture_output=True, text=True, timeout=120
+                )
+            except (OSError, subprocess.SubprocessError):
+                result = None
+            if result is None or result.returncode != 0:
+                # Unknown headers fail here as they would in the source; its own compile reports them
+                _write_atomic(pch_dir / 'failed', result.stderr if result is not None else '')
+                return None
+            os.replace(temp_gch, gch)
+        os.utime(gch)
+        self._pch_headers[headers] = str(header)
+        return self._pch_headers[headers]
+
+    def compile_flags(self, cpp_code):
+        header = self.ensure_pch(include_prefix(cpp_code))
+        return self.flags + (('-include', header, '-Winvalid-pch') if header else ())
+
+    def cache_key(self, cpp_code, tier):
+        return self._digest(cpp_code, tier, *BASE_FLAGS, *self.flags, VERDICT_VERSION, self.compiler)
+
+    def object_path(self, key):
+        return self.workspace_dir / 'objects' / key[:2] / f"{key}.o"
+
+    def validate(self, cpp_code, tier='syntax', timeout=None):
+        """Validate one unit, answering from the verdict cache when possible"""
+        key = self.cache_key(cpp_code, tier)
+        cached = self.lookup(key)
+        if cached is not None and tier == 'object' and cached['success']:
+            try:
+                os.utime(self.object_path(key))
+            except OSError:
+                cached = None
+        if cached is not None:
+            return dict(cached, cache_hit=True, time_saved=cached['duration'], duration=0.0)
+
+        object_dest = None
+        if tier == 'object':
+            object_dest = self.object_path(key)
+            object_dest.parent.mkdir(parents=True, exist_ok=True)
+        result = run_compile(cpp_code, tier, timeout, self.compile_flags(cpp_code), object_dest=object_dest)
+        if not is_environment_failure(result):
+            self.store(key, result)
+        return dict(result, cache_hit=False, time_saved=0.0)
+
+
+def validation_report(stats):
+    print(f"Validation cache: {stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['time_saved']:.2f}s compile time saved"
+          + (f", {stats['unity_builds']} unity builds" if stats.get('unity_builds') else ""))
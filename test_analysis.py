@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test file for the single-pass module analyzer
+"""
+
+import sys
+import tempfile
+
+from src.core.analysis import ModelCache, analyze_module
+from src.core.cache import TranslationCache
+from src.core.chunking import split_into_units
+from src.core.main import analyze_python_code
+
+TRICKY_CODE = '''import os, sys
+from typing import List
+
+HELP = """
+def not_a_function():
+    pass
+class NotAClass:
+import nothing
+"""
+LIMIT: int = 10
+
+
+@staticmethod
+def decorated(values: List[int]) -> int:
+    def nested(x):
+        return x * 2
+    return sum(nested(v) for v in values)
+
+
+async def fetch(url: str):
+    return os.path.basename(url)
+
+
+class Greeter:
+    def greet(self, name):
+        return decorated([len(name)])
+
+
+if __name__ == "__main__":
+    print(Greeter().greet("World"))
+'''
+
+
+def test_counts_are_ast_based():
+    """Test that decorators, nested/async defs and strings are handled"""
+    print("Testing AST-based counts...")
+    result = analyze_python_code(TRICKY_CODE)
+    expected = {'functions': 4, 'classes': 1, 'imports': 2, 'total_lines': TRICKY_CODE.count('\n') + 1}
+    passed = result == expected
+    print(f" count test {'PASSED' if passed else 'FAILED'} ({result})")
+    return passed
+
+
+def test_module_model():
+    """Test call graph, imports, globals, type hints and spans"""
+    print("\nTesting module model contents...")
+    model = analyze_module(TRICKY_CODE)
+    functions = {function.qualname: function for function in model.functions}
+    passed = (model.imports == ['os', 'sys', 'typing'] and model.globals == ['HELP', 'LIMIT']
+              and model.call_graph['Greeter.greet'] == ['decorated', 'len']
+              and 'decorated.nested' in functions and functions['fetch'].is_async
+              and functions['decorated'].decorators == ['staticmethod']
+              and functions['decorated'].lineno == 13 and model.type_hints == 4)
+    print(f" model test {'PASSED' if passed else 'FAILED'} ({model.call_graph}, {model.type_hints} hints)")
+    return passed
+
+
+def test_cache_is_shared_and_bounded():
+    """Test that stages reuse one parse and that the cache stays bounded"""
+    print("\nTesting model cache...")
+    cache = ModelCache(max_entries=2)
+    first = cache.get(TRICKY_CODE)
+    second = cache.get(TRICKY_CODE)
+    for i in range(5):
+        cache.get(f"x = {i}\n")
+
+    shared = analyze_module(TRICKY_CODE)
+    units = split_into_units(TRICKY_CODE)
+    passed = (first is second and cache.hits == 1 and len(cache._models) == 2
+              and analyze_module(TRICKY_CODE) is shared
+              and [unit.name for unit in units] == ['globals', 'decorated', 'fetch', 'Greeter', '__main__'])
+    print(f" cache test {'PASSED' if passed else 'FAILED'} ({[unit.name for unit in units]})")
+    return passed
+
+
+def test_models_persist_with_cache():
+    """Test that a model stored next to the translations is reused by a fresh cache"""
+    print("\nTesting persisted models...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        first = ModelCache(store=TranslationCache(temp_dir))
+        built = first.get(TRICKY_CODE)
+        store = TranslationCache(temp_dir)
+        second = ModelCache(store=store)
+        loaded = second.get(TRICKY_CODE)
+
+        entries = len(store._entries())
+
+    # Model lookups stay out of the translation hit/miss stats
+    passed = (loaded == built and loaded is not built and entries == 1
+              and store.hits == 0 and store.misses == 0)
+    print(f" persistence test {'PASSED' if passed else 'FAILED'} ({entries} stored models)")
+    return passed
+
+
+def main():
+    """Run all analyzer tests"""
+    print("Starting analyzer tests...")
+    print("=" * 60)
+
+    results = [
+        test_counts_are_ast_based(),
+        test_module_model(),
+        test_cache_is_shared_and_bounded(),
+        test_models_persist_with_cache(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Analyzer tests passed!")
+        return 0
+    else:
+        print("\n Some analyzer tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
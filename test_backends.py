@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Test file for translation backends (pooled client, retries, registry)
+"""
+
+import io
+import sys
+import json
+import asyncio
+import threading
+from contextlib import redirect_stdout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import src.core.backends as backends
+from src.core.backends import (
+    BackendError, OpenAIBackend, configure_backends, get_backend, register_backend, reset_backends,
+)
+from src.core.main import convert_to_cpp
+
+
+class FlakyChatHandler(BaseHTTPRequestHandler):
+    """OpenAI-compatible endpoint that rate-limits the first request"""
+
+    protocol_version = 'HTTP/1.1'
+    requests = []
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        FlakyChatHandler.requests.append((self.client_address[1], body))
+        if len(FlakyChatHandler.requests) == 1:
+            self._reply(429, {"error": {"message": "slow down", "type": "rate_limit"}}, {'retry-after': '0.05'})
+            return
+        self._reply(200, {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "int main() { return 0; }"}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        })
+
+    def _reply(self, status, payload, headers=None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class EmptyChatHandler(FlakyChatHandler):
+    """OpenAI-compatible endpoint whose message has no content"""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self._reply(200, {
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "content_filter",
+                         "message": {"role": "assistant", "content": None}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 0, "total_tokens": 1},
+        })
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_local_server_with_retry():
+    """Test a local stand-in server, Retry-After handling and connection reuse"""
+    print("Testing local OpenAI-compatible backend with a 429...")
+    FlakyChatHandler.requests = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FlakyChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        configure_backends(cpp={'provider': 'openai', 'model': 'local-coder',
+                                'base_url': f"http://127.0.0.1:{server.server_address[1]}/v1"})
+        first = convert_to_cpp("x = 1\n")
+        second = convert_to_cpp("y = 2\n")
+        backend = get_backend('cpp')
+    finally:
+        server.shutdown()
+        reset_backends()
+
+    ports = {port for port, _ in FlakyChatHandler.requests}
+    passed = (first == second == "int main() { return 0; }" and len(FlakyChatHandler.requests) == 3
+              and FlakyChatHandler.requests[0][1]['model'] == 'local-coder'
+              and backend.client() is backend.client() and len(ports) == 1)
+    print(f" local backend test {'PASSED' if passed else 'FAILED'} "
+          f"({len(FlakyChatHandler.requests)} requests over {len(ports)} connections)")
+    return passed
+
+
+def test_retry_policy():
+    """Test which errors are retried, jittered delays and async retries"""
+    print("\nTesting retry policy...")
+    delays = []
+    original_sleep = backends.time.sleep
+    backends.time.sleep = delays.append
+
+    def flaky(errors):
+        def complete(prompt, max_tokens):
+            if errors:
+                raise errors.pop(0)
+            return "ok"
+        return complete
+
+    backend = OpenAIBackend('test-model', max_retries=3)
+    try:
+        backend._complete = flaky([StatusError(503), StatusError(429)])
+        recovered = backend.complete("prompt", 10)
+        backend._complete = flaky([StatusError(400)])
+        try:
+            backend.complete("prompt", 10)
+            fatal = False
+        except BackendError:
+            fatal = True
+        backend._complete = flaky([StatusError(500)] * 5)
+        try:
+            backend.complete("prompt", 10)
+            exhausted = False
+        except BackendError:
+            exhausted = True
+        backend._complete = flaky([KeyError("bug")])
+        try:
+            backend.complete("prompt", 10)
+            bug_raised = False
+        except KeyError:
+            bug_raised = True
+    finally:
+        backends.time.sleep = original_sleep
+
+    async_errors = [StatusError(502)]
+
+    async def acomplete(prompt, max_tokens):
+        if async_errors:
+            raise async_errors.pop(0)
+        return "async ok"
+
+    backend._acomplete = acomplete
+    log = io.StringIO()
+    with redirect_stdout(log):
+        async_result = asyncio.run(backend.acomplete("prompt", 10))
+
+    passed = (recovered == "ok" and fatal and exhausted and bug_raised and async_result == "async ok"
+              and "Retrying test-model request" in log.getvalue()
+              and len(delays) == 5 and all(0 <= delay <= backends.BACKOFF_MAX for delay in delays))
+    print(f" retry policy test {'PASSED' if passed else 'FAILED'} ({[round(d, 2) for d in delays]})")
+    return passed
+
+
+def test_empty_reply_and_async_clients():
+    """Test that a reply without text is a BackendError and that async clients close with their loop"""
+    print("\nTesting empty replies and async client lifetime...")
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EmptyChatHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    backend = OpenAIBackend('empty-model', base_url=f"http://127.0.0.1:{server.server_address[1]}/v1")
+    clients, errors = [], []
+
+    async def run():
+        clients.append(await backend.async_client())
+        try:
+            await backend.acomplete("prompt", 10)
+        except BackendError as e:
+            errors.append(str(e))
+        return await backend.async_client() is clients[-1]
+
+    try:
+        try:
+            backend.complete("prompt", 10)
+        except BackendError as e:
+            errors.append(str(e))
+        reused = asyncio.run(run()) and asyncio.run(run())
+    finally:
+        server.shutdown()
+
+    passed = (len(errors) == 3 and all('content_filter' in error for error in errors) and reused
+              and clients[0] is not clients[1] and all(client.is_closed() for client in clients))
+    print(f" empty reply test {'PASSED' if passed else 'FAILED'} ({errors[:1]})")
+    return passed
+
+
+def test_registry_config():
+    """Test per-target configuration and test doubles"""
+    print("\nTesting backend registry...")
+    try:
+        configure_backends({'rust': {'provider': 'openai', 'model': 'rust-coder', 'max_retries': 1}})
+        rust = get_backend('rust')
+        same = get_backend('rust') is rust
+        try:
+            configure_backends(cpp={'provider': 'nonsense'})
+            rejected = False
+        except ValueError:
+            rejected = True
+        reset_backends()
+        double = object()
+        register_backend('cpp', double)
+        registered = get_backend('cpp') is double
+    finally:
+        reset_backends()
+
+    passed = (isinstance(rust, OpenAIBackend) and rust.model == 'rust-coder' and rust.max_retries == 1
+              and same and rejected and registered and get_backend('rust').provider == 'anthropic')
+    print(f" registry test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    """Run all backend tests"""
+    print("Starting backend tests...")
+    print("=" * 60)
+
+    results = [
+        test_local_server_with_retry(),
+        test_retry_policy(),
+        test_empty_reply_and_async_clients(),
+        test_registry_config(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Backend tests passed!")
+        return 0
+    else:
+        print("\n Some backend tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test file for batch (directory/glob) migration
+"""
+
+import sys
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import src.core.batch as batch
+from src.core.batch import discover_python_files, mirror_output_path, percentile, run_batch
+
+MOCK_CPP = """#include <iostream>
+
+int main() {
+    std::cout << "Hello" << std::endl;
+    return 0;
+}"""
+
+
+def mock_convert_to_cpp(python_code, context="", cache=None):
+    """Mock converter that sleeps like a network call"""
+    time.sleep(0.2)
+    return MOCK_CPP
+
+
+def create_tree(root):
+    for relative in ["a.py", "pkg/b.py", "pkg/sub/c.py", "notes.txt"]:
+        path = Path(root) / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("def f():\n    return 1\n", encoding="utf-8")
+
+
+def test_discover_and_mirror():
+    """Test directory discovery and output path mirroring"""
+    print("Testing file discovery and output mirroring...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        create_tree(temp_dir)
+        root, files = discover_python_files(temp_dir)
+        names = [str(path.relative_to(root)) for path in files]
+        globbed_root, globbed = discover_python_files(os.path.join(temp_dir, "pkg", "**", "*.py"))
+        mirrored = mirror_output_path(files[1], root, "out", "rust")
+
+    passed = (names == ["a.py", "pkg/b.py", "pkg/sub/c.py"]
+              and len(globbed) == 2 and globbed_root.name == "pkg"
+              and mirrored == Path("out/pkg/b.rs"))
+    print(f" discovery test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_percentile():
+    """Test nearest-rank percentiles used by the throughput summary"""
+    print("\nTesting percentile...")
+    values = list(range(1, 101))
+    passed = percentile(values, 0.5) == 50 and percentile(values, 0.95) == 95 and percentile([], 0.5) == 0.0
+    print(f" percentile test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_batch_runs_concurrently():
+    """Test that a batch run fans out conversions and mirrors the tree"""
+    print("\nTesting concurrent batch run (MOCK API)...")
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = mock_convert_to_cpp
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            create_tree(os.path.join(temp_dir, "src"))
+            output_dir = os.path.join(temp_dir, "out")
+            summary = run_batch(os.path.join(temp_dir, "src"), "cpp", output_dir,
+                                concurrency=3, validate=False)
+            written = sorted(str(path.relative_to(output_dir)) for path in Path(output_dir).rglob("*.cpp"))
+    finally:
+        batch.convert_to_cpp = original
+
+    passed = (summary is not None and summary['succeeded'] == 3
+              and summary['elapsed'] < 0.5
+              and written == ["a.cpp", "pkg/b.cpp", "pkg/sub/c.cpp"])
+    print(f" batch run test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_batch_validates_through_pool():
+    """Test that batch validation rejects files that do not compile"""
+    print("\nTesting batch validation through the pool (MOCK API)...")
+
+    def convert(python_code, context="", cache=None):
+        return MOCK_CPP if "ok" in python_code else MOCK_CPP.replace(";", "", 1)
+
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = convert
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            Path(temp_dir, "src").mkdir()
+            Path(temp_dir, "src", "good.py").write_text("ok = 1\n", encoding="utf-8")
+            Path(temp_dir, "src", "bad.py").write_text("bad = 1\n", encoding="utf-8")
+            output_dir = os.path.join(temp_dir, "out")
+            summary = run_batch(os.path.join(temp_dir, "src"), "cpp", output_dir, max_repairs=0)
+            written = sorted(path.name for path in Path(output_dir).rglob("*.cpp"))
+    finally:
+        batch.convert_to_cpp = original
+
+    passed = summary is not None and summary['succeeded'] == 1 and written == ["good.cpp"]
+    print(f" batch validation test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    """Run all batch tests"""
+    print("Starting batch migration tests...")
+    print("=" * 60)
+
+    test1_passed = test_discover_and_mirror()
+    test2_passed = test_percentile()
+    test3_passed = test_batch_runs_concurrently()
+    test4_passed = test_batch_validates_through_pool()
+
+    print("\n" + "=" * 60)
+    print("Batch Test Summary:")
+    print(f"discovery: {' PASSED' if test1_passed else ' FAILED'}")
+    print(f"percentile: {' PASSED' if test2_passed else ' FAILED'}")
+    print(f"batch run: {' PASSED' if test3_passed else ' FAILED'}")
+    print(f"batch validation: {' PASSED' if test4_passed else ' FAILED'}")
+
+    if test1_passed and test2_passed and test3_passed and test4_passed:
+        print("\n Batch tests passed!")
+        return 0
+    else:
+        print("\n Some batch tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
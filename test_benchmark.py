@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test file for the offline end-to-end benchmark
+"""
+
+import sys
+import ast
+import json
+import tempfile
+from pathlib import Path
+
+from src.core.benchmark import compare_benchmarks, generate_program, run_benchmark, write_corpus
+
+
+def test_corpus_generation():
+    """Test that generated programs are valid, deterministic and sized as asked"""
+    print("Testing benchmark corpus generation...")
+    program = generate_program(12, seed=3)
+    ast.parse(program)
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = write_corpus(tmp, (('small', 3, 2), ('large', 1, 30)))
+        files = sorted(path.relative_to(corpus).as_posix() for path in corpus.rglob('*.py'))
+        large = (corpus / 'large' / 'large_0.py').read_text(encoding='utf-8')
+
+    passed = (program == generate_program(12, seed=3) and program.count('def step_') == 12
+              and 'class Accumulator3009' in program
+              and files == ['large/large_0.py', 'small/small_0.py', 'small/small_1.py', 'small/small_2.py']
+              and large.count('def step_') == 30)
+    print(f" corpus test {'PASSED' if passed else 'FAILED'} ({files})")
+    return passed
+
+
+def test_offline_benchmark_run():
+    """Test a cold and a warm pass through the stub server with compile validation"""
+    print("\nTesting an offline benchmark run...")
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = write_corpus(Path(tmp) / 'corpus', (('small', 3, 2), ('medium', 1, 12)))
+        results = run_benchmark('cpp', latency=0.01, jitter=0.005, corpus=corpus, concurrency=4)
+    json.dumps(results)
+
+    cold, warm = results['runs']['cold'], results['runs']['warm']
+    passed = (cold['succeeded'] == warm['succeeded'] == 4 and cold['compile_pass_rate'] == 1.0
+              and cold['cache_hit_rate'] == 0.0 and warm['cache_hit_rate'] == 1.0
+              and cold['prompt_tokens'] > 0 and warm['prompt_tokens'] == 0
+              and cold['convert_p95'] >= cold['convert_p50'] > 0
+              and results['server']['requests'] == 4 and results['config']['target_language'] == 'cpp')
+    print(f" benchmark run test {'PASSED' if passed else 'FAILED'} "
+          f"(cold {cold['files_per_second']:.1f} files/s, warm {warm['files_per_second']:.1f} files/s)")
+    return passed
+
+
+def test_regression_comparison():
+    """Test that slowdowns beyond the tolerance are reported and improvements are not"""
+    print("\nTesting regression comparison...")
+    baseline = {'runs': {'cold': {'files_per_second': 10.0, 'p95_latency': 1.0, 'compile_pass_rate': 1.0,
+                                  'prompt_tokens': 1000}}}
+    slower = {'runs': {'cold': {'files_per_second': 8.0, 'p95_latency': 1.05, 'compile_pass_rate': 1.0,
+                                'prompt_tokens': 1500}}}
+    faster = {'runs': {'cold': {'files_per_second': 15.0, 'p95_latency': 0.5, 'compile_pass_rate': 1.0,
+                                'prompt_tokens': 900}}}
+    regressions = compare_benchmarks(baseline, slower)
+    passed = (len(regressions) == 2 and regressions[0].startswith('cold files_per_second')
+              and 'prompt_tokens' in regressions[1] and compare_benchmarks(baseline, faster) == []
+              and compare_benchmarks(baseline, slower, tolerance=0.6) == [])
+    print(f" comparison test {'PASSED' if passed else 'FAILED'} ({regressions})")
+    return passed
+
+
+def main():
+    """Run all benchmark tests"""
+    print("Starting benchmark tests...")
+    print("=" * 60)
+
+    results = [
+        test_corpus_generation(),
+        test_offline_benchmark_run(),
+        test_regression_comparison(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Benchmark tests passed!")
+        return 0
+    else:
+        print("\n Some benchmark tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
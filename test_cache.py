@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Test file for the translation cache
+"""
+
+import io
+import sys
+import os
+import tempfile
+import time
+import contextlib
+from pathlib import Path
+
+import src.core.batch as batch
+from src.core.batch import run_batch
+from src.core.cache import TranslationCache, make_cache_key
+from src.core.main import convert_to_cpp, CPP_MODEL, PROMPT_VERSION
+
+
+def test_cache_key():
+    """Test that keys ignore whitespace noise but not real changes"""
+    print("Testing cache key normalization...")
+    base = make_cache_key("def f():\n    return 1\n", "", "m", "cpp", 1)
+    noisy = make_cache_key("def f():   \r\n    return 1\n\n\n", "", "m", "cpp", 1)
+    other_target = make_cache_key("def f():\n    return 1\n", "", "m", "rust", 1)
+    other_prompt = make_cache_key("def f():\n    return 1\n", "", "m", "cpp", 2)
+
+    passed = base == noisy and base != other_target and base != other_prompt
+    print(f" cache key test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_hits_misses_and_refresh():
+    """Test hit/miss counting and the refresh override"""
+    print("\nTesting cache hits, misses and refresh...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TranslationCache(temp_dir)
+        key = make_cache_key("x = 1", "", "m", "cpp", 1)
+        first = cache.get(key)
+        cache.put(key, "int x = 1;")
+        second = cache.get(key)
+
+        refreshing = TranslationCache(temp_dir, refresh=True)
+        refreshed = refreshing.get(key)
+
+    passed = (first is None and second == "int x = 1;" and cache.hits == 1 and cache.misses == 1
+              and refreshed is None and refreshing.misses == 1)
+    print(f" hit/miss test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_lru_eviction():
+    """Test that the least recently used entries are evicted first"""
+    print("\nTesting LRU eviction...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TranslationCache(temp_dir)
+        keys = [make_cache_key(f"x = {i}", "", "m", "cpp", 1) for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, "x" * 100)
+            old = time.time() - 100 + i
+            os.utime(cache._entry_path(key), (old, old))
+        cache.max_bytes = 250
+        cache.get(keys[0])
+        cache.put(make_cache_key("x = 3", "", "m", "cpp", 1), "x" * 100)
+        surviving = [cache._entry_path(key).exists() for key in keys]
+        # Rewriting an entry replaces its bytes instead of adding to them
+        for _ in range(5):
+            cache.put(keys[0], "x" * 100)
+        total = cache._total_bytes
+
+    passed = surviving == [True, False, False] and total == 200
+    print(f" eviction test {'PASSED' if passed else 'FAILED'} (surviving: {surviving})")
+    return passed
+
+
+def test_convert_uses_cache():
+    """Test that a cached translation is returned without calling the API"""
+    print("\nTesting convert_to_cpp cache short-circuit...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TranslationCache(temp_dir)
+        python_code = "print('hi')"
+        cache.put(make_cache_key(python_code, "", CPP_MODEL, 'cpp', PROMPT_VERSION), "// cached")
+        result = convert_to_cpp(python_code, "", cache)
+
+    passed = result == "// cached" and cache.hits == 1
+    print(f" convert cache test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_only_valid_translations_cached():
+    """Test that a batch caches a translation only once it has compiled"""
+    print("\nTesting that failed translations stay out of the cache (MOCK API)...")
+    replies = {'code': "int main() { return 0 }"}
+    original = batch.convert_to_cpp
+
+    def mock_convert_to_cpp(python_code, context="", cache=None):
+        key = make_cache_key(python_code, context, "mock", 'cpp', 1)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            return cached
+        if cache is not None:
+            cache.put(key, replies['code'])
+        return replies['code']
+
+    batch.convert_to_cpp = mock_convert_to_cpp
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            (source / 'prog.py').write_text("def main():\n    return 0\n", encoding='utf-8')
+            cache = TranslationCache(os.path.join(temp_dir, 'cache'))
+            runs = []
+            for code in ("int main() { return 0 }", "int main() { return 0; }", "int main() { return 0 }"):
+                replies['code'] = code
+                with contextlib.redirect_stdout(io.StringIO()):
+                    summary = run_batch(str(source), 'cpp', os.path.join(temp_dir, 'out'), cache=cache,
+                                        max_repairs=0, workspace=None)
+                runs.append((summary['succeeded'], len(cache._entries())))
+    finally:
+        batch.convert_to_cpp = original
+
+    # The broken first reply is not replayed; the valid second one is, even when the model breaks again
+    passed = runs == [(0, 0), (1, 1), (1, 1)]
+    print(f" validated caching test {'PASSED' if passed else 'FAILED'} ({runs})")
+    return passed
+
+
+def test_held_commit_replacements():
+    """Test that a repaired commit writes repaired code and drops translations it could not map"""
+    print("\nTesting repaired commits...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cache = TranslationCache(temp_dir)
+        held = cache.held()
+        held.put('a' * 64, "int f() { return 1 }")
+        held.put('b' * 64, "int g() { return 2; }")
+        held.put('c' * 64, "int h() { return 3 }")
+        held.commit({"int f() { return 1 }": "int f() { return 1; }", "int g() { return 2; }": "int g() { return 2; }",
+                     "int h() { return 3 }": None})
+        stored = [cache.get(key * 64) for key in 'abc']
+
+    passed = stored == ["int f() { return 1; }", "int g() { return 2; }", None]
+    print(f" repaired commit test {'PASSED' if passed else 'FAILED'} ({stored})")
+    return passed
+
+
+def test_unvalidated_and_broken_hits():
+    """Test that --no-validate output is not replayed to validated runs and broken hits are deleted"""
+    print("\nTesting unvalidated entries and broken cache hits (MOCK API)...")
+    replies = {'code': "int main() { return 0 }"}
+    original = batch.convert_to_cpp
+
+    def mock_convert_to_cpp(python_code, context="", cache=None):
+        key = make_cache_key(python_code, context, "mock", 'cpp', 1)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            return cached
+        if cache is not None:
+            cache.put(key, replies['code'])
+        return replies['code']
+
+    batch.convert_to_cpp = mock_convert_to_cpp
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            (source / 'prog.py').write_text("def main():\n    return 0\n", encoding='utf-8')
+            cache = TranslationCache(os.path.join(temp_dir, 'cache'))
+            key = make_cache_key("def main():\n    return 0\n", "", "mock", 'cpp', 1)
+
+            def run(code, validate=True):
+                replies['code'] = code
+                with contextlib.redirect_stdout(io.StringIO()):
+                    return run_batch(str(source), 'cpp', os.path.join(temp_dir, 'out'), cache=cache,
+                                     max_repairs=0, workspace=None, validate=validate)['succeeded']
+
+            unvalidated = run("int main() { return 0 }", validate=False)
+            validated = run("int main() { return 0; }")
+            stored = cache.get(key)
+            cache.put(key, "int main() { return 0 }")
+            broken = run("int main() { return 0; }")
+            deleted = cache.get(key) is None
+            retried = run("int main() { return 0; }")
+    finally:
+        batch.convert_to_cpp = original
+
+    passed = (unvalidated == 1 and validated == 1 and stored == "int main() { return 0; }"
+              and broken == 0 and deleted and retried == 1)
+    print(f" unvalidated entries test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    """Run all cache tests"""
+    print("Starting translation cache tests...")
+    print("=" * 60)
+
+    results = [
+        test_cache_key(),
+        test_hits_misses_and_refresh(),
+        test_lru_eviction(),
+        test_convert_uses_cache(),
+        test_only_valid_translations_cached(),
+        test_held_commit_replacements(),
+        test_unvalidated_and_broken_hits(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Cache tests passed!")
+        return 0
+    else:
+        print("\n Some cache tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
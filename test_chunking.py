@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test file for function-level chunked translation
+"""
+
+import sys
+import time
+
+from src.core.chunking import split_into_units, assemble_units, translate_chunked
+from src.core.main import compile_cpp_code
+
+SAMPLE_MODULE = '''import math
+
+GREETING = "Hello"
+
+def main_helper():
+    return greet("World")
+
+@staticmethod
+def greet(name):
+    return f"{GREETING}, {name}!"
+
+class Circle:
+    def __init__(self, r):
+        self.r = r
+
+    def area(self) -> float:
+        return math.pi * self.r ** 2
+
+if __name__ == "__main__":
+    print(main_helper())
+    print(Circle(2).area())
+'''
+
+MOCK_UNITS = {
+    'def greet': '#include <string>\nstd::string greet(const std::string& name) {\n    return GREETING + ", " + name + "!";\n}',
+    'def main_helper': '#include <string>\nstd::string main_helper() {\n    return greet("World");\n}',
+    'class Circle': '#include <cmath>\nclass Circle {\npublic:\n    double r;\n    Circle(double r) : r(r) {}\n    double area() const { return M_PI * r * r; }\n};',
+    'if __name__': '#include <iostream>\nint main() {\n    std::cout << main_helper() << std::endl;\n    std::cout << Circle(2).area() << std::endl;\n    return 0;\n}',
+    'GREETING': '#include <string>\nconst std::string GREETING = "Hello";',
+}
+
+
+def mock_convert_to_cpp(python_code, context="", cache=None):
+    """Mock converter that answers per unit after a simulated network delay"""
+    time.sleep(0.2)
+    for marker, cpp_code in MOCK_UNITS.items():
+        if marker in python_code:
+            return cpp_code
+    return None
+
+
+def test_split_into_units():
+    """Test unit boundaries, decorators and dependency ordering"""
+    print("Testing split_into_units...")
+    units = split_into_units(SAMPLE_MODULE)
+    names = [unit.name for unit in units]
+    by_name = {unit.name: unit for unit in units}
+
+    passed = (names == ['globals', 'greet', 'main_helper', 'Circle', '__main__']
+              and by_name['greet'].source.startswith('@staticmethod')
+              and by_name['main_helper'].dependencies == ['greet']
+              and by_name['greet'].dependencies == ['globals']
+              and 'def area(self) -> float' in by_name['Circle'].signature
+              and by_name['__main__'].dependencies == ['Circle', 'main_helper'])
+    print(f" split test {'PASSED' if passed else 'FAILED'} ({names})")
+    return passed
+
+
+def test_assemble_units():
+    """Test that include lines are hoisted and deduplicated"""
+    print("\nTesting assemble_units...")
+    code = assemble_units(["#include <string>\nint a();", "```cpp\n#include <string>\n#include <vector>\nint b();\n```"], 'cpp')
+    passed = code.startswith("#include <string>\n#include <vector>\n\nint a();") and code.count("#include <string>") == 1
+    print(f" assemble test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_chunked_translation_compiles():
+    """Test concurrent per-unit translation and that the stitched result compiles"""
+    print("\nTesting chunked translation (MOCK API)...")
+    started = time.perf_counter()
+    cpp_code = translate_chunked(SAMPLE_MODULE, mock_convert_to_cpp, 'cpp', concurrency=8)
+    elapsed = time.perf_counter() - started
+    if cpp_code is None:
+        print(" chunked translation test FAILED - no output")
+        return False
+
+    compiled, errors = compile_cpp_code(cpp_code, "test_output")
+    passed = compiled and elapsed < 0.6
+    print(f" chunked translation test {'PASSED' if passed else 'FAILED'} ({elapsed:.2f}s)")
+    return passed
+
+
+def main():
+    """Run all chunking tests"""
+    print("Starting chunked translation tests...")
+    print("=" * 60)
+
+    results = [
+        test_split_into_units(),
+        test_assemble_units(),
+        test_chunked_translation_compiles(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Chunking tests passed!")
+        return 0
+    else:
+        print("\n Some chunking tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test file for the migration daemon and its thin client
+"""
+
+import io
+import os
+import sys
+import time
+import tempfile
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from src.core.backends import get_backend, reset_backends
+from src.core.client import (DAEMON_ENV, TOKEN_ENV, TOKEN_HEADER, find_daemon, follow, job_priority, request,
+                             run_remote, submit)
+from src.core.daemon import MigrationDaemon, session_key
+from src.core.main import parse_arguments
+from src.core.stub_server import StubLLMServer
+from src.core.tokens import usage
+
+PROGRAM = """def add(a, b):
+    return a + b
+
+if __name__ == "__main__":
+    print(add(1, 2))
+"""
+
+
+def _wait(job, timeout=30):
+    deadline = time.time() + timeout
+    while not job.done and time.time() < deadline:
+        time.sleep(0.01)
+    return job.done
+
+
+def _raw_status(url, token, content_type='application/json', host=None):
+    """Status of a hand-made POST /jobs, as a browser page or rebound name might send it"""
+    headers = {'Content-Type': content_type, TOKEN_HEADER: token}
+    if host:
+        headers['Host'] = host
+    req = urllib.request.Request(url + '/jobs', data=b'{"argv": ["x.py"], "cwd": "/"}', headers=headers)
+    try:
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_queue_and_status():
+    """Test priority order, cancellation, exit codes and rejected submissions"""
+    print("Testing the daemon job queue...")
+    release, order = threading.Event(), []
+
+    def runner(args):
+        if args.input_file == 'block.py':
+            release.wait(10)
+        order.append(args.input_file)
+        print(f"ran {args.input_file}")
+        if args.input_file == 'bad.py':
+            sys.exit(3)
+
+    with tempfile.TemporaryDirectory() as tmp, MigrationDaemon(workers=1, runner=runner) as daemon:
+        blocker, _ = daemon.submit(['block.py'], tmp)
+        while blocker.state == 'queued':
+            time.sleep(0.01)
+        low, _ = daemon.submit(['low.py'], tmp)
+        first, _ = daemon.submit(['first.py', '--priority', '5'], tmp, 5)
+        second, _ = daemon.submit(['second.py'], tmp, 5)
+        dropped, _ = daemon.submit(['dropped.py'], tmp)
+        bad, _ = daemon.submit(['bad.py'], tmp)
+        unparsable, _ = daemon.submit(['x.py', '--bogus'], tmp)
+        cancelled = daemon.cancel(dropped) and not daemon.cancel(blocker)
+        rejected = [daemon.submit(argv, cwd)[1] for argv, cwd in
+                    ((['x.py', '--trace', 't.json'], tmp), (['x.py'], 'relative'), ([], tmp))]
+        release.set()
+        finished = all(_wait(job) for job in (low, first, second, bad, unparsable))
+        listed = request(daemon.url, 'GET', '/jobs', token=daemon.token)['jobs']
+        detail = request(daemon.url, 'GET', f"/jobs/{first.id}", token=daemon.token)
+        missing = request(daemon.url, 'DELETE', '/jobs/999', token=daemon.token)
+        port = daemon.url.rsplit(':', 1)[1]
+        refused = [_raw_status(daemon.url, ''), _raw_status(daemon.url, 'wrong'),
+                   _raw_status(daemon.url, daemon.token, 'text/plain'),
+                   _raw_status(daemon.url, daemon.token, host=f"attacker.example:{port}")]
+        unlisted = request(daemon.url, 'GET', '/jobs')
+        jobs_after = len(daemon.job_list())
+        os.chdir(Path(__file__).parent)
+
+    passed = (finished and order == ['block.py', 'first.py', 'second.py', 'low.py', 'bad.py'] and cancelled
+              and dropped.state == 'cancelled' and bad.state == 'failed' and bad.exit_code == 3
+              and unparsable.exit_code == 2 and 'unrecognized arguments: --bogus' in unparsable.output()
+              and all(rejected) and '--trace' in rejected[0] and len(listed) == 7
+              and detail['output'] == 'ran first.py\n' and detail['state'] == 'done' and 'no job' in missing['error']
+              and refused == [401, 401, 415, 403] and 'token' in unlisted['error'] and jobs_after == 7)
+    print(f" queue test {'PASSED' if passed else 'FAILED'} ({order}, {rejected}, {refused})")
+    return passed
+
+
+def test_warm_migrations():
+    """Test real migrations through the daemon: streamed output, per-job cwd and a reused backend client"""
+    print("\nTesting migrations run by the daemon...")
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    home = os.getcwd()
+    streams = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp, StubLLMServer() as stub, MigrationDaemon(workers=2) as daemon:
+            projects = [Path(tmp) / name for name in ('one', 'two')]
+            for project in projects:
+                project.mkdir()
+                (project / 'prog.py').write_text(PROGRAM, encoding='utf-8')
+            base = ['prog.py', '--base-url', stub.url, '--cache-dir', str(Path(tmp) / 'cache')]
+            clients, codes = [], []
+            for project in projects + projects[:1]:
+                job = submit(daemon.url, base, str(project), token=daemon.token)
+                out, err = io.StringIO(), io.StringIO()
+                codes.append(follow(daemon.url, job['id'], out, err, token=daemon.token))
+                streams.append(out.getvalue() + err.getvalue())
+                clients.append(get_backend('cpp'))
+            failed = submit(daemon.url, ['missing.py', '--base-url', stub.url], str(projects[0]), token=daemon.token)
+            failed_code = follow(daemon.url, failed['id'], io.StringIO(), io.StringIO(), token=daemon.token)
+            outputs = [(project / 'prog.cpp').exists() for project in projects]
+            requests = stub.stats['requests']
+    finally:
+        os.chdir(home)
+        reset_backends()
+
+    passed = (codes == [0, 0, 0] and failed_code == 1 and all(outputs) and requests == 1
+              and 'Translation complete! Output saved to: prog.cpp' in streams[0]
+              and 'Translation cache: 1 hits' in streams[1]
+              and clients[0] is clients[1] is clients[2])
+    print(f" warm migration test {'PASSED' if passed else 'FAILED'} ({codes}, {requests} LLM requests)")
+    return passed
+
+
+def test_thin_client():
+    """Test that main.py hands runs to a running daemon and falls back to running locally"""
+    print("\nTesting the thin client...")
+    home = os.getcwd()
+    script = str(Path(__file__).parent / 'src' / 'core' / 'main.py')
+    env = dict(os.environ, PYTHONPATH=str(Path(__file__).parent), OPENAI_API_KEY='stub')
+    try:
+        with tempfile.TemporaryDirectory() as tmp, StubLLMServer() as stub, MigrationDaemon() as daemon:
+            (Path(tmp) / 'prog.py').write_text(PROGRAM, encoding='utf-8')
+            argv = ['prog.py', '--base-url', stub.url, '--cache-dir', str(Path(tmp) / 'cache'), '--no-validate']
+            timings = {}
+            for name, extra, daemon_env in (('remote', [], daemon.url), ('local', ['--no-daemon'], daemon.url),
+                                            ('no daemon', [], '')):
+                start = time.perf_counter()
+                run = subprocess.run([sys.executable, script] + argv + extra, capture_output=True, text=True,
+                                     cwd=tmp, env=dict(env, **{DAEMON_ENV: daemon_env, TOKEN_ENV: daemon.token}))
+                timings[name] = (time.perf_counter() - start, run.returncode, 'Translation complete' in run.stdout)
+            jobs = len(daemon.job_list())
+            os.environ[DAEMON_ENV] = daemon.url
+            os.environ[TOKEN_ENV] = 'wrong'
+            wrong_token = find_daemon() is None
+            os.environ[TOKEN_ENV] = daemon.token
+            found = find_daemon() == (daemon.url, daemon.token)
+            local_only = run_remote(argv + ['--trace', 'out.json'])
+        os.environ[DAEMON_ENV] = daemon.url
+        gone = find_daemon() is None and run_remote(argv) is None
+    finally:
+        os.environ.pop(DAEMON_ENV, None)
+        os.environ.pop(TOKEN_ENV, None)
+        os.chdir(home)
+
+    passed = (all(code == 0 and complete for _, code, complete in timings.values()) and jobs == 1
+              and timings['remote'][0] < timings['local'][0] and wrong_token and found and local_only is None and gone
+              and job_priority(['x.py', '--priority', '4']) == 4 and job_priority(['--priority=-2']) == -2
+              and job_priority(['x.py']) == 0)
+    print(f" thin client test {'PASSED' if passed else 'FAILED'} "
+          f"({ {name: round(seconds, 2) for name, (seconds, _, _) in timings.items()} })")
+    return passed
+
+
+def test_concurrent_jobs_count_their_own_tokens():
+    """Test that jobs sharing a session report only their own token usage, and that cache flags split sessions"""
+    print("\nTesting per-job token attribution...")
+    both_running = threading.Barrier(2, timeout=10)
+
+    def runner(args):
+        spent_before = usage.snapshot()
+        both_running.wait()
+        usage.record(100 if args.input_file == 'a.py' else 7, 1)
+        both_running.wait()
+        usage.report(since=spent_before)
+
+    with tempfile.TemporaryDirectory() as tmp, MigrationDaemon(workers=2, runner=runner) as daemon:
+        first, _ = daemon.submit(['a.py'], tmp)
+        second, _ = daemon.submit(['b.py'], tmp)
+        finished = _wait(first) and _wait(second)
+        os.chdir(Path(__file__).parent)
+    keys = {session_key(parse_arguments(argv), tmp) for argv in
+            (['a.py'], ['a.py', '--no-cache'], ['a.py', '--cache-dir', 'elsewhere'])}
+
+    passed = (finished and ': 100 prompt + 1 completion in 1 requests' in first.output()
+              and ': 7 prompt + 1 completion in 1 requests' in second.output() and len(keys) == 3)
+    print(f" token attribution test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    """Run all daemon tests"""
+    print("Starting migration daemon tests...")
+    print("=" * 60)
+
+    results = [
+        test_queue_and_status(),
+        test_warm_migrations(),
+        test_thin_client(),
+        test_concurrent_jobs_count_their_own_tokens(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Migration daemon tests passed!")
+        return 0
+    else:
+        print("\n Some migration daemon tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
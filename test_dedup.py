@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test file for alpha-renamed deduplication and near-duplicate detection
+"""
+
+import ast
+import io
+import os
+import sys
+import tempfile
+import contextlib
+from pathlib import Path
+
+import src.core.batch as batch
+from src.core.batch import run_batch
+from src.core.dedup import bound_names, fingerprint, minhash, near_duplicates, remap_identifiers
+
+TOTAL = '''def total_price(prices, tax):
+    """Total with tax."""
+    total = 0.0
+    for price in prices:
+        total += price * (1 + tax)
+    return total
+'''
+
+RENAMED = '''def sum_cost(costs, rate):
+    acc = 0.0
+    for cost in costs:
+        acc += cost * (1 + rate)
+    return acc
+'''
+
+ROUNDED = '''def total_price_rounded(prices, tax):
+    total = 0.0
+    for price in prices:
+        total += price * (1 + tax)
+    return round(total, 2)
+'''
+
+CLAMP = '''def clamp(value, low, high):
+    if value < low:
+        return low
+    if value > high:
+        return high
+    return value
+'''
+
+OTHER = '''def describe(counts, label):
+    parts = []
+    for key in sorted(counts):
+        parts.append(f"{label}.{key}={counts[key]!r}")
+    return "; ".join(parts) or label
+'''
+
+
+def mock_convert_to_cpp(python_code, context="", cache=None):
+    """Mock converter that writes C++ with the unit's own identifiers and counts its calls"""
+    mock_convert_to_cpp.calls.append(python_code)
+    function = ast.parse(python_code).body[0]
+    if function.name == 'clamp':
+        return ("double clamp(double value, double low, double high) {\n"
+                "    return value < low ? low : (value > high ? high : value);\n}")
+    name, values, rate, acc, item = bound_names(function)
+    result = f"std::round({acc} * 100) / 100" if 'round' in python_code else acc
+    return (f"#include <cmath>\n#include <vector>\n"
+            f"double {name}(const std::vector<double>& {values}, double {rate}) {{\n"
+            f"    double {acc} = 0.0;  // running {acc}\n"
+            f"    for (double {item} : {values}) {{ {acc} += {item} * (1 + {rate}); }}\n"
+            f"    return {result};\n}}")
+
+
+mock_convert_to_cpp.calls = []
+
+
+def test_fingerprints():
+    """Test alpha-equivalence classes, what still tells functions apart, and MinHash near-duplicates"""
+    print("Testing fingerprints...")
+    total, renamed, rounded = fingerprint(TOTAL), fingerprint(RENAMED), fingerprint(ROUNDED)
+    changed = fingerprint(TOTAL.replace('1 + tax', '2 + tax'))
+    global_call = fingerprint(RENAMED.replace('acc += cost', 'acc += scale(cost)'))
+    other_global = fingerprint(RENAMED.replace('acc += cost', 'acc += shift(cost)'))
+    scoped = bound_names(ast.parse("def f(a):\n    global g\n    g = a\n    b = [x for x in a]\n").body[0])
+    signatures = {name: minhash(found[2]) for name, found in (('total', total), ('rounded', rounded))}
+    signatures['other'] = minhash(fingerprint(OTHER)[2])
+    pairs = near_duplicates(signatures, threshold=0.6)
+
+    passed = (total[0] == renamed[0] and total[1] == ['total_price', 'prices', 'tax', 'total', 'price']
+              and renamed[1] == ['sum_cost', 'costs', 'rate', 'acc', 'cost'] and 'Total with tax' not in total[2]
+              and changed[0] != total[0] and rounded[0] != total[0] and global_call[0] != other_global[0]
+              and scoped == ['f', 'a', 'b', 'x'] and fingerprint("x = 1\n") is None
+              and minhash(CLAMP.split('\n')[0] + '\n    pass\n') is None
+              and [(first, second) for _, first, second in pairs] == [('rounded', 'total')] and pairs[0][0] < 1)
+    print(f" fingerprint test {'PASSED' if passed else 'FAILED'} ({[(round(s, 2), a, b) for s, a, b in pairs]})")
+    return passed
+
+
+def test_remap_identifiers():
+    """Test mapping a shared translation back to another copy's identifiers"""
+    print("\nTesting identifier remapping...")
+    cpp = mock_convert_to_cpp(TOTAL)
+    mapping = list(zip(fingerprint(TOTAL)[1], fingerprint(RENAMED)[1]))
+    remapped = remap_identifiers(cpp, mapping)
+    rust = ('fn total_price(prices: &[f64], tax: f64) -> f64 {\n'
+            '    let total: f64 = prices.iter().map(|price| price * (1.0 + tax)).sum();\n'
+            '    println!("total {}", total);\n    Report { total }.total\n}')
+    rust_remapped = remap_identifiers(rust, mapping)
+    swapped = remap_identifiers("int f(int a, int b) { return a - b + f(b, a); }",
+                                [('f', 'g'), ('a', 'b'), ('b', 'a')])
+
+    passed = (remapped == mock_convert_to_cpp(RENAMED).replace('running acc', 'running total')
+              and rust_remapped.startswith('fn sum_cost(prices: &[f64], tax: f64)')
+              and 'println!("total {}", total)' in rust_remapped and '.total' in rust_remapped
+              and swapped == "int g(int b, int a) { return b - a + g(a, b); }"
+              and remap_identifiers(cpp, [('missing', 'sum_cost')]) is None
+              and remap_identifiers(cpp, [('total_price', 'total')]) is None
+              and remap_identifiers("void f() { obj.f = 1; }", [('f', 'g')]) is None)
+    print(f" remap test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_batch_dedup():
+    """Test that a batch translates each class once and reports the savings"""
+    print("\nTesting deduplication across a batch (MOCK API)...")
+    mock_convert_to_cpp.calls = []
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = mock_convert_to_cpp
+    output = io.StringIO()
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            (source / 'a.py').write_text(TOTAL + '\n\n' + CLAMP, encoding='utf-8')
+            (source / 'b.py').write_text(RENAMED + '\n\n' + CLAMP + '\n\n' + ROUNDED, encoding='utf-8')
+            output_dir = os.path.join(temp_dir, 'out')
+            with contextlib.redirect_stdout(output):
+                summary = run_batch(str(source), 'cpp', output_dir, dedup=True, max_repairs=0)
+            written = {name: (Path(output_dir) / name).read_text(encoding='utf-8') for name in ('a.cpp', 'b.cpp')}
+    finally:
+        batch.convert_to_cpp = original
+
+    report = output.getvalue()
+    passed = (summary is not None and summary['succeeded'] == 2 and len(mock_convert_to_cpp.calls) == 3
+              and 'double sum_cost(const std::vector<double>& costs, double rate)' in written['b.cpp']
+              and 'double total_price(const std::vector<double>& prices, double tax)' in written['a.cpp']
+              and written['b.cpp'].count('double clamp(') == 1 and 'total_price_rounded' in written['b.cpp']
+              and 'Dedup: 4 functions in 2 classes of identical code; saved 2 LLM calls' in report
+              and 'Near-duplicates (translated separately): 1 pairs' in report
+              and 'total_price_rounded' in report.split('Near-duplicates')[1])
+    print(f" batch dedup test {'PASSED' if passed else 'FAILED'} ({len(mock_convert_to_cpp.calls)} LLM calls)")
+    print(report[report.find('Dedup:'):].rstrip())
+    return passed
+
+
+def main():
+    """Run all dedup tests"""
+    print("Starting deduplication tests...")
+    print("=" * 60)
+
+    results = [
+        test_fingerprints(),
+        test_remap_identifiers(),
+        test_batch_dedup(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Deduplication tests passed!")
+        return 0
+    else:
+        print("\n Some deduplication tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
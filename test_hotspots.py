@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+Test file for profile-guided hot-spot migration
+"""
+
+import os
+import sys
+import tempfile
+import subprocess
+from pathlib import Path
+
+from src.core.hotspots import (
+    PURE_ENV, binding_context, build_extension, hotspot_source, migrate_hotspots, patch_program,
+    profile_program, rank_hotspots, select_hotspots, time_workload, write_extension,
+)
+
+PROGRAM = """import math
+
+SCALE = 3
+UNUSED = 5
+
+
+def slow_sum(n):
+    total = 0
+    for i in range(n):
+        total += helper(i) * SCALE
+    return total
+
+
+def helper(i):
+    return i % 7
+
+
+def cold(x):
+    return math.sqrt(x)
+
+
+class Thing:
+    def method(self):
+        return sum(range(20000))
+
+
+def gen():
+    for i in range(50000):
+        yield i
+
+
+if __name__ == '__main__':
+    print(slow_sum(600000), cold(4.0), Thing().method(), sum(gen()))
+"""
+
+# Stands in for the compiled extension, which needs pybind11 or PyO3 to build
+FAST_MODULE = """def slow_sum(n):
+    full, rest = divmod(n, 7)
+    return 3 * (21 * full + rest * (rest - 1) // 2)
+"""
+
+CPP_EXTENSION = """#include <pybind11/pybind11.h>
+namespace py = pybind11;
+long slow_sum(long n) { long total = 0; for (long i = 0; i < n; ++i) total += (i % 7) * 3; return total; }
+PYBIND11_MODULE(prog_native, m) { m.def("slow_sum", &slow_sum, py::arg("n")); }
+"""
+
+
+def test_ranking():
+    """Test self-time ranking, eligibility reasons and top-N selection"""
+    print("Testing hot-spot ranking...")
+    with tempfile.TemporaryDirectory() as tmp:
+        program = Path(tmp) / 'prog.py'
+        program.write_text(PROGRAM, encoding='utf-8')
+        stats, errors = profile_program(str(program))
+        ranking = rank_hotspots(stats, str(program), PROGRAM)
+        crashed, crash = profile_program(str(program), entry=f"{Path(tmp) / 'missing.py'}")
+
+    rows = {row['name']: row for row in ranking}
+    passed = (errors is None and ranking[0]['name'] == 'slow_sum' and rows['helper']['calls'] == 600000
+              and rows['gen']['reason'] == 'generator' and rows['method']['reason'] == 'method or nested function'
+              and rows['cold']['reason'] is None and 'Thing' not in rows
+              and select_hotspots(ranking, 2) == ['slow_sum', 'helper'] and select_hotspots(ranking, 1) == ['slow_sum']
+              and 0 < rows['slow_sum']['share'] <= 1 and crashed is None and crash)
+    print(f" ranking test {'PASSED' if passed else 'FAILED'} "
+          f"({[(row['name'], round(row['self_time'] * 1000, 1), row['reason']) for row in ranking]})")
+    return passed
+
+
+def test_generated_files():
+    """Test the prompt source, binding context, patched program and build files"""
+    print("\nTesting generated extension files...")
+    source, helpers = hotspot_source(PROGRAM, ['slow_sum'])
+    context = binding_context('prog_native', ['slow_sum'], helpers, 'cpp')
+    rust_context = binding_context('prog_native', ['slow_sum'], helpers, 'rust')
+    patched = patch_program(PROGRAM, 'prog', ['slow_sum', 'helper'])
+    with tempfile.TemporaryDirectory() as tmp:
+        cpp_dir, rust_dir = Path(tmp) / 'cpp', Path(tmp) / 'rust'
+        cpp_dir.mkdir()
+        rust_dir.mkdir()
+        cpp_script = Path(write_extension(str(cpp_dir), 'prog_native', CPP_EXTENSION, 'cpp')).read_text()
+        rust_script = Path(write_extension(str(rust_dir), 'prog_native', '// lib', 'rust')).read_text()
+        cargo = (rust_dir / 'Cargo.toml').read_text(encoding='utf-8')
+        lib_written = (rust_dir / 'src' / 'lib.rs').exists() and (cpp_dir / 'prog_native.cpp').exists()
+        executable = os.access(cpp_dir / 'build.sh', os.X_OK)
+
+    lines = patched.splitlines()
+    shim_line = lines.index('_install_native_hot_spots(globals())')
+    passed = ('def helper' in source and 'SCALE = 3' in source and 'import math' in source
+              and 'def cold' not in source and 'UNUSED' not in source and helpers == ['helper']
+              and 'PYBIND11_MODULE(prog_native, m)' in context and 'helper as internal helpers' in context
+              and '#[pymodule] fn prog_native' in rust_context
+              and lines[shim_line - 4] == '    return i % 7' and 'def cold' in '\n'.join(lines[shim_line:])
+              and compile(patched, 'prog.py', 'exec') is not None
+              and '-m pybind11 --includes' in cpp_script and '-O3' in cpp_script and executable
+              and 'crate-type = ["cdylib"]' in cargo and 'extension-module' in cargo
+              and 'libprog_native.so' in rust_script and lib_written)
+    print(f" generated files test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_shim_and_timing():
+    """Test migration end to end with a stand-in native module: shim swap, fallback and timings"""
+    print("\nTesting the import shim and before/after timing...")
+    with tempfile.TemporaryDirectory() as tmp:
+        program = Path(tmp) / 'prog.py'
+        program.write_text(PROGRAM, encoding='utf-8')
+        output_dir = Path(tmp) / 'out'
+        prompts = []
+
+        def convert(source, context, cache):
+            prompts.append((source, context))
+            return CPP_EXTENSION
+
+        written = migrate_hotspots(str(program), PROGRAM, 'cpp', convert, str(output_dir), top_n=1, build=False)
+        fallback = subprocess.run([sys.executable, str(output_dir / 'prog.py')], capture_output=True, text=True)
+        bad_build = output_dir / 'build.sh'
+        bad_build.write_text("#!/bin/sh\nprintf 'def other():\\n    pass\\n' > \"$(dirname \"$0\")/prog_native.py\"\n")
+        missing = build_extension(str(bad_build), 'prog_native', ['slow_sum'])
+        (output_dir / 'prog_native.py').write_text(FAST_MODULE, encoding='utf-8')
+        case = time_workload(str(program), str(output_dir), runs=3)
+        swapped = subprocess.run([sys.executable, '-c', 'import prog; print(prog.slow_sum.__module__)'],
+                                 capture_output=True, text=True, cwd=output_dir)
+        pure = subprocess.run([sys.executable, '-c', 'import prog; print(prog.slow_sum.__module__)'],
+                              capture_output=True, text=True, cwd=output_dir, env=dict(os.environ, **{PURE_ENV: '1'}))
+
+    passed = (written and len(prompts) == 1 and 'def slow_sum' in prompts[0][0]
+              and 'PYBIND11_MODULE' in prompts[0][1] and fallback.returncode == 0
+              and 'missing exports: slow_sum' in missing
+              and case['stdout_match'] and case['native_wall'] < case['python_wall']
+              and swapped.stdout.strip() == 'prog_native' and pure.stdout.strip() == 'prog')
+    print(f" shim and timing test {'PASSED' if passed else 'FAILED'} "
+          f"(before {case['python_wall'] * 1000:.1f} ms, after {case['native_wall'] * 1000:.1f} ms)")
+    return passed
+
+
+def main():
+    """Run all hot-spot migration tests"""
+    print("Starting hot-spot migration tests...")
+    print("=" * 60)
+
+    results = [
+        test_ranking(),
+        test_generated_files(),
+        test_shim_and_timing(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Hot-spot migration tests passed!")
+        return 0
+    else:
+        print("\n Some hot-spot migration tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Test file for the crash-safe batch journal and --resume
+"""
+
+import io
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import contextlib
+from pathlib import Path
+
+import src.core.batch as batch
+from src.core.backends import configure_backends, reset_backends
+from src.core.batch import run_batch
+from src.core.journal import MigrationJournal, journal_path
+
+MOCK_CPP = "int main() {\n    return 0;\n}"
+
+
+def mock_convert_to_cpp(python_code, context="", cache=None):
+    """Mock converter that fails for sources marked FAIL and counts its calls"""
+    mock_convert_to_cpp.calls.append(python_code)
+    if 'FAIL' in python_code and mock_convert_to_cpp.failing:
+        return None
+    return f"// {python_code.split('(')[0]}\n{MOCK_CPP}"
+
+
+mock_convert_to_cpp.calls = []
+mock_convert_to_cpp.failing = True
+
+
+def _run(source, output_dir, **kwargs):
+    mock_convert_to_cpp.calls = []
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        summary = run_batch(str(source), 'cpp', output_dir, validate=False, max_repairs=0, **kwargs)
+    return summary, output.getvalue()
+
+
+def test_journal_states():
+    """Test state transitions, persistence across reopening and concurrent updates"""
+    print("Testing journal states and concurrent updates...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with MigrationJournal(temp_dir) as journal:
+            journal.begin('a.cpp', 'h1')
+            journal.advance('a.cpp', 'translated', 'code a')
+            journal.add_tokens('a.cpp', 100, 40)
+            journal.begin('b.cpp', 'h2')
+            journal.record_unit('b.cpp', 'u1', 'unit code')
+            journal.fail('b.cpp', 'conversion failed')
+            journal.begin('c.cpp', 'h3')
+            journal.record_unit('c.cpp', 'u1', 'unit code')
+            journal.fail('c.cpp', 'compilation failed', drop_units=True)
+
+            def worker(index):
+                for item in range(200):
+                    journal.begin(f"w{index}/{item}.cpp", 'h')
+                    journal.advance(f"w{index}/{item}.cpp", 'written', 'x')
+
+            threads = [threading.Thread(target=worker, args=(index,)) for index in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            counts = journal.counts()
+            commits, updates = journal.commits, journal.updates
+
+        with MigrationJournal(temp_dir, resume=True) as journal:
+            resumed = journal.entry('a.cpp')
+            units = (journal.unit('b.cpp', 'u1'), journal.unit('c.cpp', 'u1'))
+            journal.begin('a.cpp', 'h1')
+            journal.flush()
+            same_input = journal.entry('a.cpp')
+            journal.begin('b.cpp', 'h2')
+            journal.flush()
+            retried = journal.entry('b.cpp')
+            journal.begin('a.cpp', 'changed')
+            journal.flush()
+            changed = journal.entry('a.cpp')
+        with MigrationJournal(temp_dir) as journal:
+            fresh = journal.entry('a.cpp')
+        mode = sqlite3.connect(journal_path(temp_dir)).execute("PRAGMA journal_mode").fetchone()[0]
+
+    passed = (counts == {'written': 1600, 'translated': 1, 'failed': 2} and commits < updates
+              and resumed == {'input_hash': 'h1', 'state': 'translated', 'code': 'code a',
+                              'prompt_tokens': 100, 'completion_tokens': 40}
+              and units == ('unit code', None) and same_input['state'] == 'translated'
+              and retried['state'] == 'pending' and changed['state'] == 'pending' and changed['code'] is None
+              and fresh is None and mode == 'wal')
+    print(f" journal state test {'PASSED' if passed else 'FAILED'} ({updates} updates in {commits} commits)")
+    return passed
+
+
+def test_resume_files():
+    """Test that --resume skips written files, reuses in-flight translations and retries failures"""
+    print("\nTesting file-level resume (MOCK API)...")
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = mock_convert_to_cpp
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            for name in ('a', 'b', 'c', 'd'):
+                body = 'FAIL' if name == 'd' else 'ok'
+                (source / f"{name}.py").write_text(f"def {name}():\n    return '{body}'\n", encoding='utf-8')
+            output_dir = os.path.join(temp_dir, 'out')
+            mock_convert_to_cpp.failing = True
+            first, first_report = _run(source, output_dir)
+            # As if the run died after translating c.py but before writing it
+            with sqlite3.connect(journal_path(output_dir)) as db:
+                db.execute("UPDATE files SET state = 'translated' WHERE path = 'c.cpp'")
+            os.remove(os.path.join(output_dir, 'c.cpp'))
+            mock_convert_to_cpp.failing = False
+            resumed, resumed_report = _run(source, output_dir, resume=True)
+            resumed_calls = list(mock_convert_to_cpp.calls)
+            restored = Path(output_dir, 'c.cpp').read_text(encoding='utf-8').startswith('// def c')
+            fresh, _ = _run(source, output_dir)
+            fresh_calls = len(mock_convert_to_cpp.calls)
+    finally:
+        batch.convert_to_cpp = original
+        mock_convert_to_cpp.failing = True
+
+    passed = (first['succeeded'] == 3 and first['failed'] == 1
+              and 'Rerun with --resume to retry only the 1 unfinished files' in first_report
+              and resumed['succeeded'] == 4 and len(resumed_calls) == 1 and 'def d' in resumed_calls[0]
+              and restored and resumed['resumed_files'] == 2 and resumed['resumed_translations'] == 1
+              and 'Resume: skipped 2 finished files' in resumed_report and fresh_calls == 4)
+    print(f" file resume test {'PASSED' if passed else 'FAILED'} ({len(resumed_calls)} LLM calls on resume)")
+    return passed
+
+
+def test_resume_units():
+    """Test that a chunked file resumes from the units an earlier attempt translated"""
+    print("\nTesting unit-level resume (MOCK API)...")
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = mock_convert_to_cpp
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            (source / 'mod.py').write_text("def one():\n    return 1\n\n\ndef two():\n    return 2\n\n\n"
+                                           "def three():\n    return 'FAIL'\n", encoding='utf-8')
+            output_dir = os.path.join(temp_dir, 'out')
+            mock_convert_to_cpp.failing = True
+            first, _ = _run(source, output_dir, chunked=True)
+            first_calls = len(mock_convert_to_cpp.calls)
+            mock_convert_to_cpp.failing = False
+            resumed, report = _run(source, output_dir, chunked=True, resume=True)
+            resumed_calls = list(mock_convert_to_cpp.calls)
+            written = Path(output_dir, 'mod.cpp').read_text(encoding='utf-8')
+    finally:
+        batch.convert_to_cpp = original
+        mock_convert_to_cpp.failing = True
+
+    passed = (first['failed'] == 1 and first_calls == 3 and resumed['succeeded'] == 1
+              and len(resumed_calls) == 1 and 'def three' in resumed_calls[0] and resumed['units_resumed'] == 2
+              and 'reused 0 translations and 2 units from the journal' in report
+              and all(f"// def {name}" in written for name in ('one', 'two', 'three')))
+    print(f" unit resume test {'PASSED' if passed else 'FAILED'} ({first_calls} then {len(resumed_calls)} LLM calls)")
+    return passed
+
+
+def test_resume_after_model_change():
+    """Test that --resume does not reuse units translated with a different model"""
+    print("\nTesting resume after a model change (MOCK API)...")
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = mock_convert_to_cpp
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            (source / 'mod.py').write_text("def one():\n    return 1\n\n\ndef two():\n    return 'FAIL'\n",
+                                           encoding='utf-8')
+            output_dir = os.path.join(temp_dir, 'out')
+            mock_convert_to_cpp.failing = True
+            _run(source, output_dir, chunked=True)
+            with MigrationJournal(output_dir, resume=True) as journal:
+                units_before = journal._read("SELECT COUNT(*) FROM units")[0]
+            mock_convert_to_cpp.failing = False
+            configure_backends(cpp={'model': 'other-model'})
+            resumed, _ = _run(source, output_dir, chunked=True, resume=True)
+            resumed_calls = len(mock_convert_to_cpp.calls)
+            with MigrationJournal(output_dir, resume=True) as journal:
+                units_after = journal._read("SELECT COUNT(*) FROM units")[0]
+    finally:
+        batch.convert_to_cpp = original
+        mock_convert_to_cpp.failing = True
+        reset_backends()
+
+    passed = (units_before == 1 and resumed['succeeded'] == 1 and resumed['units_resumed'] == 0
+              and resumed_calls == 2 and units_after == 2)
+    print(f" model change test {'PASSED' if passed else 'FAILED'} ({resumed_calls} LLM calls, "
+          f"{units_before} then {units_after} journaled units)")
+    return passed
+
+
+def test_raising_file_is_isolated():
+    """Test that a converter exception fails only its own file and is journaled"""
+    print("\nTesting exception isolation (MOCK API)...")
+
+    def raising_convert_to_cpp(python_code, context="", cache=None):
+        if 'FAIL' in python_code:
+            raise RuntimeError("backend exploded")
+        return mock_convert_to_cpp(python_code, context, cache)
+
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = raising_convert_to_cpp
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            for name in ('a', 'b', 'c'):
+                body = 'FAIL' if name == 'b' else 'ok'
+                (source / f"{name}.py").write_text(f"def {name}():\n    return '{body}'\n", encoding='utf-8')
+            output_dir = os.path.join(temp_dir, 'out')
+            summary, report = _run(source, output_dir)
+            with sqlite3.connect(journal_path(output_dir)) as db:
+                states = dict(db.execute("SELECT path, state FROM files").fetchall())
+                error = db.execute("SELECT error FROM files WHERE path = 'b.cpp'").fetchone()[0]
+    finally:
+        batch.convert_to_cpp = original
+
+    passed = (summary['succeeded'] == 2 and summary['failed'] == 1
+              and states == {'a.cpp': 'written', 'b.cpp': 'failed', 'c.cpp': 'written'}
+              and error == "RuntimeError: backend exploded" and 'backend exploded' in report)
+    print(f" exception isolation test {'PASSED' if passed else 'FAILED'} ({states})")
+    return passed
+
+
+def main():
+    """Run all journal tests"""
+    print("Starting migration journal tests...")
+    print("=" * 60)
+
+    results = [
+        test_journal_states(),
+        test_resume_files(),
+        test_resume_units(),
+        test_resume_after_model_change(),
+        test_raising_file_is_isolated(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Migration journal tests passed!")
+        return 0
+    else:
+        print("\n Some migration journal tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test file for incremental re-migration manifests
+"""
+
+import sys
+import os
+import tempfile
+
+from src.core.main import write_cpp_file
+from src.core.manifest import translate_incremental, write_manifest, output_is_current, load_manifest, record_repair
+
+MODULE_V1 = '''def add(a, b):
+    return a + b
+
+def double(x):
+    return add(x, x)
+
+if __name__ == "__main__":
+    print(double(2))
+'''
+
+MODULE_V2 = MODULE_V1.replace("return add(x, x)", "return 2 * x")
+MODULE_V3 = MODULE_V2.replace("def add(a, b):", "def add(a, b, c=0):").replace("return a + b", "return a + b + c")
+
+calls = []
+
+
+def mock_convert_to_cpp(python_code, context="", cache=None):
+    """Mock converter that records which units were requested"""
+    first_line = python_code.splitlines()[0]
+    calls.append(first_line)
+    return f"// {first_line}"
+
+
+def migrate(python_code, output_path):
+    calls.clear()
+    code, manifest, stats = translate_incremental(python_code, mock_convert_to_cpp, 'cpp', output_path,
+                                                  "mock-model", 1)
+    if stats['translated'] or not output_is_current(output_path, manifest):
+        write_cpp_file(code, output_path)
+        write_manifest(output_path, manifest)
+    return stats, list(calls)
+
+
+def test_incremental_runs():
+    """Test that only changed units and units with changed dependencies are retranslated"""
+    print("Testing incremental re-migration...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "module.cpp")
+        first, _ = migrate(MODULE_V1, output_path)
+        unchanged, _ = migrate(MODULE_V1, output_path)
+        edited, edited_calls = migrate(MODULE_V2, output_path)
+        signature, signature_calls = migrate(MODULE_V3, output_path)
+        manifest = load_manifest(output_path)
+
+    passed = (first == {'reused': 0, 'translated': 3}
+              and unchanged == {'reused': 3, 'translated': 0}
+              and edited_calls == ["def double(x):"]
+              # double no longer calls add, so only add itself is stale
+              and signature_calls == ["def add(a, b, c=0):"]
+              and manifest is not None and len(manifest['units']) == 3
+              and all('code_hash' in entry for entry in manifest['units']))
+    print(f" incremental test {'PASSED' if passed else 'FAILED'} ({first}, {unchanged}, {edited_calls}, {signature_calls})")
+    return passed
+
+
+def test_dependency_signature_change():
+    """Test that changing a dependency's signature invalidates its callers"""
+    print("\nTesting dependency signature invalidation...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "module.cpp")
+        migrate(MODULE_V1, output_path)
+        stats, changed = migrate(MODULE_V1.replace("def add(a, b):", "def add(a, b=1):"), output_path)
+
+    passed = sorted(changed) == ["def add(a, b=1):", "def double(x):"] and stats['reused'] == 1
+    print(f" dependency test {'PASSED' if passed else 'FAILED'} ({changed})")
+    return passed
+
+
+CPP_UNITS = {
+    "def add(a, b):": "int add(int a, int b) {\n    return a + b\n}",
+    "def double(x):": "int twice(int x) {\n    return add(x, x);\n}",
+    'if __name__ == "__main__":': "int main() {\n    return twice(2);\n}",
+}
+
+
+def mock_convert_units(python_code, context="", cache=None):
+    """Mock converter returning a C++ function per unit; add is missing a semicolon"""
+    first_line = python_code.splitlines()[0]
+    calls.append(first_line)
+    return CPP_UNITS[first_line]
+
+
+def test_repair_is_stored_per_unit():
+    """Test that repaired blocks are written back to their units, and only ambiguous ones are cleared"""
+    print("\nTesting repaired units...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "module.cpp")
+        calls.clear()
+        code, manifest, _ = translate_incremental(MODULE_V1, mock_convert_units, 'cpp', output_path,
+                                                  "mock-model", 1)
+        repaired = "#include <cstdio>\n" + code.replace("a + b\n", "a + b;\n")
+        replacements = record_repair(manifest, repaired)
+        units = {entry['name']: entry['code'] for entry in manifest['units']}
+        write_cpp_file(repaired, output_path)
+        write_manifest(output_path, manifest)
+        calls.clear()
+        again, _, stats = translate_incremental(MODULE_V1, mock_convert_units, 'cpp', output_path,
+                                                "mock-model", 1)
+        current = output_is_current(output_path, load_manifest(output_path))
+
+        # A repair that renames a declaration cannot be mapped back, so that unit is cleared
+        _, renamed, _ = translate_incremental(MODULE_V1, mock_convert_units, 'cpp', output_path,
+                                              "mock-model", 1)
+        record_repair(renamed, code.replace("int twice(int x)", "long twice(int x)"))
+        cleared = [entry['name'] for entry in renamed['units'] if entry['code'] is None]
+
+    passed = ('a + b;' in units['add'] and '#include <cstdio>' in units['add']
+              and units['double'] == CPP_UNITS["def double(x):"]
+              and replacements[CPP_UNITS["def add(a, b):"]] == units['add']
+              and not calls and stats == {'reused': 3, 'translated': 0} and current
+              and again.count('a + b;') == 1 and again.startswith('#include <cstdio>')
+              and cleared == ['double'])
+    print(f" repair test {'PASSED' if passed else 'FAILED'} ({stats}, cleared {cleared})")
+    return passed
+
+
+def main():
+    """Run all manifest tests"""
+    print("Starting incremental manifest tests...")
+    print("=" * 60)
+
+    results = [
+        test_incremental_runs(),
+        test_dependency_signature_change(),
+        test_repair_is_stored_per_unit(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Manifest tests passed!")
+        return 0
+    else:
+        print("\n Some manifest tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test file for NumPy kernel detection, the Eigen/ndarray mapping and the numeric check
+"""
+
+import ast
+import sys
+import tempfile
+import py_compile
+from pathlib import Path
+
+from src.core.analysis import analyze_module, numpy_aliases
+from src.core.main import translation_context
+from src.core.numeric import (
+    EIGEN_ARRAYS, kernel_binding_context, kernel_parameters, numpy_context, print_numeric_report, run_harness,
+    write_harness,
+)
+
+KERNELS = """import numpy as np
+from numpy import exp, linalg
+
+
+def normalize(x, axis=0):
+    mean = x.mean(axis=axis)
+    std = np.sqrt(((x - mean) ** 2).mean(axis=axis))
+    return (x - mean) / std
+
+
+def softmax(logits, temperature: float = 1.0):
+    z = exp(logits / temperature - logits.max())
+    return z / z.sum()
+
+
+def gram(a):
+    return a.T @ a + linalg.norm(a[0, :]) * np.eye(a.shape[1])
+
+
+def label(n):
+    return "item %d" % n
+
+
+class Scaler:
+    def scale(self, x):
+        return np.sqrt(np.abs(x)) * np.sum(x) + np.mean(x)
+"""
+
+PLAIN = """import math
+
+
+def mean(values):
+    return sum(values) / len(values)
+"""
+
+
+def test_detection():
+    """Test NumPy call counting by category, aliases and kernel selection"""
+    print("Testing NumPy kernel detection...")
+    model = analyze_module(KERNELS)
+    functions = {function.qualname: function for function in model.functions}
+    kernels = [function.name for function in model.numpy_kernels()]
+    aliased = numpy_aliases(ast.parse("import numpy\nimport numpy as xp\nfrom numpy import dot as d\n"))
+
+    passed = (kernels == ['normalize', 'softmax', 'gram']
+              and functions['normalize'].numpy_ops.get('reduction', 0) >= 2
+              and functions['normalize'].numpy_ops.get('elementwise', 0) >= 1
+              and functions['softmax'].numpy_ops.get('elementwise') and functions['gram'].numpy_ops.get('linalg')
+              and functions['gram'].numpy_ops.get('creation')
+              and not functions['label'].numpy_ops and 'Scaler.scale' not in kernels
+              and analyze_module(PLAIN).numpy_kernels() == []
+              and aliased[0] == {'numpy', 'xp'} and aliased[1].get('d') == 'dot')
+    print(f" detection test {'PASSED' if passed else 'FAILED'} "
+          f"({kernels}, {[functions[name].numpy_ops for name in kernels]})")
+    return passed
+
+
+def test_mapping_and_parameters():
+    """Test the prompt mapping for both targets and the parameter guesses for the harness"""
+    print("\nTesting the Eigen/ndarray mapping and kernel parameters...")
+    cpp = numpy_context(KERNELS, 'cpp')
+    rust = numpy_context(KERNELS, 'rust')
+    combined = translation_context(KERNELS, "Use C++17.", 'cpp')
+    parameters = {name: kernel_parameters(KERNELS, name) for name in ('normalize', 'softmax', 'gram')}
+    binding = kernel_binding_context('kernels_native', ['normalize'], [], 'cpp')
+
+    passed = ('Eigen::ArrayXd' in cpp and 'normalize, softmax, gram' in cpp and 'RowMajor' in cpp
+              # The binding prompt uses the same Eigen types as the translation prompt
+              and all(f"const Eigen::Ref<const {EIGEN_ARRAYS[ndim]}>&" in binding
+                      and EIGEN_ARRAYS[ndim] in cpp for ndim in (1, 2))
+              and 'VectorXd' not in binding and 'Eigen::Matrix<' not in binding
+              and 'ArrayView1<f64>' in rust and 'Zip' in rust
+              and numpy_context(PLAIN, 'cpp') == "" and translation_context(PLAIN, "ctx", 'cpp') == "ctx"
+              and combined.startswith("Use C++17.\n") and combined.endswith(cpp)
+              and translation_context(KERNELS, combined, 'cpp') == combined
+              and parameters['normalize'] == [{'name': 'x', 'kind': 'array', 'ndim': 1, 'value': None},
+                                              {'name': 'axis', 'kind': 'int', 'ndim': 0, 'value': 0}]
+              and parameters['softmax'][1] == {'name': 'temperature', 'kind': 'float', 'ndim': 0, 'value': 1.0}
+              and parameters['gram'][0]['ndim'] == 2)
+    print(f" mapping test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_harness_and_report():
+    """Test the generated check harness and the throughput report"""
+    print("\nTesting the numeric check harness...")
+    with tempfile.TemporaryDirectory() as tmp:
+        program = Path(tmp) / 'kernels.py'
+        program.write_text(KERNELS, encoding='utf-8')
+        # A pure-Python stand-in for the compiled extension, which needs pybind11 or PyO3 to build
+        (Path(tmp) / 'kernels_kernels.py').write_text(
+            "import numpy as np\n\ndef softmax(logits, temperature=1.0):\n"
+            "    z = np.exp(logits / temperature - np.max(logits))\n    return z / np.sum(z)\n", encoding='utf-8')
+        kernels = {'softmax': kernel_parameters(KERNELS, 'softmax')}
+        harness = write_harness(tmp, str(program), 'kernels_kernels', kernels, size=1000)
+        py_compile.compile(harness, doraise=True)
+        results, errors = run_harness(harness)
+
+    ran = (results is not None and results['softmax']['ok'] and results['softmax']['elements'] == 1000
+           or results is None and 'numpy is not installed' in errors)
+    report = {'softmax': {'ok': True, 'max_abs_error': 1e-17, 'elements': 2000000,
+                          'python_seconds': 0.02, 'native_seconds': 0.005},
+              'gram': {'ok': False, 'error': 'shape (3,), expected (3, 3)'}}
+    print_numeric_report(report)
+    passed = ran and Path(harness).name == 'check_kernels_kernels.py'
+    print(f" harness test {'PASSED' if passed else 'FAILED'} ({results or errors})")
+    return passed
+
+
+def main():
+    """Run all NumPy kernel tests"""
+    print("Starting NumPy kernel tests...")
+    print("=" * 60)
+
+    results = [
+        test_detection(),
+        test_mapping_and_parameters(),
+        test_harness_and_report(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n NumPy kernel tests passed!")
+        return 0
+    else:
+        print("\n Some NumPy kernel tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test file for the memory-bounded batch pipeline, mmap reads and atomic writes
+"""
+
+import io
+import os
+import sys
+import asyncio
+import tempfile
+import contextlib
+from pathlib import Path
+
+import src.core.batch as batch
+import src.core.main as migrator
+from src.core.batch import iter_batch_files, run_batch
+from src.core.main import read_python_file, write_cpp_file
+from src.core.pipeline import MemoryBudget, run_pipeline
+
+MOCK_CPP = "int main() {\n    return 0;\n}"
+
+
+def mock_convert_to_cpp(python_code, context="", cache=None):
+    return MOCK_CPP
+
+
+def test_lazy_backpressure():
+    """Test that discovery is pulled only as fast as the workers take files, with results in order"""
+    print("Testing lazy discovery and backpressure...")
+    pulled, running, seen = [0], [0], {'ahead': 0, 'running': 0}
+
+    def items():
+        for index in range(40):
+            pulled[0] += 1
+            yield index
+
+    async def handle(item):
+        running[0] += 1
+        seen['running'] = max(seen['running'], running[0])
+        # Items taken from the iterator but not yet finished: in the workers or in the queue
+        seen['ahead'] = max(seen['ahead'], pulled[0] - item)
+        await asyncio.sleep(0.001)
+        running[0] -= 1
+        return item * 2
+
+    results = asyncio.run(run_pipeline(items(), handle, workers=3))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for relative in ["b.py", "a.py", "pkg/c.py", "pkg/sub/d.py", "notes.txt"]:
+            path = Path(temp_dir) / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text("x = 1\n", encoding="utf-8")
+        root, files = iter_batch_files(temp_dir)
+        lazy = not isinstance(files, list)
+        names = [str(path.relative_to(root)) for path in files]
+
+    passed = (results == [index * 2 for index in range(40)] and seen['running'] == 3 and seen['ahead'] <= 8
+              and lazy and names == ["a.py", "b.py", "pkg/c.py", "pkg/sub/d.py"])
+    print(f" backpressure test {'PASSED' if passed else 'FAILED'} ({seen})")
+    return passed
+
+
+def test_memory_budget():
+    """Test that reservations stay within the budget, in order, and an oversized file runs alone"""
+    print("\nTesting the memory budget...")
+    budget = MemoryBudget(100)
+    in_use, trace = [0], []
+
+    async def handle(item):
+        name, size = item
+        in_use[0] += size
+        trace.append((name, in_use[0]))
+        await asyncio.sleep(0.005)
+        in_use[0] -= size
+        return name
+
+    items = [('a', 60), ('b', 30), ('c', 60), ('huge', 250), ('d', 10), ('e', 10)]
+    results = asyncio.run(run_pipeline(iter(items), handle, workers=4, budget=budget, weight=lambda item: item[1]))
+    alone = [usage for name, usage in trace if name == 'huge'] == [250]
+    within = all(usage <= 100 for name, usage in trace if name != 'huge')
+    starts = [name for name, _ in trace]
+
+    passed = (results == [name for name, _ in items] and alone and within and budget.in_use == 0
+              and budget.peak == 250 and budget.waits >= 2 and starts == [name for name, _ in items])
+    print(f" memory budget test {'PASSED' if passed else 'FAILED'} ({trace})")
+    return passed
+
+
+def test_reads_and_atomic_writes():
+    """Test mmap reads, atomic output writes and the memory report of a batch (MOCK API)"""
+    print("\nTesting mmap reads, atomic writes and the batch memory report...")
+    original_threshold, original_convert = migrator.MMAP_THRESHOLD, batch.convert_to_cpp
+    output = io.StringIO()
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            large = Path(temp_dir) / 'generated.py'
+            large.write_bytes(('TABLE = [\r\n' + '    1,\r\n' * 2000 + ']\r\n# é\r\n').encode('utf-8'))
+            migrator.MMAP_THRESHOLD = 1024
+            mapped = read_python_file(str(large))
+            migrator.MMAP_THRESHOLD = original_threshold
+            plain = read_python_file(str(large))
+
+            target = Path(temp_dir) / 'out.cpp'
+            with contextlib.redirect_stdout(io.StringIO()):
+                written = write_cpp_file(MOCK_CPP, str(target))
+                # Writing a non-string fails halfway through, like an interrupted run
+                interrupted = write_cpp_file(None, str(target))
+            kept = target.read_text(encoding='utf-8') == MOCK_CPP
+            leftovers = sorted(path.name for path in Path(temp_dir).iterdir())
+            mode = target.stat().st_mode & 0o777
+
+            batch.convert_to_cpp = mock_convert_to_cpp
+            with contextlib.redirect_stdout(output):
+                summary = run_batch(temp_dir, 'cpp', os.path.join(temp_dir, 'batch_out'),
+                                    validate=False, max_memory=1)
+    finally:
+        migrator.MMAP_THRESHOLD = original_threshold
+        batch.convert_to_cpp = original_convert
+
+    umask = os.umask(0)
+    os.umask(umask)
+    report = output.getvalue()
+    passed = (mapped == plain and mapped.startswith('TABLE = [\n    1,\n') and '\r' not in mapped
+              and mapped.endswith('# é\n') and written and not interrupted and kept
+              and leftovers == ['generated.py', 'out.cpp'] and mode == 0o666 & ~umask
+              and summary is not None and summary['succeeded'] == 1 and summary['peak_rss_mb'] > 0
+              and 'Memory: peak RSS' in report and 'memory budget 1 MB' in report)
+    print(f" read/write test {'PASSED' if passed else 'FAILED'} ({leftovers}, {oct(mode)})")
+    print(report[report.find('Memory:'):].rstrip())
+    return passed
+
+
+def main():
+    """Run all pipeline tests"""
+    print("Starting memory-bounded pipeline tests...")
+    print("=" * 60)
+
+    results = [
+        test_lazy_backpressure(),
+        test_memory_budget(),
+        test_reads_and_atomic_writes(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Pipeline tests passed!")
+        return 0
+    else:
+        print("\n Some pipeline tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
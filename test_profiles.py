@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test file for optimization-profile builds and the generated build scripts
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from pathlib import Path
+
+from src.core.main import validation_flags
+from src.core.profiles import PROFILES, binary_path, build_profile, write_build_script
+from src.core.speedup import select_fastest_profile
+
+FIB_CPP = """#include <iostream>
+long fib(long n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+int main() { long n = 20; if (!(std::cin >> n)) n = 20; std::cout << fib(n) << std::endl; }
+"""
+
+FIB_RUST = """use std::io::Read;
+fn fib(n: u64) -> u64 { if n < 2 { n } else { fib(n - 1) + fib(n - 2) } }
+fn main() {
+    let mut input = String::new();
+    std::io::stdin().read_to_string(&mut input).unwrap();
+    println!("{}", fib(input.trim().parse().unwrap_or(20)));
+}
+"""
+
+
+def _run(binary, input_text):
+    return subprocess.run([binary], input=input_text, capture_output=True, text=True).stdout.strip()
+
+
+def test_profile_builds():
+    """Test every C++ profile, PGO training data, a Rust build and build failures"""
+    print("Testing profile builds...")
+    outputs, pgo_data = {}, []
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in PROFILES:
+            directory = Path(tmp) / profile
+            directory.mkdir()
+            binary, errors = build_profile(FIB_CPP, 'cpp', profile, str(directory), {'train': '22'})
+            outputs[profile] = _run(binary, '25') if binary else errors
+        pgo_data = [name for _, _, files in os.walk(Path(tmp) / 'pgo' / 'pgo-data') for name in files]
+        rust_binary, _ = build_profile(FIB_RUST, 'rust', 'release', tmp)
+        rust_output = _run(rust_binary, '25') if rust_binary else None
+        broken, errors = build_profile('int main() { return }', 'cpp', 'release', tmp)
+        crashing, crash_errors = build_profile('int main() { return 3; }', 'cpp', 'pgo', tmp)
+
+    passed = (set(outputs.values()) == {'75025'} and any(name.endswith('.gcda') for name in pgo_data)
+              and rust_output == '75025' and broken is None and 'error' in errors
+              and crashing is None and 'exited with 3' in crash_errors
+              and '-march=native' in validation_flags('release-native', 'cpp')
+              and validation_flags('auto', 'cpp') == () and validation_flags('lto', 'rust') == ())
+    print(f" builds test {'PASSED' if passed else 'FAILED'} ({outputs}, Rust {rust_output})")
+    return passed
+
+
+def test_build_scripts():
+    """Test the generated CMake target files and build scripts, and that hand-written scripts are kept"""
+    print("\nTesting generated build scripts...")
+    with tempfile.TemporaryDirectory() as tmp:
+        cpp_output, rust_output = Path(tmp) / 'cpp' / 'fib.cpp', Path(tmp) / 'rust' / 'fib.rs'
+        for path, code in ((cpp_output, FIB_CPP), (rust_output, FIB_RUST)):
+            path.parent.mkdir()
+            path.write_text(code, encoding='utf-8')
+        lto = Path(write_build_script(str(cpp_output), 'cpp', 'lto')).read_text(encoding='utf-8')
+        target = Path(write_build_script(str(cpp_output), 'cpp', 'pgo'))
+        pgo = target.read_text(encoding='utf-8')
+        # A second output in the same directory adds its own target instead of replacing fib's
+        (cpp_output.parent / 'fib2.cpp').write_text(FIB_CPP, encoding='utf-8')
+        second = Path(write_build_script(str(cpp_output.parent / 'fib2.cpp'), 'cpp', 'release'))
+        cmake = cpp_output.parent / 'CMakeLists.txt'
+        project = cmake.read_text(encoding='utf-8')
+        both_kept = target.read_text(encoding='utf-8') == pgo and second != target
+        built = True
+        if shutil.which('cmake'):
+            build = cmake.parent / 'build'
+            stages = [['cmake', '-S', str(cmake.parent), '-B', str(build), '-DPGO_STAGE=generate'],
+                      ['cmake', '--build', str(build)], [str(build / 'fib')],
+                      ['cmake', '-S', str(cmake.parent), '-B', str(build), '-DPGO_STAGE=use'],
+                      ['cmake', '--build', str(build)]]
+            built = all(subprocess.run(stage, input='20', capture_output=True, text=True).returncode == 0
+                        for stage in stages) and _run(str(build / 'fib'), '25') == '75025' \
+                and _run(str(build / 'fib2'), '25') == '75025'
+        script = write_build_script(str(rust_output), 'rust', 'release')
+        (rust_output.parent / 'fib2.rs').write_text(FIB_RUST, encoding='utf-8')
+        rust_scripts = {script, write_build_script(str(rust_output.parent / 'fib2.rs'), 'rust', 'release')}
+        subprocess.run([script], capture_output=True, check=True)
+        rust_built = _run(binary_path(str(rust_output)), '25')
+        cmake.write_text("add_executable(app main.cpp)\n", encoding='utf-8')
+        kept = write_build_script(str(cpp_output), 'cpp', 'release') is None
+        hand_written = cmake.read_text(encoding='utf-8')
+
+    passed = ('-flto' in lto and 'target_link_options' in lto and 'CMAKE_CXX_STANDARD 17' in project
+              and '-fprofile-generate=${PGO_DIR}' in pgo and '-fprofile-use=${PGO_DIR}' in pgo and built
+              and rust_built == '75025' and kept and hand_written.startswith('add_executable(app')
+              and both_kept and target.name == 'fib.target.cmake'
+              and sorted(Path(path).name for path in rust_scripts) == ['fib.build.sh', 'fib2.build.sh'])
+    print(f" build script test {'PASSED' if passed else 'FAILED'} (cmake PGO build ok: {built})")
+    return passed
+
+
+def test_auto_selection():
+    """Test that auto-selection times every candidate and skips ones that fail"""
+    print("\nTesting fastest-profile selection...")
+    fastest, timings = select_fastest_profile(FIB_CPP, 'cpp', {'heavy': '32'}, ('debug', 'release'), runs=2)
+    none, failures = select_fastest_profile('int main() { return 1; }', 'cpp', profiles=('release',), runs=1)
+
+    passed = (fastest == 'release' and timings['release'] < timings['debug']
+              and none is None and isinstance(failures['release'], str))
+    print(f" auto selection test {'PASSED' if passed else 'FAILED'} ({timings})")
+    return passed
+
+
+def main():
+    """Run all profile tests"""
+    print("Starting build profile tests...")
+    print("=" * 60)
+
+    results = [
+        test_profile_builds(),
+        test_build_scripts(),
+        test_auto_selection(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Build profile tests passed!")
+        return 0
+    else:
+        print("\n Some build profile tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test file for import-graph ordered project migration
+"""
+
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+import src.core.batch as batch
+from src.core.batch import run_batch
+from src.core.project import build_import_graph, topological_waves, extract_interface
+
+PROJECT = {
+    "shapes/__init__.py": "",
+    "shapes/geometry.py": "def area(w, h):\n    return w * h\n",
+    "shapes/report.py": "from .geometry import area\n\ndef describe(w, h):\n    return f'{area(w, h)}'\n",
+    "app.py": "import os\nfrom shapes import report\n\nprint(report.describe(2, 3))\n",
+    "cycle_a.py": "import cycle_b\n",
+    "cycle_b.py": "import cycle_a\n",
+    "uses_cycle.py": "import cycle_b\n",
+}
+
+GEOMETRY_CPP = """#include <iostream>
+
+int area(int w,
+         int h) {
+    return w * h;
+}
+"""
+
+
+def create_project(root):
+    for relative, source in PROJECT.items():
+        path = Path(root) / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source, encoding="utf-8")
+
+
+def test_import_graph_and_waves():
+    """Test relative/package imports, wave order and cycle handling"""
+    print("Testing import graph and waves...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        create_project(temp_dir)
+        root = Path(temp_dir)
+        sources = {root / relative: source for relative, source in PROJECT.items()}
+        graph = build_import_graph(sources, root)
+        waves = [[str(path.relative_to(root)) for path in wave] for wave in topological_waves(graph)]
+
+    # Only the cycle's own members share a wave; a module importing the cycle still comes after it
+    passed = (waves == [["cycle_a.py", "cycle_b.py", "shapes/__init__.py", "shapes/geometry.py"],
+                        ["shapes/report.py", "uses_cycle.py"], ["app.py"]])
+    print(f" waves test {'PASSED' if passed else 'FAILED'} ({waves})")
+    return passed
+
+
+def test_extract_interface():
+    """Test that bodies are reduced to declarations and main is dropped"""
+    print("\nTesting interface extraction...")
+    cpp = extract_interface(GEOMETRY_CPP + "\nint main() {\n    return area(1, 2);\n}\n", 'cpp')
+    rust = extract_interface("pub fn area(w: i32, h: i32) -> i32 {\n    w * h\n}\n\n"
+                             "fn helper() {}\n\nfn main() {}\n", 'rust')
+    passed = (cpp == "int area(int w,\n         int h);"
+              and rust == "pub fn area(w: i32, h: i32) -> i32;")
+    print(f" interface test {'PASSED' if passed else 'FAILED'} ({cpp!r}, {rust!r})")
+    return passed
+
+
+def test_project_batch_passes_signatures():
+    """Test that dependents get their dependencies' translated signatures only (MOCK API)"""
+    print("\nTesting project batch run (MOCK API)...")
+    contexts = {}
+
+    def convert(python_code, context="", cache=None):
+        contexts[python_code] = context
+        if "def describe" in python_code:
+            return "std::string describe(int w, int h) {\n    return std::to_string(area(w, h));\n}\n"
+        return GEOMETRY_CPP if "def area" in python_code else "int value = 1;\n"
+
+    original = batch.convert_to_cpp
+    batch.convert_to_cpp = convert
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            create_project(os.path.join(temp_dir, "src"))
+            summary = run_batch(os.path.join(temp_dir, "src"), "cpp", os.path.join(temp_dir, "out"),
+                                validate=False, project=True)
+    finally:
+        batch.convert_to_cpp = original
+
+    report_context = contexts[PROJECT["shapes/report.py"]]
+    passed = (summary is not None and summary['succeeded'] == len(PROJECT)
+              and "int area(int w,\n         int h);" in report_context
+              and "return w * h" not in report_context
+              and "std::string describe(int w, int h);" in contexts[PROJECT["app.py"]])
+    print(f" project batch test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    """Run all project scheduling tests"""
+    print("Starting project scheduling tests...")
+    print("=" * 60)
+
+    results = [
+        test_import_graph_and_waves(),
+        test_extract_interface(),
+        test_project_batch_passes_signatures(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Project scheduling tests passed!")
+        return 0
+    else:
+        print("\n Some project scheduling tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
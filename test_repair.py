@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test file for the compiler-error-driven repair loop
+"""
+
+import sys
+
+from src.core.repair import parse_diagnostics, find_top_level_blocks, repair
+from src.core.validation import run_compile
+
+BROKEN_CPP = """#include <iostream>
+#include <string>
+
+std::string greet(const std::string& name) {
+    return "Hello, " + name + "!";
+}
+
+int add(int a, int b) {
+    return a + b
+}
+
+int main() {
+    std::cout << greet("World") << std::endl;
+    std::cout << add(2, 3) << std::endl;
+    return 0;
+}
+"""
+
+FIXED_ADD = """int add(int a, int b) {
+    return a + b;
+}"""
+
+
+def test_parse_diagnostics():
+    """Test that g++ errors are mapped back to the enclosing function"""
+    print("Testing diagnostic parsing...")
+    result = run_compile(BROKEN_CPP, 'syntax')
+    diagnostics = parse_diagnostics(result['errors'])
+    spans = find_top_level_blocks(BROKEN_CPP)
+
+    passed = (not result['success'] and diagnostics and diagnostics[0]['line'] == 9
+              and spans == [(4, 6), (8, 10), (12, 16)])
+    print(f" diagnostics test {'PASSED' if passed else 'FAILED'} ({diagnostics[:1]}, {spans})")
+    return passed
+
+
+def test_repair_sends_only_failing_function():
+    """Test that only the broken function is sent back and spliced in"""
+    print("\nTesting repair loop (MOCK API)...")
+    prompts = []
+
+    def complete(prompt):
+        prompts.append(prompt)
+        return FIXED_ADD
+
+    code, success, errors, stats = repair(BROKEN_CPP, 'cpp', lambda c: run_compile(c, 'syntax'), complete)
+
+    passed = (success and len(prompts) == 1 and "int add(int a, int b)" in prompts[0]
+              and "return \"Hello, \"" not in prompts[0] and "return a + b;" in code
+              and stats['iterations'] == 1 and stats['fragments'] == 1)
+    print(f" repair test {'PASSED' if passed else 'FAILED'} ({stats})")
+    return passed
+
+
+def test_repair_respects_budgets():
+    """Test that the loop stops at the iteration and token budgets"""
+    print("\nTesting repair budgets (MOCK API)...")
+    calls = []
+
+    def unhelpful(prompt):
+        calls.append(prompt)
+        return "int add(int a, int b) {\n    return a + b\n}"
+
+    validate = lambda c: run_compile(c, 'syntax')
+    _, iter_success, _, iter_stats = repair(BROKEN_CPP, 'cpp', validate, unhelpful, max_iterations=2)
+    calls_after_iterations = len(calls)
+    _, token_success, _, token_stats = repair(BROKEN_CPP, 'cpp', validate, unhelpful, token_budget=10)
+
+    passed = (not iter_success and iter_stats['iterations'] == 2 and calls_after_iterations == 2
+              and not token_success and token_stats['iterations'] == 0 and len(calls) == 2)
+    print(f" budget test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    """Run all repair tests"""
+    print("Starting repair loop tests...")
+    print("=" * 60)
+
+    results = [
+        test_parse_diagnostics(),
+        test_repair_sends_only_failing_function(),
+        test_repair_respects_budgets(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Repair tests passed!")
+        return 0
+    else:
+        print("\n Some repair tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test file for Rust validation (rustc checks, verdict cache, repair diagnostics)
+"""
+
+import sys
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+import src.core.rust_validation as rust_validation
+
+from src.core.repair import parse_diagnostics, repair
+from src.core.rust_validation import RustWorkspace, external_crates, parse_dependency_spec
+from src.core.validation import ValidationPool, run_rust_check
+
+VALID_RUST = """fn add(a: i32, b: i32) -> i32 {
+    a + b
+}
+
+fn main() {
+    println!("{}", add(2, 3));
+}
+"""
+
+BROKEN_RUST = """fn greet(name: &str) -> String {
+    format!("Hello, {}!", name)
+}
+
+fn add(a: i32, b: i32) -> i32 {
+    let total: String = a + b;
+    total
+}
+
+fn main() {
+    println!("{} {}", greet("World"), add(2, 3));
+}
+"""
+
+FIXED_ADD = """fn add(a: i32, b: i32) -> i32 {
+    let total: i32 = a + b;
+    total
+}"""
+
+
+def test_rustc_check():
+    """Test the metadata-only rustc check on valid, broken and library code"""
+    print("Testing rustc checks...")
+    valid = run_rust_check(VALID_RUST, 'syntax')
+    broken = run_rust_check(BROKEN_RUST, 'syntax')
+    library = run_rust_check("pub fn double(x: i32) -> i32 {\n    x * 2\n}\n", 'syntax')
+    linked = run_rust_check(VALID_RUST, 'link')
+
+    passed = (valid['success'] and not broken['success'] and "E0308" in broken['errors']
+              and library['success'] and linked['success'])
+    print(f" rustc check test {'PASSED' if passed else 'FAILED'} "
+          f"(syntax {valid['duration']:.2f}s, link {linked['duration']:.2f}s)")
+    return passed
+
+
+def test_verdict_cache():
+    """Test that repeated Rust checks are answered from the workspace cache"""
+    print("\nTesting Rust verdict cache...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workspace = RustWorkspace(temp_dir)
+        first = workspace.validate(VALID_RUST, 'syntax')
+        second = workspace.validate(VALID_RUST, 'syntax')
+        broken_first = workspace.validate(BROKEN_RUST, 'syntax')
+        broken_second = workspace.validate(BROKEN_RUST, 'syntax')
+
+    passed = (first['success'] and not first['cache_hit'] and second['cache_hit']
+              and second['time_saved'] > 0 and broken_second['cache_hit']
+              and broken_second['errors'] == broken_first['errors'])
+    print(f" verdict cache test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_cargo_check():
+    """Test that cargo checks library code and gives concurrent checks their own target dir"""
+    print("\nTesting cargo checks...")
+    library = "pub fn double(x: i32) -> i32 {\n    x * 2\n}\n"
+    saved_slots = rust_validation.TARGET_SLOTS
+    rust_validation.TARGET_SLOTS = 2
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            workspace = RustWorkspace(temp_dir)
+            checked_library = workspace.cargo_check(library, 'syntax')
+            checked_broken = workspace.cargo_check(BROKEN_RUST, 'syntax')
+            # Candidates check the same code from several threads of one process
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                concurrent = list(pool.map(lambda _: workspace.cargo_check(library, 'syntax'), range(2)))
+            with workspace._target_slot() as first, workspace._target_slot() as second:
+                distinct = first != second
+    finally:
+        rust_validation.TARGET_SLOTS = saved_slots
+
+    passed = (checked_library['success'] and not checked_broken['success'] and distinct
+              and all(result['success'] for result in concurrent))
+    print(f" cargo check test {'PASSED' if passed else 'FAILED'} ({checked_library['errors']})")
+    return passed
+
+
+def test_dependency_detection():
+    """Test crate detection and --rust-deps parsing"""
+    print("\nTesting dependency detection...")
+    crates = external_crates("use std::io;\nuse ndarray::Array2;\nextern crate rand;\nuse crate::x;\n")
+    spec = parse_dependency_spec("ndarray=0.15, rand")
+    passed = crates == {'ndarray', 'rand'} and spec == {'ndarray': '0.15', 'rand': '*'}
+    print(f" dependency test {'PASSED' if passed else 'FAILED'} ({crates}, {spec})")
+    return passed
+
+
+def test_rust_repair():
+    """Test that rustc diagnostics drive the repair loop to the failing function"""
+    print("\nTesting Rust repair (MOCK API)...")
+    diagnostics = parse_diagnostics(run_rust_check(BROKEN_RUST, 'syntax')['errors'], '.rs')
+    prompts = []
+
+    def complete(prompt):
+        prompts.append(prompt)
+        return FIXED_ADD
+
+    code, success, _, stats = repair(BROKEN_RUST, 'rust', lambda c: run_rust_check(c, 'syntax'), complete)
+
+    passed = (diagnostics and diagnostics[0]['line'] == 6 and success and len(prompts) == 1
+              and "fn add" in prompts[0] and "format!" not in prompts[0] and stats['fragments'] == 1)
+    print(f" rust repair test {'PASSED' if passed else 'FAILED'} ({diagnostics[:1]})")
+    return passed
+
+
+def test_parallel_pool():
+    """Test that the pool checks Rust units concurrently"""
+    print("\nTesting Rust validation pool...")
+    sources = {f"unit_{i}.rs": VALID_RUST.replace("2, 3", f"{i}, 3") for i in range(4)}
+    sources["broken.rs"] = BROKEN_RUST
+    with ValidationPool(language='rust') as pool:
+        results = dict(pool.validate_many(sources, 'syntax', unity=True))
+
+    passed = (not results["broken.rs"]['success']
+              and all(results[f"unit_{i}.rs"]['success'] for i in range(4)))
+    print(f" pool test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def main():
+    """Run all Rust validation tests"""
+    print("Starting Rust validation tests...")
+    print("=" * 60)
+
+    results = [
+        test_rustc_check(),
+        test_verdict_cache(),
+        test_cargo_check(),
+        test_dependency_detection(),
+        test_rust_repair(),
+        test_parallel_pool(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Rust validation tests passed!")
+        return 0
+    else:
+        print("\n Some Rust validation tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test file for the rate-limit-aware request scheduler
+"""
+
+import sys
+import time
+import asyncio
+
+import src.core.backends as backends
+from src.core.backends import OpenAIBackend, add_rate_limit_listener, remove_rate_limit_listener
+from src.core.scheduler import RequestScheduler, TokenBucket, parse_reset, read_rate_limit_headers
+
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+    def __init__(self, headers):
+        super().__init__("HTTP 429")
+        self.response = Response(headers)
+
+
+def test_shortest_job_first():
+    """Test that queued requests are admitted cheapest first"""
+    print("Testing shortest-job-first admission...")
+    scheduler = RequestScheduler(max_concurrency=1)
+    order = []
+
+    async def request(cost):
+        async with scheduler.slot(cost):
+            order.append(cost)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        first = asyncio.create_task(request(0))
+        await asyncio.sleep(0)
+        await asyncio.gather(first, *(request(cost) for cost in (5000, 40, 900, 40)))
+
+    asyncio.run(run())
+    passed = order == [0, 40, 40, 900, 5000] and scheduler.active == 0
+    print(f" SJF test {'PASSED' if passed else 'FAILED'} ({order})")
+    return passed
+
+
+def test_budgets_from_headers():
+    """Test header parsing and that an exhausted token budget delays admission"""
+    print("\nTesting token buckets and rate-limit headers...")
+    headers = {'x-ratelimit-limit-tokens': '6000', 'x-ratelimit-remaining-tokens': '0',
+               'x-ratelimit-reset-tokens': '500ms', 'x-ratelimit-remaining-requests': '99'}
+    parsed = read_rate_limit_headers(headers)
+    anthropic = read_rate_limit_headers({'anthropic-ratelimit-requests-limit': '50',
+                                         'anthropic-ratelimit-requests-remaining': '49'})
+    scheduler = RequestScheduler(max_concurrency=4, rpm=600)
+
+    async def run():
+        async with scheduler.slot(10):
+            scheduler.observe(headers)
+        await asyncio.sleep(0)
+        started = time.monotonic()
+        # The bucket refills at the 6000/min limit, never faster because of a short reset
+        async with scheduler.slot(30):
+            pass
+        return time.monotonic() - started
+
+    waited = asyncio.run(run())
+    passed = (parsed['tokens'] == (6000.0, 0.0, 0.5) and parsed['requests'] == (None, 99.0, None)
+              and anthropic['requests'] == (50.0, 49.0, None)
+              and parse_reset('6m0s') == 360.0 and parse_reset('1s') == 1.0 and parse_reset('soon') is None
+              and scheduler.tokens is not None and scheduler.tokens.capacity == 6000.0
+              and scheduler.stats['requests'] == 2 and 0.2 <= waited < 1.0)
+    print(f" budget test {'PASSED' if passed else 'FAILED'} (waited {waited:.2f}s for 30 tokens)")
+    return passed
+
+
+def test_headers_never_raise_the_budget():
+    """Test that shared rate-limit headers lower a bucket's rate but never lift it past the budget"""
+    print("\nTesting bucket rate ceiling...")
+    bucket = TokenBucket(60)
+    bucket.sync(10, 1.2)
+    fast_reset = bucket.rate
+    bucket.sync(0, 120)
+    slow_reset = bucket.rate
+    bucket.sync(60)
+    recovered = bucket.rate
+
+    passed = fast_reset == 1.0 and slow_reset == 0.5 and recovered == 1.0
+    print(f" rate ceiling test {'PASSED' if passed else 'FAILED'} ({fast_reset}, {slow_reset}, {recovered}/s)")
+    return passed
+
+
+def test_aimd_concurrency():
+    """Test that a 429 halves concurrency once, successes grow it back, and backends report throttles"""
+    print("\nTesting AIMD concurrency control...")
+    scheduler = RequestScheduler(max_concurrency=8)
+    in_flight, peak = [0], [0]
+    original_sleep = backends.time.sleep
+    backends.time.sleep = lambda delay: None
+    errors = [RateLimited({'retry-after': '0'})]
+
+    def complete(prompt, max_tokens):
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    backend = OpenAIBackend('test-model', max_retries=2)
+    backend._complete = complete
+
+    async def request():
+        async with scheduler.slot(1):
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+
+    async def run():
+        async with scheduler.slot(1):
+            await asyncio.to_thread(backend.complete, "prompt", 10)
+            scheduler.observe({}, throttled=True)
+        await asyncio.sleep(0.01)
+        after_throttles = scheduler.limit
+        await asyncio.gather(*(request() for _ in range(12)))
+        return after_throttles
+
+    add_rate_limit_listener(scheduler.observe)
+    try:
+        after_throttles = asyncio.run(run())
+    finally:
+        remove_rate_limit_listener(scheduler.observe)
+        backends.time.sleep = original_sleep
+
+    passed = (after_throttles == 4.0 and scheduler.stats['throttled'] == 2 and peak[0] <= 4
+              and scheduler.stats['min_limit'] == 4.0)
+    # Successes only arrive through observe(); none were reported here, so the limit holds
+    scheduler.limit = 2.0
+    for _ in range(4):
+        scheduler._apply_feedback({}, False)
+    passed = passed and 3.0 <= scheduler.limit < 4.0
+    print(f" AIMD test {'PASSED' if passed else 'FAILED'} "
+          f"(limit {after_throttles} after throttles, peak {peak[0]}, grew to {scheduler.limit:.2f})")
+    return passed
+
+
+def main():
+    """Run all scheduler tests"""
+    print("Starting scheduler tests...")
+    print("=" * 60)
+
+    results = [
+        test_shortest_job_first(),
+        test_budgets_from_headers(),
+        test_headers_never_raise_the_budget(),
+        test_aimd_concurrency(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Scheduler tests passed!")
+        return 0
+    else:
+        print("\n Some scheduler tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
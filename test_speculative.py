@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test file for speculative multi-candidate translation
+"""
+
+import io
+import os
+import sys
+import asyncio
+import tempfile
+import contextlib
+from pathlib import Path
+
+from src.core.backends import register_backend, reset_backends
+from src.core.batch import run_batch
+from src.core.scheduler import RequestScheduler
+from src.core.speculative import candidate_score, candidate_temperatures, race_candidates
+
+VALID_CPP = "int add(int a, int b) { return a + b; }\nint main() { return add(1, 2) - 3; }\n"
+BROKEN_CPP = "int add(int a, int b) { return a + b }\nint main() { return 0; }\n"
+PROGRAM = "def add(a, b):\n    return a + b\n\nif __name__ == '__main__':\n    print(add(1, 2))\n"
+
+
+async def fake_validate(code):
+    await asyncio.sleep(0.01)
+    success = 'BAD' not in code
+    return {'success': success, 'errors': None if success else 'x.cpp:1: error: BAD\n' * code.count('BAD'),
+            'duration': 0.01}
+
+
+def test_race():
+    """Test first-valid selection, cancellation, size ranking and the fallback when none is valid"""
+    print("Testing the candidate race...")
+    started, cancelled = [], []
+
+    def fake_complete(replies):
+        async def complete(temperature, extra):
+            started.append((temperature, extra))
+            delay, code = replies[temperature]
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(temperature)
+                raise
+            return code
+        return complete
+
+    temperatures = candidate_temperatures(4)
+    # The usual candidate is broken, two valid ones arrive together, the slowest is cancelled
+    replies = dict(zip(temperatures, [(0.01, 'BAD long'), (0.05, 'int f() {\n    int one = 1;\n    return one;\n}'),
+                                      (0.05, 'int f(){return 1;}  '), (5.0, 'never')]))
+    code, verdict, stats = asyncio.run(race_candidates(4, fake_complete(replies), fake_validate, prompt_tokens=100))
+    first_started = list(started)
+    failing = dict(zip(candidate_temperatures(3), [(0.01, 'BAD BAD'), (0.02, None), (0.03, 'BAD x')]))
+    started.clear()
+    fallback, fallback_verdict, fallback_stats = asyncio.run(race_candidates(3, fake_complete(failing),
+                                                                             fake_validate))
+    ranked = sorted([('compiles', {'success': False, 'compiled': True, 'errors': 'stdout differs'}),
+                     ('short', {'success': True}), ('a much longer one', {'success': True}),
+                     ('x', {'success': False, 'errors': 'a: error\nb: error'})],
+                    key=lambda entry: candidate_score(*entry), reverse=True)
+
+    passed = (temperatures == [0.1, 0.4, 0.7, 1.0] and code == 'int f(){return 1;}  ' and verdict['success']
+              and stats['winner'] == 2 and stats['arrived'] == 3 and stats['cancelled'] == 1
+              and cancelled == [1.0] and stats['extra_tokens'] > stats['cancelled_tokens'] == 100
+              and [extra for _, extra in first_started] == [False, True, True, True]
+              and fallback == 'BAD x' and not fallback_verdict['success'] and fallback_stats['winner'] == 2
+              and not fallback_stats['valid'] and fallback_stats['arrived'] == 2
+              and [name for name, _ in ranked] == ['short', 'a much longer one', 'compiles', 'x'])
+    print(f" race test {'PASSED' if passed else 'FAILED'} ({stats})")
+    return passed
+
+
+def test_extra_candidates_yield():
+    """Test that extra candidates wait while ordinary requests queue for a slot"""
+    print("\nTesting scheduler priority for extra candidates...")
+    order = []
+
+    async def run():
+        scheduler = RequestScheduler(1)
+
+        async def request(name, cost, priority):
+            async with scheduler.slot(cost, priority=priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        holder = asyncio.create_task(request('first', 10, 0))
+        await asyncio.sleep(0)
+        await asyncio.gather(holder, request('extra', 1, 1), request('ordinary', 50, 0),
+                             request('cheap', 5, 0))
+
+    asyncio.run(run())
+    passed = order == ['first', 'cheap', 'ordinary', 'extra']
+    print(f" priority test {'PASSED' if passed else 'FAILED'} ({order})")
+    return passed
+
+
+class RacingBackend:
+    """Test double: the usual temperature answers fast with broken code, hotter ones slower and valid"""
+
+    model = 'race-model'
+    provider = 'test'
+
+    def __init__(self):
+        self.temperatures = []
+
+    async def acomplete(self, prompt, max_tokens, temperature=None):
+        self.temperatures.append(temperature)
+        if temperature == 0.1:
+            await asyncio.sleep(0.01)
+            return BROKEN_CPP
+        await asyncio.sleep(0.2 * temperature)
+        return VALID_CPP
+
+
+def test_batch_speculation():
+    """Test a batch with --candidates: valid winners, no compile step after the race and the report"""
+    print("\nTesting speculative batch migration (MOCK BACKEND)...")
+    backend = RacingBackend()
+    register_backend('cpp', backend)
+    output = io.StringIO()
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            for name in ('one', 'two'):
+                (source / f"{name}.py").write_text(PROGRAM, encoding='utf-8')
+            with contextlib.redirect_stdout(output):
+                summary = run_batch(str(source), 'cpp', os.path.join(temp_dir, 'out'), candidates=3,
+                                    max_repairs=0)
+            written = [Path(temp_dir, 'out', f"{name}.cpp").read_text(encoding='utf-8') for name in ('one', 'two')]
+    finally:
+        reset_backends()
+
+    report = output.getvalue()
+    passed = (summary is not None and summary['succeeded'] == 2 and all(code == VALID_CPP for code in written)
+              and summary['speculated'] == 2 and summary['race_valid'] == 2 and summary['race_winners'] == {1: 2}
+              and summary['race_cancelled'] == 2 and sorted(set(backend.temperatures)) == [0.1, 0.4, 0.7]
+              and 'Speculation: 2/2 files had a valid candidate' in report and 'winners by candidate #1: 2' in report)
+    print(f" batch speculation test {'PASSED' if passed else 'FAILED'}")
+    print(report[report.find('Speculation:'):].split('\n')[0])
+    return passed
+
+
+def main():
+    """Run all speculative translation tests"""
+    print("Starting speculative translation tests...")
+    print("=" * 60)
+
+    results = [
+        test_race(),
+        test_extra_candidates_yield(),
+        test_batch_speculation(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Speculative translation tests passed!")
+        return 0
+    else:
+        print("\n Some speculative translation tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test file for the translated-binary speedup report
+"""
+
+import sys
+import resource
+import tempfile
+from pathlib import Path
+
+from src.core.speedup import benchmark_translation, bootstrap_ratio_ci, run_limited
+
+FIB_PYTHON = """import sys
+
+def fib(n):
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+print(fib(int(sys.stdin.read() or 20)))
+"""
+
+FIB_CPP = """#include <iostream>
+long fib(long n) { return n < 2 ? n : fib(n - 1) + fib(n - 2); }
+int main() { long n = 20; if (!(std::cin >> n)) n = 20; std::cout << fib(n) << std::endl; }
+"""
+
+FIB_RUST = """use std::io::Read;
+fn fib(n: u64) -> u64 { if n < 2 { n } else { fib(n - 1) + fib(n - 2) } }
+fn main() {
+    let mut input = String::new();
+    std::io::stdin().read_to_string(&mut input).unwrap();
+    println!("{}", fib(input.trim().parse().unwrap_or(20)));
+}
+"""
+
+
+def test_run_limits():
+    """Test stdin/stdout plumbing, peak RSS and the time and memory limits"""
+    print("Testing limited runs...")
+    echo = run_limited([sys.executable, '-c', 'import sys; print(sys.stdin.read().upper())'], 'hello')
+    big = run_limited([sys.executable, '-c', 'import time; x = bytearray(150 * 1024 * 1024); time.sleep(0.05)'])
+    runaway = run_limited([sys.executable, '-c', 'while True: pass'], timeout=0.5)
+    hog = run_limited([sys.executable, '-c', 'x = bytearray(1024 ** 3)'], memory_mb=256)
+    # Without prlimit (macOS, BSD) the wall-clock kill still stops a runaway child
+    prlimit = resource.prlimit
+    del resource.prlimit
+    try:
+        portable = run_limited([sys.executable, '-c', 'while True: pass'], timeout=0.5)
+    finally:
+        resource.prlimit = prlimit
+
+    passed = (echo['stdout'] == 'HELLO\n' and echo['error'] is None and echo['rss_mb'] < 100
+              and big['rss_mb'] >= 150 and runaway['timed_out'] and runaway['wall'] < 3
+              and hog['returncode'] != 0 and 'MemoryError' in hog['error']
+              and portable['timed_out'] and portable['wall'] < 3)
+    print(f" limits test {'PASSED' if passed else 'FAILED'} "
+          f"(echo {echo['rss_mb']:.1f} MB, big {big['rss_mb']:.1f} MB, runaway {runaway['wall']:.2f}s)")
+    return passed
+
+
+def test_speedup_report():
+    """Test C++ and Rust builds against Python on several inputs, plus mismatches and build failures"""
+    print("\nTesting the speedup report...")
+    with tempfile.TemporaryDirectory() as tmp:
+        script = Path(tmp) / 'fib.py'
+        script.write_text(FIB_PYTHON, encoding='utf-8')
+        inputs = {'small': '15', 'large': '22'}
+        cpp = benchmark_translation(str(script), FIB_CPP, 'cpp', inputs, runs=3)
+        rust = benchmark_translation(str(script), FIB_RUST, 'rust', {'default': ''}, runs=2)
+        wrong = benchmark_translation(str(script), FIB_CPP.replace('n - 2', 'n - 3'), 'cpp', inputs, runs=1)
+        broken = benchmark_translation(str(script), 'int main() { return }', 'cpp', runs=1)
+
+    cases = {case['case']: case for case in cpp['cases']}
+    passed = (set(cases) == {'small', 'large'} and all(case['stdout_match'] for case in cpp['cases'])
+              and cases['large']['speedup'] > 1 and cases['large']['speedup_ci'][0] <= cases['large']['speedup']
+              and cases['large']['native_rss_mb'] < cases['large']['python_rss_mb']
+              and rust['cases'][0]['stdout_match'] and rust['cases'][0]['speedup'] > 0
+              and not any(case['stdout_match'] for case in wrong['cases'])
+              and broken['build_error'] and not broken['cases'])
+    print(f" report test {'PASSED' if passed else 'FAILED'} "
+          f"(C++ {cases['large']['speedup']:.1f}x, Rust {rust['cases'][0]['speedup']:.1f}x)")
+    return passed
+
+
+def test_confidence_interval():
+    """Test the bootstrap interval on constant and noisy samples"""
+    print("\nTesting bootstrap confidence intervals...")
+    exact = bootstrap_ratio_ci([2.0] * 5, [0.5] * 5)
+    noisy = bootstrap_ratio_ci([1.0, 1.2, 0.9, 1.1, 1.0], [0.10, 0.12, 0.09, 0.11, 0.10])
+    passed = exact == (4.0, 4.0) and noisy[0] < 10.0 < noisy[1] and noisy == bootstrap_ratio_ci(
+        [1.0, 1.2, 0.9, 1.1, 1.0], [0.10, 0.12, 0.09, 0.11, 0.10])
+    print(f" confidence interval test {'PASSED' if passed else 'FAILED'} ({exact}, {noisy})")
+    return passed
+
+
+def main():
+    """Run all speedup tests"""
+    print("Starting speedup tests...")
+    print("=" * 60)
+
+    results = [
+        test_run_limits(),
+        test_speedup_report(),
+        test_confidence_interval(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Speedup tests passed!")
+        return 0
+    else:
+        print("\n Some speedup tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
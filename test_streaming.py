@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test file for streamed translation output
+"""
+
+import io
+import sys
+import os
+import tempfile
+import contextlib
+from pathlib import Path
+
+import src.core.batch as batch
+from src.core.batch import run_batch
+from src.core.streaming import consume_stream, stream_to_partial, partial_path, StructureChecker
+
+CPP_CODE = """#include <iostream>
+
+int main() {
+    std::cout << "}" << std::endl; // a } in a comment
+    return 0;
+}
+"""
+
+
+def chunked(text, size=3, finish_reason='stop'):
+    """Split text into small chunks like a streaming API would"""
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    for index, piece in enumerate(pieces):
+        yield piece, finish_reason if index == len(pieces) - 1 else None
+
+
+def test_fences_are_stripped():
+    """Test that fences split across chunks are removed and trailing prose is never consumed"""
+    print("Testing fence stripping...")
+    consumed = []
+
+    def source():
+        for chunk in chunked("```cpp\n" + CPP_CODE + "```\nThis code prints a brace and exits.\n"):
+            consumed.append(chunk)
+            yield chunk
+
+    result = consume_stream(source(), 'cpp')
+    total_chunks = len(list(chunked("```cpp\n" + CPP_CODE + "```\nThis code prints a brace and exits.\n")))
+    passed = (not result['aborted'] and result['code'] == CPP_CODE
+              and len(consumed) < total_chunks and result['ttfb'] is not None)
+    print(f" fence test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_prose_aborts_early():
+    """Test that a prose answer is aborted before the whole response is read"""
+    print("\nTesting early abort on prose...")
+    consumed = []
+    text = "Here is the translated C++ program for you:\n" + CPP_CODE * 20
+
+    def source():
+        for chunk in chunked(text):
+            consumed.append(chunk)
+            yield chunk
+
+    result = consume_stream(source(), 'cpp')
+    passed = result['aborted'] and result['reason'] == "prose in output" and len(consumed) < 20
+    print(f" prose test {'PASSED' if passed else 'FAILED'} ({result['reason']}, {len(consumed)} chunks)")
+    return passed
+
+
+def test_structure_errors():
+    """Test unbalanced and truncated output detection"""
+    print("\nTesting structure checks...")
+    unbalanced = consume_stream(chunked("int main() {\n    return 0;\n}}\n"), 'cpp')
+    truncated = consume_stream(chunked("int main() {\n    return 0;\n", finish_reason='length'), 'cpp')
+    rust = StructureChecker('rust')
+    rust_reason = rust.feed("fn first<'a>(s: &'a str) -> char {\n    let c = '{';\n    s.chars().next().unwrap_or(c)\n}\n")
+
+    passed = (unbalanced['aborted'] and unbalanced['reason'].startswith("unbalanced")
+              and truncated['aborted'] and "unclosed" in truncated['reason']
+              and rust_reason is None and rust.finish() is None)
+    print(f" structure test {'PASSED' if passed else 'FAILED'} ({unbalanced['reason']}, {truncated['reason']})")
+    return passed
+
+
+def test_partial_file():
+    """Test that output lands in <output>.part and is removed on abort"""
+    print("\nTesting partial output files...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_path = os.path.join(temp_dir, "out.cpp")
+        good = stream_to_partial(chunked(CPP_CODE), 'cpp', output_path)
+        with open(partial_path(output_path), encoding='utf-8') as f:
+            written = f.read()
+        bad = stream_to_partial(chunked("int main() {\n"), 'cpp', os.path.join(temp_dir, "bad.cpp"))
+        bad_exists = os.path.exists(partial_path(os.path.join(temp_dir, "bad.cpp")))
+
+    passed = not good['aborted'] and written == CPP_CODE and bad['aborted'] and not bad_exists
+    print(f" partial file test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_stale_partial_is_not_finalized():
+    """Test that only a .part streamed by this run is moved into place, holding the returned code"""
+    print("\nTesting stale partial files...")
+    original_convert, original_stream = batch.convert_to_cpp, batch.stream_translation
+
+    def fake_stream(python_code, target_language, context, cache, output_path):
+        result = stream_to_partial(chunked("\n\n" + CPP_CODE + "\n\n"), target_language, output_path)
+        return result['code'], result
+
+    batch.convert_to_cpp = lambda python_code, context="", cache=None: "// chunked\n" + CPP_CODE
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = Path(temp_dir) / 'src'
+            source.mkdir()
+            (source / 'a.py').write_text("def f():\n    return 1\n", encoding='utf-8')
+            output_dir = Path(temp_dir) / 'out'
+            output_dir.mkdir()
+            partial = Path(partial_path(output_dir / 'a.cpp'))
+            outputs = []
+            for options in ({'chunked': True}, {}):
+                partial.write_text("junk from a crashed stream", encoding='utf-8')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    run_batch(str(source), 'cpp', str(output_dir), validate=False, stream=True, **options)
+                    batch.stream_translation = fake_stream
+                outputs.append(((output_dir / 'a.cpp').read_text(encoding='utf-8'), partial.exists()))
+    finally:
+        batch.convert_to_cpp, batch.stream_translation = original_convert, original_stream
+
+    passed = ('// chunked' in outputs[0][0] and 'junk' not in outputs[0][0] and not outputs[0][1]
+              and outputs[1] == (CPP_CODE, False))
+    print(f" stale partial test {'PASSED' if passed else 'FAILED'} ({[text[:12] for text, _ in outputs]})")
+    return passed
+
+
+def main():
+    """Run all streaming tests"""
+    print("Starting streaming tests...")
+    print("=" * 60)
+
+    results = [
+        test_fences_are_stripped(),
+        test_prose_aborts_early(),
+        test_structure_errors(),
+        test_partial_file(),
+        test_stale_partial_is_not_finalized(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Streaming tests passed!")
+        return 0
+    else:
+        print("\n Some streaming tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
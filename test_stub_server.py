@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test file for the offline OpenAI-compatible stub server
+"""
+
+import sys
+
+import src.core.backends as backends
+from src.core.backends import BackendError, OpenAIBackend
+from src.core.main import build_prompt
+from src.core.scheduler import read_rate_limit_headers
+from src.core.stub_server import StubLLMServer, prompt_digest, synthesize_completion
+from src.core.validation import run_compile
+
+PYTHON_CODE = """def add(a, b):
+    return a + b
+
+class Point:
+    pass
+
+if __name__ == "__main__":
+    print(add(1, 2))
+"""
+
+
+def test_replay_and_stream():
+    """Test recorded replay, synthesized fallbacks and streamed responses"""
+    print("Testing completion replay and streaming...")
+    recorded_prompt = build_prompt("x = 1\n", "", "C++")
+    recordings = [{'prompt_sha256': prompt_digest(recorded_prompt), 'completion': 'int main() { return 1; }'},
+                  {'contains': 'def greet', 'completion': 'void greet() {}'}]
+    with StubLLMServer(recordings, latency=0.01, jitter=0.005) as server:
+        backend = OpenAIBackend('stub-model', base_url=server.url, max_retries=0)
+        exact = backend.complete(recorded_prompt, 100)
+        partial = backend.complete(build_prompt("def greet():\n    pass\n", "", "C++"), 100)
+        synthesized = backend.complete(build_prompt(PYTHON_CODE, "", "C++"), 100)
+        streamed = ''.join(text for text, _ in backend.stream(build_prompt(PYTHON_CODE, "", "C++"), 100))
+        stats = dict(server.stats)
+
+    verdict = run_compile(synthesized, 'syntax')
+    rust = synthesize_completion(build_prompt(PYTHON_CODE, "", "Rust"))
+    unit = synthesize_completion(build_prompt("def helper(x):\n    return x\n", "", "C++"))
+    passed = (exact == 'int main() { return 1; }' and partial == 'void greet() {}'
+              and 'int64_t add(int64_t a, int64_t b)' in synthesized and 'struct Point' in synthesized
+              and verdict['success'] and streamed.strip() == synthesized
+              and 'fn add(a: i64, b: i64) -> i64' in rust and 'fn main()' in rust and 'main' not in unit
+              and stats['replayed'] == 2 and stats['completed'] == 4)
+    print(f" replay test {'PASSED' if passed else 'FAILED'} ({stats}, {verdict['errors']})")
+    return passed
+
+
+def test_rate_limit_responses():
+    """Test 429s with Retry-After and x-ratelimit-* headers once the window is full"""
+    print("\nTesting rate-limit responses...")
+    seen = []
+    with StubLLMServer(rpm=2) as server:
+        backend = OpenAIBackend('stub-model', base_url=server.url, max_retries=0)
+        backend.complete(build_prompt("x = 1\n", "", "C++"), 100)
+        raw = backend.client().chat.completions.with_raw_response.create(**backend._request("y = 2", 100))
+        seen.append(read_rate_limit_headers(raw.headers))
+        try:
+            backend.complete("z = 3", 100)
+            limited = False
+        except BackendError as e:
+            limited = '429' in str(e) or 'rate' in str(e).lower()
+            headers = e.__cause__.response.headers
+        stats = dict(server.stats)
+
+    requests = seen[0]['requests']
+    passed = (limited and requests[0] == 2.0 and requests[1] == 0.0 and 0 < requests[2] <= 60
+              and 0 < float(headers['retry-after']) <= 60 and stats['rate_limited'] == 1)
+    print(f" rate limit test {'PASSED' if passed else 'FAILED'} ({requests}, {stats})")
+    return passed
+
+
+def test_injected_errors():
+    """Test that error_rate turns responses into retryable 500s"""
+    print("\nTesting injected errors...")
+    with StubLLMServer(error_rate=1.0) as server:
+        backend = OpenAIBackend('stub-model', base_url=server.url, max_retries=1)
+        original_sleep = backends.time.sleep
+        backends.time.sleep = lambda delay: None
+        try:
+            backend.complete("x = 1", 100)
+            failed = False
+        except BackendError:
+            failed = True
+        finally:
+            backends.time.sleep = original_sleep
+        stats = dict(server.stats)
+
+    passed = failed and stats['errors'] == 2 and stats['requests'] == 2
+    print(f" injected error test {'PASSED' if passed else 'FAILED'} ({stats})")
+    return passed
+
+
+def main():
+    """Run all stub server tests"""
+    print("Starting stub server tests...")
+    print("=" * 60)
+
+    results = [
+        test_replay_and_stream(),
+        test_rate_limit_responses(),
+        test_injected_errors(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Stub server tests passed!")
+        return 0
+    else:
+        print("\n Some stub server tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
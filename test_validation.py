@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test file for the tiered validation pool
+"""
+
+import sys
+import time
+
+from src.core.validation import ValidationPool, run_compile
+
+NO_MAIN_CPP = """#include <string>
+
+std::string greet(const std::string& name) {
+    return "Hello, " + name;
+}"""
+
+BROKEN_CPP = """#include <iostream>
+
+int main() {
+    std::cout << "Hello" << std::endl
+    return 0;
+}"""
+
+VALID_CPP = """#include <iostream>
+
+int main() {
+    std::cout << "Hello" << std::endl;
+    return 0;
+}"""
+
+
+def test_tiers():
+    """Test that syntax-only accepts library code that a full link rejects"""
+    print("Testing validation tiers...")
+    syntax = run_compile(NO_MAIN_CPP, 'syntax')
+    obj = run_compile(NO_MAIN_CPP, 'object')
+    link = run_compile(NO_MAIN_CPP, 'link')
+    broken = run_compile(BROKEN_CPP, 'syntax')
+
+    passed = syntax['success'] and obj['success'] and not link['success'] and not broken['success']
+    print(f" tier test {'PASSED' if passed else 'FAILED'} "
+          f"(syntax {syntax['duration']:.2f}s, link {link['duration']:.2f}s)")
+    return passed
+
+
+def test_timeout_per_tier():
+    """Test that the configured timeout is applied"""
+    print("\nTesting per-tier timeout...")
+    result = run_compile(VALID_CPP, 'link', timeout=0.001)
+    passed = not result['success'] and "timed out" in result['errors']
+    print(f" timeout test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_validate_many_streams_results():
+    """Test that many units are validated in parallel and streamed back"""
+    print("\nTesting parallel validation of many units...")
+    sources = {f"unit_{i}.cpp": VALID_CPP for i in range(6)}
+    sources["broken.cpp"] = BROKEN_CPP
+    started = time.perf_counter()
+    with ValidationPool() as pool:
+        results = dict(pool.validate_many(sources, tier='syntax'))
+    elapsed = time.perf_counter() - started
+
+    passed = (len(results) == 7 and not results["broken.cpp"]['success']
+              and all(results[f"unit_{i}.cpp"]['success'] for i in range(6)))
+    print(f" validate_many test {'PASSED' if passed else 'FAILED'} ({elapsed:.2f}s)")
+    return passed
+
+
+def main():
+    """Run all validation tests"""
+    print("Starting validation pool tests...")
+    print("=" * 60)
+
+    results = [
+        test_tiers(),
+        test_timeout_per_tier(),
+        test_validate_many_streams_results(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Validation tests passed!")
+        return 0
+    else:
+        print("\n Some validation tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test file for the validation workspace (PCH, verdict cache, unity builds)
+"""
+
+import os
+import sys
+import tempfile
+
+from src.core.validation import ValidationPool, build_unity_source, run_compile
+from src.core.workspace import ValidationWorkspace, include_prefix
+
+VALID_CPP = """#include <iostream>
+#include <vector>
+
+int main() {
+    std::vector<int> values = {1, 2, 3};
+    std::cout << values.size() << std::endl;
+    return 0;
+}"""
+
+# Uses std::vector without including <vector>
+MISSING_INCLUDE_CPP = """#include <iostream>
+
+int main() {
+    std::vector<int> values{1, 2};
+    std::cout << values[0];
+    return 0;
+}"""
+
+BROKEN_CPP = """#include <string>
+
+std::string broken() {
+    return 42
+}"""
+
+
+def test_pch_and_verdict_cache():
+    """Test per-prefix PCHs, that no header is forced on a source, the verdict cache and pruning"""
+    print("Testing PCH build and verdict cache...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        workspace = ValidationWorkspace(temp_dir)
+        prefix = include_prefix(VALID_CPP)
+        unbuilt = workspace.ensure_pch(prefix)
+        header = workspace.ensure_pch(prefix)
+        with_pch = workspace.validate(VALID_CPP.replace('1, 2, 3', '4'), 'syntax')
+        workspace.ensure_pch(include_prefix(MISSING_INCLUDE_CPP))
+        missing = workspace.validate(MISSING_INCLUDE_CPP, 'syntax')
+        plain_missing = run_compile(MISSING_INCLUDE_CPP, 'syntax')
+        first = workspace.validate(VALID_CPP, 'syntax')
+        second = workspace.validate(VALID_CPP, 'syntax')
+        broken_first = workspace.validate(BROKEN_CPP, 'syntax')
+        broken_second = workspace.validate(BROKEN_CPP, 'syntax')
+        obj = workspace.validate(VALID_CPP, 'object')
+        object_cached = workspace.object_path(workspace.cache_key(VALID_CPP, 'object')).exists()
+        workspace.max_bytes = 64 * 1024
+        pruned = workspace.prune()
+        gch_kept = os.path.exists(header + '.gch')
+
+    passed = (prefix == ('iostream', 'vector') and unbuilt is None and header is not None and with_pch['success']
+              and not missing['success'] and not plain_missing['success'] and 'vector' in missing['errors']
+              and pruned <= 64 * 1024 and not gch_kept
+              and first['success'] and not first['cache_hit']
+              and second['success'] and second['cache_hit'] and second['time_saved'] > 0
+              and not broken_first['success'] and broken_second['cache_hit']
+              and broken_second['errors'] == broken_first['errors']
+              and obj['success'] and object_cached)
+    print(f" verdict cache test {'PASSED' if passed else 'FAILED'} "
+          f"(first {first['duration']:.2f}s, saved {second['time_saved']:.2f}s)")
+    return passed
+
+
+def test_unity_source():
+    """Test that units with clashing names still compile together"""
+    print("\nTesting unity source construction...")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        result = ValidationWorkspace(temp_dir).validate(build_unity_source([VALID_CPP, VALID_CPP]), 'syntax')
+    passed = result['success']
+    print(f" unity source test {'PASSED' if passed else 'FAILED'}")
+    return passed
+
+
+def test_pool_unity_with_fallback():
+    """Test unity validation in the pool, including attribution of a failing unit"""
+    print("\nTesting pool unity builds with fallback...")
+    sources = {f"ok_{i}.cpp": VALID_CPP.replace("1, 2, 3", f"{i}") for i in range(4)}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        with ValidationPool(workspace=ValidationWorkspace(temp_dir)) as pool:
+            good = dict(pool.validate_many(sources, 'syntax', unity=True))
+            mixed = dict(pool.validate_many(dict(sources, **{"broken.cpp": BROKEN_CPP}), 'syntax', unity=True))
+            # Grouped with units that include <vector>, this one would compile
+            missing = dict(pool.validate_many({"a.cpp": MISSING_INCLUDE_CPP, "b.cpp": MISSING_INCLUDE_CPP + "\n",
+                                               "c.cpp": VALID_CPP}, 'syntax', unity=True))
+            stats = dict(pool.stats)
+
+    passed = (all(result['success'] for result in good.values()) and good["ok_0.cpp"].get('unity')
+              and not mixed["broken.cpp"]['success']
+              and all(mixed[name]['success'] for name in sources)
+              and not missing["a.cpp"]['success'] and not missing["b.cpp"]['success'] and missing["c.cpp"]['success']
+              and stats['unity_builds'] == 2 and stats['misses'] == 6 and stats['hits'] == 1)
+    print(f" pool unity test {'PASSED' if passed else 'FAILED'} ({stats})")
+    return passed
+
+
+def main():
+    """Run all workspace tests"""
+    print("Starting validation workspace tests...")
+    print("=" * 60)
+
+    results = [
+        test_pch_and_verdict_cache(),
+        test_unity_source(),
+        test_pool_unity_with_fallback(),
+    ]
+
+    print("\n" + "=" * 60)
+    if all(results):
+        print("\n Workspace tests passed!")
+        return 0
+    else:
+        print("\n Some workspace tests failed!")
+        return 1
+
+if __name__ == "__main__":
+    sys.exit(main())